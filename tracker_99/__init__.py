@@ -20,8 +20,20 @@ from tracker_99.app_utils import validate_input, check_system, start_log_file, l
 from tracker_99.config import CONFIGS
 # Import a SQLAlchemy object
 from tracker_99.models import db, migrate, login_manager
+# Import the key manager for course keys
+from tracker_99.key_manager import key_manager
+# Import the in-process caches
+from tracker_99.caches import listing_counts, privilege_maps, token_cache, token_versions
 # Import profiler middleware
 from tracker_99.profiler import add_profiler_middleware
+# Import the per-request timers
+from tracker_99.instrumentation import init_instrumentation
+# Import the JSON provider for API responses
+from tracker_99.json_provider import init_json_provider
+# Import the SQLite connection settings
+from tracker_99.sqlite_pragmas import init_sqlite_pragmas
+# Import the worker pool for password hashes
+from tracker_99.password_service import password_service
 
 # Flask application factories require lazy loading to prevent circular imports,
 # so disable the warning
@@ -56,6 +68,9 @@ def create_app(config_name: str = 'default', log_events: Union[bool, None] = Non
     # Load the configuration class from config.py based on the environment
     _app.config.from_object(CONFIGS[config_name])
 
+    # Encode JSON responses with orjson, if it is installed, and support bytes, Rows, etc.
+    init_json_provider(_app)
+
     # Optionally add the profiler middleware based on configuration
     if _app.config.get('PROFILING_ENABLED', False):
         _app = add_profiler_middleware(_app)
@@ -63,6 +78,9 @@ def create_app(config_name: str = 'default', log_events: Union[bool, None] = Non
     # Configure logging
     _app, _logging_enabled, _logging_level = _configure_logging(_app, log_events)
 
+    # Time each request and its database statements (see `log_page_request`)
+    init_instrumentation(_app)
+
     if _logging_enabled:
         # Start the log at logging.INFO to enter application starting messages
         start_log_file(_app, log_dir='tracker_logs', logging_level=_logging_level)
@@ -84,6 +102,13 @@ def create_app(config_name: str = 'default', log_events: Union[bool, None] = Non
             # Do not forget to return the response to the client, or the app will crash
             return response
 
+    # Hash passwords in worker processes, and reject logins while the workers are full
+    password_service.init_app(_app)
+
+    # Load and validate the key for course keys once,
+    # before the database is created and course keys are encrypted
+    key_manager.init_app(_app)
+
     # Configure database
     _app = _configure_database(_app)
 
@@ -91,6 +116,27 @@ def create_app(config_name: str = 'default', log_events: Union[bool, None] = Non
     login_manager.init_app(_app)
     login_manager.login_view = 'auth_bp.login'
 
+    # Configure the cache of verified API tokens
+    token_cache.init_app(_app)
+    token_versions.configure(ttl=_app.config.get('TOKEN_VERSION_TTL'))
+    privilege_maps.configure(ttl=_app.config.get('PRIVILEGE_CACHE_TTL'))
+    listing_counts.configure(ttl=_app.config.get('LISTING_COUNT_CACHE_TTL'))
+
+    # Drop the cached tokens of members once a commit changes their token versions
+    from tracker_99.token_claims import init_token_claims
+
+    init_token_claims(_app)
+
+    # Increment the version of each table a commit changes, for conditional GET requests
+    from tracker_99.table_versions import init_table_versions
+
+    init_table_versions(_app)
+
+    # Load the roles once, instead of querying them on every request
+    from tracker_99.roles_cache import roles_cache
+
+    roles_cache.init_app(_app)
+
     # Start routing using blueprints
     # Import modules after instantiating 'app' to avoid known circular import problems with Flask
     from tracker_99.blueprints import main, error, admin, api, auth
@@ -104,6 +150,11 @@ def create_app(config_name: str = 'default', log_events: Union[bool, None] = Non
     _app.register_blueprint(api.api_bp)
     _app.register_blueprint(auth.auth_bp)
 
+    # Add maintenance commands, like `flask keys rotate`
+    from tracker_99.cli import register_commands
+
+    register_commands(_app)
+
     @_app.route('/doh')
     def doh() -> None:
         """Use to raise an exception to trigger a 500 error for testing.
@@ -172,6 +223,9 @@ def _configure_database(app: Flask) -> Flask:
     # Bind the database instance to the app
     db.init_app(app)
 
+    # Set the SQLite pragmas (e.g., WAL mode in production) on each new connection
+    init_sqlite_pragmas(app)
+
     # Link the Migrate object to the app and the database to allow migrations,
     # like schema updates, etc.
     migrate.init_app(app, db)
@@ -191,5 +245,10 @@ def _configure_database(app: Flask) -> Flask:
             from tracker_99.models.create_db import create_db
 
             create_db()
+        else:
+            # Add the tables and indexes that were added since the database was created
+            from tracker_99.models.create_db import upgrade_db
+
+            upgrade_db()
 
     return app
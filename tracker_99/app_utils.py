@@ -8,13 +8,12 @@ import os
 import socket
 import sys
 import time
-from logging.handlers import RotatingFileHandler
 from types import UnionType
 from typing import Union
 
 from flask_login import current_user
 import jwt
-from flask import Flask, Request, Response, current_app
+from flask import Flask, Request, Response, current_app, g
 
 from tracker_99 import constants as c
 
@@ -25,6 +24,7 @@ __all__ = [
     'log_page_request',
     'encode_auth_token',
     'decode_auth_token',
+    'decode_auth_token_claims',
 ]
 
 
@@ -102,6 +102,10 @@ def start_log_file(
 
     Each instance of this class to have a separate log file in the 'logs' directory.
 
+    If LOG_QUEUE_ENABLED is True, records are put in a bounded queue and written to the file
+    in batches by a background thread (see `log_pipeline.py`), so request threads never wait
+    for the disk. The pipeline is stored in `app.extensions['log_pipeline']`.
+
     **NOTE** - This may sound counter-intuitive, but if you run the app in debug mode, so you can \
     make hot fixes, you may end up with a huge log file. Therefore, I recommend you do not log \
     events when in debug mode (`python flask --debug run`)
@@ -122,33 +126,63 @@ def start_log_file(
     if not os.path.exists(log_dir):
         os.mkdir(log_dir)
 
+    # With ACCESS_LOG_FORMAT = 'json', write one JSON object per line (see below)
+    _json_format = app.config.get('ACCESS_LOG_FORMAT', 'csv') == 'json'
+
     # The name of the log file is the name of the instance,
     # plus the time the instance was instantiated (tracker_99_1234567890.1234567.log).
     _log_name = f'{app.name}_{time.time()}'
-    _log_path = f'{log_dir}/{_log_name}.log'
+    _log_path = f'{log_dir}/{_log_name}.{"jsonl" if _json_format else "log"}'
+
+    # Lazy import to avoid circular imports
+    # pylint: disable-next=import-outside-toplevel
+    from tracker_99.log_pipeline import BatchedRotatingFileHandler, JsonLinesFormatter, LogPipeline
 
     # Use multiple small logs for easy reading
-    _file_handler = RotatingFileHandler(
+    _file_handler = BatchedRotatingFileHandler(
         _log_path, mode='a', maxBytes=c.LOG_SIZE, backupCount=10, encoding='utf-8'
     )
 
     _server_hostname = socket.gethostname()
     _server_ip_address = socket.gethostbyname(_server_hostname)
 
-    # Use CSV format for log entries, with columns for Time, Server IP, Process ID, Message Level,
-    # and Message
-    # Example entry: "2024-07-09 22:08:25,132", "192.168.56.1", "9132", "INFO",
-    # "Starting Flask application."
-    _msg_format = (
-        f'"%(asctime)s", "{_server_ip_address}", "%(process)d", "%(levelname)s", '
-        f'"%(message)s\"'
-    )
-    _formatter = logging.Formatter(_msg_format)
-    _file_handler.setFormatter(_formatter)
-    app.logger.addHandler(_file_handler)
+    if _json_format:
+        # Use JSON lines, so log pipelines can aggregate entries without parsing messages
+        # Example entry: {"ts":"2024-07-09 22:08:25,132","server_ip":"192.168.56.1",
+        # "pid":9132,"level":"INFO","type":"access","path":"/","status":200,"wall_ms":3.1,...}
+        _file_handler.setFormatter(JsonLinesFormatter(server_ip=_server_ip_address))
+    else:
+        # Use CSV format for log entries, with columns for Time, Server IP, Process ID,
+        # Message Level, and Message
+        # Example entry: "2024-07-09 22:08:25,132", "192.168.56.1", "9132", "INFO",
+        # "Starting Flask application."
+        _msg_format = (
+            f'"%(asctime)s", "{_server_ip_address}", "%(process)d", "%(levelname)s", '
+            f'"%(message)s\"'
+        )
+        _formatter = logging.Formatter(_msg_format)
+        _file_handler.setFormatter(_formatter)
 
-    # Write CSV column names to the start of the log
-    _file_handler.stream.write('"date_time", "server_ip", "process_id", "msg_level", "message"\n')
+        # Write CSV column names to the start of the log
+        _file_handler.stream.write(
+            '"date_time", "server_ip", "process_id", "msg_level", "message"\n'
+        )
+
+    if app.config.get('LOG_QUEUE_ENABLED', False):
+        # Only the background thread writes to the file
+        _pipeline = LogPipeline(
+            _file_handler,
+            max_size=int(app.config.get('LOG_QUEUE_SIZE', 10000)),
+            batch_size=int(app.config.get('LOG_QUEUE_BATCH_SIZE', 256)),
+            flush_interval=float(app.config.get('LOG_QUEUE_FLUSH_INTERVAL', 0.5)),
+            policy=app.config.get('LOG_QUEUE_POLICY', 'drop_new'),
+            block_timeout=float(app.config.get('LOG_QUEUE_BLOCK_TIMEOUT', 0.05)),
+        )
+        app.logger.addHandler(_pipeline.handler)
+        _pipeline.start()
+        app.extensions['log_pipeline'] = _pipeline
+    else:
+        app.logger.addHandler(_file_handler)
 
     # Get the name of the logging level from config.py
     _logging_level_name = logging.getLevelName(logging_level)
@@ -184,30 +218,57 @@ def log_page_request(app: Flask, request: Request, response: Response) -> None:
     validate_input('request', request, Request)
     validate_input('response', response, Response)
 
-    # Get the address of the requester
-    _client_address = request.environ.get('HTTP_X_FORWARDED_FOR') or request.environ['REMOTE_ADDR']
-
-    _requester = 'ANON'
-
-    if current_user:
-        _requester = f'USER:{current_user.get_id()}'
-
     # Check if requests for static content should be logged (default is false)
     _log_flag = current_app.config['LOG_STATIC_REQUESTS'] or not request.path.startswith('/static')
 
-    if _log_flag:
-        # Log the requested page, client address, and user ID
-        app.logger.info(
-            f'{request.path} requested by {_client_address} ({_requester}) using {request.method}; '
-            f'{response.status}.'
-        )
+    if not _log_flag:
+        return
+
+    # Get the address of the requester
+    _client_address = request.environ.get('HTTP_X_FORWARDED_FOR') or request.environ['REMOTE_ADDR']
+
+    # API requests are authorized by token, not by the session (see `token_required`)
+    _requester_id = g.get('requester_id')
+    if _requester_id is None and current_user:
+        _requester_id = current_user.get_id()
+
+    if current_app.config.get('ACCESS_LOG_FORMAT', 'csv') == 'json':
+        # Lazy import to avoid circular imports
+        # pylint: disable-next=import-outside-toplevel
+        from tracker_99.instrumentation import request_timing
+
+        # Pass the fields as a dictionary, so they are encoded once, on the logging thread
+        app.logger.info('access', extra={'access': {
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'status': response.status_code,
+            # None for streamed responses, whose length is unknown
+            'bytes': response.calculate_content_length(),
+            'requester': _requester_id,
+            'client': _client_address,
+            **request_timing(),
+        }})
+        return
+
+    _requester = 'ANON' if _requester_id is None else f'USER:{_requester_id}'
+
+    # Log the requested page, client address, and user ID
+    # Use lazy % formatting, so the message is only built if the record is logged
+    app.logger.info(
+        '%s requested by %s (%s) using %s; %s.',
+        request.path, _client_address, _requester, request.method, response.status
+    )
 
 
-def encode_auth_token(member_id: int, expiration_in_min: int = 15) -> str:
+def encode_auth_token(member_id: int, expiration_in_min: int = 15,
+                      extra_claims: Union[dict, None] = None) -> str:
     """Generates the authorization token for a member.
 
     :param int member_id: The ID of the member in the database.
     :param int expiration_in_min: The duration of the token in minutes, defaults to 15
+    :param dict or None extra_claims: Additional claims to sign into the token \
+        (e.g., the privileges from `token_claims.build_rich_claims()`), defaults to None
 
     :returns: The authorization token.
     :rtype: str
@@ -222,6 +283,9 @@ def encode_auth_token(member_id: int, expiration_in_min: int = 15) -> str:
             # Subject is the member ID
             'sub': str(member_id),
         }
+        if extra_claims:
+            # Do not let the extra claims replace the registered claims (exp, iat, and sub)
+            payload = {**extra_claims, **payload}
         auth_token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
         return auth_token
     except (KeyError, NotImplementedError, TypeError, jwt.PyJWTError) as e:
@@ -236,11 +300,22 @@ def decode_auth_token(auth_token: str) -> Union[int, None]:
     :returns: The member ID from the database or None upon error.
     :rtype: Union[int, None]
     """
+    _claims = decode_auth_token_claims(auth_token)
+    return _claims['sub'] if _claims else None
+
+
+def decode_auth_token_claims(auth_token: str) -> Union[dict, None]:
+    """Verifies the authorization token and returns all of its claims.
+
+    :param str auth_token: The authorization token.
+
+    :returns: The payload of the token (sub, exp, iat, etc.) or None upon error.
+    :rtype: Union[dict, None]
+    """
     try:
-        payload = jwt.decode(
+        return jwt.decode(
             auth_token, current_app.config['SECRET_KEY'], algorithms=['HS256']
         )
-        return payload['sub']
     except jwt.ExpiredSignatureError as e:
         # Token has expired
         print(f'Token Expired: {e}')
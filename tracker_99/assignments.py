@@ -0,0 +1,267 @@
+"""Set-based reads and writes for course assignments (the associations table).
+
+Reads every member's role in a course with one LEFT OUTER JOIN, instead of separate
+queries for assigned and unassigned members, and applies assignment changes with
+one upsert statement and one delete statement, so the cost of saving depends on
+the number of changes, not on the number of members.
+
+Usage:
+- _rows = course_member_roles(course_id=12)
+- apply_assignments(upserts=[(12, 16, 2)], deletes=[(12, 3)])
+- _results, _counts = bulk_assign([(12, 16, 2), (12, 3, None)], requester_id=1, \
+    requester_is_admin=True)
+"""
+
+from collections import Counter
+from typing import Iterator, List, Tuple, Union
+
+from sqlalchemy import and_, bindparam, delete, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from tracker_99 import constants as c
+from tracker_99.app_utils import validate_input
+from tracker_99.models import db
+from tracker_99.models.models import Association, Course, Member, Role
+from tracker_99.privileges import course_privileges
+from tracker_99.roles_cache import roles_cache
+
+__all__ = ['UNASSIGNED_ROLE_ID', 'apply_assignments', 'bulk_assign', 'course_member_roles']
+
+# The role ID the assignment form uses for members who are not assigned to the course
+# Unassigned members are not stored, to keep the associations table small
+UNASSIGNED_ROLE_ID = 1
+
+# The number of values in each IN list, well below SQLite's limit on bound parameters
+_IN_CHUNK_SIZE = 500
+
+
+def course_member_roles(course_id: int,
+                        member_ids: Union[list, set, tuple, None] = None) -> List[dict]:
+    """Get every member, with their role in a course, if any.
+
+    :param int course_id: The ID of the course
+    :param list or set or tuple or None member_ids: Only get these members, defaults to None \
+        (get every member)
+
+    :returns: A dictionary for each member with member_id, member_name, is_admin, \
+        member_group, role_id, and role_privilege (role_id and role_privilege are None \
+        if the member is not assigned to the course)
+    :rtype: List[dict]
+    """
+    # Validate inputs
+    validate_input('course_id', course_id, int)
+    validate_input('member_ids', member_ids, Union[list, set, tuple, None], allow_empty=True)
+
+    """
+    SELECT members.member_id, members.member_name, members.is_admin, members.member_group,
+        associations.role_id, roles.role_privilege
+    FROM members
+    LEFT OUTER JOIN associations
+        ON associations.member_id = members.member_id AND associations.course_id = 12
+    LEFT OUTER JOIN roles ON roles.role_id = associations.role_id
+    ORDER BY members.member_id;
+    """
+    _stmt = (
+        select(
+            Member.member_id,
+            Member.member_name,
+            Member.is_admin,
+            Member.member_group,
+            Association.role_id,
+            Role.role_privilege,
+        )
+        .outerjoin(Association, and_(Association.member_id == Member.member_id,
+                                     Association.course_id == course_id))
+        .outerjoin(Role, Role.role_id == Association.role_id)
+        .order_by(Member.member_id)
+    )
+    if member_ids is not None:
+        _stmt = _stmt.where(Member.member_id.in_(member_ids))
+
+    return [dict(_row) for _row in db.session.execute(_stmt).mappings()]
+
+
+def apply_assignments(upserts: Union[list, tuple, None] = None,
+                      deletes: Union[list, tuple, None] = None) -> None:
+    """Add, reassign, and remove course assignments in two statements.
+
+    **NOTE** - The changes are part of the current transaction, so commit afterward.
+    Mark the tokens of the affected members as stale (`bump_token_versions()`) as well.
+
+    :param list or tuple or None upserts: (course_id, member_id, role_id) tuples to add, \
+        or to reassign if the member is already assigned to the course
+    :param list or tuple or None deletes: (course_id, member_id) tuples to remove
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('upserts', upserts, Union[list, tuple, None], allow_empty=True)
+    validate_input('deletes', deletes, Union[list, tuple, None], allow_empty=True)
+
+    _associations = Association.__table__
+
+    if upserts:
+        """
+        INSERT INTO associations (course_id, member_id, role_id) VALUES (?, ?, ?)
+        ON CONFLICT (course_id, member_id) DO UPDATE SET role_id = excluded.role_id;
+        """
+        _stmt = sqlite_insert(_associations)
+        _stmt = _stmt.on_conflict_do_update(
+            index_elements=[_associations.c.course_id, _associations.c.member_id],
+            set_={'role_id': _stmt.excluded.role_id},
+        )
+        # executemany: one statement, many parameter sets
+        db.session.execute(_stmt, [
+            {'course_id': _course_id, 'member_id': _member_id, 'role_id': _role_id}
+            for _course_id, _member_id, _role_id in upserts
+        ])
+
+    if deletes:
+        """
+        DELETE FROM associations WHERE course_id = ? AND member_id = ?;
+        """
+        # Bind each pair, instead of building an IN list, so there is no limit on
+        # the number of variables in the statement
+        db.session.execute(
+            delete(_associations)
+            .where(_associations.c.course_id == bindparam('_course_id'),
+                   _associations.c.member_id == bindparam('_member_id')),
+            [{'_course_id': _course_id, '_member_id': _member_id}
+             for _course_id, _member_id in deletes],
+        )
+
+
+# pylint: disable-next=too-many-locals
+def bulk_assign(items: Union[list, tuple], requester_id: int, requester_is_admin: bool = False,
+                requester_privileges: Union[dict, None] = None) -> Tuple[List[dict], dict]:
+    """Add, reassign, and remove many course assignments, with a result for each item.
+
+    The courses, members, roles, current assignments, and the requester's privileges are
+    read with a few set-based queries, instead of several queries per item, and the changes
+    are saved with `apply_assignments()`. Items that fail a check are skipped; the others
+    are applied. Use role_id 1 (or None) to remove an assignment. Every item of a course
+    and member that appear more than once is invalid, since a pair can only have one role.
+
+    Non-admins follow the same rules as `/api/courses/assign`: they cannot reassign
+    themselves, they must have at least an editor's privilege in the course, and they
+    can only assign roles below their own privilege. They also cannot change members
+    whose current role is at or above their privilege.
+
+    **NOTE** - The changes are part of the current transaction, so commit afterward.
+
+    :param list or tuple items: (course_id, member_id, role_id) tuples
+    :param int requester_id: The ID of the requester
+    :param bool requester_is_admin: If the requester is an administrator, defaults to False
+    :param dict or None requester_privileges: The requester's role privilege by course ID, \
+        from the token's rich claims, defaults to None (read them from the database)
+
+    :returns: A result for each item, in order, with its status (added, updated, removed, \
+        unchanged, invalid, not_found, or forbidden), and the number of items with each status
+    :rtype: Tuple[List[dict], dict]
+    """
+    # Validate inputs
+    validate_input('items', items, Union[list, tuple], allow_empty=True)
+    validate_input('requester_id', requester_id, int)
+    validate_input('requester_is_admin', requester_is_admin, bool)
+    validate_input('requester_privileges', requester_privileges, Union[dict, None],
+                   allow_empty=True)
+
+    _items = [(_course_id, _member_id, UNASSIGNED_ROLE_ID if _role_id is None else _role_id)
+              for _course_id, _member_id, _role_id in items]
+
+    _pair_counts = Counter((_course_id, _member_id) for _course_id, _member_id, _ in _items)
+    _pairs = set(_pair_counts)
+    _course_ids = {_course_id for _course_id, _ in _pairs}
+    _member_ids = {_member_id for _, _member_id in _pairs}
+
+    _role_privileges = {_role.role_id: _role.role_privilege for _role in roles_cache.all()}
+    _role_privileges[UNASSIGNED_ROLE_ID] = 0
+
+    """
+    SELECT course_id FROM courses WHERE course_id IN (1, 2, 3);
+    SELECT member_id FROM members WHERE member_id IN (4, 5, 6);
+    """
+    _found_courses = set()
+    for _chunk in _chunks(_course_ids):
+        _found_courses.update(db.session.scalars(
+            select(Course.course_id).where(Course.course_id.in_(_chunk))))
+    _found_members = set()
+    for _chunk in _chunks(_member_ids):
+        _found_members.update(db.session.scalars(
+            select(Member.member_id).where(Member.member_id.in_(_chunk))))
+
+    """
+    SELECT course_id, member_id, role_id FROM associations
+    WHERE (course_id, member_id) IN ((1, 4), (2, 5));
+    """
+    _current = {}
+    for _chunk in _chunks(_pairs):
+        _current.update({
+            (_row.course_id, _row.member_id): _row.role_id
+            for _row in db.session.execute(
+                select(Association.course_id, Association.member_id, Association.role_id)
+                .where(tuple_(Association.course_id, Association.member_id).in_(_chunk)))
+        })
+
+    # Check the requester's privilege once per course
+    if requester_is_admin:
+        _privileges = {}
+    elif requester_privileges is not None:
+        _privileges = requester_privileges
+    else:
+        # Use the requester's privileges from this request or the cache, or query them once
+        _privileges = course_privileges(requester_id)
+
+    _results = []
+    _counts = dict.fromkeys(
+        ('added', 'updated', 'removed', 'unchanged', 'invalid', 'not_found', 'forbidden'), 0)
+    _upserts = []
+    _deletes = []
+
+    for _course_id, _member_id, _role_id in _items:
+        _current_role_id = _current.get((_course_id, _member_id))
+
+        if _pair_counts[(_course_id, _member_id)] > 1:
+            # Each pair can only have one role, so do not guess which item wins
+            _status = 'invalid'
+        elif (_course_id not in _found_courses or _member_id not in _found_members
+              or _role_id not in _role_privileges):
+            _status = 'not_found'
+        elif not requester_is_admin and (
+                _member_id == requester_id
+                or _privileges.get(_course_id, 0) < c.PRIVILEGE_LVL_EDITOR
+                or _privileges[_course_id] <= _role_privileges[_role_id]
+                or _privileges[_course_id] <= _role_privileges.get(_current_role_id, 0)
+        ):
+            _status = 'forbidden'
+        elif _role_id == (_current_role_id or UNASSIGNED_ROLE_ID):
+            _status = 'unchanged'
+        elif _role_id == UNASSIGNED_ROLE_ID:
+            _deletes.append((_course_id, _member_id))
+            _status = 'removed'
+        else:
+            _upserts.append((_course_id, _member_id, _role_id))
+            _status = 'added' if _current_role_id is None else 'updated'
+
+        _counts[_status] += 1
+        _results.append({'course_id': _course_id, 'member_id': _member_id,
+                         'role_id': _role_id, 'status': _status})
+
+    if _upserts or _deletes:
+        apply_assignments(upserts=_upserts, deletes=_deletes)
+
+    return _results, _counts
+
+
+def _chunks(values: Union[list, set, tuple]) -> Iterator[list]:
+    """Split values into lists that fit in an IN list.
+
+    :param list or set or tuple values: The values to split
+
+    :returns: Lists of up to _IN_CHUNK_SIZE values
+    :rtype: Iterator[list]
+    """
+    _values = list(values)
+    for _start in range(0, len(_values), _IN_CHUNK_SIZE):
+        yield _values[_start:_start + _IN_CHUNK_SIZE]
@@ -0,0 +1,101 @@
+"""Compare the JSON encoders on the payloads of the large list endpoints.
+
+Builds payloads shaped like the responses of /api/members/all, /api/courses/all,
+and /api/courses/get/details (with encrypted course keys as bytes), and times `jsonify`
+with the standard library encoder and with orjson (if it is installed).
+
+Activate the virtual environment:
+source .venv/bin/activate or .venv/Scripts/activate
+
+Run the benchmark from the repository root:
+python -B -m tracker_99.benchmark_json --rows 10000 --repeat 5
+"""
+
+import argparse
+import os
+import time
+from typing import Callable
+
+from tracker_99 import create_app
+from tracker_99.json_provider import orjson
+from tracker_99.serializers import (COURSE_DETAILS_SERIALIZER, COURSE_SERIALIZER,
+                                    MEMBER_SERIALIZER)
+
+
+def build_payloads(rows: int) -> dict:
+    """Build the payloads of the list endpoints.
+
+    :param int rows: The number of rows in each payload
+
+    :returns: The payload of each endpoint
+    :rtype: dict
+    """
+    _members = [dict(zip(MEMBER_SERIALIZER.names, (
+        _i, f'Member.{_i}', f'member.{_i}@tracker.edu', _i % 50 == 0
+    ))) for _i in range(1, rows + 1)]
+
+    _course_values = [(
+        _i, f'Course {_i}', f'CRS {_i}', 'SDEV', os.urandom(45), f'Description of course {_i}.'
+    ) for _i in range(1, rows + 1)]
+    _courses = [dict(zip(COURSE_SERIALIZER.names, _values)) for _values in _course_values]
+
+    _details = [dict(zip(COURSE_DETAILS_SERIALIZER.names, (
+        _i, f'Member.{_i}', *_course_values[0], 2, 'Student', 1
+    ))) for _i in range(1, rows + 1)]
+
+    return {
+        '/api/members/all': {'members': _members},
+        '/api/courses/all': {'courses': _courses, 'total': rows, 'filtered': rows,
+                             'next_cursor': None},
+        '/api/courses/get/details': _details,
+    }
+
+
+def time_encoder(encode: Callable[[], object], repeat: int) -> float:
+    """Get the fastest time of several runs.
+
+    :param Callable encode: The function to time
+    :param int repeat: The number of runs
+
+    :returns: The fastest time, in seconds
+    :rtype: float
+    """
+    _best = float('inf')
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        encode()
+        _best = min(_best, time.perf_counter() - _start)
+    return _best
+
+
+def main() -> None:
+    """Run the benchmark and print the throughput of each encoder.
+
+    :returns: None
+    :rtype: None
+    """
+    _parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    _parser.add_argument('--rows', type=int, default=10000, help='Rows per payload')
+    _parser.add_argument('--repeat', type=int, default=5, help='Runs per encoder')
+    _args = _parser.parse_args()
+
+    _app = create_app('testing')
+    _payloads = build_payloads(_args.rows)
+    _encoders = ['stdlib'] + (['orjson'] if orjson is not None else [])
+
+    print(f"{'Endpoint':<28} {'Encoder':<8} {'ms':>9} {'rows/s':>12} {'MB':>7}")
+    with _app.app_context():
+        for _endpoint, _payload in _payloads.items():
+            for _encoder in _encoders:
+                _app.json.use_orjson = _encoder == 'orjson'
+                _size = len(_app.json.response(_payload).get_data())
+                _seconds = time_encoder(lambda: _app.json.response(_payload), _args.repeat)
+                print(f'{_endpoint:<28} {_encoder:<8} {_seconds * 1000:>9.1f} '
+                      f'{_args.rows / _seconds:>12,.0f} {_size / 1e6:>7.2f}')
+
+    if orjson is None:
+        print('orjson is not installed; install it with `python -m pip install orjson`.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Compare the read throughput of SQLite configurations while a writer is active.
+
+For each configuration, copies tracker.db to a temporary directory, and, for a few seconds,
+runs reader threads that fetch a member's course listing, while one writer thread
+replaces the rows of a scratch table in each transaction, like an administrator
+running a bulk import. The default configuration uses the rollback journal,
+and the production configuration uses the pragmas in ProductionConfig.SQLITE_PRAGMAS (WAL, etc.).
+
+In rollback-journal mode, a transaction that changes more pages than the page cache holds
+locks out the readers until it commits; in WAL mode, the readers are not blocked.
+
+Activate the virtual environment:
+source .venv/bin/activate or .venv/Scripts/activate
+
+Run the benchmark from the repository root:
+python -B -m tracker_99.benchmark_sqlite --readers 4 --seconds 5
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import exc, text
+
+from tracker_99 import create_app
+from tracker_99.config import Config
+from tracker_99.listing import course_listing_query
+from tracker_99.models import db
+
+_DB_PATH = os.path.join(os.path.dirname(__file__), 'tracker.db')
+
+
+def run_workload(config_name: str, readers: int, seconds: float, rows: int) -> dict:
+    """Run the readers and the writer against a copy of the database.
+
+    :param str config_name: The configuration from `config.py` (e.g., 'production')
+    :param int readers: The number of reader threads
+    :param float seconds: How long to run the workload
+    :param int rows: The number of rows the writer inserts per transaction
+
+    :returns: The journal mode, reads and writes per second, read latencies, and lock errors
+    :rtype: dict
+    """
+    _temp_dir = tempfile.mkdtemp()
+    _original_uri = Config.SQLALCHEMY_DATABASE_URI
+    try:
+        shutil.copyfile(_DB_PATH, os.path.join(_temp_dir, 'tracker.db'))
+        Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(_temp_dir, 'tracker.db')}"
+        _app = create_app(config_name, log_events=False)
+    finally:
+        Config.SQLALCHEMY_DATABASE_URI = _original_uri
+
+    with _app.app_context():
+        _engine = db.engine
+    with _engine.begin() as _conn:
+        _conn.execute(text('CREATE TABLE benchmark_writes (id INTEGER PRIMARY KEY, payload TEXT)'))
+
+    # Member 2 is assigned to several courses, so the listing joins every table
+    _read_stmt, _ = course_listing_query(2, False)
+    _payload = 'x' * 200
+
+    _stop = threading.Event()
+    _latencies = [[] for _ in range(readers)]
+    _counts = {'writes': 0, 'errors': 0}
+    _lock = threading.Lock()
+
+    def read(index: int) -> None:
+        """Fetch the course listing until the workload stops.
+
+        :param int index: The reader's list of latencies
+
+        :returns: None
+        :rtype: None
+        """
+        while not _stop.is_set():
+            _start = time.perf_counter()
+            try:
+                with _engine.connect() as _conn:
+                    _conn.execute(_read_stmt).all()
+            except exc.OperationalError:
+                with _lock:
+                    _counts['errors'] += 1
+                continue
+            _latencies[index].append(time.perf_counter() - _start)
+
+    def write() -> None:
+        """Replace the rows of the scratch table until the workload stops.
+
+        :returns: None
+        :rtype: None
+        """
+        _params = [{'payload': _payload} for _ in range(rows)]
+        while not _stop.is_set():
+            try:
+                with _engine.begin() as _conn:
+                    _conn.execute(text('DELETE FROM benchmark_writes'))
+                    _conn.execute(
+                        text('INSERT INTO benchmark_writes (payload) VALUES (:payload)'), _params)
+                _counts['writes'] += 1
+            except exc.OperationalError:
+                with _lock:
+                    _counts['errors'] += 1
+
+    _threads = [threading.Thread(target=read, args=(_i,)) for _i in range(readers)]
+    _threads.append(threading.Thread(target=write))
+    for _thread in _threads:
+        _thread.start()
+    time.sleep(seconds)
+    _stop.set()
+    for _thread in _threads:
+        _thread.join()
+
+    with _engine.connect() as _conn:
+        _journal_mode = _conn.execute(text('PRAGMA journal_mode')).scalar()
+    _engine.dispose()
+    shutil.rmtree(_temp_dir, ignore_errors=True)
+
+    _all = sorted(_latency for _thread_latencies in _latencies for _latency in _thread_latencies)
+    return {
+        'journal_mode': _journal_mode,
+        'reads_per_second': len(_all) / seconds,
+        'writes_per_second': _counts['writes'] / seconds,
+        'median_ms': statistics.median(_all) * 1000 if _all else 0.0,
+        'p99_ms': _all[int(len(_all) * 0.99)] * 1000 if _all else 0.0,
+        'errors': _counts['errors'],
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print the throughput of each configuration.
+
+    :returns: None
+    :rtype: None
+    """
+    _parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    _parser.add_argument('--readers', type=int, default=4, help='Reader threads')
+    _parser.add_argument('--seconds', type=float, default=5.0, help='Seconds per configuration')
+    _parser.add_argument('--rows', type=int, default=20000,
+                         help='Rows inserted per write transaction')
+    _args = _parser.parse_args()
+
+    print(f"{'Config':<11} {'Journal':<8} {'reads/s':>9} {'median ms':>10} {'p99 ms':>8} "
+          f"{'writes/s':>9} {'errors':>7}")
+    for _config_name in ('default', 'production'):
+        _result = run_workload(_config_name, _args.readers, _args.seconds, _args.rows)
+        print(f"{_config_name:<11} {_result['journal_mode']:<8} "
+              f"{_result['reads_per_second']:>9,.0f} {_result['median_ms']:>10.2f} "
+              f"{_result['p99_ms']:>8.2f} {_result['writes_per_second']:>9,.1f} "
+              f"{_result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,23 +3,33 @@
 
 from typing import Union
 
-from flask import Response, abort, redirect, url_for, render_template, request
+from flask import Response, abort, jsonify, render_template, request
+from flask import current_app
 from flask_login import login_required, current_user
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from wtforms.validators import ValidationError
 
 from tracker_99 import db, constants as c
 from tracker_99.app_utils import validate_input
+from tracker_99.assignments import UNASSIGNED_ROLE_ID, apply_assignments, course_member_roles
 from tracker_99.blueprints.admin import admin_bp
-from tracker_99.blueprints.admin.admin_forms import SimpleForm
-from tracker_99.models.models import Course, Member, Role, Association
+from tracker_99.listing import (ASSIGN_CANDIDATE_COLUMNS, assign_candidates_query, fetch_page,
+                                parse_datatables_args)
+from tracker_99.models.models import Course, Member
+from tracker_99.privileges import course_privilege
+from tracker_99.roles_cache import roles_cache
+from tracker_99.token_claims import bump_token_versions
 
 
-@admin_bp.route('/admin/assign_course/<int:course_id>', methods=['GET', 'POST'])
+@admin_bp.route('/admin/assign_course/<int:course_id>', methods=['GET'])
 @login_required
-def assign_course(course_id: int) -> Union[str, Response]:  # NOSONAR
+def assign_course(course_id: int) -> Union[str, Response]:
     """Assign members to a course.
 
-    NOTE - (NOSONAR) This method updates information in a three-way association table,
-    and I am accepting the code complexity above 15.
+    **NOTE** - The page loads the members one page at a time from `assign_course_candidates()`,
+    and sends only the changed assignments to `assign_course_changes()`, so the size of
+    the page and of the request does not grow with the number of members.
+    Changes are only saved through `assign_course_changes()`, which checks the CSRF token.
 
     :param int course_id: The ID of the course to modify access
 
@@ -35,196 +45,241 @@ def assign_course(course_id: int) -> Union[str, Response]:  # NOSONAR
     # Get the course data (e.g., course_id, course_name) from the database
     _course = Course.query.get_or_404(course_id)
 
-    # Get the members assigned to the course
-    # The query will generate a list of tuples
-    # Each tuple in the list will have the role_id, member_id, member_name, is_admin, member_group,
-    # and role_privilege of member assigned to the course in that order, like
-    # [(1, 16, 0, 'Stilgar.Tabr', 20), (2, 2, 0, 'Leto.Atreides', 10), ...]
-    """
-    SELECT associations.role_id,
-        members.member_id,
-        members.member_name,
-        members.is_admin,
-        members.member_group,
-        roles.role_privilege
-    FROM associations,
-        members,
-        roles
-    WHERE associations.member_id = members.member_id AND
-        associations.role_id = roles.role_id AND
-        associations.course_id = 12;
-    """
-    _assigned_members = (
-        db.session.query(
-            Association.role_id,
-            Member.member_id,
-            Member.member_name,
-            Member.is_admin,
-            Member.member_group,
-            Role.role_privilege,
-        )
-        .join(Member, Association.member_id == Member.member_id)
-        .join(Role, Association.role_id == Role.role_id)
-        .filter(Association.course_id == course_id)
-        .all()
-    )
-
-    # Convert _assigned_members to a list of dictionaries
-    # Make sure the keys correspond to the values
-    _keys = ['role_id', 'member_id', 'member_name', 'is_admin', 'member_group', 'role_privilege']
-    _assigned_members = [dict(zip(_keys, row)) for row in _assigned_members]
-
-    # Get the ID of the current user
-    _member_id = int(current_user.get_id())
-
     # Only members with role_privileges greater than or equal to 10,
     # like chairs and teachers of the course and admins,
     # can assign other members to a course
-    if not current_user.is_admin and not any(
-        a['member_id'] == _member_id and a['role_privilege'] >= c.PRIVILEGE_LVL_ASSIGNER
-        for a in _assigned_members
-    ):
+    _privilege_lvl_level = _assignable_privilege_level(_course.course_id)
+    if _privilege_lvl_level is None:
         abort(403, c.NOT_AUTH_MSG)
 
-    # Get a list of ID for assigned members
-    _assigned_member_ids = [a['member_id'] for a in _assigned_members]
+    _roles_list = _assignable_roles(_privilege_lvl_level)
+
+    return render_template(
+        'assign_course.html',
+        page_title=_page_title,
+        page_description=_page_description,
+        course_id=_course.course_id,
+        course_name=_course.course_name,
+        roles_list=_roles_list,
+        page_size=c.DEFAULT_PAGE_SIZE,
+        csrf_token=generate_csrf(),
+    )
+
+
+@admin_bp.route('/admin/assign_course/<int:course_id>/candidates')
+@login_required
+def assign_course_candidates(course_id: int) -> Union[tuple, Response]:
+    """One page of the members who can be assigned to a course, with their current role,
+    using DataTables server-side processing.
+
+    Unassigned members have the 'Unassigned' role (role_id 1).
+    Search by member name, ID, or group.
+
+    .. seealso:: https://datatables.net/manual/server-side
 
-    # Get a list of unassigned members
+    :param int course_id: The ID of the course
+
+    :returns: The page of members in JSON format, or an error message with the HTTP status code
+    :rtype: Response/tuple
     """
-    SELECT members.member_id,
-           members.member_name,
-           members.is_admin,
-           members.member_group
-    FROM members
-    WHERE members.member_id NOT IN (2, 3, 4, 16);
+    # Validate inputs
+    validate_input('course_id', course_id, int)
+
+    _privilege_lvl_level = _assignable_privilege_level(course_id)
+    if _privilege_lvl_level is None:
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+
+    _options = parse_datatables_args(request.args, ASSIGN_CANDIDATE_COLUMNS)
+    _draw = _options.pop('draw')
+
+    _stmt, _columns = assign_candidates_query(course_id, _privilege_lvl_level)
+    _page = fetch_page(_stmt, _columns, Member.member_id, **_options)
+
+    _data = [{
+        'member_name': _row.member_name,
+        'member_id': _row.member_id,
+        'is_admin': bool(_row.is_admin),
+        'member_group': _row.member_group,
+        'role_id': UNASSIGNED_ROLE_ID if _row.role_id is None else _row.role_id,
+    } for _row in _page['rows']]
+
+    return jsonify({
+        'draw': _draw,
+        'recordsTotal': _page['total'],
+        'recordsFiltered': _page['filtered'],
+        'data': _data,
+        # Return the keyset cursor and where the next page starts,
+        # so the client can send the cursor back instead of an offset
+        'cursor': _page['cursor'],
+        'next_start': _options['start'] + len(_data),
+    })
+
+
+@admin_bp.route('/admin/assign_course/<int:course_id>/changes', methods=['PATCH'])
+@login_required
+def assign_course_changes(course_id: int) -> tuple:
+    """Save only the changed assignments of a course.
+
+    Send the CSRF token from the assign course page in the X-CSRFToken header,
+    and the changes as JSON. Use role_id 1 to unassign a member:
+
+    {"changes": [{"member_id": 16, "role_id": 2}, {"member_id": 4, "role_id": 1}]}
+
+    :param int course_id: The ID of the course
+
+    :returns: The number of added, reassigned, and removed members, or an error message, \
+        with the HTTP status code (Response, int)
+    :rtype: tuple
     """
-    _unassigned_members = (
-        db.session.query(
-            Member.member_id, Member.member_name, Member.is_admin, Member.member_group,)
-        .filter(Member.member_id.notin_(_assigned_member_ids))
-        .all()
-    )
+    # Validate inputs
+    validate_input('course_id', course_id, int)
+
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError:
+            return jsonify({'error': 'The CSRF token is missing or invalid.'}), 400
+
+    if db.session.get(Course, course_id) is None:
+        return jsonify({'error': c.NOT_FOUND_MSG}), 404
+
+    _privilege_lvl_level = _assignable_privilege_level(course_id)
+    if _privilege_lvl_level is None:
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+
+    # Get the contents of the request body and check the format of each change
+    _data = request.get_json(silent=True) or {}
+    _changes = _data.get('changes') if isinstance(_data, dict) else None
+    if not isinstance(_changes, list) or not all(
+            isinstance(_change, dict)
+            and isinstance(_change.get('member_id'), int)
+            and isinstance(_change.get('role_id'), int)
+            for _change in _changes
+    ):
+        return jsonify({'error': 'Send a list of changes with a member_id and role_id.'}), 400
+    if len(_changes) > c.MAX_ASSIGNMENT_CHANGES:
+        return jsonify(
+            {'error': f'Send at most {c.MAX_ASSIGNMENT_CHANGES} changes per request.'}
+        ), 413
+
+    _requested = {_change['member_id']: _change['role_id'] for _change in _changes}
 
-    # Convert _unassigned_members to a list of dictionaries
-    # Make sure the keys correspond to their values
-    _keys = ['member_id', 'member_name', 'is_admin', 'member_group']
-    _unassigned_members = [dict(zip(_keys, row)) for row in _unassigned_members]
-
-    # Members cannot elevate their privileges
-    # (teachers cannot reassign themselves to chairs, etc.)
-    # and they cannot reassign other members at or above their privilege level
-    # (teachers cannot assign or reassign other teachers, etc.)
-    # Therefore, set the cutoff to one less than the privilege level of the current user
-    # This sets the default to assigning members as students only
-    if not current_user.is_admin:
-        _privilege_lvl_level = (
-            int(
-                next(
-                    (
-                        a['role_privilege']
-                        for a in _assigned_members
-                        if _member_id == a['member_id']
-                    ),
-                    c.PRIVILEGE_LVL_EDITOR,
-                )
-            )
-            - 1
+    try:
+        _counts = _save_assignment_changes(
+            course_id, _privilege_lvl_level, _assignable_roles(_privilege_lvl_level), _requested
         )
-    else:
-        _privilege_lvl_level = 99
+    except PermissionError:
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+    except LookupError:
+        return jsonify({'error': 'Member not found.'}), 404
+
+    return jsonify({'message': 'Assignments saved.', **_counts}), 200
 
-    # Get members with privilege less than the level of the current user
-    _touchable_members = [
-        a for a in _assigned_members if int(a['role_privilege']) <= _privilege_lvl_level
-    ]
 
-    # Match the structure of _unassigned_members and _touchable_members
-    # by adding required key-value pairs
-    for u in _unassigned_members:
-        u['role_id'] = 1
-        u['role_privilege'] = 0
+def _assignable_privilege_level(course_id: int) -> Union[int, None]:
+    """Get the highest role privilege the current user can assign in a course.
 
-    # Combine the two lists of dictionaries
-    _members_list = _touchable_members + _unassigned_members
+    Members cannot elevate their privileges
+    (teachers cannot reassign themselves to chairs, etc.)
+    and they cannot reassign other members at or above their privilege level
+    (teachers cannot assign or reassign other teachers, etc.)
+    Therefore, the cutoff is one less than the privilege level of the current user.
 
-    # Get info for roles less than the privilege level of the current user
-    # Use ORDER BY for rendering in the template by privilege level
+    :param int course_id: The ID of the course
+
+    :returns: The privilege level, or None if the current user cannot assign members
+    :rtype: int or None
     """
-    SELECT role_id, role_name FROM roles
-    WHERE roles.role_privilege < 10 ORDER BY role_privilege DESC;
+    if current_user.is_admin:
+        return 99
+
+    _privilege = course_privilege(course_id, int(current_user.get_id()))
+    if _privilege is None or _privilege < c.PRIVILEGE_LVL_ASSIGNER:
+        return None
+    return int(_privilege) - 1
+
+
+def _assignable_roles(privilege_level: int) -> list:
+    """Get the roles the current user can assign, including the 'Unassigned' role.
+
+    :param int privilege_level: The highest role privilege the current user can assign
+
+    :returns: The role_id and role_name of each role, by privilege level
+    :rtype: list
     """
-    _roles_list = (
-        db.session.query(Role.role_id, Role.role_name)
-        .filter(Role.role_privilege <= _privilege_lvl_level)
-        .order_by(Role.role_privilege.desc())
-        .all()
-    )
+    # Get info for roles less than the privilege level of the current user from the cached roles
+    # Sort for rendering in the template by privilege level
+    _roles_list = [
+        {'role_id': _role.role_id, 'role_name': _role.role_name}
+        for _role in sorted(roles_cache.all(), key=lambda _role: _role.role_privilege,
+                            reverse=True)
+        if _role.role_privilege <= privilege_level
+    ]
 
     # Temporarily add a 'Unassigned' role
     # Members in this role will be deleted from the Association table
     # or skipped if they are not in the table
     # Do not store 'Unassigned' members, since that will increase
     # the size of the Association table and slow down queries
-    _roles_list.append({"role_id": 1, "role_name": "Unassigned"})
-
-    if request.method == 'POST':
-        # Get all associations for the given course in advance
-        _existing_associations = {
-            a.member_id: a
-            for a in Association.query.filter(Association.course_id == _course.course_id).all()
-        }
-
-        # Iterate through each member and check if their assignment has changed
-        for _u in _members_list:
-            # Get the current assignment in the Association table
-            _member_id = str(_u['member_id'])
-
-            # Get the value of the selected radio button in the template for the member
-            # Using the member_id in the name keeps each group unique (name="2_role")
-            _role_id = int(request.form.get(f'{_member_id}_role'))
-
-            # Check if the member already has an association
-            _a = _existing_associations.get(int(_member_id))
-
-            # Add an association if the assignment does not exist in the Association table
-            # but the course is now assigned
-            if _a is None and _role_id != 1:
-                print('Adding...')
-                _new_assoc = Association(
-                    course_id=_course.course_id, role_id=_role_id, member_id=_member_id
-                )
-                db.session.add(_new_assoc)
-
-            # Delete the association if the assignment exists in the Association table
-            # but the course is now unassigned
-            elif _a is not None and _role_id == 1:
-                print('Deleting...')
-                db.session.delete(_a)
-
-            # Update the association if the assignment exists in the Association table
-            # but the role has changed
-            elif _a is not None and _a.role_id != _role_id:
-                print('Updating...')
-                _a.role_id = _role_id
-
-            else:
-                print('Skipping...')
+    _roles_list.append({'role_id': UNASSIGNED_ROLE_ID, 'role_name': 'Unassigned'})
+    return _roles_list
 
-        db.session.commit()
 
-        return redirect(url_for(c.INDEX_PAGE))
+def _save_assignment_changes(course_id: int, privilege_level: int, roles_list: list,
+                             requested: dict) -> dict:
+    """Compare the requested roles with the current roles, and save only the changes.
 
-    # Instantiate the form
-    _form = SimpleForm()
+    Only the requested members are read, and the changes are saved with one upsert
+    and one delete, so the cost depends on the number of changes, not the number of members.
 
-    # Default behavior if not sending data to the server (POST, etc.)
-    # Re-displays page with flash messages (e.g., errors, etc.)
-    return render_template(
-        'assign_course.html',
-        page_title=_page_title,
-        page_description=_page_description,
-        course_name=_course.course_name,
-        form=_form,
-        roles_list=_roles_list,
-        members_list=_members_list,
-    )
+    :param int course_id: The ID of the course
+    :param int privilege_level: The highest role privilege the current user can assign
+    :param list roles_list: The roles the current user can assign
+    :param dict requested: The requested role ID, by member ID
+
+    :raises PermissionError: If a member or a role is above the current user's level
+    :raises LookupError: If a member does not exist
+
+    :returns: The number of added, reassigned, and removed members
+    :rtype: dict
+    """
+    _counts = {'added': 0, 'updated': 0, 'removed': 0}
+    if not requested:
+        return _counts
+
+    _allowed_role_ids = {_role['role_id'] for _role in roles_list}
+    _current = {_m['member_id']: _m for _m in course_member_roles(course_id, set(requested))}
+
+    _upserts = []
+    _deletes = []
+
+    for _member_id, _role_id in requested.items():
+        _m = _current.get(_member_id)
+        if _m is None:
+            raise LookupError(_member_id)
+        if _role_id not in _allowed_role_ids or (
+                _m['role_privilege'] is not None and _m['role_privilege'] > privilege_level
+        ):
+            raise PermissionError(_member_id)
+
+        _current_role_id = _m['role_id'] or UNASSIGNED_ROLE_ID
+        if _role_id == _current_role_id:
+            continue
+
+        if _role_id == UNASSIGNED_ROLE_ID:
+            # Delete the association, since the course is now unassigned
+            _deletes.append((course_id, _member_id))
+            _counts['removed'] += 1
+        else:
+            # Add the association, or update the role if the member is already assigned
+            _upserts.append((course_id, _member_id, _role_id))
+            _counts['added' if _m['role_id'] is None else 'updated'] += 1
+
+    if _upserts or _deletes:
+        apply_assignments(upserts=_upserts, deletes=_deletes)
+
+        # API tokens hold the privileges of the reassigned members, so mark them as stale
+        bump_token_versions({_change[1] for _change in _upserts + _deletes})
+        db.session.commit()
+
+    return _counts
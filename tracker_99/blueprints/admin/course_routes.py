@@ -15,6 +15,9 @@ from tracker_99.blueprints.admin.course_forms import (
     DeleteCourseForm,
 )
 from tracker_99.models.models import Course, Association, Member, Role
+from tracker_99.privileges import course_privilege
+from tracker_99.roles_cache import roles_cache
+from tracker_99.token_claims import bump_token_versions
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -57,24 +60,17 @@ def add_course() -> Union[str, Response]:
             # Get row_id of the new course
             _new_id = _course.course_id
 
-            # Get the first role_id that has owner privileges
+            # Get the role_id that has owner privileges from the cached roles
             # instead of using a hard-coded int or ID
-            """
-            SELECT roles.role_id
-            FROM roles
-            WHERE roles.role_privilege = 30
-            LIMIT 1;
-            """
-            _role_id = (db.session.query(Role.role_id)
-                .filter(Role.role_privilege == 30)
-                .limit(1)
-                .scalar())
+            _role_id = roles_cache.by_privilege(c.PRIVILEGE_LVL_OWNER).role_id
 
             # Add the course and chair to the association table
             _member_id = int(current_user.get_id())
             _assoc = Association(course_id=_new_id, role_id=_role_id, member_id=_member_id)
 
             db.session.add(_assoc)
+            # API tokens without the new course are stale
+            bump_token_versions([_member_id])
             db.session.commit()
 
             flash('Addition successful.')
@@ -266,6 +262,8 @@ def delete_course(course_id: int) -> Union[str, Response]:
 
     if _form.validate_on_submit():
         try:
+            # Mark the API tokens of the members assigned to the course as stale
+            bump_token_versions(course_id=_course.course_id)
             # Delete association data first
             """
             DELETE FROM associations WHERE course_id = 17;
@@ -307,22 +305,9 @@ def _get_privilege_level(course_id: int) -> int:
         _member_id = int(current_user.get_id())
 
         # Ensure the current user has the right privileges
-        """
-        SELECT roles.role_privilege
-        FROM associations,
-            roles
-        WHERE associations.course_id = 3 AND
-            associations.member_id = 2 AND
-            associations.role_id = roles.role_id
-        LIMIT 1;
-        """
-        _role_privilege = (db.session.query(Role.role_privilege)
-            .join(Association, Association.role_id == Role.role_id)
-            .filter(Association.course_id == course_id,
-                    Association.member_id == _member_id)
-            .first())
-
+        # The user's privileges in every course are read once per request (see privileges.py)
+        _role_privilege = course_privilege(course_id, _member_id)
         if _role_privilege is None:
             return 0
         else:
-            return _role_privilege[0]
+            return _role_privilege
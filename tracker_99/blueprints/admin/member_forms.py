@@ -59,9 +59,10 @@ class AddMemberForm(FlaskForm):
         :returns: None
         :rtype: None
         """
-        # SELECT * FROM members WHERE LOWER(members.member_name) = LOWER("LeTo.ATREIDES");
+        # SELECT member_id FROM members WHERE member_name_lower = 'leto.atreides';
         if db.session.scalar(
-                select(Member).where(func.lower(Member.member_name) == func.lower(member_name.data))
+                select(Member.member_id)
+                .where(Member.member_name_lower == Member.normalize_name(member_name.data))
         ):
             raise ValidationError('Name already exists.')
 
@@ -139,9 +140,11 @@ class EditMemberForm(FlaskForm):
         :returns: None
         :rtype: None
         """
-        # SELECT * FROM members WHERE LOWER(members.member_name) = LOWER("LeTo.ATREIDES");
-        if member_name.data != self.current_member_name and db.session.scalar(
-                select(Member).where(func.lower(Member.member_name) == func.lower(member_name.data))
+        # Members can change the case of their own name
+        # SELECT member_id FROM members WHERE member_name_lower = 'leto.atreides';
+        _name_lower = Member.normalize_name(member_name.data)
+        if _name_lower != Member.normalize_name(self.current_member_name) and db.session.scalar(
+                select(Member.member_id).where(Member.member_name_lower == _name_lower)
         ):
             raise ValidationError('Name already exists.')
 
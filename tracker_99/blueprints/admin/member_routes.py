@@ -16,6 +16,8 @@ from tracker_99.blueprints.admin.member_forms import (
     UpdateProfileForm,
 )
 from tracker_99.models.models import Member, Association
+from tracker_99.password_service import PasswordServiceBusy
+from tracker_99.token_claims import bump_token_versions, forget_cached_tokens
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -62,6 +64,14 @@ def add_member() -> Union[str, Response]:
         # except exc.IntegrityError:
         #     db.session.rollback()
         #     flash('Addition failed: Member exists', 'error')
+        except PasswordServiceBusy as e:
+            # The password service rejects new hashes while its workers are full
+            db.session.rollback()
+            flash(str(e), 'error')
+            return render_template(
+                'add_member.html', page_title=_page_title, page_description=_page_description,
+                form=_form
+            ), 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             db.session.rollback()
             flash(f'Addition failed: {str(e)}', 'error')
@@ -166,6 +176,8 @@ def edit_member(member_id: int) -> Union[str, Response]:
                 is_admin = 0
             WHERE member_id = 17;
             """
+            # API tokens hold a snapshot of the member (e.g., is_admin), so mark them as stale
+            bump_token_versions([_member.member_id])
             # db.session.add(_member)
             db.session.commit()
             flash('Update successful.')
@@ -173,6 +185,14 @@ def edit_member(member_id: int) -> Union[str, Response]:
         # except exc.IntegrityError:
         #     db.session.rollback()
         #     flash('Update failed: Member exists', 'error')
+        except PasswordServiceBusy as e:
+            # The password service rejects new hashes while its workers are full
+            db.session.rollback()
+            flash(str(e), 'error')
+            return render_template(
+                'edit_member.html', page_title=_page_title, page_description=_page_description,
+                form=_form
+            ), 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             db.session.rollback()
             flash(f'Update failed: {str(e)}', 'error')
@@ -233,6 +253,9 @@ def delete_member(member_id: int) -> Union[str, Response]:
             DELETE FROM members WHERE member_id = 17;
             """
             db.session.delete(_member)
+            # The member no longer exists, so drop the cached token version and API tokens
+            # once the deletion commits
+            forget_cached_tokens([member_id])
             # Ensure changes are pushed before commit
             db.session.flush()
             db.session.commit()
@@ -301,9 +324,19 @@ def update_profile(member_id: int) -> Union[str, Response]:
             WHERE member_id = 17;
             """
             # db.session.add(_member)
+            # Changing the password revokes the member's API tokens
+            bump_token_versions([_member.member_id])
             db.session.commit()
             flash('Update successful.')
             return redirect(url_for(c.INDEX_PAGE))
+        except PasswordServiceBusy as e:
+            # The password service rejects new hashes while its workers are full
+            db.session.rollback()
+            flash(str(e), 'error')
+            return render_template(
+                'update_profile.html', page_title=_page_title, page_description=_page_description,
+                form=_form, member=_member
+            ), 503, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             db.session.rollback()
             flash(f'Update failed: {str(e)}', 'error')
@@ -15,6 +15,8 @@ from tracker_99.blueprints.admin.role_forms import (
     DeleteRoleForm,
 )
 from tracker_99.models.models import Role, Association
+from tracker_99.roles_cache import roles_cache
+from tracker_99.token_claims import bump_token_versions
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -59,6 +61,8 @@ def add_role() -> Union[str, Response]:
             """
             db.session.add(_role)
             db.session.commit()
+            # Reload the cached roles, so the next request sees the change
+            roles_cache.reload()
             flash('Addition successful.')
             return redirect(url_for(c.ROLES_PAGE))
         except Exception as e:
@@ -155,8 +159,12 @@ def edit_role(role_id: int) -> Union[str, Response]:
                 role_privilege = "999"
             WHERE role_id = 4;
             """
+            # API tokens hold the privileges of the members with this role, so mark them as stale
+            bump_token_versions(role_id=_role.role_id)
             # db.session.add(_role)
             db.session.commit()
+            # Reload the cached roles, so the next request sees the change
+            roles_cache.reload()
             flash('Update successful.')
             return redirect(url_for(c.ROLES_PAGE))
         except Exception as e:
@@ -207,6 +215,7 @@ def delete_role(role_id: int) -> Union[str, Response]:
 
     if _form.validate_on_submit():
         try:
+            bump_token_versions(role_id=_role.role_id)
             # Delete association data first
             """
             DELETE FROM associations WHERE role_id = 4;
@@ -217,6 +226,8 @@ def delete_role(role_id: int) -> Union[str, Response]:
             """
             db.session.delete(_role)
             db.session.commit()
+            # Reload the cached roles, so the next request sees the change
+            roles_cache.reload()
             flash('Delete successful.')
             return redirect(url_for(c.ROLES_PAGE))
         except Exception as e:
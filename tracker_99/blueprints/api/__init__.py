@@ -3,14 +3,18 @@
 This file also turns the directory into a package whose scripts can be imported as modules.
 """
 
+import hashlib
 from functools import wraps
 from typing import Any, Callable, Union
 
-from flask import Blueprint
-from flask import jsonify, request
+from flask import Blueprint, Response
+from flask import g, jsonify, make_response, request
 
-from tracker_99.app_utils import decode_auth_token
-from tracker_99.models.models import Member
+from tracker_99.app_utils import decode_auth_token_claims
+from tracker_99.caches import token_cache
+from tracker_99.privileges import course_privilege
+from tracker_99.table_versions import get_table_versions
+from tracker_99.token_claims import current_token_version, requester_from_claims
 
 api_bp = Blueprint('api_bp', __name__, template_folder='templates')
 
@@ -21,7 +25,13 @@ def token_required(f: Callable[..., Any]) -> Callable[..., Any]:
     This decorator checks if a valid JWT token is included in the request's
     `Authorization` header. If the token is missing or invalid, an error response
     is returned. If the token is valid, the wrapped function is executed with
-    additional requester data (e.g., `requester_id`, `requester_is_admin`).
+    additional requester data (e.g., `requester_id`, `requester_is_admin`,
+    and `requester_privileges`, which is None unless the token has current rich claims).
+
+    Verified tokens are cached until they expire (see `caches.TokenCache`),
+    so repeated calls with the same token do not decode it or query the requester again.
+    A cached token is only used while the member's token version is the one it was cached with,
+    so a token revoked in another process is rejected within TOKEN_VERSION_TTL seconds.
 
     :param Callable[..., Any] f: The function to wrap.
 
@@ -52,29 +62,182 @@ def token_required(f: Callable[..., Any]) -> Callable[..., Any]:
         except IndexError:
             return jsonify({'error': 'Invalid token format.'}), 400
 
-        # Decode the token to get the requester's info
-        _requester_id = decode_auth_token(_auth_token)
-        if not _requester_id:
-            return jsonify({'error': 'Invalid or expired token.'}), 401
+        # Reuse the verified claims and requester snapshot if the token was seen before
+        _entry = token_cache.get_token(_auth_token)
+        if _entry is not None and _entry['requester']['token_version'] != current_token_version(
+                _entry['requester']['member_id']):
+            # The member's privileges or credentials changed since the token was cached
+            token_cache.pop(token_cache.digest(_auth_token))
+            _entry = None
+
+        if _entry is None:
+            # Decode the token to get the requester's info
+            _claims = decode_auth_token_claims(_auth_token)
+            if not _claims:
+                return jsonify({'error': 'Invalid or expired token.'}), 401
+
+            # Authorize from the signed claims if they are current;
+            # otherwise, fetch the member associated with the token from the database
+            # Only the member ID, is_admin, course privileges, and token version are kept
+            # in the cache, so add other attributes, like member_name, etc., to the snapshot if needed
+            _requester = requester_from_claims(_claims)
+            if not _requester:
+                return jsonify({'error': 'Requester not found.'}), 404
+
+            _entry = {'claims': _claims, 'requester': _requester}
+            token_cache.set_token(_auth_token, _entry['claims'], _entry['requester'])
+
+        # Record the requester for the access log (see `log_page_request`)
+        g.requester_id = _entry['requester']['member_id']
+
+        # If token is valid, pass requester information to the protected route
+        # IMPORTANT - Do not add a response code to the return value;
+        # the wrapped function will return the HTTP response code
+        return f(*args, **kwargs, requester_id=_entry['requester']['member_id'],
+                 requester_is_admin=_entry['requester']['is_admin'],
+                 requester_privileges=_entry['requester']['privileges'])
 
-        # Fetch the member associated with the _member_id
-        # I considered adding is_admin to the token in app_utils.py
-        # to avoid perform additional queries, but I left it here,
-        # in case I wanted to add other attributes, like member_name, etc.
-        """
-        SELECT * FROM members WHERE member_id = 1 LIMIT 1;
+    return wrapper
+
+
+def conditional_get(*tables: str,
+                    allow: Union[Callable[..., bool], None] = None) -> Callable[..., Any]:
+    """Decorator that answers repeated GET requests with `304 Not Modified`
+    if the tables the route reads have not changed.
+
+    The strong ETag of a response is derived from the versions of the tables
+    (see `table_versions.py`), the requester's ID and administrator status,
+    and the path and query string, so requesters with different scopes never share an ETag.
+    If the client's `If-None-Match` matches it, or, without `If-None-Match`,
+    the tables have not changed since `If-Modified-Since`, the route is not called.
+
+    A 304 skips the route's own authorization, so routes that reject some requesters
+    pass `allow`, which gets the route's arguments and the requester information.
+    If it returns False, the route is called, and returns its error, without the validators.
+
+    **NOTE** - Place the decorator below @token_required, so it gets the requester information.
+
+    :param str tables: The names of the tables the route reads
+    :param Callable or None allow: Returns True if the requester can use the route, \
+        defaults to None (every requester can use the route)
+
+    :return: A decorator that adds conditional GET handling to the route
+    :rtype: Callable[..., Any]
+    """
+    if not tables:
+        raise ValueError('conditional_get needs at least one table.')
+
+    def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap the route.
+
+        :param Callable[..., Any] f: The function to wrap.
+
+        :return: The original function wrapped with conditional GET handling.
+        :rtype: Callable[..., Any]
         """
-        _requester = Member.query.filter_by(member_id=_requester_id).first()
-        if _requester:
-            # If token is valid, pass requester information to the protected route
-            # IMPORTANT - Do not add a response code to the return value;
-            # the wrapped function will return the HTTP response code
-            return f(*args, **kwargs, requester_id=_requester_id,
-                     requester_is_admin=_requester.is_admin)
-        else:
-            return jsonify({'error': 'Requester not found.'}), 404
 
-    return wrapper
+        @wraps(f)
+        def wrapper(*args, **kwargs) -> Union[tuple, Response]:
+            """Checks the validators of the request and then runs the wrapped function.
+
+            :returns: An empty 304 response, or the HTTP response from the wrapped function \
+                with an ETag and Last-Modified if its status code is 200
+            :rtype: Union[tuple, Response]
+            """
+            # Do not answer 304 to a requester the route would reject
+            if allow is not None and not allow(*args, **kwargs):
+                return f(*args, **kwargs)
+
+            _versions = get_table_versions(tables)
+            _scope = (
+                kwargs.get('requester_id'), kwargs.get('requester_is_admin'), request.full_path,
+                tuple(_versions[_table][0] for _table in tables),
+            )
+            _etag = hashlib.sha256(repr(_scope).encode('utf-8')).hexdigest()[:32]
+            # HTTP dates only have seconds, so round down, like the client's copy of the header
+            _changed_at = int(max(_changed_at for _, _changed_at in _versions.values()))
+
+            # If-None-Match takes precedence over If-Modified-Since (RFC 9110, 13.2.2)
+            if request.if_none_match:
+                _not_modified = request.if_none_match.contains(_etag)
+            else:
+                _not_modified = (
+                    _changed_at > 0 and request.if_modified_since is not None
+                    and _changed_at <= request.if_modified_since.timestamp()
+                )
+
+            if _not_modified:
+                _response = Response(status=304)
+            else:
+                _response = make_response(f(*args, **kwargs))
+                if _response.status_code != 200:
+                    return _response
+
+            _response.set_etag(_etag)
+            if _changed_at > 0:
+                _response.last_modified = _changed_at
+            # Let clients keep the response, but make them check that it is still current
+            _response.cache_control.private = True
+            _response.cache_control.no_cache = True
+            return _response
+
+        return wrapper
+
+    return decorator
+
+
+def requester_course_privilege(course_id: int, requester_id: int,
+                               requester_privileges: Union[dict, None]) -> Union[int, None]:
+    """Get the requester's role privilege in a course.
+
+    Uses the privileges from the token's rich claims if available, without querying the database.
+
+    :param int course_id: The ID of the course
+    :param int requester_id: The ID of the requester, from @token_required
+    :param dict or None requester_privileges: The course privileges from @token_required
+
+    :returns: The role privilege or None if the requester is not assigned to the course
+    :rtype: int or None
+    """
+    if requester_privileges is not None:
+        return requester_privileges.get(course_id)
+
+    # Read the requester's privileges in every course once per request (see privileges.py)
+    return course_privilege(course_id, requester_id)
+
+
+def requester_is_admin(**kwargs) -> bool:
+    """Check if the requester is an administrator, for `conditional_get(allow=...)`.
+
+    :returns: True if the requester is an administrator
+    :rtype: bool
+    """
+    return bool(kwargs.get('requester_is_admin', False))
+
+
+def requester_is_admin_or_self(member_id: int, **kwargs) -> bool:
+    """Check if the requester is an administrator or the member,
+    for `conditional_get(allow=...)`.
+
+    :param int member_id: The ID of the member the route reads
+
+    :returns: True if the requester is an administrator or the member
+    :rtype: bool
+    """
+    return requester_is_admin(**kwargs) or int(kwargs.get('requester_id', 0)) == member_id
+
+
+def requester_in_course(course_id: int, **kwargs) -> bool:
+    """Check if the requester is an administrator or is assigned to the course,
+    for `conditional_get(allow=...)`.
+
+    :param int course_id: The ID of the course the route reads
+
+    :returns: True if the requester is an administrator or is assigned to the course
+    :rtype: bool
+    """
+    return requester_is_admin(**kwargs) or requester_course_privilege(
+        course_id, kwargs.get('requester_id', 0), kwargs.get('requester_privileges')) is not None
 
 
 # Import the other modules in the package after instantiating
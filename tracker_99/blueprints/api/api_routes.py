@@ -3,17 +3,27 @@
 Test: http://127.0.0.1:5000/api/test
 """
 
+import io
 import os
+from typing import Union
 
-from flask import Response, send_from_directory
+from flask import Response, current_app, send_from_directory, stream_with_context
 from flask import jsonify, request
-from sqlalchemy import Row, func
-from werkzeug.security import check_password_hash
 
 from tracker_99 import db, constants as c
 from tracker_99.app_utils import encode_auth_token, validate_input
-from tracker_99.blueprints.api import api_bp, token_required
+from tracker_99.assignments import bulk_assign
+from tracker_99.bulk_export import (EXPORT_FORMATS, EXPORT_KINDS, export_chunks,
+                                    export_statement, gzip_chunks)
+from tracker_99.bulk_import import IMPORT_KINDS, import_rows, read_rows
+from tracker_99.blueprints.api import (api_bp, conditional_get, requester_course_privilege,
+                                       requester_in_course, token_required)
+from tracker_99.caches import token_cache
 from tracker_99.models.models import Association, Course, Member, Role
+from tracker_99.password_service import PasswordServiceBusy
+from tracker_99.roles_cache import roles_cache
+from tracker_99.serializers import COURSE_DETAILS_SERIALIZER
+from tracker_99.token_claims import build_rich_claims, bump_token_versions
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -44,15 +54,41 @@ def login() -> tuple:
     _submitted_name = _data.get('username')
     _submitted_password = _data.get('password')
 
-    # Find requester by name (case-insensitive comparison)
+    if not all(isinstance(_value, str) and _value
+               for _value in (_submitted_name, _submitted_password)):
+        return jsonify({'error': 'Invalid credentials.'}), 401
+
+    # Find requester by name (case-insensitive comparison, using the index)
+    """
+    SELECT * FROM members WHERE member_name_lower = 'leto.atreides';
+    """
     _requester = Member.query.filter(
-        func.lower(Member.member_name) == func.lower(_submitted_name)
+        Member.member_name_lower == Member.normalize_name(_submitted_name)
     ).first()
 
     # Ensure the requester is a member with correct credentials
-    if _requester and check_password_hash(_requester.password_hash, _submitted_password):
-        # Generate a JWT token containing the member ID
-        _auth_token = encode_auth_token(_requester.member_id)
+    # The password is checked in the password service's worker processes,
+    # which reject new logins while they are full, instead of queueing them
+    try:
+        _verified = _requester is not None and _requester.verify_password(_submitted_password)
+    except PasswordServiceBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+
+    if _verified:
+        # Move the stored hash to PASSWORD_HASH_METHOD while the password is known
+        try:
+            if _requester.rehash_password(_submitted_password):
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(
+                'Password rehash failed for member %d: %s', _requester.member_id, e)
+
+        # Generate a JWT token containing the member ID and, optionally,
+        # the requester's privileges, so API calls can be authorized without the database
+        _extra_claims = (build_rich_claims(_requester)
+                         if current_app.config.get('RICH_TOKENS_ENABLED', False) else None)
+        _auth_token = encode_auth_token(_requester.member_id, extra_claims=_extra_claims)
         if 'error' in _auth_token.lower():
             return jsonify({'error': _auth_token}), 500
         return jsonify({'message': 'Login successful.', 'auth_token': _auth_token}), 200
@@ -64,6 +100,8 @@ def login() -> tuple:
 @api_bp.route('/api/courses/get/details/<int:course_id>', methods=['GET'],
               endpoint='get_details')
 @token_required
+@conditional_get('associations', 'courses', 'members', 'roles',
+                 allow=requester_in_course)
 def api_get_details(course_id: int, **kwargs) -> tuple:
     """Respond to an API request to:
 
@@ -90,56 +128,43 @@ def api_get_details(course_id: int, **kwargs) -> tuple:
     # Get kwargs from the @token_required decorator
     _requester_id = kwargs.get('requester_id', 0)
     _is_admin = kwargs.get('requester_is_admin', False)
+    _privileges = kwargs.get('requester_privileges')
 
+    # If the token lists the requester's courses, reject unassigned members without a query
+    if not _is_admin and _privileges is not None and course_id not in _privileges:
+        return jsonify({'error': c.NOT_FOUND_MSG}), 404
+
+    # Select only the serialized columns, instead of loading Course and Role objects
     """
-    SELECT associations.member_id, members.member_name, courses.*, roles.*
-    FROM associations, courses, members, roles
-    WHERE associations.course_id = 12 AND
-        associations.course_id = courses.course_id AND
-        associations.member_id = members.member_id AND
-        associations.role_id = roles.role_id;
+    SELECT associations.member_id, members.member_name,
+        courses.course_id, courses.course_name, courses.course_code, courses.course_group,
+        courses.course_key, courses.course_desc,
+        roles.role_id, roles.role_name, roles.role_privilege
+    FROM associations
+    JOIN courses ON associations.course_id = courses.course_id
+    JOIN members ON associations.member_id = members.member_id
+    JOIN roles ON associations.role_id = roles.role_id
+    WHERE associations.course_id = 12;
     """
-    _result = (db.session.query(Association.member_id, Member.member_name, Course, Role)
-               .join(Course, Association.course_id == Course.course_id)
-               .join(Member, Association.member_id == Member.member_id)
-               .join(Role, Association.role_id == Role.role_id)
-               .filter(Association.course_id == course_id)
-               .all())
+    _stmt = (COURSE_DETAILS_SERIALIZER.select()
+             .select_from(Association)
+             .join(Course, Association.course_id == Course.course_id)
+             .join(Member, Association.member_id == Member.member_id)
+             .join(Role, Association.role_id == Role.role_id)
+             .where(Association.course_id == course_id))
+    # Members only get their own assignment, so do not fetch everyone else's
+    if not _is_admin:
+        _stmt = _stmt.where(Association.member_id == _requester_id)
+    _result = COURSE_DETAILS_SERIALIZER.dump_all(db.session.execute(_stmt))
     if not _result:
         return jsonify({'error': c.NOT_FOUND_MSG}), 404
 
-    def dict_builder(r: Row) -> dict:
-        """Create a dictionary from a row in the results of a query.
-
-        :param Row r: A SQLAlchemy row from the results of a query
-
-        :returns: A dictionary containing keys and row values
-        :rtype: dict
-        """
-        # Unpack the member_id and the course and role objects
-        _member_id, _member_name, _course, _role = r
-        return {
-            'member_id': _member_id,
-            'member_name': _member_name,
-            'course_id': _course.course_id,
-            'course_name': _course.course_name,
-            'course_code': _course.course_code,
-            'course_group': _course.course_group,
-            'course_key': _course.course_key,
-            'course_desc': _course.course_desc,
-            'role_id': _role.role_id,
-            'role_name': _role.role_name,
-            'role_privilege': _role.role_privilege
-        }
-
     if _is_admin:
         # For admin, return a list of all assigned courses
-        _assigned_courses = [dict_builder(r) for r in _result]
-        return jsonify(_assigned_courses), 200
+        return jsonify(_result), 200
     else:
         # For member, check if the requester is assigned to the course
-        for r in _result:
-            _info = dict_builder(r)
+        for _info in _result:
             if _requester_id == _info['member_id']:
                 return jsonify(_info), 200
 
@@ -200,36 +225,15 @@ def api_assign_course(**kwargs) -> tuple:  # NOSONAR
         if _requester_id == _member_id:
             return jsonify({'error': c.NOT_AUTH_MSG}), 403
 
-        """
-        SELECT roles.role_privilege
-        FROM associations
-        JOIN roles ON associations.role_id = roles.role_id
-        WHERE associations.course_id = 12
-        AND associations.member_id = 2;
-        """
-        _result = (db.session.query(Role.role_privilege)
-                   .select_from(Association)
-                   .join(Role, Association.role_id == Role.role_id)
-                   .filter(Association.course_id == _course_id)
-                   .filter(Association.member_id == _requester_id)
-                   .first())
-        if not _result:
+        # Use the privileges in the token if available, or query the database
+        _requestor_role_privilege = requester_course_privilege(
+            _course_id, _requester_id, kwargs.get('requester_privileges'))
+        if _requestor_role_privilege is None:
             return jsonify({'error': c.NOT_FOUND_MSG}), 404
 
-        # Unpack the query row (i.e., convert tuple (2,) to int (2))
-        _requestor_role_privilege = _result[0]
-
-        # Get the requested role ID
-        """
-        SELECT roles.role_privilege FROM roles WHERE roles.role_id = 3;
-        """
-        _result = (db.session.query(Role.role_privilege)
-                   .filter(Role.role_id == _role_id)
-                   .first())
-
-        # Unpack the query row (i.e., convert tuple (2,) to int (2))
+        # Get the privilege of the requested role from the cached roles
         # Default to 0 for deletions
-        _assignee_role_privilege = 0 if not _result else _result[0]
+        _assignee_role_privilege = roles_cache.privilege(_role_id) or 0
 
         # Compare the requestor's privilege to the _assignee_role_privilege
         # Remember, non-admins cannot assign at or above their privilege level
@@ -247,6 +251,8 @@ def api_assign_course(**kwargs) -> tuple:  # NOSONAR
                                  role_id=_role_id)
 
             db.session.add(_assoc)
+            # The member's privileges changed, so tokens with the old privileges are stale
+            bump_token_versions([_member_id])
             db.session.commit()
 
             return jsonify(
@@ -276,6 +282,7 @@ def api_assign_course(**kwargs) -> tuple:  # NOSONAR
             """
             UPDATE association SET role_id = 2 WHERE course_id = 1 AND member_id == 6;
             """
+            bump_token_versions([_member_id])
             db.session.commit()
 
             return jsonify({'message':
@@ -299,6 +306,7 @@ def api_assign_course(**kwargs) -> tuple:  # NOSONAR
             DELETE FROM associations WHERE course_id = 1 AND member_id == 6;
             """
             db.session.delete(_assoc)
+            bump_token_versions([_member_id])
             # Ensure changes are pushed before commit
             db.session.flush()
             db.session.commit()
@@ -312,6 +320,197 @@ def api_assign_course(**kwargs) -> tuple:  # NOSONAR
     return jsonify('No action taken'), 204
 
 
+# Do not forget to add an endpoint, or you will get an AssertionError!
+@api_bp.route('/api/courses/assign/bulk', methods=['POST'], endpoint='assign_course_bulk')
+@token_required
+def api_assign_course_bulk(**kwargs) -> tuple:
+    """Respond to an API request to add, reassign, or remove many course assignments.
+
+    Send up to MAX_BULK_ASSIGNMENTS items. Use a role_id of 1 (or null) to remove an assignment.
+    Items that fail a check are skipped and the others are saved in one transaction,
+    so check the status of each item in the results. If a course and member appear
+    more than once, every one of their items is invalid.
+
+    Bash:
+    curl -X POST -H "Authorization: Bearer json.web.token" \
+        -H "Content-Type: application/json" \
+        -d '{"assignments": [{"course_id": 2, "member_id": 2, "role_id": 3}, \
+            {"course_id": 2, "member_id": 6, "role_id": 1}]}' \
+        http://127.0.0.1:5000/api/courses/assign/bulk
+
+    PS:
+    Invoke-WebRequest -Method Post \
+        -Headers "Authorization: Bearer json.web.token" \
+        -ContentType "application/json" \
+        -Body "{`"assignments`": [{`"course_id`": 2, `"member_id`": 2, `"role_id`": 3}]}" \
+        -Uri "http://127.0.0.1:5000/api/courses/assign/bulk"
+
+    :returns: The number of items with each status and the result of each item in JSON format, \
+        or an error message, with the HTTP status code (Response, int)
+    :rtype: tuple
+    """
+    # Get the JSON data from the request and check the format of each item
+    _data = request.get_json(silent=True) or {}
+    _assignments = _data.get('assignments') if isinstance(_data, dict) else None
+    if not isinstance(_assignments, list) or not all(
+            isinstance(_item, dict)
+            and isinstance(_item.get('course_id'), int)
+            and isinstance(_item.get('member_id'), int)
+            and isinstance(_item.get('role_id'), (int, type(None)))
+            for _item in _assignments
+    ):
+        return jsonify(
+            {'error': 'Send a list of assignments with a course_id, member_id, and role_id.'}
+        ), 400
+    if len(_assignments) > c.MAX_BULK_ASSIGNMENTS:
+        return jsonify(
+            {'error': f'Send at most {c.MAX_BULK_ASSIGNMENTS} assignments per request.'}
+        ), 413
+
+    # Get kwargs from the @token_required decorator
+    _requester_id = kwargs.get('requester_id', 2)
+    _is_admin = kwargs.get('requester_is_admin', False)
+
+    # Allow except Exception, since any database error must roll back the whole batch
+    try:
+        _results, _counts = bulk_assign(
+            [(_item['course_id'], _item['member_id'], _item.get('role_id'))
+             for _item in _assignments],
+            requester_id=_requester_id,
+            requester_is_admin=_is_admin,
+            requester_privileges=kwargs.get('requester_privileges'),
+        )
+
+        # The members' privileges changed, so tokens with the old privileges are stale
+        bump_token_versions({
+            _result['member_id'] for _result in _results
+            if _result['status'] in ('added', 'updated', 'removed')
+        })
+        db.session.commit()
+    except Exception as e:  # pylint: disable=broad-except
+        db.session.rollback()
+        return jsonify({'message': f'Bulk assignment failed: {str(e)}'}), 500
+
+    return jsonify({'message': 'Assignments processed.', **_counts, 'results': _results}), 200
+
+
+# Do not forget to add an endpoint, or you will get an AssertionError!
+@api_bp.route('/api/import/<string:kind>', methods=['POST'], endpoint='import_rows')
+@token_required
+def api_import_rows(kind: str, **kwargs) -> tuple:
+    """Respond to an API request to import members, courses, or roles (Admin only).
+
+    Send one JSON object per line (Content-Type: application/x-ndjson),
+    or CSV with a header row (Content-Type: text/csv).
+    The body is read one line at a time, so large imports do not use much memory.
+
+    Bash:
+    curl -X POST -H "Authorization: Bearer json.web.token" \
+        -H "Content-Type: application/x-ndjson" \
+        --data-binary @members.ndjson \
+        http://127.0.0.1:5000/api/import/members
+
+    PS:
+    Invoke-WebRequest -Method Post \
+        -Headers @{ "Authorization" = "Bearer json.web.token" } \
+        -ContentType "text/csv" \
+        -InFile "courses.csv" \
+        -Uri "http://127.0.0.1:5000/api/import/courses"
+
+    :param str kind: members, courses, or roles
+
+    :returns: The number of rows read, inserted, and failed, and the first errors \
+        in JSON format, or an error message, with the HTTP status code (Response, int)
+    :rtype: tuple
+    """
+    # Validate inputs
+    validate_input('kind', kind, str)
+
+    # Only administrators can import data
+    # Get kwargs from the @token_required decorator
+    if not kwargs.get('requester_is_admin', False):
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+
+    if kind not in IMPORT_KINDS:
+        return jsonify({'error': f'Import one of {IMPORT_KINDS}.'}), 404
+
+    _format = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    # Read the body as a stream of lines, instead of loading it into memory
+    _lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+
+    _report = import_rows(
+        kind, read_rows(_lines, _format),
+        batch_size=current_app.config.get('BULK_IMPORT_BATCH_SIZE', 1000),
+        # Hash the passwords in the shared workers of the password service
+        max_errors=c.MAX_IMPORT_ERRORS,
+    )
+
+    return jsonify({'message': 'Import complete.', **_report}), 200
+
+
+# Do not forget to add an endpoint, or you will get an AssertionError!
+@api_bp.route('/api/export/<string:kind>', methods=['GET'], endpoint='export_rows')
+@token_required
+def api_export_rows(kind: str, **kwargs) -> Union[tuple, Response]:
+    """Respond to an API request to export every member, course, role, or course assignment.
+
+    The rows are sent as they are read (chunked transfer encoding), as NDJSON (default)
+    or CSV (?format=csv), and compressed with gzip if the client accepts it.
+    Administrators can export everything; members can only export their assigned courses.
+
+    Bash:
+    curl -H "Authorization: Bearer json.web.token" --compressed \
+        "http://127.0.0.1:5000/api/export/members?format=csv" -o members.csv
+
+    PS:
+    Invoke-WebRequest -Method GET \
+        -Headers @{ "Authorization" = "Bearer json.web.token" } \
+        -Uri "http://127.0.0.1:5000/api/export/members?format=csv" -OutFile "members.csv"
+
+    :param str kind: members, courses, roles, or associations
+
+    :returns: The streamed rows, or an error message with the HTTP status code (Response, int)
+    :rtype: Response/tuple
+    """
+    # Validate inputs
+    validate_input('kind', kind, str)
+
+    if kind not in EXPORT_KINDS:
+        return jsonify({'error': f'Export one of {EXPORT_KINDS}.'}), 404
+
+    _format = request.args.get('format', 'ndjson')
+    if _format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Use one of {EXPORT_FORMATS} as the format.'}), 400
+
+    # Get kwargs from the @token_required decorator
+    try:
+        _stmt = export_statement(kind, int(kwargs.get('requester_id', 0)),
+                                 bool(kwargs.get('requester_is_admin', False)))
+    except PermissionError:
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+
+    _chunks = export_chunks(_stmt, _format,
+                            batch_size=current_app.config.get('EXPORT_BATCH_SIZE', 1000))
+
+    _headers = {
+        'Content-Disposition': f'attachment; filename={kind}.{_format}',
+        # Ask proxies, like nginx, to pass each chunk on instead of buffering the response
+        'X-Accel-Buffering': 'no',
+        'Vary': 'Accept-Encoding',
+    }
+    if 'gzip' in request.accept_encodings:
+        _chunks = gzip_chunks(_chunks)
+        _headers['Content-Encoding'] = 'gzip'
+
+    # Keep the application context (and the database session) open while the rows are sent
+    # Without a Content-Length, the server sends the response in chunks as they are yielded
+    return Response(
+        stream_with_context(_chunks),
+        mimetype='text/csv' if _format == 'csv' else 'application/x-ndjson',
+        headers=_headers,
+    )
+
+
 @api_bp.route('/favicon.ico')
 def api_get_favicon() -> Response:
     """Loads application icon.
@@ -358,3 +557,56 @@ def api_get_test_data() -> tuple:
     :rtype: tuple
     """
     return jsonify(test_data=_DUMMY_DATA, status=200, mimetype='application/json'), 200
+
+
+# Do not forget to add an endpoint, or you will get an AssertionError!
+@api_bp.route('/api/stats/token_cache', methods=['GET'], endpoint='token_cache_stats')
+@token_required
+def api_token_cache_stats(**kwargs) -> tuple:
+    """Respond to an API request for the hit and miss counters of the token cache.
+
+    Bash:
+    curl -H "Authorization: Bearer json.web.token" http://127.0.0.1:5000/api/stats/token_cache
+
+    PS:
+    Invoke-WebRequest -Headers @{ "Authorization" = "Bearer json.web.token" } \
+        -Uri "http://127.0.0.1:5000/api/stats/token_cache"
+
+    :returns: The counters in JSON format and the HTTP status code (Response, int)
+    :rtype: tuple
+    """
+    # Only administrators can view the counters
+    # Get kwargs from the @token_required decorator
+    if not kwargs.get('requester_is_admin', False):
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+
+    return jsonify({'enabled': token_cache.enabled, **token_cache.stats()}), 200
+
+
+# Do not forget to add an endpoint, or you will get an AssertionError!
+@api_bp.route('/api/stats/logging', methods=['GET'], endpoint='logging_stats')
+@token_required
+def api_logging_stats(**kwargs) -> tuple:
+    """Respond to an API request for the queued and dropped counters of the logging pipeline.
+
+    Bash:
+    curl -H "Authorization: Bearer json.web.token" http://127.0.0.1:5000/api/stats/logging
+
+    PS:
+    Invoke-WebRequest -Headers @{ "Authorization" = "Bearer json.web.token" } \
+        -Uri "http://127.0.0.1:5000/api/stats/logging"
+
+    :returns: The counters in JSON format and the HTTP status code (Response, int)
+    :rtype: tuple
+    """
+    # Only administrators can view the counters
+    # Get kwargs from the @token_required decorator
+    if not kwargs.get('requester_is_admin', False):
+        return jsonify({'error': c.NOT_AUTH_MSG}), 403
+
+    # The pipeline only exists if logging is enabled and LOG_QUEUE_ENABLED is True
+    _pipeline = current_app.extensions.get('log_pipeline')
+    if _pipeline is None:
+        return jsonify({'enabled': False}), 200
+
+    return jsonify({'enabled': True, **_pipeline.stats()}), 200
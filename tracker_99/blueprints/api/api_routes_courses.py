@@ -7,8 +7,13 @@ from flask import jsonify, request
 
 from tracker_99 import db, constants as c
 from tracker_99.app_utils import validate_input
-from tracker_99.blueprints.api import api_bp, token_required
-from tracker_99.models.models import Association, Course, Member, Role
+from tracker_99.blueprints.api import (api_bp, conditional_get, requester_course_privilege,
+                                       requester_in_course, token_required)
+from tracker_99.listing import (COURSE_LISTING_COLUMNS, course_listing_query, fetch_page,
+                                parse_api_listing_args)
+from tracker_99.models.models import Association, Course, Member
+from tracker_99.serializers import COURSE_SERIALIZER
+from tracker_99.token_claims import bump_token_versions
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -18,62 +23,51 @@ from tracker_99.models.models import Association, Course, Member, Role
 # Do not forget to add an endpoint, or you will get an AssertionError!
 @api_bp.route('/api/courses/all', methods=['GET'], endpoint='courses_all')
 @token_required
+@conditional_get('courses', 'associations', 'roles')
 def api_courses_all(**kwargs) -> tuple:
-    """Respond to an API request for a list of all courses and their information.
+    """Respond to an API request for the courses and their information, one page at a time
+    if the client sends a limit, a cursor, or an offset, or every course otherwise.
+
+    Optional query string parameters:
+
+        - limit: The number of courses per page (maximum 100)
+        - after: The `next_cursor` value from the previous page
+        - sort: The column to sort by (course_name, course_id, course_code, etc.)
+        - order: 'asc' or 'desc'
+        - q: Text to find in any column
+        - course_name, course_code, course_group, etc.: Text to find in that column
 
     Bash:
-    curl -X GET -H "Authorization: Bearer json.web.token" http://127.0.0.1:5000/api/courses/all
+    curl -X GET -H "Authorization: Bearer json.web.token" \
+        "http://127.0.0.1:5000/api/courses/all?limit=10&course_group=CMSC"
 
     PS:
     Invoke-WebRequest -Method GET \
         -Headers @{ "Authorization" = "Bearer json.web.token" } \
-        -Uri "http://127.0.0.1:5000/api/courses/all"
+        -Uri "http://127.0.0.1:5000/api/courses/all?limit=10&course_group=CMSC"
 
     :returns: The data in JSON format or an error message with the HTTP status code (Response, int)
     :rtype: tuple
     """
     # Get kwargs from the @token_required decorator
-    _member_id = kwargs.get('requester_id', 0)
-    _is_admin = kwargs.get('requester_is_admin', False)
+    _member_id = int(kwargs.get('requester_id', 0))
+    _is_admin = bool(kwargs.get('requester_is_admin', False))
 
-    if _is_admin:
-        # Administrators can view all courses
-        # query.all() always returns a list, even if it is empty
-        """
-        SELECT * FROM courses;
-        """
-        _courses_list = Course.query.all()
-    else:
-        """
-        SELECT courses.*
-        FROM courses,
-            associations
-        WHERE associations.member_id = 2 AND
-            associations.course_id = courses.course_id;
-        """
-        # _courses_list = Course.query.join(Association).filter(
-        #     Association.member_id == _member_id).all()
-        _courses_list = db.session.query(Course).join(
-            Association).filter(Association.member_id == _member_id).all()
+    # Administrators can view all courses, and members can view their assigned courses
+    _stmt, _columns = course_listing_query(_member_id, _is_admin, include_key=True)
+    _page = fetch_page(_stmt, _columns, Course.course_id,
+                       **parse_api_listing_args(request.args, COURSE_LISTING_COLUMNS))
 
-    if not _courses_list:
+    if _page['total'] == 0:
         return jsonify({'error': c.NOT_FOUND_MSG}), 404
 
-    # Exclude the 'password_hash' field
-    _filtered_courses = [
-        {
-            'course_id': course.course_id,
-            'course_name': course.course_name,
-            'course_code': course.course_code,
-            'course_group': course.course_group,
-            'course_key': course.course_key,
-            'course_desc': course.course_desc,
-        }
-        for course in _courses_list
-    ]
+    # The rows also have the requester's role, so the serializer picks the course fields by name
+    _filtered_courses = COURSE_SERIALIZER.dump_all(_page['rows'])
 
     # Use jsonify to convert the filtered list to JSON
-    return jsonify(courses=_filtered_courses), 200
+    # Send next_cursor back as 'after' to get the next page; it is null on the last page
+    return jsonify(courses=_filtered_courses, total=_page['total'], filtered=_page['filtered'],
+                   next_cursor=_page['cursor']), 200
 
 
 # Do not forget to add an endpoint, or you will get an AssertionError!
@@ -149,6 +143,8 @@ def api_add_course(**kwargs) -> tuple:
         _assoc = Association(course_id=_new_id, role_id=4, member_id=_member_id)
 
         db.session.add(_assoc)
+        # The requester is now the chair of the course, so tokens without it are stale
+        bump_token_versions([_member_id])
         db.session.commit()
 
         return jsonify(
@@ -161,6 +157,7 @@ def api_add_course(**kwargs) -> tuple:
 # Do not forget to add an endpoint, or you will get an AssertionError!
 @api_bp.route('/api/courses/get/<int:course_id>', methods=['GET'], endpoint='get_course')
 @token_required
+@conditional_get('courses', 'associations', 'roles', allow=requester_in_course)
 def api_get_course(course_id: int, **kwargs) -> tuple:
     """Respond to an API request for course information.
 
@@ -185,17 +182,10 @@ def api_get_course(course_id: int, **kwargs) -> tuple:
     _is_admin = kwargs.get('requester_is_admin', False)
 
     # Admins can view any course, and members can view assigned courses
-    if not _is_admin:
-        """
-        SELECT * FROM associations WHERE course_id = 17 AND member_id = 2;
-        """
-        _assoc = Association.query.filter(
-            Association.course_id == course_id,
-            Association.member_id == _member_id,
-        ).first()
-
-        if not _assoc:
-            return jsonify({'error': c.NOT_FOUND_MSG}), 403
+    # Use the privileges in the token if available, or query the database
+    if not _is_admin and requester_course_privilege(
+            course_id, _member_id, kwargs.get('requester_privileges')) is None:
+        return jsonify({'error': c.NOT_FOUND_MSG}), 403
 
     # Verify course exists
     """
@@ -258,29 +248,20 @@ def api_edit_course(course_id: int, **kwargs) -> tuple:
             return jsonify({'error': c.NOT_FOUND_MSG}), 404
     else:
         # Members can edit their own courses
-        """
-        SELECT courses.*, role_privilege
-        FROM courses,
-            associations,
-            roles
-        WHERE associations.member_id = 2 AND
-            courses.course_id = 12 AND
-            associations.course_id = courses.course_id AND
-            associations.role_id = roles.role_id;
-        """
-        _result = (db.session.query(Course, Role.role_privilege)
-                   .join(Association, Association.course_id == Course.course_id)
-                   .join(Role, Association.role_id == Role.role_id)
-                   .filter(Association.member_id == _member_id, Course.course_id == course_id)
-                   .first())
-        if _result:
-            _course, _role_privilege = _result
-        else:
+        # Use the privileges in the token if available, or read them once per request
+        _role_privilege = requester_course_privilege(
+            course_id, _member_id, kwargs.get('requester_privileges'))
+        if _role_privilege is None:
             return jsonify({'error': c.NOT_FOUND_MSG}), 404
 
         if _role_privilege < c.PRIVILEGE_LVL_EDITOR:
             return jsonify({'error': c.NOT_AUTH_MSG}), 403
 
+        """
+        SELECT * FROM courses WHERE course_id = 12;
+        """
+        _course = Course.query.get_or_404(course_id)
+
     try:
         # Get the JSON data from the request
         _data = request.get_json()
@@ -356,33 +337,26 @@ def api_delete_course(course_id: int, **kwargs) -> tuple:
             return jsonify({'error': c.NOT_FOUND_MSG}), 404
     else:
         # Members can edit their own courses
-        """
-        SELECT courses.*, role_privilege
-        FROM courses,
-            associations,
-            roles
-        WHERE associations.member_id = 2 AND
-            courses.course_id = 12 AND
-            associations.course_id = courses.course_id AND
-            associations.role_id = roles.role_id;
-        """
-        _result = (db.session.query(Course, Role.role_privilege)
-                   .join(Association, Association.course_id == Course.course_id)
-                   .join(Role, Association.role_id == Role.role_id)
-                   .filter(Association.member_id == _member_id, Course.course_id == course_id)
-                   .first())
-        if _result:
-            _course, _role_privilege = _result
-        else:
+        # Use the privileges in the token if available, or read them once per request
+        _role_privilege = requester_course_privilege(
+            course_id, _member_id, kwargs.get('requester_privileges'))
+        if _role_privilege is None:
             return jsonify({'error': c.NOT_FOUND_MSG}), 404
 
         if _role_privilege < c.PRIVILEGE_LVL_OWNER:
             return jsonify({'error': c.NOT_AUTH_MSG}), 403
 
+        """
+        SELECT * FROM courses WHERE course_id = 12;
+        """
+        _course = Course.query.get_or_404(course_id)
+
     # Save name for message after deletion
     _course_name = _course.course_name
 
     try:
+        # Mark the tokens of the members assigned to the course as stale
+        bump_token_versions(course_id=_course.course_id)
         # Delete association data first
         """
         DELETE FROM associations WHERE course_id = 17;
@@ -7,8 +7,12 @@ from flask import jsonify, request
 
 from tracker_99 import db, constants as c
 from tracker_99.app_utils import validate_input
-from tracker_99.blueprints.api import api_bp, token_required
+from tracker_99.blueprints.api import (api_bp, conditional_get, requester_is_admin,
+                                       requester_is_admin_or_self, token_required)
 from tracker_99.models.models import Association, Member
+from tracker_99.password_service import PasswordServiceBusy
+from tracker_99.serializers import MEMBER_SERIALIZER
+from tracker_99.token_claims import bump_token_versions, forget_cached_tokens
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -18,6 +22,7 @@ from tracker_99.models.models import Association, Member
 # Do not forget to add an endpoint, or you will get an AssertionError!
 @api_bp.route('/api/members/all', methods=['GET'], endpoint='members_all')
 @token_required
+@conditional_get('members', allow=requester_is_admin)
 def api_members_all(**kwargs) -> tuple:
     """Respond to an API request for a list of all members and their information.
 
@@ -37,26 +42,18 @@ def api_members_all(**kwargs) -> tuple:
     if not kwargs.get('requester_is_admin', False):
         return jsonify({'error': c.NOT_AUTH_MSG}), 403
 
-    # query.all() always returns a list, even if it is empty
+    # Select only the serialized columns, instead of loading Member objects
+    # The serializer excludes the 'password_hash' field
     """
-    SELECT * FROM members;
+    SELECT member_id, member_name, member_email, is_admin FROM members ORDER BY member_id;
     """
-    _members_list = Member.query.all()
+    _filtered_members = MEMBER_SERIALIZER.dump_all(
+        db.session.execute(MEMBER_SERIALIZER.select().order_by(Member.member_id))
+    )
 
-    if not _members_list:
+    if not _filtered_members:
         return jsonify({'error': 'No members found.'}), 404
 
-    # Exclude the 'password_hash' field
-    _filtered_members = [
-        {
-            'member_id': m.member_id,
-            'member_name': m.member_name,
-            'member_email': m.member_email,
-            'is_admin': m.is_admin,
-        }
-        for m in _members_list
-    ]
-
     # Use jsonify to convert the filtered list to JSON
     return jsonify(members=_filtered_members), 200
 
@@ -70,14 +67,14 @@ def api_add_member(**kwargs) -> tuple:
     Bash:
     curl -X POST -H "Content-Type: application/json" \
         -H "Authorization: Bearer json.web.token" \
-        -d '{"member_name": "Farok.Tabr", "member_email": "farok.tabr@fremen.com", "is_admin": false, "password": "Change.Me.123"}' \
+        -d '{"member_name": "Farok.Tabr", "member_email": "farok.tabr@fremen.com", "member_group": "fremen", "is_admin": false, "password": "Change.Me.123"}' \
         http://127.0.0.1:5000/api/members/add
 
     PS:
     Invoke-WebRequest -Method Post \
         -ContentType "application/json" \
         -Headers "Authorization: Bearer json.web.token" \
-        -Body "{`"member_name`": `"Farok.Tabr`", `"member_email`": `"farok.tabr@fremen.com`", `"is_admin`": false, `"password`": `"Change.Me.123`"}" \
+        -Body "{`"member_name`": `"Farok.Tabr`", `"member_email`": `"farok.tabr@fremen.com`", `"member_group`": `"fremen`", `"is_admin`": false, `"password`": `"Change.Me.123`"}" \
         -Uri "http://127.0.0.1:5000/api/members/add"
 
      :returns: A status message with the HTTP status code (Response, int)
@@ -94,6 +91,7 @@ def api_add_member(**kwargs) -> tuple:
     # Add member if all attributes are provided and correct
     validate_input("_data['member_name']", _data['member_name'], str)
     validate_input("_data['member_email']", _data['member_email'], str)
+    validate_input("_data['member_group']", _data['member_group'], str)
     validate_input("_data['is_admin']", _data['is_admin'], bool)
     validate_input("_data['password']", _data['password'], str)
 
@@ -102,13 +100,14 @@ def api_add_member(**kwargs) -> tuple:
         _member = Member(
             member_name=_data['member_name'],
             member_email=_data['member_email'],
+            member_group=_data['member_group'],
             is_admin=_data['is_admin'],
         )
         # Use the setter in the Member class to set Member.password_hash
         _member.set_password(_data['password'])
         """
-        INSERT INTO members (member_name, member_email, password_hash, is_admin)
-        VALUES ("farok.tabr", "farok.tabr@fremen.com", "scrypt:32768:8:1$...", 0);
+        INSERT INTO members (member_name, member_email, member_group, password_hash, is_admin)
+        VALUES ("farok.tabr", "farok.tabr@fremen.com", "fremen", "scrypt:32768:8:1$...", 0);
         """
         db.session.add(_member)
         db.session.commit()
@@ -117,6 +116,10 @@ def api_add_member(**kwargs) -> tuple:
 
         return jsonify(
             {'message': f'POST: Successfully added {_member.member_name} ({_new_id}).'}), 200
+    except PasswordServiceBusy as e:
+        # The password service rejects new hashes while its workers are full
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Addition failed: {str(e)}'}), 500
@@ -125,6 +128,7 @@ def api_add_member(**kwargs) -> tuple:
 # Do not forget to add an endpoint, or you will get an AssertionError!
 @api_bp.route('/api/members/get/<int:member_id>', methods=['GET'], endpoint='get_member')
 @token_required
+@conditional_get('members', allow=requester_is_admin_or_self)
 def api_get_member(member_id: int, **kwargs) -> tuple:
     """Respond to an API request for member information.
 
@@ -229,9 +233,15 @@ def api_edit_member(member_id: int, **kwargs) -> tuple:
             is_admin = 0
         WHERE member_id = 17;
         """
+        # Tokens hold a snapshot of the member (e.g., is_admin), so mark them as stale
+        bump_token_versions([_member.member_id])
         # db.session.add(_member)
         db.session.commit()
         return jsonify({'message': f'PUT: Successfully updated {_member.member_name}.'}), 200
+    except PasswordServiceBusy as e:
+        # The password service rejects new hashes while its workers are full
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Update failed: {str(e)}'}), 500
@@ -286,6 +296,9 @@ def api_delete_member(member_id: int, **kwargs) -> tuple:
         DELETE FROM members WHERE member_id = 17;
         """
         db.session.delete(_member)
+        # The member no longer exists, so drop the cached token version and API tokens
+        # once the deletion commits
+        forget_cached_tokens([member_id])
         # Ensure changes are pushed before commit
         db.session.flush()
         db.session.commit()
@@ -7,8 +7,12 @@ from flask import jsonify, request
 
 from tracker_99 import db, constants as c
 from tracker_99.app_utils import validate_input
-from tracker_99.blueprints.api import api_bp, token_required
+from tracker_99.blueprints.api import (api_bp, conditional_get, requester_is_admin,
+                                       token_required)
 from tracker_99.models.models import Role
+from tracker_99.roles_cache import roles_cache
+from tracker_99.serializers import ROLE_SERIALIZER
+from tracker_99.token_claims import bump_token_versions
 
 
 # Allow `except Exception as e` so issues can percolate up, like ValueErrors from the model
@@ -18,6 +22,7 @@ from tracker_99.models.models import Role
 # Do not forget to add an endpoint, or you will get an AssertionError!
 @api_bp.route('/api/roles/all', methods=['GET'], endpoint='roles_all')
 @token_required
+@conditional_get('roles', allow=requester_is_admin)
 def api_roles_all(**kwargs) -> tuple:
     """Respond to an API request for a list of all roles and their information.
 
@@ -39,25 +44,12 @@ def api_roles_all(**kwargs) -> tuple:
         return jsonify({'error': c.NOT_AUTH_MSG}), 403
 
     # Administrators can view all roles
-    # query.all() always returns a list, even if it is empty
-    """
-    SELECT * FROM roles;
-    """
-    _roles_list = Role.query.all()
+    # Use the cached roles, which have the same fields as the serializer, instead of a query
+    _filtered_roles = ROLE_SERIALIZER.dump_all(roles_cache.all())
 
-    if not _roles_list:
+    if not _filtered_roles:
         return jsonify({'error': c.NOT_FOUND_MSG}), 404
 
-    # Exclude the 'password_hash' field
-    _filtered_roles = [
-        {
-            'role_id': role.role_id,
-            'role_name': role.role_name,
-            'role_privilege': role.role_privilege,
-        }
-        for role in _roles_list
-    ]
-
     # Use jsonify to convert the filtered list to JSON
     return jsonify(roles=_filtered_roles), 200
 
@@ -111,6 +103,8 @@ def api_add_role(**kwargs) -> tuple:
         """
         db.session.add(_role)
         db.session.commit()
+        # Reload the cached roles, so the next request sees the change
+        roles_cache.reload()
 
         # Get row_id of the new role
         _new_id = _role.role_id
@@ -125,6 +119,7 @@ def api_add_role(**kwargs) -> tuple:
 # Do not forget to add an endpoint, or you will get an AssertionError!
 @api_bp.route('/api/roles/get/<int:role_id>', methods=['GET'], endpoint='get_role')
 @token_required
+@conditional_get('roles', allow=requester_is_admin)
 def api_get_role(role_id: int, **kwargs) -> tuple:
     """Respond to an API request for role information.
 
@@ -217,8 +212,13 @@ def api_edit_role(role_id: int, **kwargs) -> tuple:
         SET role_privilege = 25
         WHERE role_id = 5;
         """
+        # Tokens hold the privileges of the members with this role, so mark them as stale
+        if 'role_privilege' in _data:
+            bump_token_versions(role_id=_role.role_id)
         # db.session.add(_role)
         db.session.commit()
+        # Reload the cached roles, so the next request sees the change
+        roles_cache.reload()
         return jsonify({'message': f'PUT: Successfully updated {_role.role_name}.'}), 200
     except Exception as e:
         db.session.rollback()
@@ -261,6 +261,8 @@ def api_delete_role(role_id: int, **kwargs) -> tuple:
     _role_name = _role.role_name
 
     try:
+        # Mark the tokens of the members with this role as stale before the role is deleted
+        bump_token_versions(role_id=_role.role_id)
         """
         DELETE FROM roles WHERE role_id = 5;
         """
@@ -268,6 +270,8 @@ def api_delete_role(role_id: int, **kwargs) -> tuple:
         # Ensure changes are pushed before commit
         db.session.flush()
         db.session.commit()
+        # Reload the cached roles, so the next request sees the change
+        roles_cache.reload()
         return jsonify({'message': f'DELETE: Successfully deleted {_role_name}.'}), 200
     except Exception as e:
         db.session.rollback()
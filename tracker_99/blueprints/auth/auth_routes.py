@@ -6,7 +6,7 @@ Test: http://127.0.0.1:5000/login
 from typing import Union
 from urllib.parse import urlsplit
 
-from flask import Response, flash, redirect, render_template, request, url_for
+from flask import Response, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_user, logout_user
 from markupsafe import escape
 from sqlalchemy import select
@@ -15,6 +15,7 @@ from tracker_99 import db, constants as c
 from tracker_99.blueprints.auth import auth_bp
 from tracker_99.blueprints.auth.auth_forms import LoginForm
 from tracker_99.models.models import Member
+from tracker_99.password_service import PasswordServiceBusy
 
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
@@ -38,14 +39,36 @@ def login() -> Union[str, Response]:
     _next_page = url_for(c.INDEX_PAGE)
 
     if request.method == 'POST' and _form.validate_on_submit():
+        # SELECT * FROM members WHERE member_name_lower = 'leto.atreides';
         _member = db.session.scalar(
-            select(Member).where(Member.member_name.ilike(_form.member_name.data))
+            select(Member)
+            .where(Member.member_name_lower == Member.normalize_name(_form.member_name.data))
         )
 
-        if _member is None or not _member.verify_password(_form.password.data):
+        # The password service rejects new logins while its workers are full
+        try:
+            _verified = _member is not None and _member.verify_password(_form.password.data)
+        except PasswordServiceBusy as e:
+            flash(str(e))
+            return render_template(
+                'login.html', page_title=_page_title, page_description=_page_description,
+                form=_form, next_page=_next_page
+            ), 503, {'Retry-After': str(e.retry_after)}
+
+        if not _verified:
             flash('Invalid member name or password')
             return redirect(url_for(c.LOGIN_PAGE))
 
+        # Move the stored hash to PASSWORD_HASH_METHOD while the password is known
+        # Allow except Exception, since a failed rehash must not fail the login
+        try:
+            if _member.rehash_password(_form.password.data):
+                db.session.commit()
+        except Exception as e:  # pylint: disable=broad-except
+            db.session.rollback()
+            current_app.logger.warning(
+                'Password rehash failed for member %d: %s', _member.member_id, e)
+
         login_user(_member, remember=_form.remember_me.data)
 
         return redirect(_next_page)
@@ -4,16 +4,19 @@
 from typing import Union
 
 from flask import Response, abort
-from flask import flash
+from flask import jsonify
 from flask import redirect
 from flask import render_template
+from flask import request
 from flask import url_for
 from flask_login import current_user, login_required
 
-from tracker_99 import constants as c
+from tracker_99 import db, constants as c
 from tracker_99.blueprints.main import main_bp
-from tracker_99.models import db
-from tracker_99.models.models import Course, Member, Role, Association
+from tracker_99.listing import (COURSE_LISTING_COLUMNS, course_listing_query, fetch_page,
+                                parse_datatables_args)
+from tracker_99.models.models import Course, Member
+from tracker_99.roles_cache import roles_cache
 
 
 @main_bp.route('/')
@@ -22,50 +25,14 @@ from tracker_99.models.models import Course, Member, Role, Association
 def index() -> Union[str, Response]:
     """The landing page.
 
+    **NOTE** - The course list is loaded one page at a time from `courses_data()`.
+
     :returns: The HTML code to display with {{ placeholders }} populated
     :rtype: str/Response
     """
     _page_title = 'Welcome!'
     _page_description = 'Landing Page'
 
-    if current_user.is_admin:
-        _courses = Course.query.all()
-        for course in _courses:
-            course.role_name = 'Admin'
-    else:
-        _member_id = int(current_user.get_id())
-
-        # This works, but I can't figure out how to simplify the SQLAlchemy query
-        # I have to break out the columns either in the query or afterwards
-        # to use with Jinja templating
-        """
-        SELECT courses.*, roles.*
-        FROM courses
-        JOIN associations ON courses.course_id = associations.course_id
-        JOIN roles ON roles.role_id = associations.role_id
-        WHERE associations.member_id = 2;
-        """
-        _courses = (
-            db.session.query(
-                Course.course_id,
-                Course.course_name,
-                Course.course_code,
-                Course.course_group,
-                Course.course_key,
-                Course.course_desc,
-                Role.role_id,
-                Role.role_name,
-                Role.role_privilege,
-            )
-            .join(Association, Course.course_id == Association.course_id)
-            .join(Role, Role.role_id == Association.role_id)
-            .filter(Association.member_id == _member_id)
-            .all()
-        )
-
-    # Convert to list if there is only one result
-    _courses = [_courses] if not isinstance(_courses, list) else _courses
-
     _privilege = {
         'assigner': c.PRIVILEGE_LVL_ASSIGNER,
         'editor': c.PRIVILEGE_LVL_EDITOR,
@@ -76,11 +43,45 @@ def index() -> Union[str, Response]:
         'index.html',
         page_title=_page_title,
         page_description=_page_description,
-        courses=_courses,
         privilege=_privilege,
+        page_size=c.DEFAULT_PAGE_SIZE,
     )
 
 
+@main_bp.route('/courses/data')
+@login_required
+def courses_data() -> Response:
+    """One page of the course list, using DataTables server-side processing.
+
+    .. seealso:: https://datatables.net/manual/server-side
+
+    :returns: The page of courses in JSON format
+    :rtype: Response
+    """
+    _options = parse_datatables_args(request.args, COURSE_LISTING_COLUMNS)
+    _draw = _options.pop('draw')
+
+    _is_admin = bool(current_user.is_admin)
+    _member_id = 0 if _is_admin else int(current_user.get_id())
+
+    _stmt, _columns = course_listing_query(_member_id, _is_admin)
+    _page = fetch_page(_stmt, _columns, Course.course_id, **_options)
+
+    _keys = COURSE_LISTING_COLUMNS + ('role_privilege',)
+    _data = [{_key: getattr(_row, _key) for _key in _keys} for _row in _page['rows']]
+
+    return jsonify({
+        'draw': _draw,
+        'recordsTotal': _page['total'],
+        'recordsFiltered': _page['filtered'],
+        'data': _data,
+        # Return the keyset cursor and where the next page starts,
+        # so the client can send the cursor back instead of an offset
+        'cursor': _page['cursor'],
+        'next_start': _options['start'] + len(_data),
+    })
+
+
 @main_bp.route('/about')
 def about() -> Union[str, Response]:
     """The about page.
@@ -120,10 +121,13 @@ def members() -> Union[str, Response]:
     _page_title = 'View Members'
     _page_description = 'List of Members'
 
-    _members = Member.query.all()
-
-    # Convert to list if there is only one result
-    _members = [_members] if not isinstance(_members, list) else _members
+    # Select only the columns on the page, as rows, instead of loading Member objects
+    """
+    SELECT member_id, member_name, member_email, member_group FROM members;
+    """
+    _members = db.session.execute(
+        db.select(Member.member_id, Member.member_name, Member.member_email, Member.member_group)
+    ).all()
 
     _html = render_template(
         'members.html',
@@ -149,10 +153,8 @@ def roles() -> Union[str, Response]:
     _page_title = 'View Roles'
     _page_description = 'List of Roles'
 
-    _roles = Role.query.all()
-
-    # Convert to list if there is only one result
-    _roles = [_roles] if not isinstance(_roles, list) else _roles
+    # Use the cached roles, which have the same attributes as Role objects, instead of a query
+    _roles = roles_cache.all()
 
     _html = render_template(
         'roles.html', page_title=_page_title, page_description=_page_description, roles=_roles
@@ -0,0 +1,157 @@
+"""Export members, courses, roles, or course assignments as NDJSON or CSV, one chunk at a time.
+
+The rows are read from the database in batches of EXPORT_BATCH_SIZE (`yield_per`),
+and each batch is encoded and sent before the next one is read, so memory use depends
+on the batch size, not on the size of the table, and the first bytes are sent right away.
+The chunks can also be compressed with gzip as they are sent.
+
+Password hashes and encrypted course keys are never exported.
+
+Usage:
+- _chunks = export_chunks(export_statement('members', member_id=1, is_admin=True), 'ndjson')
+- _chunks = gzip_chunks(_chunks)
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from sqlalchemy import Select, select
+
+from tracker_99.app_utils import validate_input
+from tracker_99.listing import course_listing_query
+from tracker_99.models import db
+from tracker_99.models.models import Association, Course, Member, Role
+
+__all__ = ['EXPORT_FORMATS', 'EXPORT_KINDS', 'export_chunks', 'export_statement', 'gzip_chunks']
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_KINDS = ('members', 'courses', 'roles', 'associations')
+
+# wbits=31 writes a gzip header and trailer, instead of a raw zlib stream
+_GZIP_WBITS = 31
+
+
+def export_statement(kind: str, member_id: int, is_admin: bool) -> Select:
+    """Build the statement that selects the rows to export, in primary key order.
+
+    Administrators can export every kind; members can only export the courses assigned to them.
+
+    :param str kind: 'members', 'courses', 'roles', or 'associations'
+    :param int member_id: The ID of the member requesting the export
+    :param bool is_admin: True if the member is an administrator
+
+    :raises PermissionError: If the member cannot export this kind
+
+    :returns: The unexecuted statement
+    :rtype: Select
+    """
+    # Validate inputs
+    validate_input('kind', kind, str)
+    validate_input('member_id', member_id, int)
+    validate_input('is_admin', is_admin, bool)
+
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f'Invalid export kind. Use one of {EXPORT_KINDS}.')
+
+    if kind == 'courses':
+        # Use the same statement as the course listing, without the encrypted key
+        _stmt, _ = course_listing_query(member_id, is_admin)
+        return _stmt.order_by(Course.course_id)
+
+    if not is_admin:
+        raise PermissionError(kind)
+
+    if kind == 'members':
+        """
+        SELECT member_id, member_name, member_email, member_group, is_admin
+        FROM members ORDER BY member_id;
+        """
+        return select(Member.member_id, Member.member_name, Member.member_email,
+                      Member.member_group, Member.is_admin).order_by(Member.member_id)
+
+    if kind == 'roles':
+        """
+        SELECT role_id, role_name, role_privilege FROM roles ORDER BY role_id;
+        """
+        return select(Role.role_id, Role.role_name, Role.role_privilege).order_by(Role.role_id)
+
+    """
+    SELECT course_id, member_id, role_id FROM associations ORDER BY course_id, member_id;
+    """
+    return (select(Association.course_id, Association.member_id, Association.role_id)
+            .order_by(Association.course_id, Association.member_id))
+
+
+def export_chunks(stmt: Select, export_format: str = 'ndjson',
+                  batch_size: int = 1000) -> Iterator[bytes]:
+    """Run a statement and encode its rows, one batch at a time.
+
+    **NOTE** - Run within an application context; for a streamed response,
+    wrap the chunks with `flask.stream_with_context()`.
+
+    :param Select stmt: The statement, from `export_statement()`
+    :param str export_format: 'ndjson' or 'csv', defaults to 'ndjson'
+    :param int batch_size: The number of rows to read and encode at a time, defaults to 1000
+
+    :returns: The encoded rows, one chunk per batch (CSV starts with a header row)
+    :rtype: Iterator[bytes]
+    """
+    # Validate inputs
+    validate_input('export_format', export_format, str)
+    validate_input('batch_size', batch_size, int)
+
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Invalid export format. Use one of {EXPORT_FORMATS}.')
+
+    # yield_per fetches batch_size rows at a time from the cursor,
+    # instead of loading every row before returning the first one
+    _result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    _columns = list(_result.keys())
+
+    try:
+        if export_format == 'csv':
+            _buffer = io.StringIO()
+            _writer = csv.writer(_buffer, lineterminator='\n')
+            _writer.writerow(_columns)
+            for _rows in _result.partitions():
+                _writer.writerows(_rows)
+                yield _buffer.getvalue().encode('utf-8')
+                _buffer.seek(0)
+                _buffer.truncate()
+            # Send the header if there were no rows
+            if _buffer.tell():
+                yield _buffer.getvalue().encode('utf-8')
+            return
+
+        for _rows in _result.partitions():
+            yield ''.join(
+                json.dumps(dict(zip(_columns, _row)), separators=(',', ':')) + '\n'
+                for _row in _rows
+            ).encode('utf-8')
+    finally:
+        # Release the cursor, even if the client disconnects before the last chunk
+        _result.close()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress chunks with gzip as they are produced.
+
+    :param Iterable[bytes] chunks: The chunks to compress
+    :param int level: The compression level, from 1 (fastest) to 9 (smallest), defaults to 6
+
+    :returns: The gzip stream, one chunk per input chunk
+    :rtype: Iterator[bytes]
+    """
+    # Validate inputs
+    validate_input('level', level, int)
+
+    _compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    for _chunk in chunks:
+        # Flush each chunk, so the client receives data as soon as it is read
+        _compressed = _compressor.compress(_chunk) + _compressor.flush(zlib.Z_SYNC_FLUSH)
+        if _compressed:
+            yield _compressed
+    yield _compressor.flush()
@@ -0,0 +1,424 @@
+"""Import members, courses, or roles from NDJSON or CSV in batches.
+
+The input is read one line at a time, so memory use depends on the batch size,
+not on the size of the input. Each batch is validated with the regular expressions
+in constants.py, checked for duplicates, hashed (member passwords, in the workers
+of the password service) or encrypted (course keys), and inserted with one executemany
+statement and one commit.
+Rows that fail a check are skipped and reported with their line number.
+
+NDJSON input has one JSON object per line, and CSV input has a header row,
+with the same field names as the add API endpoints:
+
+- members: member_name, member_email, member_group, password, is_admin
+- courses: course_name, course_code, course_group, course_key, course_desc
+- roles: role_name, role_privilege
+
+Usage:
+- with open('members.ndjson', encoding='utf-8') as _file:
+      _report = import_rows('members', read_rows(_file, 'ndjson'))
+"""
+
+import csv
+import json
+import re
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+from sqlalchemy import insert, select, tuple_
+
+from tracker_99 import constants as c
+from tracker_99.app_utils import validate_input
+from tracker_99.key_manager import key_manager
+from tracker_99.models import db
+from tracker_99.models.models import Course, Member, Role
+from tracker_99.password_service import PasswordService, password_service
+
+__all__ = ['IMPORT_FORMATS', 'IMPORT_KINDS', 'import_rows', 'read_rows']
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+IMPORT_KINDS = ('members', 'courses', 'roles')
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'y')
+_FALSE_VALUES = ('', '0', 'false', 'no', 'n')
+
+
+def read_rows(lines: Iterable[str], input_format: str = 'ndjson') -> Iterator[Tuple[int, dict]]:
+    """Read rows from NDJSON or CSV lines, one at a time.
+
+    Rows that cannot be parsed are returned with an '_error' key, so they can be reported.
+
+    :param Iterable[str] lines: The input, like an open text file
+    :param str input_format: 'ndjson' or 'csv', defaults to 'ndjson'
+
+    :returns: The line number and the fields of each row
+    :rtype: Iterator[Tuple[int, dict]]
+    """
+    # Validate inputs
+    validate_input('input_format', input_format, str)
+
+    if input_format not in IMPORT_FORMATS:
+        raise ValueError(f'Invalid input format. Use one of {IMPORT_FORMATS}.')
+
+    if input_format == 'csv':
+        _reader = csv.DictReader(lines)
+        for _row in _reader:
+            yield _reader.line_num, _row
+        return
+
+    for _line_number, _line in enumerate(lines, start=1):
+        if not _line.strip():
+            continue
+        try:
+            _row = json.loads(_line)
+        except ValueError:
+            yield _line_number, {'_error': 'Invalid JSON.'}
+            continue
+        yield _line_number, (_row if isinstance(_row, dict) else {'_error': 'Not an object.'})
+
+
+# pylint: disable-next=[too-many-arguments, too-many-positional-arguments, too-many-locals]
+def import_rows(kind: str, rows: Iterable[Tuple[int, dict]], batch_size: int = 1000,
+                workers: Union[int, None] = None, max_errors: Union[int, None] = None,
+                report: Union[Callable[[dict], None], None] = None) -> dict:
+    """Validate and insert rows in batches, and report the rows that were skipped.
+
+    **NOTE** - Each batch is committed, so a failed import keeps the batches before it.
+    Run the import again with the same input to skip the rows that were added.
+
+    :param str kind: 'members', 'courses', or 'roles'
+    :param Iterable[Tuple[int, dict]] rows: The line number and fields of each row, \
+        from `read_rows()`
+    :param int batch_size: The number of rows to insert and commit at a time, defaults to 1000
+    :param int or None workers: The number of processes that hash passwords for this import \
+        (0 for one per CPU, 1 to hash in this process), defaults to None \
+        (hash in the shared workers of the password service)
+    :param int or None max_errors: Keep at most this many errors in the report, \
+        defaults to None (keep every error); the failed count includes every error
+    :param Callable or None report: Called with the totals after each batch, defaults to None
+
+    :returns: The number of rows read, inserted, and failed, and the errors \
+        (line number and message)
+    :rtype: dict
+    """
+    # Validate inputs
+    validate_input('kind', kind, str)
+    validate_input('batch_size', batch_size, int)
+    validate_input('workers', workers, Union[int, None], allow_empty=True)
+    validate_input('max_errors', max_errors, Union[int, None], allow_empty=True)
+
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f'Invalid import kind. Use one of {IMPORT_KINDS}.')
+    if batch_size < 1 or (workers is not None and workers < 0):
+        raise ValueError('batch_size must be greater than 0, and workers cannot be negative.')
+
+    _importer = _IMPORTERS[kind]
+    _duplicate_msg = f'{kind.capitalize()[:-1]} already exists.'
+    _totals = {'kind': kind, 'rows': 0, 'inserted': 0, 'failed': 0, 'errors': []}
+    # Keys added earlier in this import, to find duplicates between batches
+    _seen = set()
+
+    def _fail(line_number: int, error: str) -> None:
+        """Count a skipped row, and keep its error if there is room in the report.
+
+        :param int line_number: The line number of the row
+        :param str error: The reason the row was skipped
+
+        :returns: None
+        :rtype: None
+        """
+        _totals['failed'] += 1
+        if max_errors is None or len(_totals['errors']) < max_errors:
+            _totals['errors'].append({'line': line_number, 'error': error})
+
+    # Use the long-lived workers of the password service, unless the import asks for its own
+    # (e.g., from the command line); do not start a process pool for every API request
+    _service = password_service
+    if kind == 'members' and workers is not None:
+        _service = PasswordService(workers=workers, method=password_service.method)
+
+    try:
+        _rows = iter(rows)
+        while True:
+            _batch = list(islice(_rows, batch_size))
+            if not _batch:
+                break
+            _totals['rows'] += len(_batch)
+
+            # Check each row, then check the keys of the valid rows against the database
+            _valid = []
+            _batch_errors = []
+            for _line_number, _row in _batch:
+                try:
+                    if '_error' in _row:
+                        raise ValueError(_row['_error'])
+                    _values = _importer['validate'](_row)
+                except (ValueError, TypeError) as e:
+                    _batch_errors.append((_line_number, str(e)))
+                    continue
+                _valid.append((_line_number, _values))
+
+            _existing = _importer['existing']([_values for _, _values in _valid])
+            _new = []
+            for _line_number, _values in _valid:
+                _keys = _importer['keys'](_values)
+                if any(_key in _seen or _key in _existing for _key in _keys):
+                    _batch_errors.append((_line_number, _duplicate_msg))
+                    continue
+                _seen.update(_keys)
+                _new.append((_line_number, _values))
+
+            if _new:
+                _records = _importer['prepare']([_values for _, _values in _new], _service)
+                # Allow except Exception, since any database error fails the whole batch
+                try:
+                    # executemany: one statement, many parameter sets
+                    db.session.execute(insert(_importer['model']), _records)
+                    db.session.commit()
+                    _totals['inserted'] += len(_records)
+                except Exception as e:  # pylint: disable=broad-except
+                    db.session.rollback()
+                    _batch_errors.extend((_line_number, f'Insert failed: {str(e)}')
+                                         for _line_number, _ in _new)
+
+            # Report the errors in line order
+            for _line_number, _error in sorted(_batch_errors):
+                _fail(_line_number, _error)
+
+            if report is not None:
+                report(_totals)
+    finally:
+        if _service is not password_service:
+            _service.shutdown()
+
+    return _totals
+
+
+def _text(row: dict, name: str, regex: Union[str, None] = None, required: bool = True,
+          message: str = '') -> Union[str, None]:
+    """Get a text field from a row, and check it against a regular expression.
+
+    :param dict row: The fields of the row
+    :param str name: The name of the field
+    :param str or None regex: The pattern the value must match, defaults to None
+    :param bool required: If the field cannot be empty, defaults to True
+    :param str message: The error message if the value does not match, defaults to ''
+
+    :raises ValueError: If the value is missing or does not match
+
+    :returns: The value, or None if the field is empty and not required
+    :rtype: str or None
+    """
+    _value = row.get(name)
+    if _value is None or (isinstance(_value, str) and _value.strip() == ''):
+        if required:
+            raise ValueError(f'{name} is required.')
+        return None
+    if not isinstance(_value, str):
+        raise ValueError(f'{name} must be text.')
+    if regex is not None and not re.fullmatch(regex, _value):
+        raise ValueError(message or f'Invalid {name}.')
+    return _value
+
+
+def _validate_member(row: dict) -> dict:
+    """Check the fields of a member row.
+
+    :param dict row: The fields of the row
+
+    :raises ValueError: If a field is missing or invalid
+
+    :returns: The member's values, with the password in plain text
+    :rtype: dict
+    """
+    _is_admin = row.get('is_admin', False)
+    if isinstance(_is_admin, str):
+        if _is_admin.strip().lower() not in _TRUE_VALUES + _FALSE_VALUES:
+            raise ValueError('is_admin must be true or false.')
+        _is_admin = _is_admin.strip().lower() in _TRUE_VALUES
+    if not isinstance(_is_admin, bool):
+        raise ValueError('is_admin must be true or false.')
+
+    return {
+        'member_name': _text(row, 'member_name', c.NAME_REGEX, message=c.INVALID_NAME_MSG),
+        'member_email': _text(row, 'member_email', c.EMAIL_REGEX),
+        'member_group': _text(row, 'member_group', c.GROUP_REGEX, required=False),
+        'password': _text(row, 'password', c.PASSWORD_REGEX, message=c.INVALID_PASSWORD_MSG),
+        'is_admin': _is_admin,
+    }
+
+
+def _validate_course(row: dict) -> dict:
+    """Check the fields of a course row.
+
+    :param dict row: The fields of the row
+
+    :raises ValueError: If a field is missing or invalid
+
+    :returns: The course's values, with the key in plain text
+    :rtype: dict
+    """
+    return {
+        'course_name': _text(row, 'course_name', c.TEXT_REGEX, message=c.INVALID_TEXT_MSG),
+        'course_code': _text(row, 'course_code', c.TEXT_REGEX, message=c.INVALID_TEXT_MSG),
+        'course_group': _text(row, 'course_group', c.GROUP_REGEX, required=False),
+        'course_key': _text(row, 'course_key', c.PASSWORD_REGEX,
+                            message=c.INVALID_PASSWORD_MSG),
+        'course_desc': _text(row, 'course_desc', required=False),
+    }
+
+
+def _validate_role(row: dict) -> dict:
+    """Check the fields of a role row.
+
+    :param dict row: The fields of the row
+
+    :raises ValueError: If a field is missing or invalid
+
+    :returns: The role's values
+    :rtype: dict
+    """
+    _name = _text(row, 'role_name', c.TEXT_REGEX, message=c.INVALID_TEXT_MSG)
+    if _name.lower() == 'unassigned':
+        raise ValueError('The Unassigned role is reserved.')
+
+    _privilege = row.get('role_privilege')
+    if isinstance(_privilege, str) and _privilege.strip().isdigit():
+        _privilege = int(_privilege)
+    # bool is a subclass of int, so exclude it explicitly
+    if not isinstance(_privilege, int) or isinstance(_privilege, bool) or not (
+            1 <= _privilege <= 99):
+        raise ValueError('role_privilege must be between 1 and 99.')
+
+    return {'role_name': _name, 'role_privilege': _privilege}
+
+
+def _existing_members(values: List[dict]) -> set:
+    """Get the keys of the members in a batch that are already in the database.
+
+    :param List[dict] values: The values of the valid rows
+
+    :returns: The existing email addresses and lowercase member names
+    :rtype: set
+    """
+    if not values:
+        return set()
+    """
+    SELECT member_email FROM members WHERE member_email IN ('a@tracker.edu', 'b@tracker.edu');
+    """
+    _keys = {('member_email', _email) for _email in db.session.scalars(
+        select(Member.member_email)
+        .where(Member.member_email.in_({_v['member_email'] for _v in values}))
+    )}
+    """
+    SELECT member_name_lower FROM members WHERE member_name_lower IN ('farok.tabr', 'stilgar.tabr');
+    """
+    _keys.update(('member_name', _name) for _name in db.session.scalars(
+        select(Member.member_name_lower)
+        .where(Member.member_name_lower.in_(
+            {Member.normalize_name(_v['member_name']) for _v in values}))
+    ))
+    return _keys
+
+
+def _existing_courses(values: List[dict]) -> set:
+    """Get the keys of the courses in a batch that are already in the database.
+
+    :param List[dict] values: The values of the valid rows
+
+    :returns: The existing (course_name, course_code) pairs
+    :rtype: set
+    """
+    if not values:
+        return set()
+    """
+    SELECT course_name, course_code FROM courses
+    WHERE (course_name, course_code) IN (('Intro to Foo', 'FOO 101'));
+    """
+    return {tuple(_row) for _row in db.session.execute(
+        select(Course.course_name, Course.course_code)
+        .where(tuple_(Course.course_name, Course.course_code).in_(
+            {(_v['course_name'], _v['course_code']) for _v in values}))
+    )}
+
+
+def _existing_roles(_values: List[dict]) -> set:
+    """Get the keys of the roles in the database.
+
+    The roles table is small, so every role is read.
+
+    :param List[dict] _values: The values of the valid rows. Not used
+
+    :returns: The existing role names and privileges
+    :rtype: set
+    """
+    """
+    SELECT role_name, role_privilege FROM roles;
+    """
+    _keys = set()
+    for _name, _privilege in db.session.execute(select(Role.role_name, Role.role_privilege)):
+        _keys.update({('role_name', _name), ('role_privilege', _privilege)})
+    return _keys
+
+
+def _prepare_members(values: List[dict], service: PasswordService) -> List[dict]:
+    """Hash the passwords of a batch of members with the password service.
+
+    :param List[dict] values: The values of the new members
+    :param PasswordService service: The password service that hashes the passwords
+
+    :returns: The parameters for the insert statement
+    :rtype: List[dict]
+    """
+    # Hashed with the method of the password service (PASSWORD_HASH_METHOD)
+    _hashes = service.hash_passwords([_v['password'] for _v in values])
+
+    return [{
+        'member_name': _v['member_name'],
+        # Core inserts skip the model, so set the lowercase name here
+        'member_name_lower': Member.normalize_name(_v['member_name']),
+        'member_email': _v['member_email'],
+        'member_group': _v['member_group'],
+        'password_hash': _hash,
+        'is_admin': _v['is_admin'],
+    } for _v, _hash in zip(values, _hashes)]
+
+
+def _prepare_courses(values: List[dict], _service: PasswordService) -> List[dict]:
+    """Encrypt the keys of a batch of courses.
+
+    :param List[dict] values: The values of the new courses
+    :param PasswordService _service: Not used, since encryption is fast
+
+    :returns: The parameters for the insert statement
+    :rtype: List[dict]
+    """
+    _keys = key_manager.encrypt_many([_v['course_key'] for _v in values])
+    return [{**_v, 'course_key': _key} for _v, _key in zip(values, _keys)]
+
+
+_IMPORTERS = {
+    'members': {
+        'model': Member,
+        'validate': _validate_member,
+        'existing': _existing_members,
+        'keys': lambda _v: (('member_email', _v['member_email']),
+                            ('member_name', Member.normalize_name(_v['member_name']))),
+        'prepare': _prepare_members,
+    },
+    'courses': {
+        'model': Course,
+        'validate': _validate_course,
+        'existing': _existing_courses,
+        'keys': lambda _v: ((_v['course_name'], _v['course_code']),),
+        'prepare': _prepare_courses,
+    },
+    'roles': {
+        'model': Role,
+        'validate': _validate_role,
+        'existing': _existing_roles,
+        'keys': lambda _v: (('role_name', _v['role_name']),
+                            ('role_privilege', _v['role_privilege'])),
+        'prepare': lambda _values, _service: _values,
+    },
+}
@@ -0,0 +1,318 @@
+"""In-process caches shared by the request threads of the application.
+
+> **NOTE** - Each process has its own caches. If you run several worker processes,
+an invalidation in one process does not reach the others, so keep the time-to-live short.
+
+Usage:
+- token_cache.init_app(app)
+- token_cache.get_token(auth_token)
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Union
+
+from flask import Flask
+
+from tracker_99.app_utils import validate_input
+
+__all__ = ['TTLCache', 'TokenCache', 'listing_counts', 'privilege_maps', 'table_versions',
+           'token_cache', 'token_versions']
+
+
+class TTLCache:
+    """A thread-safe, size-bounded cache whose entries expire.
+
+    When the cache is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param int max_size: The maximum number of entries, defaults to 1024
+        :param float ttl: The default number of seconds an entry stays valid, defaults to 60.0
+        """
+        # Validate inputs
+        validate_input('max_size', max_size, int)
+        validate_input('ttl', ttl, (int, float))
+
+        if max_size < 1 or ttl <= 0:
+            raise ValueError('max_size and ttl must be greater than 0.')
+
+        self.max_size = max_size
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_size: Union[int, None] = None,
+                  ttl: Union[float, None] = None) -> None:
+        """Change the size and time-to-live of the cache, and remove all entries.
+
+        :param int or None max_size: The maximum number of entries, defaults to the current size
+        :param float or None ttl: The default number of seconds an entry stays valid, \
+            defaults to the current time-to-live
+
+        :returns: None
+        :rtype: None
+        """
+        _max_size = self.max_size if max_size is None else int(max_size)
+        _ttl = self.ttl if ttl is None else float(ttl)
+
+        if _max_size < 1 or _ttl <= 0:
+            raise ValueError('max_size and ttl must be greater than 0.')
+
+        self.max_size = _max_size
+        self.ttl = _ttl
+        self.clear()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get an entry if it exists and has not expired.
+
+        :param Any key: The key of the entry
+        :param Any default: The value to return if there is no valid entry, defaults to None
+
+        :returns: The cached value or the default
+        :rtype: Any
+        """
+        with self._lock:
+            _entry = self._entries.get(key)
+            if _entry is None:
+                self.misses += 1
+                return default
+            _value, _expires = _entry
+            if _expires <= time.monotonic():
+                self._evict(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _value
+
+    def set(self, key: Any, value: Any, ttl: Union[float, None] = None) -> None:
+        """Add or replace an entry.
+
+        :param Any key: The key of the entry
+        :param Any value: The value to cache
+        :param float or None ttl: The number of seconds the entry stays valid, \
+            defaults to the cache's time-to-live. The cache's time-to-live is also the maximum
+
+        :returns: None
+        :rtype: None
+        """
+        _ttl = self.ttl if ttl is None else min(float(ttl), self.ttl)
+        if _ttl <= 0:
+            return
+
+        with self._lock:
+            self._insert(key, value, _ttl)
+
+    def pop(self, key: Any) -> None:
+        """Remove an entry if it exists.
+
+        :param Any key: The key of the entry
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters.
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Get the cache counters.
+
+        :returns: The number of hits, misses, evictions, and entries, and the maximum size
+        :rtype: dict
+        """
+        with self._lock:
+            _lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / _lookups, 4) if _lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+    def _insert(self, key: Any, value: Any, ttl: float) -> None:
+        """Add or replace an entry, and evict the least recently used entries
+        if the cache is full. The caller must hold the lock.
+
+        :param Any key: The key of the entry
+        :param Any value: The value to cache
+        :param float ttl: The number of seconds the entry stays valid
+
+        :returns: None
+        :rtype: None
+        """
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._evict(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _evict(self, key: Any) -> None:
+        """Remove an entry. The caller must hold the lock.
+
+        :param Any key: The key of the entry
+
+        :returns: None
+        :rtype: None
+        """
+        del self._entries[key]
+
+
+class TokenCache(TTLCache):
+    """Cache of verified JWTs, so protected API calls do not decode the token
+    and query the requester on every request.
+
+    Entries are keyed by a digest of the token, so the tokens themselves are not kept in memory.
+    Each entry expires with its token (`exp`) or after the cache's time-to-live,
+    whichever comes first. The snapshot keeps the member's token version, so callers can
+    drop the entry once the version changes (see `api.token_required`).
+    """
+
+    def __init__(self, max_size: int = 4096, ttl: float = 300.0) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param int max_size: The maximum number of tokens, defaults to 4096
+        :param float ttl: The maximum number of seconds to trust a cached token, defaults to 300.0
+        """
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.enabled = True
+        # Map member IDs to the digests of their tokens for invalidation
+        self._members = {}
+
+    def init_app(self, app: Flask) -> None:
+        """Configure the cache using the application's configuration.
+
+        :param Flask app: The application instance
+
+        :returns: None
+        :rtype: None
+        """
+        # Validate inputs
+        validate_input('app', app, Flask)
+
+        self.enabled = bool(app.config.get('TOKEN_CACHE_ENABLED', True))
+        self.configure(app.config.get('TOKEN_CACHE_SIZE'), app.config.get('TOKEN_CACHE_TTL'))
+
+    @staticmethod
+    def digest(auth_token: str) -> bytes:
+        """Get the key for a token.
+
+        :param str auth_token: The authorization token
+
+        :returns: The SHA-256 digest of the token
+        :rtype: bytes
+        """
+        return hashlib.sha256(auth_token.encode('utf-8')).digest()
+
+    def get_token(self, auth_token: str) -> Union[dict, None]:
+        """Get the cached claims and requester snapshot for a token.
+
+        :param str auth_token: The authorization token
+
+        :returns: The cached entry or None if the token is not cached or caching is disabled
+        :rtype: dict or None
+        """
+        if not self.enabled:
+            return None
+        return self.get(self.digest(auth_token))
+
+    def set_token(self, auth_token: str, claims: dict, requester: dict) -> None:
+        """Cache the claims of a verified token and a snapshot of the requester.
+
+        :param str auth_token: The authorization token
+        :param dict claims: The decoded payload of the token
+        :param dict requester: A snapshot of the requester \
+            (e.g., member_id, is_admin, token_version)
+
+        :returns: None
+        :rtype: None
+        """
+        if not self.enabled:
+            return
+
+        # Never trust a cached token after it expires
+        _ttl = min(float(claims.get('exp', 0)) - time.time(), self.ttl)
+        if _ttl <= 0:
+            return
+        _key = self.digest(auth_token)
+
+        # Index the entry in the same step, and only if it was not evicted to make room
+        with self._lock:
+            self._insert(_key, {'claims': claims, 'requester': requester}, _ttl)
+            if _key in self._entries:
+                self._members.setdefault(requester['member_id'], set()).add(_key)
+
+    def invalidate_member(self, member_id: int) -> None:
+        """Remove the cached tokens of a member, e.g., after the member is edited or deleted.
+
+        :param int member_id: The ID of the member
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            for _key in self._members.pop(int(member_id), set()):
+                if _key in self._entries:
+                    del self._entries[_key]
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters.
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            self._members.clear()
+        super().clear()
+
+    def _evict(self, key: Any) -> None:
+        """Remove an entry and its member index. The caller must hold the lock.
+
+        :param Any key: The key of the entry
+
+        :returns: None
+        :rtype: None
+        """
+        _value, _ = self._entries.pop(key)
+        _keys = self._members.get(_value['requester']['member_id'])
+        if _keys is not None:
+            _keys.discard(key)
+            if not _keys:
+                del self._members[_value['requester']['member_id']]
+
+
+# Create an instance of the cache for verified tokens
+token_cache = TokenCache()
+
+# Create an instance of the cache for the current token version of each member
+# Keep the time-to-live short, since other processes cannot invalidate it
+token_versions = TTLCache(max_size=4096, ttl=30.0)
+
+# Create an instance of the cache for the change version of each table (see `table_versions.py`)
+table_versions = TTLCache(max_size=64, ttl=5.0)
+
+# Create an instance of the cache for each member's course assignments (see `privileges.py`)
+privilege_maps = TTLCache(max_size=4096, ttl=60.0)
+
+# Create an instance of the cache for the row counts of listings (see `listing.py`)
+listing_counts = TTLCache(max_size=1024, ttl=60.0)
@@ -0,0 +1,460 @@
+"""Flask command-line commands for maintaining the application.
+
+> **NOTE** - Remember to activate your Python virtual environment first.
+
+Usage:
+- python -B -m flask --app tracker_99 keys rotate
+- python -B -m flask --app tracker_99 keys rotate --batch-size 1000 --pause 0.1
+- python -B -m flask --app tracker_99 tracker-logs report
+- python -B -m flask --app tracker_99 tracker-logs report --log-dir tracker_logs --json
+- python -B -m flask --app tracker_99 data import members members.ndjson
+- python -B -m flask --app tracker_99 data import courses courses.csv --format csv
+- python -B -m flask --app tracker_99 passwords calibrate --target-ms 250
+- python -B -m flask --app tracker_99 passwords calibrate --method pbkdf2:sha256:600000 --json
+"""
+
+import json
+import os
+import time
+from typing import Callable, List, Union
+
+import click
+from cryptography.exceptions import InvalidTag
+from flask import Flask, current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, select, update
+
+from tracker_99.app_utils import validate_input
+from tracker_99.bulk_import import IMPORT_FORMATS, IMPORT_KINDS, import_rows, read_rows
+from tracker_99.key_manager import key_manager
+from tracker_99.log_report import build_report
+from tracker_99.models import db
+from tracker_99.models.models import Course
+from tracker_99.password_service import (PBKDF2_CANDIDATES, SCRYPT_CANDIDATES, calibrate,
+                                         password_service)
+
+__all__ = ['register_commands', 'rotate_course_keys']
+
+keys_cli = AppGroup('keys', help='Manage the keys that encrypt course keys.')
+logs_cli = AppGroup('tracker-logs', help='Analyze the log files in tracker_logs.')
+data_cli = AppGroup('data', help='Import members, courses, and roles.')
+passwords_cli = AppGroup('passwords', help='Tune the cost of password hashes.')
+
+# The number of times in a row a course may change during a key rotation before it stops
+_MAX_CONFLICT_RETRIES = 3
+
+# Marks a course key that no key in the ring can decrypt during a key rotation
+_UNREADABLE = object()
+
+
+def register_commands(app: Flask) -> None:
+    """Add the commands to the application's `flask` command.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('app', app, Flask)
+
+    app.cli.add_command(keys_cli)
+    app.cli.add_command(logs_cli)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(passwords_cli)
+
+
+@keys_cli.command('rotate')
+@click.option('--batch-size', default=500, show_default=True, type=click.IntRange(1, 10000),
+              help='The number of courses to re-encrypt and commit at a time.')
+@click.option('--checkpoint', default=None, type=click.Path(dir_okay=False),
+              help='The file that records progress. Defaults to instance/key_rotation.json.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the beginning.')
+@click.option('--pause', default=0.0, show_default=True, type=click.FloatRange(0),
+              help='The number of seconds to wait between batches, to let other writers in.')
+def rotate_keys_command(batch_size: int, checkpoint: Union[str, None], restart: bool,
+                        pause: float) -> None:
+    """Re-encrypt every course key with the active key (ACTIVE_KEY_ID).
+
+    :param int batch_size: The number of courses to re-encrypt and commit at a time
+    :param str or None checkpoint: The file that records progress
+    :param bool restart: Ignore the checkpoint and start from the beginning
+    :param float pause: The number of seconds to wait between batches
+
+    :returns: None
+    :rtype: None
+    """
+    _checkpoint = checkpoint or os.path.join(current_app.instance_path, 'key_rotation.json')
+    try:
+        _totals = rotate_course_keys(batch_size, _checkpoint, restart=restart, pause=pause,
+                                     report=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e)) from e
+    click.echo(
+        f"Rotation complete: {_totals['rotated']} re-encrypted, {_totals['skipped']} "
+        f"already current, {_totals['conflicts']} changed during the rotation and retried, "
+        f"{len(_totals['unreadable'])} unreadable, {_totals['rows_per_second']:.0f} rows/s."
+    )
+    if _totals['unreadable']:
+        raise click.ClickException(
+            'These courses have keys encrypted with a key that is not in KEY_RING, '
+            f"and were not re-encrypted: {', '.join(map(str, _totals['unreadable']))}. "
+            'Add the old key to KEY_RING and run the rotation again.')
+
+
+# pylint: disable-next=too-many-arguments
+def rotate_course_keys(batch_size: int, checkpoint: str, restart: bool = False,
+                       pause: float = 0.0, report: Callable[[str], None] = print) -> dict:
+    """Re-encrypt every course key with the active key, one batch of courses at a time.
+
+    Courses are read in primary key order (WHERE course_id > last ID), and each batch
+    is committed in its own short transaction, so memory use is bounded by the batch size
+    and the courses table is never locked for the whole rotation. After each batch,
+    the last course ID is saved to the checkpoint file, so an interrupted rotation
+    resumes where it left off.
+
+    Each key is only replaced if it is still the key that was read (compare-and-set),
+    so a key changed by the application or another rotation in the meantime is not
+    overwritten with the old key. The batch stops at the first changed course,
+    and the checkpoint stays before it, so the next batch reads its new key and retries it.
+
+    Keys that no key in the ring can decrypt (e.g., the key was removed from KEY_RING)
+    are skipped, and their course IDs are returned, instead of stopping the rotation.
+
+    :param int batch_size: The number of courses to re-encrypt and commit at a time
+    :param str checkpoint: The file that records progress
+    :param bool restart: Ignore the checkpoint and start from the beginning, defaults to False
+    :param float pause: The number of seconds to wait between batches, defaults to 0.0
+    :param Callable report: The function that displays progress, defaults to print
+
+    :returns: The number of rotated, skipped, and retried (conflicts) courses, \
+        the IDs of the courses whose keys could not be decrypted, and the throughput
+    :rtype: dict
+    """
+    # Validate inputs
+    validate_input('batch_size', batch_size, int)
+    validate_input('checkpoint', checkpoint, str)
+    validate_input('restart', restart, bool)
+    validate_input('pause', pause, (int, float), allow_empty=True)
+
+    _state = {'active_key_id': key_manager.active_key_id, 'last_id': 0,
+              'rotated': 0, 'skipped': 0, 'conflicts': 0, 'unreadable': []}
+    if not restart:
+        _saved = _read_checkpoint(checkpoint)
+        # A checkpoint for a different key belongs to a different rotation
+        if _saved and _saved.get('active_key_id') == key_manager.active_key_id:
+            _state.update(_saved)
+            report(f"Resuming after course #{_state['last_id']}...")
+
+    _courses = Course.__table__
+    """
+    UPDATE courses SET course_key = ? WHERE course_id = ? AND course_key = ?;
+    """
+    _update_stmt = (
+        update(_courses)
+        .where((_courses.c.course_id == bindparam('_course_id'))
+               & (_courses.c.course_key == bindparam('_old_key')))
+        .values(course_key=bindparam('_course_key'))
+    )
+
+    _start = time.perf_counter()
+    _processed = 0
+    # The course that changed during the rotation, and how many times in a row
+    _retry = {'course_id': None, 'count': 0}
+
+    while True:
+        """
+        SELECT course_id, course_key FROM courses
+        WHERE course_id > 500 ORDER BY course_id LIMIT 500;
+        """
+        _rows = db.session.execute(
+            select(_courses.c.course_id, _courses.c.course_key)
+            .where(_courses.c.course_id > _state['last_id'])
+            .order_by(_courses.c.course_id)
+            .limit(batch_size)
+        ).all()
+        if not _rows:
+            break
+
+        _reencrypted = _reencrypt_keys([_row.course_key for _row in _rows])
+
+        _done = 0
+        _rotated = 0
+        _unreadable = []
+        for _row, _key in zip(_rows, _reencrypted):
+            if _key is _UNREADABLE:
+                _unreadable.append(_row.course_id)
+            elif _key is not None:
+                _result = db.session.execute(_update_stmt, {
+                    '_course_id': _row.course_id, '_old_key': _row.course_key, '_course_key': _key,
+                })
+                if _result.rowcount == 0:
+                    # The key changed since it was read; retry the course in the next batch
+                    break
+                _rotated += 1
+            _done += 1
+        db.session.commit()
+
+        if _done < len(_rows):
+            _conflict_id = _rows[_done].course_id
+            _retry['count'] = _retry['count'] + 1 if _retry['course_id'] == _conflict_id else 1
+            _retry['course_id'] = _conflict_id
+            _state['conflicts'] += 1
+            if _retry['count'] > _MAX_CONFLICT_RETRIES:
+                _write_checkpoint(checkpoint, _state)
+                raise RuntimeError(
+                    f'Course #{_conflict_id} kept changing during the rotation. '
+                    'Run the rotation again to resume from the checkpoint.')
+
+        if _done:
+            _state['last_id'] = _rows[_done - 1].course_id
+        _state['rotated'] += _rotated
+        _state['skipped'] += _done - _rotated - len(_unreadable)
+        _state['unreadable'].extend(_unreadable)
+        _processed += _done
+        _write_checkpoint(checkpoint, _state)
+
+        _elapsed = time.perf_counter() - _start
+        report(f"Through course #{_state['last_id']}: {_state['rotated']} re-encrypted, "
+               f"{_state['skipped']} already current, {_state['conflicts']} changed and retried, "
+               f"{len(_state['unreadable'])} unreadable ({_processed / _elapsed:.0f} rows/s).")
+
+        if pause:
+            time.sleep(pause)
+
+    _elapsed = time.perf_counter() - _start
+
+    # The rotation is complete, so the next rotation starts from the beginning
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    return {
+        'rotated': _state['rotated'],
+        'skipped': _state['skipped'],
+        'conflicts': _state['conflicts'],
+        'unreadable': _state['unreadable'],
+        'seconds': _elapsed,
+        'rows_per_second': _processed / _elapsed if _elapsed else 0.0,
+    }
+
+
+@logs_cli.command('report')
+@click.option('--log-dir', default='tracker_logs', show_default=True,
+              type=click.Path(exists=True, file_okay=False),
+              help='The directory that holds the log files.')
+@click.option('--top', default=10, show_default=True, type=click.IntRange(1),
+              help='The number of top requesters to display.')
+@click.option('--workers', default=1, show_default=True, type=click.IntRange(1, 64),
+              help='The number of processes that read log files at the same time.')
+@click.option('--json', 'as_json', is_flag=True, help='Display the report as JSON.')
+def logs_report_command(log_dir: str, top: int, workers: int, as_json: bool) -> None:
+    """Display request counts, status codes, top requesters, and latencies by endpoint.
+
+    :param str log_dir: The directory that holds the log files
+    :param int top: The number of top requesters to display
+    :param int workers: The number of processes that read log files at the same time
+    :param bool as_json: Display the report as JSON
+
+    :returns: None
+    :rtype: None
+    """
+    _start = time.perf_counter()
+    _report = build_report(log_dir, workers=workers).to_dict(top=top)
+    _elapsed = time.perf_counter() - _start
+
+    if as_json:
+        click.echo(json.dumps(_report, indent=2))
+        return
+
+    click.echo(f"{_report['requests']} requests in {_report['files']} files "
+               f"({_report['lines']} lines, {_elapsed:.2f}s).")
+    click.echo()
+    click.echo(f"{'Endpoint':<40} {'Requests':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  "
+               f"Statuses")
+    for _entry in _report['endpoints']:
+        _statuses = ', '.join(f'{_code}: {_count}' for _code, _count in _entry['statuses'].items())
+        _percentiles = ' '.join(
+            f"{'-' if _entry.get(_key) is None else _entry[_key]:>9}"
+            for _key in ('p50_ms', 'p95_ms', 'p99_ms')
+        )
+        click.echo(f"{_entry['endpoint'][:40]:<40} {_entry['requests']:>8} {_percentiles}  "
+                   f"{_statuses}")
+    click.echo()
+    click.echo('Top requesters:')
+    for _requester, _count in _report['top_requesters']:
+        click.echo(f'  {_requester:<20} {_count:>8}')
+
+
+@data_cli.command('import')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('input_file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'input_format', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='The format of the input. Defaults to csv for .csv files, and ndjson otherwise.')
+@click.option('--batch-size', default=None, type=click.IntRange(1, 10000),
+              help='The number of rows to insert and commit at a time. '
+                   'Defaults to BULK_IMPORT_BATCH_SIZE.')
+@click.option('--workers', default=None, type=click.IntRange(0, 64),
+              help='The number of processes that hash passwords (0 for one per CPU). '
+                   'Defaults to BULK_IMPORT_WORKERS, or the password service if it is not set.')
+@click.option('--json', 'as_json', is_flag=True, help='Display the report as JSON.')
+# pylint: disable-next=[too-many-arguments, too-many-positional-arguments]
+def data_import_command(kind: str, input_file: click.File, input_format: Union[str, None],
+                        batch_size: Union[int, None], workers: Union[int, None],
+                        as_json: bool) -> None:
+    """Import members, courses, or roles from an NDJSON or CSV file (use - for stdin).
+
+    :param str kind: members, courses, or roles
+    :param click.File input_file: The NDJSON or CSV file
+    :param str or None input_format: ndjson or csv
+    :param int or None batch_size: The number of rows to insert and commit at a time
+    :param int or None workers: The number of processes that hash passwords
+    :param bool as_json: Display the report as JSON
+
+    :returns: None
+    :rtype: None
+    """
+    _format = input_format or ('csv' if input_file.name.lower().endswith('.csv') else 'ndjson')
+    _start = time.perf_counter()
+
+    def _progress(totals: dict) -> None:
+        """Display the totals after each batch.
+
+        :param dict totals: The number of rows read, inserted, and failed so far
+
+        :returns: None
+        :rtype: None
+        """
+        if not as_json:
+            _elapsed = time.perf_counter() - _start
+            click.echo(f"{totals['rows']} rows: {totals['inserted']} inserted, "
+                       f"{totals['failed']} failed ({totals['rows'] / _elapsed:.0f} rows/s).")
+
+    _report = import_rows(
+        kind, read_rows(input_file, _format),
+        batch_size=batch_size or current_app.config.get('BULK_IMPORT_BATCH_SIZE', 1000),
+        workers=current_app.config.get('BULK_IMPORT_WORKERS') if workers is None else workers,
+        report=_progress,
+    )
+
+    if as_json:
+        click.echo(json.dumps(_report, indent=2))
+        return
+
+    for _error in _report['errors']:
+        click.echo(f"Line {_error['line']}: {_error['error']}")
+    click.echo(f"Import complete: {_report['inserted']} {kind} inserted, "
+               f"{_report['failed']} failed.")
+
+
+@passwords_cli.command('calibrate')
+@click.option('--target-ms', default=250.0, show_default=True, type=click.FloatRange(min=1),
+              help='The longest acceptable time to verify a password, in milliseconds.')
+@click.option('--method', 'methods', multiple=True,
+              help='A method to time (e.g., scrypt:65536:8:1); repeat to time several. '
+                   'Defaults to the scrypt or pbkdf2 candidates, like PASSWORD_HASH_METHOD.')
+@click.option('--samples', default=3, show_default=True, type=click.IntRange(1, 100),
+              help='The number of times to verify a password with each method.')
+@click.option('--json', 'as_json', is_flag=True, help='Display the results as JSON.')
+def passwords_calibrate_command(target_ms: float, methods: tuple, samples: int,
+                                as_json: bool) -> None:
+    """Time password verification with candidate hash methods on this host,
+    and recommend a PASSWORD_HASH_METHOD for the target time.
+
+    :param float target_ms: The longest acceptable time to verify a password, in milliseconds
+    :param tuple methods: The methods to time
+    :param int samples: The number of times to verify a password with each method
+    :param bool as_json: Display the results as JSON
+
+    :returns: None
+    :rtype: None
+    """
+    _current = password_service.method
+    if not methods:
+        methods = SCRYPT_CANDIDATES if _current.startswith('scrypt') else PBKDF2_CANDIDATES
+    try:
+        _calibration = calibrate((*methods, _current), target_ms, samples=samples)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--method') from e
+
+    if as_json:
+        click.echo(json.dumps({'current': _current, **_calibration}, indent=2))
+        return
+
+    _workers = current_app.config.get('PASSWORD_HASH_WORKERS', 2) or os.cpu_count() or 1
+    click.echo(f"{'Method':<32} {'median ms':>10} {'verifies/s':>11}")
+    for _result in _calibration['results']:
+        _marker = '  (current)' if _result['method'] == _current else ''
+        click.echo(f"{_result['method']:<32} {_result['median_ms']:>10.1f} "
+                   f"{_result['verifies_per_second'] or 0:>11.1f}{_marker}")
+    click.echo()
+    click.echo(f'verifies/s is per worker; {_workers} workers run at once '
+               f'(see PASSWORD_HASH_WORKERS).')
+
+    _recommended = _calibration['recommended']
+    if _recommended is None:
+        click.echo(f'No method verifies within {target_ms:g} ms on this host; '
+                   f'raise --target-ms or time cheaper methods with --method.')
+    elif _recommended == _current:
+        click.echo(f"PASSWORD_HASH_METHOD = '{_current}' is already the costliest method "
+                   f'within {target_ms:g} ms.')
+    else:
+        click.echo(f"Recommended: PASSWORD_HASH_METHOD = '{_recommended}' "
+                   f'(existing hashes are replaced as members log in).')
+
+
+def _reencrypt_keys(course_keys: List[bytes]) -> list:
+    """Re-encrypt a batch of course keys, and mark the keys that cannot be decrypted.
+
+    :param List[bytes] course_keys: The encrypted course keys
+
+    :returns: The re-encrypted keys, in the same order, None for keys already encrypted \
+        with the active key, or _UNREADABLE for keys that no key in the ring can decrypt
+    :rtype: list
+    """
+    try:
+        return key_manager.reencrypt_many(course_keys)
+    except (InvalidTag, ValueError):
+        pass
+
+    # Find the keys that failed, so one of them does not stop the rotation
+    _reencrypted = []
+    for _course_key in course_keys:
+        try:
+            _reencrypted.append(key_manager.reencrypt_many([_course_key])[0])
+        except (InvalidTag, ValueError):
+            _reencrypted.append(_UNREADABLE)
+    return _reencrypted
+
+
+def _read_checkpoint(checkpoint: str) -> Union[dict, None]:
+    """Read the progress of an interrupted rotation.
+
+    :param str checkpoint: The file that records progress
+
+    :returns: The saved progress, or None if there is no valid checkpoint
+    :rtype: dict or None
+    """
+    try:
+        with open(checkpoint, 'r', encoding='utf-8') as _file:
+            _saved = json.load(_file)
+    except (OSError, ValueError):
+        return None
+    return _saved if isinstance(_saved, dict) else None
+
+
+def _write_checkpoint(checkpoint: str, state: dict) -> None:
+    """Save the progress of a rotation.
+
+    The file is replaced in one step, so an interruption never leaves a partial checkpoint.
+
+    :param str checkpoint: The file that records progress
+    :param dict state: The progress to save
+
+    :returns: None
+    :rtype: None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint)), exist_ok=True)
+    _temp = f'{checkpoint}.tmp'
+    with open(_temp, 'w', encoding='utf-8') as _file:
+        json.dump(state, _file)
+    os.replace(_temp, checkpoint)
@@ -38,12 +38,47 @@ class Config:
     # to reduce the size of the log files
     LOG_STATIC_REQUESTS = False
 
+    # Put log records in a bounded queue and write them in batches on a background thread,
+    # so request threads never wait for the log file
+    # When the queue is full, LOG_QUEUE_POLICY decides what happens to new records:
+    # 'drop_new' (never block), 'drop_oldest', or 'block'
+    # (for up to LOG_QUEUE_BLOCK_TIMEOUT seconds)
+    LOG_QUEUE_ENABLED = True
+    LOG_QUEUE_SIZE = 10000
+    LOG_QUEUE_BATCH_SIZE = 256
+    LOG_QUEUE_FLUSH_INTERVAL = 0.5
+    LOG_QUEUE_POLICY = 'drop_new'
+    LOG_QUEUE_BLOCK_TIMEOUT = 0.05
+
+    # The format of the log file: 'csv' (one quoted message per line) or 'json'
+    # (one JSON object per line, with per-request timing fields, for log pipelines)
+    ACCESS_LOG_FORMAT = 'csv'
+
+    # Add a Server-Timing header with the database and total time to each response,
+    # so browser developer tools show where the time went
+    # WARNING: The header reveals timing details to clients, so keep it off in production
+    SERVER_TIMING_ENABLED = False
+
+    # Log a warning when one statement runs this many times in a request (a likely N+1 query),
+    # or 0 to disable the warning
+    N_PLUS_ONE_THRESHOLD = 5
+
     # Return error pages, instead of the stack trace, when not testing
     TESTING = False
 
     # Set profiling to false by default
     PROFILING_ENABLED = False
 
+    # 'every' profiles every request and prints the stats (for development)
+    # 'sample' profiles 1 in PROFILE_SAMPLE_RATE requests, keeps the profiles of requests
+    # that took at least PROFILE_SLOW_MS milliseconds, merges them by endpoint,
+    # and writes them to PROFILE_DIR every PROFILE_FLUSH_INTERVAL seconds (for real traffic)
+    PROFILING_MODE = 'every'
+    PROFILE_SAMPLE_RATE = 100
+    PROFILE_SLOW_MS = 0
+    PROFILE_DIR = 'tracker_profiles'
+    PROFILE_FLUSH_INTERVAL = 60
+
     # Get the database location from the environment or, if undefined,
     # use the test database
     # Same as:
@@ -57,6 +92,11 @@ class Config:
     # Disable Flask-SQLAlchemy event notification system to save resources
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Options for `create_engine()`, like the size of the connection pool, and the SQLite pragmas
+    # to set on each new connection (see sqlite_pragmas.py); the defaults change nothing
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLITE_PRAGMAS = {}
+
     # Get the secret key from the environment or, if undefined,
     # use a default value to protect against Cross-site request forgery (CRSF) attacks
     # Always include a default value, since unittest cannot get values from .env and .flaskenv
@@ -66,6 +106,79 @@ class Config:
     # Ensure CSRF protection is enabled
     WTF_CSRF_ENABLED = True
 
+    # Get the 256-bit (32-byte) key used to encrypt course keys from the environment or,
+    # if undefined, use a default value
+    # WARNING: Always set KEY_32 in the environment in production
+    KEY_32 = os.getenv('KEY_32', 'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF')
+
+    # Additional keys for rotation, as comma-separated `id=key` pairs (IDs 1-255),
+    # and the ID of the key used to encrypt new course keys
+    # If ACTIVE_KEY_ID is not set, new course keys are encrypted with KEY_32
+    # See key_manager.py for the rotation steps
+    KEY_RING = os.getenv('KEY_RING', '')
+    ACTIVE_KEY_ID = os.getenv('ACTIVE_KEY_ID')
+
+    # Cache verified API tokens, so protected API calls do not query the requester every time
+    # Entries expire with the token or after TOKEN_CACHE_TTL seconds, whichever comes first,
+    # and are dropped as soon as the member's token version changes (see TOKEN_VERSION_TTL)
+    TOKEN_CACHE_ENABLED = True
+    TOKEN_CACHE_SIZE = 4096
+    TOKEN_CACHE_TTL = 300
+
+    # Sign is_admin, the token version, and the member's course privileges into API tokens,
+    # so API calls can be authorized without querying the database
+    # Tokens for members with more than RICH_TOKEN_MAX_COURSES courses omit the privileges
+    RICH_TOKENS_ENABLED = False
+    RICH_TOKEN_MAX_COURSES = 50
+
+    # The number of seconds to trust a cached token version before reading it again
+    # Cached tokens and rich claims are checked against this version, so other processes
+    # see revoked tokens and changed privileges after this delay
+    TOKEN_VERSION_TTL = 30
+
+    # Bulk imports insert and commit this many rows at a time
+    # The import command hashes member passwords in this many processes (0 for one per CPU),
+    # or in the workers of the password service if None; the API always uses the password service
+    BULK_IMPORT_BATCH_SIZE = 1000
+    BULK_IMPORT_WORKERS = None
+
+    # Exports read, encode, and send this many rows at a time
+    EXPORT_BATCH_SIZE = 1000
+
+    # The JSON encoder for API responses: 'auto' (orjson if it is installed, or the standard
+    # library), 'orjson', or 'stdlib'
+    JSON_PROVIDER = 'auto'
+
+    # The number of seconds to trust a cached table version before reading it again
+    # Other processes see changes, and send new ETags, after this delay
+    TABLE_VERSION_TTL = 5
+
+    # The number of seconds to keep a member's course privileges for authorization checks
+    # The entries are keyed by the version of the associations table, so changes apply right away
+    PRIVILEGE_CACHE_TTL = 60
+
+    # The number of seconds to keep the row counts of paginated listings
+    # The counts are keyed by the versions of the listed tables, so changes apply right away
+    LISTING_COUNT_CACHE_TTL = 60
+
+    # Hash and verify passwords in this many worker processes (1 to hash in the request thread,
+    # 0 for one per CPU), with at most PASSWORD_HASH_MAX_PENDING hashes
+    # running or waiting; other logins wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds for room,
+    # then get 503 Service Unavailable and Retry-After: PASSWORD_HASH_RETRY_AFTER
+    # Each worker is a process with its own copy of the application, so raise this on hosts
+    # with spare cores, instead of starting one per CPU on every instance
+    # See password_service.py
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_MAX_PENDING = 16
+    PASSWORD_HASH_QUEUE_TIMEOUT = 0.0
+    PASSWORD_HASH_RETRY_AFTER = 1
+
+    # The method and cost of new password hashes: 'scrypt:N:r:p' or 'pbkdf2:hash_name:iterations'
+    # Logins replace hashes made with another method, so members move to a new cost as they log in
+    # Run `flask --app tracker_99 passwords calibrate` to find the costliest method that verifies
+    # within your login latency budget on this host
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+
 
 class DevelopmentConfig(Config):
     """Configuration variables and settings for development."""
@@ -79,6 +192,9 @@ class DevelopmentConfig(Config):
     # WARNING: This will increase the size of the log files
     LOG_STATIC_REQUESTS = True
 
+    # Show the database time of each request in the browser's developer tools
+    SERVER_TIMING_ENABLED = True
+
 
 class ProfilingConfig(Config):
     """Configuration variables and settings for profiling."""
@@ -93,6 +209,39 @@ class ProfilingConfig(Config):
     # Profile the application
     PROFILING_ENABLED = True
 
+    # Profile a sample of requests and write the merged profiles to tracker_profiles
+    # Use PROFILING_MODE = 'every' to print the profile of every request instead
+    PROFILING_MODE = 'sample'
+
+
+class ProductionConfig(Config):
+    """Configuration variables and settings for production."""
+
+    CONFIG_MSG = 'You are using the production configuration.'
+
+    # Let readers keep reading while an administrator saves changes (WAL),
+    # and wait for locks, instead of failing with 'database is locked'
+    # WARNING: WAL mode is stored in the database file, and does not work on network drives
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        # Sync at checkpoints, not on every commit; safe from corruption in WAL mode
+        'synchronous': 'NORMAL',
+        # Milliseconds to wait for a lock
+        'busy_timeout': 5000,
+        # Read the database through up to 256 MiB of memory-mapped I/O
+        'mmap_size': 268435456,
+        # A negative size is in KiB, so 64 MiB of page cache per connection
+        'cache_size': -65536,
+        'temp_store': 'MEMORY',
+    }
+
+    # One connection per request thread, and a short wait for a free connection
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 10,
+    }
+
 
 class TestingConfig(Config):
     """Configuration variables and settings for testing."""
@@ -114,11 +263,15 @@ class TestingConfig(Config):
     SERVER_NAME = '127.0.0.1:5000'
     PREFERRED_URL_SCHEME = 'http'
 
+    # Hash passwords in the test process, instead of starting worker processes
+    PASSWORD_HASH_WORKERS = 1
+
 
 CONFIGS = {
     'default': Config,
     'development': DevelopmentConfig,
     'profile': ProfilingConfig,
+    'production': ProductionConfig,
     'testing': TestingConfig,
 }
 
@@ -162,8 +315,45 @@ app_config_vars = {
     'LOGGING_ENABLED': True,
     'LOGGING_LEVEL': 20,
     'LOG_STATIC_REQUESTS': False,
+    'LOG_QUEUE_ENABLED': True,
+    'LOG_QUEUE_SIZE': 10000,
+    'LOG_QUEUE_BATCH_SIZE': 256,
+    'LOG_QUEUE_FLUSH_INTERVAL': 0.5,
+    'LOG_QUEUE_POLICY': 'drop_new',
+    'LOG_QUEUE_BLOCK_TIMEOUT': 0.05,
+    'ACCESS_LOG_FORMAT': 'csv',
+    'SERVER_TIMING_ENABLED': False,
+    'N_PLUS_ONE_THRESHOLD': 5,
     'PROFILING_ENABLED': False,
+    'PROFILING_MODE': 'every',
+    'PROFILE_SAMPLE_RATE': 100,
+    'PROFILE_SLOW_MS': 0,
+    'PROFILE_DIR': 'tracker_profiles',
+    'PROFILE_FLUSH_INTERVAL': 60,
     'SQLALCHEMY_DATABASE_URI': 'sqlite:///tracker.db',
     'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'SQLALCHEMY_ENGINE_OPTIONS': {},
+    'SQLITE_PRAGMAS': {},
     'WTF_CSRF_ENABLED': True,
+    'KEY_32': 'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF',
+    'KEY_RING': '',
+    'ACTIVE_KEY_ID': None,
+    'TOKEN_CACHE_ENABLED': True,
+    'TOKEN_CACHE_SIZE': 4096,
+    'TOKEN_CACHE_TTL': 300,
+    'RICH_TOKENS_ENABLED': False,
+    'RICH_TOKEN_MAX_COURSES': 50,
+    'TOKEN_VERSION_TTL': 30,
+    'BULK_IMPORT_BATCH_SIZE': 1000,
+    'BULK_IMPORT_WORKERS': None,
+    'EXPORT_BATCH_SIZE': 1000,
+    'JSON_PROVIDER': 'auto',
+    'TABLE_VERSION_TTL': 5,
+    'PRIVILEGE_CACHE_TTL': 60,
+    'LISTING_COUNT_CACHE_TTL': 60,
+    'PASSWORD_HASH_WORKERS': 2,
+    'PASSWORD_HASH_MAX_PENDING': 16,
+    'PASSWORD_HASH_QUEUE_TIMEOUT': 0.0,
+    'PASSWORD_HASH_RETRY_AFTER': 1,
+    'PASSWORD_HASH_METHOD': 'scrypt:32768:8:1',
 }
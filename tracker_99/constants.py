@@ -4,6 +4,9 @@ regardless of the configuration used.
 
 COURSES_PAGE = 'main_bp.courses'
 
+# The number of rows returned per page by listing endpoints, unless the client asks for fewer
+DEFAULT_PAGE_SIZE = 25
+
 EMAIL_REGEX = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}$'
 
 # Groups must:
@@ -30,6 +33,18 @@ LOGIN_PAGE = 'auth_bp.login'
 
 LOG_SIZE = 1024 * 1000
 
+# Never accept more than this many assignment changes per request, to keep each request bounded
+MAX_ASSIGNMENT_CHANGES = 1000
+
+# Never accept more than this many items per bulk assignment request (/api/courses/assign/bulk)
+MAX_BULK_ASSIGNMENTS = 10000
+
+# Never return more than this many row errors in a bulk import response (/api/import/<kind>)
+MAX_IMPORT_ERRORS = 1000
+
+# Never return more than this many rows per page, to keep each request bounded
+MAX_PAGE_SIZE = 100
+
 MEMBERS_PAGE = 'main_bp.members'
 
 # Member names must:
@@ -0,0 +1,195 @@
+"""Per-request timing: wall time, database time, the number of database queries,
+and the time spent hashing passwords (see password_service.py).
+
+The timers start in a `before_request` hook, and SQLAlchemy cursor events add the time
+spent in each statement to the current request, so `request_timing()` can report them
+in an `after_request` hook (e.g., in the JSON-lines access log).
+
+Each statement is also counted by its fingerprint (the statement with its literals, whitespace,
+and IN lists normalized), so a statement that runs once per row of an earlier query
+(an N+1 pattern) is logged as a warning when it runs N_PLUS_ONE_THRESHOLD times.
+If SERVER_TIMING_ENABLED is True, the timing is also sent in a `Server-Timing` header.
+
+Usage:
+- init_instrumentation(app)
+- _timing = request_timing()
+"""
+
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+
+from tracker_99.app_utils import validate_input
+
+__all__ = ['fingerprint', 'init_instrumentation', 'request_timing']
+
+# The engine events are registered once per process for every engine,
+# since each application instance (e.g., in tests) creates its own engine
+_ENGINE_EVENTS_REGISTERED = False
+
+_WHITESPACE = re.compile(r'\s+')
+# IN (?, ?, ?) and IN (__[POSTCOMPILE_ids]) become IN (?), whatever the number of values
+_IN_LIST = re.compile(r'\bIN \((?:\?(?:, \?)*|__\[POSTCOMPILE_\w+\])\)', re.IGNORECASE)
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement, so statements that differ only by their values match.
+
+    :param str statement: The SQL statement
+
+    :returns: The statement with literals replaced by ? and its whitespace collapsed
+    :rtype: str
+    """
+    _statement = _WHITESPACE.sub(' ', statement).strip()
+    _statement = _STRING.sub('?', _statement)
+    _statement = _NUMBER.sub('?', _statement)
+    return _IN_LIST.sub('IN (?)', _statement)
+
+
+def init_instrumentation(app: Flask) -> None:
+    """Start the per-request timers and listen for database statements.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('app', app, Flask)
+
+    global _ENGINE_EVENTS_REGISTERED  # pylint: disable=global-statement
+    if not _ENGINE_EVENTS_REGISTERED:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        # Statements that raise do not call after_cursor_execute
+        event.listen(Engine, 'handle_error', _handle_error)
+        _ENGINE_EVENTS_REGISTERED = True
+
+    @app.before_request
+    def start_request_timer() -> None:
+        """Reset the timers for the request.
+
+        :returns: None
+        :rtype: None
+        """
+        g.request_start = time.perf_counter()
+        g.db_time = 0.0
+        g.db_queries = 0
+        g.db_statements = Counter()
+        g.hash_time = 0.0
+
+    @app.after_request
+    def report_request_timing(response: Response) -> Response:
+        """Add the Server-Timing header and warn about likely N+1 queries.
+
+        **NOTE** - This will not change the response body.
+
+        :param Response response: The response to the request
+
+        :returns: The response, with the Server-Timing header if enabled
+        :rtype: Response
+        """
+        _timing = request_timing()
+
+        if current_app.config.get('SERVER_TIMING_ENABLED', False):
+            # e.g., Server-Timing: db;dur=1.234;desc="3 queries", total;dur=5.678
+            _hash = f'hash;dur={_timing["hash_ms"]}, ' if _timing['hash_ms'] else ''
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={_timing["db_ms"]};desc="{_timing["db_queries"]} queries", '
+                f'{_hash}total;dur={_timing["wall_ms"]}'
+            )
+
+        _threshold = current_app.config.get('N_PLUS_ONE_THRESHOLD', 0)
+        if _threshold and _timing['db_repeats'] >= _threshold:
+            _statement, _count = g.db_statements.most_common(1)[0]
+            # Use lazy % formatting in logging functions
+            current_app.logger.warning(
+                'Possible N+1 query in %s: %d of %d queries were: %s',
+                request.endpoint or request.path, _count, _timing['db_queries'], _statement
+            )
+
+        # Do not forget to return the response to the client, or the app will crash
+        return response
+
+
+def request_timing() -> dict:
+    """Get the timing of the current request so far.
+
+    :returns: The wall time, database time, and password hashing time in milliseconds, \
+        the number of queries, and the number of times the most repeated statement ran
+    :rtype: dict
+    """
+    _start = g.get('request_start')
+    _statements = g.get('db_statements')
+    return {
+        'wall_ms': round((time.perf_counter() - _start) * 1000, 3) if _start else None,
+        'db_ms': round(g.get('db_time', 0.0) * 1000, 3),
+        'db_queries': g.get('db_queries', 0),
+        'hash_ms': round(g.get('hash_time', 0.0) * 1000, 3),
+        'db_repeats': _statements.most_common(1)[0][1] if _statements else 0,
+    }
+
+
+# pylint: disable-next=[too-many-arguments, too-many-positional-arguments, unused-argument]
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Record when a statement starts. Called by SQLAlchemy.
+
+    :returns: None
+    :rtype: None
+    """
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+# pylint: disable-next=[too-many-arguments, too-many-positional-arguments, unused-argument]
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Add the time spent in a statement to the current request. Called by SQLAlchemy.
+
+    :returns: None
+    :rtype: None
+    """
+    _record_statement(conn, statement)
+
+
+def _handle_error(context: ExceptionContext) -> None:
+    """Add the time spent in a statement that raised to the current request,
+    so its start time is not left on the pooled connection. Called by SQLAlchemy.
+
+    :param ExceptionContext context: The failed statement and its connection
+
+    :returns: None
+    :rtype: None
+    """
+    # Errors outside a statement (e.g., while connecting) have no start time
+    if context.connection is not None and context.statement is not None:
+        _record_statement(context.connection, context.statement)
+
+
+def _record_statement(conn: Connection, statement: str) -> None:
+    """Take the start time of the last statement off the connection,
+    and add the statement to the current request.
+
+    :param Connection conn: The connection that ran the statement
+    :param str statement: The SQL statement
+
+    :returns: None
+    :rtype: None
+    """
+    _starts = conn.info.get('query_start')
+    if not _starts:
+        return
+    _elapsed = time.perf_counter() - _starts.pop()
+
+    # Statements outside a request, like CLI commands, are not timed
+    if has_request_context() and 'request_start' in g:
+        g.db_time += _elapsed
+        g.db_queries += 1
+        g.db_statements[fingerprint(statement)] += 1
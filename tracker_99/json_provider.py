@@ -0,0 +1,147 @@
+"""A JSON provider for `jsonify` and `app.json` that uses orjson, if it is installed.
+
+orjson encodes large lists of dictionaries several times faster than the standard library.
+If orjson is not installed, or JSON_PROVIDER is 'stdlib', the standard library is used,
+so the application does not depend on orjson. Both encoders also handle values
+the default provider cannot:
+
+    - bytes (e.g., encrypted course keys): Base64 text
+    - datetime, date, and time: ISO 8601 text
+    - SQLAlchemy Row and RowMapping: An object with a key for each column
+
+> **NOTE** - orjson is optional: `python -m pip install orjson`
+
+Usage:
+- init_json_provider(app)
+"""
+
+import base64
+import dataclasses
+import datetime
+import decimal
+import uuid
+from typing import Any
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Row, RowMapping
+
+from tracker_99.app_utils import validate_input
+
+# orjson is optional, so fall back to the standard library if it is not installed
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+__all__ = ['JSON_PROVIDERS', 'FastJSONProvider', 'init_json_provider', 'json_default']
+
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+
+def json_default(o: Any) -> Any:
+    """Convert a value that the JSON encoder does not support.
+
+    :param Any o: The value to convert
+
+    :raises TypeError: If the value cannot be converted
+
+    :returns: A value the encoder supports
+    :rtype: Any
+    """
+    if isinstance(o, (bytes, bytearray, memoryview)):
+        return base64.b64encode(o).decode('ascii')
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    if isinstance(o, Row):
+        return o._asdict()
+    if isinstance(o, RowMapping):
+        return dict(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    # Support Markup and other objects that render as HTML, like the default provider
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Encode JSON with orjson if it is available, or the standard library otherwise."""
+
+    default = staticmethod(json_default)
+
+    # Set by init_json_provider(), based on JSON_PROVIDER
+    use_orjson = orjson is not None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as JSON.
+
+        :param Any obj: The data to serialize
+        :param Any kwargs: Arguments for `json.dumps()`, which use the standard library
+
+        :returns: The JSON text
+        :rtype: str
+        """
+        # Only use orjson for the options it supports, like `jsonify`'s
+        if self.use_orjson and not kwargs:
+            return self._orjson_dumps(obj, indent=False).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        """Serialize data as a JSON response. Called by `jsonify`.
+
+        :param Any args: A single value to serialize, or multiple values as a list
+        :param Any kwargs: Treat as a dict to serialize
+
+        :returns: The response with the JSON body
+        :rtype: flask.Response
+        """
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+
+        _obj = self._prepare_response_obj(args, kwargs)
+        # Indent the output in debug mode, like the default provider
+        _indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            self._orjson_dumps(_obj, indent=_indent) + b'\n', mimetype=self.mimetype
+        )
+
+    def _orjson_dumps(self, obj: Any, indent: bool) -> bytes:
+        """Serialize data as JSON with orjson.
+
+        :param Any obj: The data to serialize
+        :param bool indent: Indent the output with two spaces
+
+        :returns: The JSON text, encoded as UTF-8
+        :rtype: bytes
+        """
+        # Allow integer keys, like json.dumps() does
+        _options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            _options |= orjson.OPT_SORT_KEYS
+        if indent:
+            _options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=json_default, option=_options)
+
+
+def init_json_provider(app: Flask) -> None:
+    """Use the fast JSON provider for `jsonify` and `app.json`.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('app', app, Flask)
+
+    _choice = app.config.get('JSON_PROVIDER', 'auto')
+    if _choice not in JSON_PROVIDERS:
+        raise ValueError(f'Invalid JSON provider. Use one of {JSON_PROVIDERS}.')
+    if _choice == 'orjson' and orjson is None:
+        raise ValueError("JSON_PROVIDER is 'orjson', but orjson is not installed.")
+
+    app.json = FastJSONProvider(app)
+    app.json.use_orjson = orjson is not None and _choice != 'stdlib'
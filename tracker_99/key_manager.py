@@ -0,0 +1,275 @@
+"""Encrypts and decrypts course keys using AES-256-GCM.
+
+The 256-bit keys are loaded and validated once, and a single AESGCM primitive per key is reused
+for every operation, instead of reading the environment and building a new cipher per call.
+
+Encrypted data is stored in one of two formats:
+
+    - Legacy: IV (12 bytes) + ciphertext + tag (16 bytes), encrypted with KEY_32
+    - Key ring: key ID (1 byte) + IV + ciphertext + tag, encrypted with that key in KEY_RING
+
+New data is encrypted with the key ring key in ACTIVE_KEY_ID or, if ACTIVE_KEY_ID is not set,
+in the legacy format. Both formats can always be decrypted, so you can rotate keys online:
+
+    1. Add the new key to KEY_RING (e.g., KEY_RING="1=<32 bytes>,2=<32 bytes>").
+    2. Set ACTIVE_KEY_ID to the ID of the new key and restart the application.
+    3. Run `flask --app tracker_99 keys rotate` to re-encrypt the existing course keys.
+    4. Remove the old key once the rotation is complete.
+
+Usage:
+- key_manager.init_app(app)
+- _encrypted_data = key_manager.encrypt('Change.Me.123')
+- _keys = key_manager.decrypt_many([_course.course_key for _course in _courses])
+"""
+
+import os
+import threading
+from typing import Iterable, List, Union
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from flask import Flask
+
+from tracker_99.app_utils import validate_input
+
+__all__ = ['KeyManager', 'key_manager', 'parse_key_ring']
+
+# The default key if KEY_32 is not set in the environment or the configuration
+# WARNING: Never use the default key in production
+DEFAULT_KEY_32 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF'
+
+# GCM standard is 96 bits (12 bytes);
+# longer IV's do not improve security and may hurt performance
+IV_SIZE = 12
+TAG_SIZE = 16
+
+
+def parse_key_ring(key_ring: Union[str, dict, None]) -> dict:
+    """Convert a key ring setting into a dictionary of key IDs and keys.
+
+    :param str or dict or None key_ring: A dictionary, or a string of comma-separated \
+        `id=key` pairs (e.g., "1=ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF,2=...")
+
+    :returns: The keys, by ID (1-255)
+    :rtype: dict
+    """
+    validate_input('key_ring', key_ring, Union[str, dict, None], allow_empty=True)
+
+    if isinstance(key_ring, dict):
+        _pairs = key_ring.items()
+    else:
+        _pairs = [
+            _pair.split('=', 1) for _pair in (key_ring or '').split(',') if _pair.strip()
+        ]
+
+    _ring = {}
+    for _key_id, _key in _pairs:
+        _key_id = int(_key_id)
+        if not 1 <= _key_id <= 255:
+            raise ValueError('Key IDs must be between 1 and 255.')
+        _ring[_key_id] = _key.strip() if isinstance(_key, str) else _key
+    return _ring
+
+
+class KeyManager:
+    """Holds the validated key material and reusable AESGCM primitives."""
+
+    def __init__(self) -> None:
+        """Initialization. The keys are loaded by `init_app()`, or from the environment
+        the first time they are needed (e.g., when creating the database outside a request).
+        """
+        self._legacy = None
+        self._ring = {}
+        self.active_key_id = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """Load and validate the keys using the application's configuration.
+
+        :param Flask app: The application instance
+
+        :returns: None
+        :rtype: None
+        """
+        # Validate inputs
+        validate_input('app', app, Flask)
+
+        self.load_keys(
+            app.config.get('KEY_32') or os.environ.get('KEY_32', DEFAULT_KEY_32),
+            app.config.get('KEY_RING'),
+            app.config.get('ACTIVE_KEY_ID'),
+        )
+
+    def load_key(self, key_32: Union[str, bytes]) -> None:
+        """Validate the legacy 256-bit key and build its AESGCM primitive.
+
+        :param str or bytes key_32: The 32-byte (256-bit) key
+
+        :returns: None
+        :rtype: None
+        """
+        _aesgcm = self._build(key_32)
+        with self._lock:
+            self._legacy = _aesgcm
+
+    def load_keys(self, key_32: Union[str, bytes], key_ring: Union[str, dict, None] = None,
+                  active_key_id: Union[int, str, None] = None) -> None:
+        """Validate the legacy key and the key ring, and build their AESGCM primitives.
+
+        :param str or bytes key_32: The 32-byte (256-bit) key for data in the legacy format
+        :param str or dict or None key_ring: The keys by ID (see `parse_key_ring()`)
+        :param int or str or None active_key_id: The ID of the key ring key used to encrypt \
+            new data, or None to encrypt new data in the legacy format
+
+        :returns: None
+        :rtype: None
+        """
+        validate_input('active_key_id', active_key_id, Union[int, str, None], allow_empty=True)
+
+        _legacy = self._build(key_32)
+        _ring = {_id: self._build(_key) for _id, _key in parse_key_ring(key_ring).items()}
+        _active = int(active_key_id) if active_key_id not in (None, '') else None
+
+        if _active is not None and _active not in _ring:
+            raise ValueError(f'ACTIVE_KEY_ID {_active} is not in the key ring.')
+
+        with self._lock:
+            self._legacy = _legacy
+            self._ring = _ring
+            self.active_key_id = _active
+
+    @staticmethod
+    def _build(key_32: Union[str, bytes]) -> AESGCM:
+        """Validate a 256-bit key and build its AESGCM primitive.
+
+        :param str or bytes key_32: The 32-byte (256-bit) key
+
+        :returns: The AESGCM primitive
+        :rtype: AESGCM
+        """
+        validate_input('key_32', key_32, (str, bytes))
+
+        _key = key_32 if isinstance(key_32, bytes) else key_32.encode('utf-8')
+        if len(_key) != 32:
+            raise ValueError('Key must be 32 bytes to use AES-256 encryption.')
+        return AESGCM(_key)
+
+    @property
+    def aesgcm(self) -> AESGCM:
+        """Get the AESGCM primitive for the legacy key, loading it from the environment
+        if necessary.
+
+        :returns: The AESGCM primitive
+        :rtype: AESGCM
+        """
+        if self._legacy is None:
+            self.load_key(os.environ.get('KEY_32', DEFAULT_KEY_32))
+        return self._legacy
+
+    def encrypt(self, plain_text: str) -> bytes:
+        """Encrypt text using AES-GCM and the active key.
+
+        :param str plain_text: The text to encrypt
+
+        :returns: The key ID (unless using the legacy key), IV, ciphertext, and tag
+        :rtype: bytes
+        """
+        validate_input('plain_text', plain_text, str)
+
+        return self.encrypt_many([plain_text])[0]
+
+    def decrypt(self, encrypted_data: bytes) -> str:
+        """Decrypt AES-GCM encrypted data in either format.
+
+        :param bytes encrypted_data: The encrypted data to decrypt
+
+        :returns: The decrypted text
+        :rtype: str
+        """
+        validate_input('encrypted_data', encrypted_data, bytes)
+
+        return self.decrypt_with_key_id(encrypted_data)[0]
+
+    def decrypt_with_key_id(self, encrypted_data: bytes) -> tuple:
+        """Decrypt AES-GCM encrypted data and report which key decrypted it.
+
+        The first byte of legacy data is part of a random IV, so it may match a key ID
+        by chance. If the key ring key fails to authenticate the data, the legacy key is tried.
+
+        :param bytes encrypted_data: The encrypted data to decrypt
+
+        :returns: The decrypted text and the key ID (None for the legacy key)
+        :rtype: tuple
+        """
+        validate_input('encrypted_data', encrypted_data, bytes)
+
+        if len(encrypted_data) < IV_SIZE + TAG_SIZE:
+            raise ValueError('Encrypted data is too short.')
+
+        _aesgcm = self._ring.get(encrypted_data[0])
+        if _aesgcm is not None and len(encrypted_data) > IV_SIZE + TAG_SIZE:
+            try:
+                _plain = _aesgcm.decrypt(
+                    encrypted_data[1:IV_SIZE + 1], encrypted_data[IV_SIZE + 1:], None
+                )
+                return _plain.decode('utf-8'), encrypted_data[0]
+            except InvalidTag:
+                pass
+
+        # The first 12 bytes are the IV, and the remainder is the ciphertext and tag
+        _plain = self.aesgcm.decrypt(encrypted_data[:IV_SIZE], encrypted_data[IV_SIZE:], None)
+        return _plain.decode('utf-8'), None
+
+    def encrypt_many(self, plain_texts: Iterable[str]) -> List[bytes]:
+        """Encrypt many texts with one lookup of the active key.
+
+        :param Iterable[str] plain_texts: The texts to encrypt
+
+        :returns: The encrypted data, in the same order
+        :rtype: List[bytes]
+        """
+        _key_id = self.active_key_id
+        if _key_id is None:
+            _aesgcm, _prefix = self.aesgcm, b''
+        else:
+            _aesgcm, _prefix = self._ring[_key_id], bytes([_key_id])
+
+        _encrypted = []
+        for _text in plain_texts:
+            validate_input('plain_text', _text, str)
+            # Generate a random initialization vector (IV) / nonce for every encryption
+            _iv = os.urandom(IV_SIZE)
+            # AESGCM appends the tag to the ciphertext
+            _encrypted.append(_prefix + _iv + _aesgcm.encrypt(_iv, _text.encode('utf-8'), None))
+        return _encrypted
+
+    def decrypt_many(self, encrypted_items: Iterable[bytes]) -> List[str]:
+        """Decrypt many items in either format.
+
+        :param Iterable[bytes] encrypted_items: The encrypted data to decrypt
+
+        :returns: The decrypted texts, in the same order
+        :rtype: List[str]
+        """
+        return [self.decrypt_with_key_id(_data)[0] for _data in encrypted_items]
+
+    def reencrypt_many(self, encrypted_items: Iterable[bytes]) -> List[Union[bytes, None]]:
+        """Re-encrypt many items with the active key.
+
+        :param Iterable[bytes] encrypted_items: The encrypted data to re-encrypt
+
+        :returns: The re-encrypted data, in the same order, \
+            or None for items already encrypted with the active key
+        :rtype: List[bytes or None]
+        """
+        _reencrypted = []
+        for _data in encrypted_items:
+            _plain, _key_id = self.decrypt_with_key_id(_data)
+            _reencrypted.append(
+                None if _key_id == self.active_key_id else self.encrypt_many([_plain])[0]
+            )
+        return _reencrypted
+
+
+# Create an instance of the key manager to share across the application
+key_manager = KeyManager()
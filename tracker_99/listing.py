@@ -0,0 +1,487 @@
+"""Server-side listing helpers for large tables.
+
+Builds keyset-paginated, sortable, and searchable queries, so each request only touches
+a bounded number of rows, and translates DataTables server-side processing parameters
+into query options.
+
+The total and filtered row counts are cached (LISTING_COUNT_CACHE_TTL), keyed by the statement,
+the filters, and the versions of the tables it reads (see `table_versions.py`),
+so paging through an unchanged table does not count its rows again.
+
+Cursors are signed with the SECRET_KEY of the application, so clients cannot forge
+the values that are bound into the keyset query.
+
+Usage:
+- _stmt, _columns = course_listing_query(member_id=2, is_admin=False)
+- _page = fetch_page(_stmt, _columns, Course.course_id, **parse_datatables_args(request.args))
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+from typing import Union
+
+from sqlalchemy import Integer, Select, String, and_, cast, func, literal, null, or_, select
+from flask import current_app
+from sqlalchemy.sql.util import find_tables
+
+from tracker_99 import constants as c
+from tracker_99.app_utils import validate_input
+from tracker_99.caches import listing_counts
+from tracker_99.models import db
+from tracker_99.models.models import Association, Course, Member, Role
+from tracker_99.table_versions import get_table_versions
+
+__all__ = [
+    'ASSIGN_CANDIDATE_COLUMNS',
+    'COURSE_LISTING_COLUMNS',
+    'assign_candidates_query',
+    'course_listing_query',
+    'fetch_page',
+    'parse_datatables_args',
+    'parse_api_listing_args',
+]
+
+# The order of the columns in the course table on the index page
+# DataTables sends sorting and searching information by column index
+COURSE_LISTING_COLUMNS = (
+    'course_name',
+    'course_id',
+    'course_code',
+    'course_group',
+    'course_desc',
+    'role_name',
+)
+
+# The order of the columns in the member table on the assign course page
+ASSIGN_CANDIDATE_COLUMNS = (
+    'member_name',
+    'member_id',
+    'is_admin',
+    'member_group',
+    'role_id',
+)
+
+
+def course_listing_query(member_id: int, is_admin: bool, include_key: bool = False) -> tuple:
+    """Build the statement that lists the courses a member can see.
+
+    **NOTE** - The statement is not executed; pass it to `fetch_page()` to get one page of rows.
+
+    :param int member_id: The ID of the member requesting the list
+    :param bool is_admin: True if the member is an administrator, who can see every course
+    :param bool include_key: Include the encrypted course key in the results, defaults to False
+
+    :returns: The unexecuted statement and a dictionary of the columns that can be \
+        sorted or searched by name
+    :rtype: tuple
+    """
+    # Validate inputs
+    validate_input('member_id', member_id, int)
+    validate_input('is_admin', is_admin, bool)
+    validate_input('include_key', include_key, bool)
+
+    _columns = {
+        'course_name': Course.course_name,
+        'course_id': Course.course_id,
+        'course_code': Course.course_code,
+        'course_group': Course.course_group,
+        'course_desc': Course.course_desc,
+    }
+
+    _selected = [
+        Course.course_id,
+        Course.course_name,
+        Course.course_code,
+        Course.course_group,
+        Course.course_desc,
+    ]
+
+    if include_key:
+        _selected.append(Course.course_key)
+
+    if is_admin:
+        # Administrators can view all courses
+        """
+        SELECT courses.*, 'Admin' AS role_name, NULL AS role_privilege
+        FROM courses;
+        """
+        _stmt = select(
+            *_selected, literal('Admin').label('role_name'), null().label('role_privilege')
+        )
+    else:
+        """
+        SELECT courses.*, roles.role_name, roles.role_privilege
+        FROM courses
+        JOIN associations ON courses.course_id = associations.course_id
+        JOIN roles ON roles.role_id = associations.role_id
+        WHERE associations.member_id = 2;
+        """
+        _stmt = (
+            select(*_selected, Role.role_name, Role.role_privilege)
+            .join(Association, Course.course_id == Association.course_id)
+            .join(Role, Role.role_id == Association.role_id)
+            .where(Association.member_id == member_id)
+        )
+        # Administrators are 'Admin' in every course, so only members can sort by role
+        _columns['role_name'] = Role.role_name
+
+    return _stmt, _columns
+
+
+def assign_candidates_query(course_id: int, privilege_level: int) -> tuple:
+    """Build the statement that lists the members who can be assigned to a course.
+
+    Unassigned members and members whose role is at or below the privilege level
+    are listed, with their current role in the course (role_id is NULL if unassigned).
+
+    **NOTE** - The statement is not executed; pass it to `fetch_page()` to get one page of rows.
+
+    :param int course_id: The ID of the course
+    :param int privilege_level: The highest role privilege the requester can assign
+
+    :returns: The unexecuted statement and a dictionary of the columns that can be \
+        sorted or searched by name
+    :rtype: tuple
+    """
+    # Validate inputs
+    validate_input('course_id', course_id, int)
+    validate_input('privilege_level', privilege_level, int)
+
+    """
+    SELECT members.member_id, members.member_name, members.is_admin, members.member_group,
+        associations.role_id
+    FROM members
+    LEFT OUTER JOIN associations
+        ON associations.member_id = members.member_id AND associations.course_id = 12
+    LEFT OUTER JOIN roles ON roles.role_id = associations.role_id
+    WHERE roles.role_privilege IS NULL OR roles.role_privilege <= 19;
+    """
+    _stmt = (
+        select(
+            Member.member_id,
+            Member.member_name,
+            Member.is_admin,
+            Member.member_group,
+            Association.role_id,
+        )
+        .outerjoin(Association, and_(Association.member_id == Member.member_id,
+                                     Association.course_id == course_id))
+        .outerjoin(Role, Role.role_id == Association.role_id)
+        .where(or_(Role.role_privilege.is_(None), Role.role_privilege <= privilege_level))
+    )
+
+    # Members can be found by name, ID, or group
+    _columns = {
+        'member_name': Member.member_name,
+        'member_id': Member.member_id,
+        'member_group': Member.member_group,
+    }
+
+    return _stmt, _columns
+
+
+# pylint: disable-next=[too-many-arguments, too-many-locals]
+def fetch_page(
+        stmt: Select,
+        columns: dict,
+        tie_breaker: object,
+        sort: str = '',
+        direction: str = 'asc',
+        after: Union[str, None] = None,
+        start: int = 0,
+        length: Union[int, None] = c.DEFAULT_PAGE_SIZE,
+        searches: Union[dict, None] = None,
+        search: str = '',
+) -> dict:
+    """Get one page of rows using keyset pagination.
+
+    If the `after` cursor from the previous page matches the requested sort and filters,
+    the query seeks directly to the next row (WHERE (sort, id) > (value, id)) instead of
+    counting and skipping `start` rows with OFFSET.
+
+    :param Select stmt: The unexecuted statement, e.g., from `course_listing_query()`
+    :param dict columns: The columns that can be sorted or searched, by name
+    :param object tie_breaker: A unique, non-null column used to order rows with the same \
+        sort value (e.g., Course.course_id)
+    :param str sort: The name of the column to sort by; uses the first column if invalid
+    :param str direction: The direction to sort, 'asc' or 'desc'
+    :param str or None after: The cursor returned with the previous page
+    :param int start: The number of rows to skip if there is no valid cursor
+    :param int or None length: The maximum number of rows to return, or None to return \
+        every row that matches the filters, without a cursor
+    :param dict or None searches: Search terms for individual columns, by name
+    :param str search: A search term to match against any text column
+
+    :returns: The rows, the total number of rows, the number of rows that match the filters, \
+        and the cursor for the next page
+    :rtype: dict
+    """
+    # Validate inputs
+    validate_input('columns', columns, dict)
+    validate_input('sort', sort, str, allow_empty=True)
+    validate_input('direction', direction, str)
+    validate_input('after', after, Union[str, None], allow_empty=True)
+    validate_input('start', start, int)
+    validate_input('length', length, Union[int, None], allow_empty=True)
+    validate_input('searches', searches, Union[dict, None], allow_empty=True)
+    validate_input('search', search, str, allow_empty=True)
+
+    if sort not in columns:
+        sort = next(iter(columns))
+    _descending = direction.lower() == 'desc'
+    _length = None if length is None else min(max(length, 1), c.MAX_PAGE_SIZE)
+
+    # Build the WHERE clauses for the column and global searches
+    _filters = []
+    for _name, _term in (searches or {}).items():
+        if _name in columns and _term:
+            _filters.append(_contains(columns[_name], _term))
+    if search:
+        _filters.append(or_(*[_contains(_col, search) for _col in columns.values()]))
+
+    # Rows with the same sort value are ordered by the tie breaker,
+    # and NULLs are sorted as empty strings, so (value, id) always has a strict order
+    _sort_col = columns[sort]
+    _sort_expr = _sort_col if isinstance(_sort_col.type, Integer) else func.coalesce(_sort_col, '')
+
+    # Fingerprint the sort and filters, so a cursor is never reused for a different query
+    _fingerprint = hashlib.sha1(
+        json.dumps([sort, _descending, searches or {}, search], sort_keys=True).encode('utf-8')
+    ).hexdigest()[:12]
+
+    _filtered_stmt = stmt.where(*_filters) if _filters else stmt
+    _total, _filtered = _row_counts(stmt, _filtered_stmt if _filters else None, _fingerprint)
+
+    _page_stmt = _filtered_stmt.add_columns(_sort_expr.label('_sort_key'))
+
+    _cursor = _decode_cursor(after, int if isinstance(_sort_col.type, Integer) else str)
+    if _cursor is not None and _cursor['f'] == _fingerprint:
+        # Seek past the last row of the previous page
+        """
+        ... WHERE (sort_key > 'Database Security')
+            OR (sort_key = 'Database Security' AND courses.course_id > 7)
+        """
+        if _descending:
+            _keyset = or_(_sort_expr < _cursor['v'],
+                          and_(_sort_expr == _cursor['v'], tie_breaker < _cursor['i']))
+        else:
+            _keyset = or_(_sort_expr > _cursor['v'],
+                          and_(_sort_expr == _cursor['v'], tie_breaker > _cursor['i']))
+        _page_stmt = _page_stmt.where(_keyset)
+    elif start > 0:
+        # Fall back to OFFSET when jumping to an arbitrary page
+        _page_stmt = _page_stmt.offset(start)
+
+    if _descending:
+        _page_stmt = _page_stmt.order_by(_sort_expr.desc(), tie_breaker.desc())
+    else:
+        _page_stmt = _page_stmt.order_by(_sort_expr.asc(), tie_breaker.asc())
+
+    if _length is not None:
+        _page_stmt = _page_stmt.limit(_length)
+    _rows = db.session.execute(_page_stmt).all()
+
+    _next_cursor = None
+    if _length is not None and len(_rows) == _length:
+        _last = _rows[-1]
+        _next_cursor = _encode_cursor(
+            {'f': _fingerprint, 'v': _last._sort_key, 'i': getattr(_last, tie_breaker.key)}
+        )
+
+    return {'rows': _rows, 'total': _total, 'filtered': _filtered, 'cursor': _next_cursor}
+
+
+def parse_datatables_args(args: dict, columns: tuple) -> dict:
+    """Convert DataTables server-side processing parameters into `fetch_page()` options.
+
+    .. seealso:: https://datatables.net/manual/server-side
+
+    :param dict args: The query string parameters (e.g., `request.args`)
+    :param tuple columns: The names of the table columns, in the order they appear on the page
+
+    :returns: The draw counter and the keyword arguments for `fetch_page()`
+    :rtype: dict
+    """
+    _sort_index = _to_int(args.get('order[0][column]'), 0)
+    _sort = columns[_sort_index] if 0 <= _sort_index < len(columns) else columns[0]
+
+    _searches = {}
+    for _index, _name in enumerate(columns):
+        _term = str(args.get(f'columns[{_index}][search][value]', '')).strip()
+        if _term:
+            _searches[_name] = _term
+
+    _length = _to_int(args.get('length'), c.DEFAULT_PAGE_SIZE)
+
+    return {
+        'draw': _to_int(args.get('draw'), 0),
+        'sort': _sort,
+        'direction': 'desc' if args.get('order[0][dir]') == 'desc' else 'asc',
+        'after': args.get('after') or None,
+        'start': max(_to_int(args.get('start'), 0), 0),
+        # DataTables sends -1 for 'All'; never return more than one page
+        'length': c.MAX_PAGE_SIZE if _length < 1 else _length,
+        'searches': _searches,
+        'search': str(args.get('search[value]', '')).strip(),
+    }
+
+
+def parse_api_listing_args(args: dict, columns: tuple) -> dict:
+    """Convert API query string parameters into `fetch_page()` options.
+
+    Example: /api/courses/all?limit=50&sort=course_code&order=desc&course_group=CMSC&after=...
+
+    :param dict args: The query string parameters (e.g., `request.args`)
+    :param tuple columns: The names of the columns that can be sorted or searched
+
+    **NOTE** - If the client sends no limit, cursor, or offset, every matching row is returned,
+    as before the listing was paginated.
+
+    :returns: The keyword arguments for `fetch_page()`
+    :rtype: dict
+    """
+    _paged = any(args.get(_name) for _name in ('limit', 'after', 'offset'))
+
+    _searches = {}
+    for _name in columns:
+        _term = str(args.get(_name, '')).strip()
+        if _term:
+            _searches[_name] = _term
+
+    return {
+        'sort': args.get('sort', columns[0]),
+        'direction': 'desc' if args.get('order') == 'desc' else 'asc',
+        'after': args.get('after') or None,
+        'start': max(_to_int(args.get('offset'), 0), 0),
+        'length': _to_int(args.get('limit'), c.DEFAULT_PAGE_SIZE) if _paged else None,
+        'searches': _searches,
+        'search': str(args.get('q', '')).strip(),
+    }
+
+
+def _row_counts(stmt: Select, filtered_stmt: Union[Select, None], fingerprint: str) -> tuple:
+    """Count the rows of a listing and the rows that match its filters, using the cache if possible.
+
+    :param Select stmt: The unexecuted statement, without the filters
+    :param Select or None filtered_stmt: The statement with the filters, or None if unfiltered
+    :param str fingerprint: The fingerprint of the sort and filters
+
+    :returns: The total number of rows and the number of rows that match the filters
+    :rtype: tuple
+    """
+    # The statement's SQL, with its parameters, identifies the listing and the requester
+    _sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    _versions = get_table_versions(sorted({_table.name for _table in find_tables(stmt)}))
+    _key = (_sql, tuple(_version for _version, _ in _versions.values()))
+
+    _total = listing_counts.get(_key)
+    if _total is None:
+        """
+        SELECT COUNT(*) FROM (SELECT ... FROM courses ...);
+        """
+        _total = db.session.scalar(select(func.count()).select_from(stmt.subquery()))
+        listing_counts.set(_key, _total)
+
+    if filtered_stmt is None:
+        return _total, _total
+
+    _filtered_key = _key + (fingerprint,)
+    _filtered = listing_counts.get(_filtered_key)
+    if _filtered is None:
+        """
+        SELECT COUNT(*) FROM (SELECT ... FROM courses ... WHERE courses.course_group LIKE '%CMSC%');
+        """
+        _filtered = db.session.scalar(select(func.count()).select_from(filtered_stmt.subquery()))
+        listing_counts.set(_filtered_key, _filtered)
+
+    return _total, _filtered
+
+
+def _contains(column: object, term: str) -> object:
+    """Build a case-insensitive 'contains' clause, treating % and _ in the term as literals.
+
+    :param object column: The column to search
+    :param str term: The text to find
+
+    :returns: The SQL expression
+    :rtype: object
+    """
+    _escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    if isinstance(column.type, Integer):
+        column = cast(column, String)
+    return column.ilike(f'%{_escaped}%', escape='\\')
+
+
+def _encode_cursor(cursor: dict) -> str:
+    """Encode a keyset cursor as an opaque, URL-safe, signed string.
+
+    :param dict cursor: The fingerprint, last sort value, and last ID of a page
+
+    :returns: The encoded cursor and its signature, separated by a period
+    :rtype: str
+    """
+    _payload = base64.urlsafe_b64encode(
+        json.dumps(cursor, separators=(',', ':')).encode('utf-8')).decode('ascii')
+    return f'{_payload}.{_sign_cursor(_payload)}'
+
+
+def _decode_cursor(cursor: Union[str, None], value_type: type) -> Union[dict, None]:
+    """Decode a keyset cursor created by `_encode_cursor()`, and check its signature and values.
+
+    :param str or None cursor: The encoded cursor
+    :param type value_type: The type of the sort column's values, int or str
+
+    :returns: The cursor, or None if it is missing, malformed, forged, or for another column type
+    :rtype: dict or None
+    """
+    if not cursor:
+        return None
+    _payload, _, _signature = cursor.partition('.')
+    if not hmac.compare_digest(_signature, _sign_cursor(_payload)):
+        return None
+    try:
+        _decoded = json.loads(base64.urlsafe_b64decode(_payload.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if not isinstance(_decoded, dict) or not {'f', 'v', 'i'} <= _decoded.keys():
+        return None
+
+    # The values are bound into the keyset query, so only accept what `fetch_page()` writes
+    # (bool is a subclass of int, and integer columns can be NULL)
+    _value = _decoded['v']
+    _valid_value = (_value is None and value_type is int) or (
+        isinstance(_value, value_type) and not isinstance(_value, bool))
+    if not _valid_value or not isinstance(_decoded['i'], int) or isinstance(_decoded['i'], bool):
+        return None
+    return _decoded
+
+
+def _sign_cursor(payload: str) -> str:
+    """Sign an encoded cursor with the SECRET_KEY of the application.
+
+    :param str payload: The encoded cursor
+
+    :returns: The URL-safe signature
+    :rtype: str
+    """
+    _key = str(current_app.config['SECRET_KEY']).encode('utf-8')
+    _digest = hmac.new(_key, payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(_digest).decode('ascii').rstrip('=')
+
+
+def _to_int(value: object, default: int) -> int:
+    """Convert a query string value to an integer.
+
+    :param object value: The value to convert
+    :param int default: The value to use if the conversion fails
+
+    :returns: The converted value or the default
+    :rtype: int
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,345 @@
+"""Queue-based logging, so request threads never write to the log file themselves.
+
+Request threads put log records in a bounded queue and return immediately.
+A background thread takes the records off the queue in batches, writes each batch
+to the rotating log file, and flushes the file once per batch, instead of once per record.
+
+If the queue is full (e.g., the disk is slow), the overflow policy decides what happens:
+
+    - drop_new: Discard the new record (the default; never blocks the request thread)
+    - drop_oldest: Discard the oldest queued record to make room for the new record
+    - block: Wait up to LOG_QUEUE_BLOCK_TIMEOUT seconds for room, then discard the new record
+
+With ACCESS_LOG_FORMAT = 'json', JsonLinesFormatter writes each record as one JSON object
+per line. Access records carry their fields in `extra={'access': {...}}`, so they are
+encoded on the background thread, not on the request thread.
+
+Usage:
+- _file_handler.setFormatter(JsonLinesFormatter(server_ip='127.0.0.1'))
+- _pipeline = LogPipeline(_file_handler, max_size=10000)
+- app.logger.addHandler(_pipeline.handler)
+- _pipeline.start()
+- _pipeline.stats()
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import List, Union
+
+from tracker_99.app_utils import validate_input
+
+__all__ = [
+    'OVERFLOW_POLICIES',
+    'BatchedRotatingFileHandler',
+    'BoundedQueueHandler',
+    'JsonLinesFormatter',
+    'LogPipeline',
+]
+
+OVERFLOW_POLICIES = ('drop_new', 'drop_oldest', 'block')
+
+# Put in the queue by LogPipeline.stop() to tell the background thread to stop
+_SENTINEL = None
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """A rotating file handler that can write many records with a single flush."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Initialization. Takes the same arguments as RotatingFileHandler."""
+        self._batching = False
+        super().__init__(*args, **kwargs)
+
+    def flush(self) -> None:
+        """Flush the stream, unless a batch is being written.
+
+        :returns: None
+        :rtype: None
+        """
+        if not self._batching:
+            super().flush()
+
+    def handle_batch(self, records: List[logging.LogRecord]) -> None:
+        """Write a batch of records, then flush the stream once.
+
+        :param List[logging.LogRecord] records: The records to write
+
+        :returns: None
+        :rtype: None
+        """
+        self._batching = True
+        try:
+            for _record in records:
+                self.handle(_record)
+        finally:
+            self._batching = False
+            self.flush()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line.
+
+    Access records (logged with `extra={'access': {...}}`) include the access fields,
+    like path, status, and timing. Other records include the message.
+    """
+
+    def __init__(self, server_ip: str = '') -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param str server_ip: The IP address of the server, defaults to ''
+        """
+        # Validate inputs
+        validate_input('server_ip', server_ip, str, allow_empty=True)
+
+        super().__init__()
+        self.server_ip = server_ip
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a record as a JSON object.
+
+        :param logging.LogRecord record: The record to format
+
+        :returns: The record as a single line of JSON
+        :rtype: str
+        """
+        _entry = {
+            'ts': self.formatTime(record),
+            'server_ip': self.server_ip,
+            'pid': record.process,
+            'level': record.levelname,
+        }
+        _access = getattr(record, 'access', None)
+        if isinstance(_access, dict):
+            _entry['type'] = 'access'
+            _entry.update(_access)
+        else:
+            _entry['type'] = 'event'
+            _entry['message'] = record.getMessage()
+            if record.exc_info:
+                _entry['exc_info'] = self.formatException(record.exc_info)
+        # Paths and messages may contain any character, so never fail on encoding
+        return json.dumps(_entry, default=str, separators=(',', ':'))
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Puts records in a bounded queue without blocking, and counts queued and dropped records."""
+
+    def __init__(self, log_queue: queue.Queue, policy: str = 'drop_new',
+                 block_timeout: float = 0.05) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param queue.Queue log_queue: The bounded queue
+        :param str policy: What to do when the queue is full (see OVERFLOW_POLICIES)
+        :param float block_timeout: The number of seconds to wait for room with the 'block' policy
+        """
+        # Validate inputs
+        validate_input('log_queue', log_queue, queue.Queue)
+        validate_input('policy', policy, str)
+        validate_input('block_timeout', block_timeout, (int, float), allow_empty=True)
+
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Invalid overflow policy. Use one of {OVERFLOW_POLICIES}.')
+
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = float(block_timeout)
+        self.queued = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._count_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record in the queue, applying the overflow policy if the queue is full.
+
+        :param logging.LogRecord record: The prepared record
+
+        :returns: None
+        :rtype: None
+        """
+        _dropped = 0
+        _queued = True
+        try:
+            if self.policy == 'block':
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            _queued = False
+            if self.policy == 'drop_oldest':
+                # Make room by discarding the oldest record, then try once more
+                _keep_sentinel = False
+                try:
+                    if self.queue.get_nowait() is _SENTINEL:
+                        _keep_sentinel = True
+                    else:
+                        _dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    # Never discard the stop sentinel; put it back and drop the new record instead
+                    self.queue.put_nowait(_SENTINEL if _keep_sentinel else record)
+                    _queued = not _keep_sentinel
+                except queue.Full:
+                    pass
+            if not _queued:
+                _dropped += 1
+
+        with self._count_lock:
+            self.dropped += _dropped
+            if _queued:
+                self.queued += 1
+                self.max_depth = max(self.max_depth, self.queue.qsize())
+
+
+class LogPipeline:
+    """A bounded queue, the handler that fills it, and the thread that drains it in batches."""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, target: BatchedRotatingFileHandler, max_size: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 0.5,
+                 policy: str = 'drop_new', block_timeout: float = 0.05) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param BatchedRotatingFileHandler target: The handler that writes to the log file
+        :param int max_size: The maximum number of records waiting to be written
+        :param int batch_size: The maximum number of records written per flush
+        :param float flush_interval: The maximum number of seconds a record waits for a batch
+        :param str policy: What to do when the queue is full (see OVERFLOW_POLICIES)
+        :param float block_timeout: The number of seconds to wait for room with the 'block' policy
+        """
+        # Validate inputs
+        validate_input('target', target, logging.Handler)
+        validate_input('max_size', max_size, int)
+        validate_input('batch_size', batch_size, int)
+        validate_input('flush_interval', flush_interval, (int, float))
+
+        if max_size < 1 or batch_size < 1 or flush_interval <= 0:
+            raise ValueError('max_size, batch_size, and flush_interval must be greater than 0.')
+
+        self.target = target
+        self.batch_size = batch_size
+        self.flush_interval = float(flush_interval)
+        self.queue = queue.Queue(maxsize=max_size)
+        self.handler = BoundedQueueHandler(self.queue, policy=policy, block_timeout=block_timeout)
+        self.written = 0
+        self.batches = 0
+        self._thread = None
+        # Set by stop(), so the thread stops once the queue is empty even without the sentinel
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        """Start the background thread that writes the records.
+
+        :returns: None
+        :rtype: None
+        """
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='log-pipeline', daemon=True)
+        self._thread.start()
+        # Write the remaining records when the process exits
+        atexit.register(self.stop)
+
+    def stop(self, timeout: Union[float, None] = 5.0) -> None:
+        """Write the remaining records and stop the background thread.
+
+        If the thread cannot write the remaining records in time (e.g., the disk is stuck),
+        this returns anyway, so the process can exit; the records left in the queue are lost.
+
+        :param float or None timeout: The maximum number of seconds to wait in all, \
+            or None to wait until every record is written, defaults to 5.0
+
+        :returns: None
+        :rtype: None
+        """
+        if self._thread is None:
+            return
+        _deadline = None if timeout is None else time.monotonic() + timeout
+        self._stopping.set()
+        try:
+            # Wait for room for the sentinel, even if the queue is full, but not forever
+            self.queue.put(_SENTINEL, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(None if _deadline is None else max(_deadline - time.monotonic(), 0))
+        self._thread = None
+
+    def stats(self) -> dict:
+        """Get the pipeline counters.
+
+        :returns: The number of queued, dropped, and written records, the number of batches, \
+            and the current and maximum queue depths
+        :rtype: dict
+        """
+        return {
+            'policy': self.handler.policy,
+            'queued': self.handler.queued,
+            'dropped': self.handler.dropped,
+            'written': self.written,
+            'batches': self.batches,
+            'depth': self.queue.qsize(),
+            'max_depth': self.handler.max_depth,
+            'max_size': self.queue.maxsize,
+        }
+
+    def _run(self) -> None:
+        """Take records off the queue in batches and write them until stopped.
+
+        :returns: None
+        :rtype: None
+        """
+        while True:
+            # Wait for the first record, then take whatever else is already waiting
+            try:
+                _batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            while len(_batch) < self.batch_size:
+                try:
+                    _batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            _stop = _SENTINEL in _batch
+            _records = [_record for _record in _batch if _record is not _SENTINEL]
+
+            if _records:
+                self._write(_records)
+
+            if _stop:
+                # Write anything queued after the sentinel before leaving
+                _rest = []
+                while True:
+                    try:
+                        _rest.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                _rest = [_record for _record in _rest if _record is not _SENTINEL]
+                if _rest:
+                    self._write(_rest)
+                return
+
+    def _write(self, records: List[logging.LogRecord]) -> None:
+        """Write a batch of records to the target handler.
+
+        :param List[logging.LogRecord] records: The records to write
+
+        :returns: None
+        :rtype: None
+        """
+        if isinstance(self.target, BatchedRotatingFileHandler):
+            self.target.handle_batch(records)
+        else:
+            for _record in records:
+                self.target.handle(_record)
+        self.written += len(records)
+        self.batches += 1
@@ -0,0 +1,330 @@
+"""Aggregate the log files in `tracker_logs/` into traffic and latency reports.
+
+Reads every log file, including rotated files (e.g., `tracker_99_123.log.1`), one line
+at a time, so memory use depends on the number of endpoints and requesters,
+not on the size of the logs. Both formats written by `start_log_file` are supported:
+
+    - CSV (ACCESS_LOG_FORMAT = 'csv'): Counts, status codes, and requesters by path
+    - JSON lines (ACCESS_LOG_FORMAT = 'json'): Also endpoints and latency percentiles
+
+Latencies are counted in logarithmic buckets that are 5% wide, instead of being kept
+in a list, so the percentiles are within 5% of the exact values.
+
+Usage:
+- _report = build_report('tracker_logs')
+- _report.to_dict(top=10)
+"""
+
+import glob
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Union
+
+from tracker_99.app_utils import validate_input
+
+__all__ = ['LatencyHistogram', 'LogReport', 'build_report', 'find_log_files', 'parse_log_file']
+
+# "2024-07-09 22:08:25,132", "192.168.56.1", "9132", "INFO", "<message>"
+_CSV_LINE = re.compile(r'^"[^"]*", "[^"]*", "[^"]*", "([A-Z]+)", "(.*)"$')
+# /courses requested by 127.0.0.1 (USER:1) using GET; 200 OK.
+_CSV_ACCESS = re.compile(r'^(.*) requested by (.*) \((.*)\) using ([A-Z]+); (\d{3})')
+
+# Only access records contain this, so the other records are never decoded
+_JSON_ACCESS_MARKER = '"type":"access"'
+
+_READ_BUFFER = 1024 * 1024
+
+
+class LatencyHistogram:
+    """Counts latencies in logarithmic buckets, to estimate percentiles in constant memory."""
+
+    GROWTH = 1.05
+
+    def __init__(self) -> None:
+        """Initialization."""
+        self.buckets = Counter()
+        self.count = 0
+
+    @classmethod
+    def bucket(cls, value_ms: float) -> int:
+        """Get the bucket for a latency.
+
+        :param float value_ms: The latency in milliseconds
+
+        :returns: The index of the bucket
+        :rtype: int
+        """
+        # Latencies under 1 microsecond share the first bucket
+        return math.ceil(math.log(max(value_ms, 0.001), cls.GROWTH))
+
+    def add(self, value_ms: float, count: int = 1) -> None:
+        """Count a latency.
+
+        :param float value_ms: The latency in milliseconds
+        :param int count: The number of requests with the latency, defaults to 1
+
+        :returns: None
+        :rtype: None
+        """
+        self.add_bucket(self.bucket(value_ms), count)
+
+    def add_bucket(self, index: int, count: int = 1) -> None:
+        """Count latencies that are already assigned to a bucket.
+
+        :param int index: The index of the bucket
+        :param int count: The number of latencies, defaults to 1
+
+        :returns: None
+        :rtype: None
+        """
+        self.buckets[index] += count
+        self.count += count
+
+    def percentile(self, percent: float) -> Union[float, None]:
+        """Estimate a percentile from the bucket counts.
+
+        :param float percent: The percentile, between 0 and 100
+
+        :returns: The upper bound of the bucket that holds the percentile in milliseconds, \
+            or None if there are no latencies
+        :rtype: float or None
+        """
+        if not self.count:
+            return None
+        _rank = math.ceil(self.count * percent / 100) or 1
+        _seen = 0
+        for _index in sorted(self.buckets):
+            _seen += self.buckets[_index]
+            if _seen >= _rank:
+                return round(self.GROWTH ** _index, 3)
+        return None
+
+
+class LogReport:
+    """Request counts, status codes, requesters, and latencies, by endpoint.
+
+    Each request increments a single counter, keyed by its endpoint, status code,
+    requester, and latency bucket. Most requests share a key, so counting is one dictionary
+    update per line, and the totals are only computed once, by `to_dict()`.
+    """
+
+    def __init__(self) -> None:
+        """Initialization."""
+        self.files = 0
+        self.lines = 0
+        self.tally = Counter()
+
+    def add_request(self, endpoint: str, status: int, requester: Union[str, None],
+                    wall_ms: Union[float, None] = None) -> None:
+        """Count a request.
+
+        :param str endpoint: The endpoint, or the path if the endpoint is not logged
+        :param int status: The HTTP status code
+        :param str or None requester: The requester, or None if anonymous
+        :param float or None wall_ms: The time to handle the request in milliseconds, \
+            defaults to None
+
+        :returns: None
+        :rtype: None
+        """
+        _bucket = None if wall_ms is None else LatencyHistogram.bucket(wall_ms)
+        self.tally[(endpoint, status, requester, _bucket)] += 1
+
+    def merge(self, other: 'LogReport') -> None:
+        """Add the counts from another report (e.g., from another file).
+
+        :param LogReport other: The other report
+
+        :returns: None
+        :rtype: None
+        """
+        self.files += other.files
+        self.lines += other.lines
+        self.tally.update(other.tally)
+
+    def to_dict(self, top: int = 10) -> dict:
+        """Get the report.
+
+        :param int top: The number of top requesters to include, defaults to 10
+
+        :returns: The totals, and the counts, status codes, and latency percentiles by endpoint
+        :rtype: dict
+        """
+        _counts = Counter()
+        _statuses = defaultdict(Counter)
+        _requesters = Counter()
+        _latencies = defaultdict(LatencyHistogram)
+
+        for (_endpoint, _status, _requester, _bucket), _count in self.tally.items():
+            _counts[_endpoint] += _count
+            _statuses[_endpoint][_status] += _count
+            _requesters[_requester or 'ANON'] += _count
+            if _bucket is not None:
+                _latencies[_endpoint].add_bucket(_bucket, _count)
+
+        _endpoints = []
+        for _endpoint, _count in _counts.most_common():
+            _entry = {
+                'endpoint': _endpoint,
+                'requests': _count,
+                'statuses': dict(sorted(_statuses[_endpoint].items())),
+            }
+            if _endpoint in _latencies:
+                _histogram = _latencies[_endpoint]
+                _entry.update({
+                    'p50_ms': _histogram.percentile(50),
+                    'p95_ms': _histogram.percentile(95),
+                    'p99_ms': _histogram.percentile(99),
+                })
+            _endpoints.append(_entry)
+
+        return {
+            'files': self.files,
+            'lines': self.lines,
+            'requests': sum(_counts.values()),
+            'endpoints': _endpoints,
+            'top_requesters': _requesters.most_common(top),
+        }
+
+
+def find_log_files(log_dir: str) -> List[str]:
+    """Find the current and rotated log files.
+
+    :param str log_dir: The directory that holds the log files
+
+    :returns: The paths of the log files
+    :rtype: List[str]
+    """
+    # Validate inputs
+    validate_input('log_dir', log_dir, str)
+
+    _paths = set()
+    for _pattern in ('*.log', '*.log.*', '*.jsonl', '*.jsonl.*'):
+        _paths.update(glob.glob(os.path.join(log_dir, _pattern)))
+    return sorted(_paths)
+
+
+def parse_log_file(path: str) -> LogReport:
+    """Count the access records in a log file, one line at a time.
+
+    :param str path: The path of the log file
+
+    :returns: The counts for the file
+    :rtype: LogReport
+    """
+    # Validate inputs
+    validate_input('path', path, str)
+
+    _report = LogReport()
+    _report.files = 1
+
+    # This loop runs once per line, so look up names once, outside the loop
+    _tally = _report.tally
+    _loads = json.loads
+    _bucket = LatencyHistogram.bucket
+    _lines = 0
+
+    with open(path, 'r', encoding='utf-8', errors='replace', buffering=_READ_BUFFER) as _file:
+        for _line in _file:
+            _lines += 1
+            if _line[0] != '{':
+                _parse_csv_line(_report, _line.rstrip('\n'))
+                continue
+            # Skip event records without decoding them
+            if _JSON_ACCESS_MARKER not in _line:
+                continue
+            try:
+                _entry = _loads(_line)
+            except ValueError:
+                continue
+            # Skip records that were not written by the access log (e.g., a damaged line),
+            # instead of failing the whole report
+            if not isinstance(_entry, dict):
+                continue
+            _endpoint = _entry.get('endpoint') or '(no endpoint)'
+            _status = _entry.get('status')
+            _requester = _entry.get('requester')
+            _wall_ms = _entry.get('wall_ms')
+            if (not isinstance(_endpoint, str) or not _is_number(_status, int)
+                    or not _is_number(_wall_ms, (int, float))):
+                continue
+            _tally[(
+                _endpoint,
+                _status,
+                None if _requester is None else f'USER:{_requester}',
+                None if _wall_ms is None else _bucket(_wall_ms),
+            )] += 1
+
+    _report.lines = _lines
+    return _report
+
+
+def build_report(log_dir: str, workers: int = 1) -> LogReport:
+    """Count the access records in every log file in a directory.
+
+    :param str log_dir: The directory that holds the log files
+    :param int workers: The number of processes that read files at the same time, defaults to 1
+
+    :returns: The counts for all the files
+    :rtype: LogReport
+    """
+    # Validate inputs
+    validate_input('log_dir', log_dir, str)
+    validate_input('workers', workers, int)
+
+    _paths = find_log_files(log_dir)
+    _report = LogReport()
+
+    _reports: Iterable[LogReport]
+    if workers > 1 and len(_paths) > 1:
+        # Each rotated file is independent, so files are read in parallel and merged
+        with ProcessPoolExecutor(max_workers=workers) as _executor:
+            _reports = list(_executor.map(parse_log_file, _paths))
+    else:
+        _reports = map(parse_log_file, _paths)
+
+    for _file_report in _reports:
+        _report.merge(_file_report)
+    return _report
+
+
+def _parse_csv_line(report: LogReport, line: str) -> None:
+    """Count a CSV access record.
+
+    :param LogReport report: The report to update
+    :param str line: The line from the log file
+
+    :returns: None
+    :rtype: None
+    """
+    # Only access records contain ' requested by ', so skip the rest without a regex
+    if ' requested by ' not in line:
+        return
+    _match = _CSV_LINE.match(line)
+    if not _match:
+        return
+    _access = _CSV_ACCESS.match(_match.group(2))
+    if not _access:
+        return
+    _requester = _access.group(3)
+    # Older logs recorded anonymous requesters as 'USER:None'
+    if _requester in ('ANON', 'USER:None'):
+        _requester = None
+    report.add_request(_access.group(1), int(_access.group(5)), _requester)
+
+
+def _is_number(value: object, types: Union[type, tuple]) -> bool:
+    """Check that a field of a JSON access record is a number of the expected type, or missing.
+
+    :param object value: The value of the field
+    :param type or tuple types: The expected types, e.g., (int, float)
+
+    :returns: True if the value is None, or of the types and not a bool
+    :rtype: bool
+    """
+    # bool is a subclass of int, so reject it explicitly
+    return value is None or (isinstance(value, types) and not isinstance(value, bool))
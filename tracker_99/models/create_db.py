@@ -1,9 +1,140 @@
 """Creates the Tracker database.
 """
 
+from sqlalchemy import MetaData, Table, inspect, text
+from sqlalchemy.schema import CreateTable
+
 from tracker_99.models import db
 from tracker_99.models.models import Course, Member, Role, Association
 
+
+def upgrade_db():
+    """Function to add the tables, columns, and indexes that an existing database is missing.
+
+    The repository does not ship migrations, so this runs at startup, and only adds
+    what does not exist yet; it never changes or drops existing columns, and only rebuilds
+    the members table, with its rows, to stop reusing the IDs of deleted members.
+    """
+    # Create the missing tables, with their indexes
+    db.create_all()
+
+    _member_columns = {_column['name'] for _column in inspect(db.engine).get_columns('members')}
+
+    # Tokens carry the version of their member, so add it before anyone logs in (token_claims.py)
+    if 'token_version' not in _member_columns:
+        with db.engine.begin() as _conn:
+            _conn.execute(text(
+                'ALTER TABLE members ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0'))
+
+    # Add and backfill the lowercase member names before their unique index is created
+    if 'member_name_lower' not in _member_columns:
+        with db.engine.begin() as _conn:
+            _conn.execute(text(
+                "ALTER TABLE members ADD COLUMN member_name_lower VARCHAR(64) NOT NULL DEFAULT ''"))
+            _conn.execute(text('UPDATE members SET member_name_lower = LOWER(member_name)'))
+
+    # Tokens name their member by ID, so a new member must never get a deleted member's ID
+    _add_autoincrement(Member.__table__)
+
+    # Names that only differ in case cannot share the unique index of the lowercase names
+    _check_member_names()
+
+    # create_all() skips existing tables, so create their new indexes separately
+    for _table in db.metadata.sorted_tables:
+        for _index in _table.indexes:
+            _index.create(db.engine, checkfirst=True)
+
+
+def _check_member_names() -> None:
+    """Stop the upgrade if members have names that only differ in case,
+    before the unique index of the lowercase names is created.
+
+    The logins match names without case, so an administrator must rename these members;
+    otherwise, creating the index fails without saying which names conflict.
+
+    :raises RuntimeError: If the lowercase names are not unique, with the conflicting names
+    """
+    _indexes = {_index['name'] for _index in inspect(db.engine).get_indexes('members')}
+    if 'ix_members_member_name_lower' in _indexes:
+        return
+
+    """
+    SELECT member_name FROM members WHERE member_name_lower IN (
+        SELECT member_name_lower FROM members
+        GROUP BY member_name_lower HAVING COUNT(*) > 1)
+    ORDER BY member_name_lower, member_id;
+    """
+    with db.engine.connect() as _conn:
+        _names = _conn.scalars(text(
+            'SELECT member_name FROM members WHERE member_name_lower IN ('
+            'SELECT member_name_lower FROM members '
+            'GROUP BY member_name_lower HAVING COUNT(*) > 1) '
+            'ORDER BY member_name_lower, member_id')).all()
+    if _names:
+        raise RuntimeError(
+            'Cannot add the unique index of the lowercase member names, since these members '
+            f'have names that only differ in case: {", ".join(_names)}. '
+            'Rename them, then start the application again.')
+
+
+def _add_autoincrement(table: Table) -> None:
+    """Rebuild a table whose integer primary key reuses the IDs of deleted rows,
+    so that new rows always get a higher ID than any row before them.
+
+    SQLite cannot add AUTOINCREMENT to an existing table, so the rows are copied
+    into a new table, which replaces the old one
+    (see https://www.sqlite.org/lang_altertable.html#otheralter).
+    Foreign keys are not enforced during the copy, so the rows that reference the table
+    (e.g., associations) are kept, and are checked before the rebuild commits.
+
+    **NOTE** - The indexes of the table are dropped with the old table;
+    `upgrade_db()` creates them again.
+
+    :param Table table: The table, whose model sets sqlite_autoincrement
+    """
+    _new_name = f'{table.name}_new'
+    _columns = ', '.join(_column.name for _column in table.columns)
+
+    with db.engine.connect() as _conn:
+        _table_sql = _conn.scalar(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': table.name})
+        if _table_sql is None or 'AUTOINCREMENT' in _table_sql.upper():
+            _conn.rollback()
+            return
+
+        # The foreign_keys pragma cannot be changed within a transaction
+        _foreign_keys = _conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        _conn.exec_driver_sql('PRAGMA foreign_keys = OFF')
+        try:
+            _conn.exec_driver_sql('BEGIN')
+            """
+            CREATE TABLE members_new (member_id INTEGER NOT NULL, ...,
+                PRIMARY KEY (member_id AUTOINCREMENT), UNIQUE (member_email));
+            INSERT INTO members_new (member_id, ...) SELECT member_id, ... FROM members;
+            DROP TABLE members;
+            ALTER TABLE members_new RENAME TO members;
+            """
+            _new_table = table.to_metadata(MetaData(), name=_new_name)
+            _conn.execute(CreateTable(_new_table))
+            _conn.exec_driver_sql(
+                f'INSERT INTO {_new_name} ({_columns}) SELECT {_columns} FROM {table.name}')
+            _conn.exec_driver_sql(f'DROP TABLE {table.name}')
+            _conn.exec_driver_sql(f'ALTER TABLE {_new_name} RENAME TO {table.name}')
+
+            _violations = _conn.exec_driver_sql('PRAGMA foreign_key_check').all()
+            if _violations:
+                raise RuntimeError(
+                    f'Rebuilding {table.name} would break foreign keys: {_violations}')
+            _conn.commit()
+        except Exception:
+            _conn.rollback()
+            raise
+        finally:
+            if _foreign_keys:
+                _conn.exec_driver_sql('PRAGMA foreign_keys = ON')
+
+
 def create_db():
     """Function to initialize the database (create tables and insert data)"""
     # Create tables if they don't exist
@@ -1,20 +1,18 @@
 """Classes for the database models using SQLAlchemy ORM Declarative Mapping.
 """
 
-import os
 import re
 from typing import List, Union, Optional
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from flask_login import UserMixin
-from sqlalchemy import String, UniqueConstraint, ForeignKey, LargeBinary
+from sqlalchemy import String, UniqueConstraint, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from tracker_99 import login_manager, constants as c
 from tracker_99.app_utils import validate_input
+from tracker_99.key_manager import key_manager
 from tracker_99.models import db
+from tracker_99.password_service import password_service
 
 CASCADE_ARG = 'all, delete-orphan'
 
@@ -23,14 +21,27 @@ class Member(UserMixin, db.Model):
     """Member database model"""
 
     __tablename__ = 'members'
+    # Member names are unique regardless of case, and logins look them up by this index
+    # IDs are never reused (AUTOINCREMENT), so the tokens of a deleted member never match
+    # a new member, whose token version starts at 0 again
+    __table_args__ = (
+        Index('ix_members_member_name_lower', 'member_name_lower', unique=True),
+        {'sqlite_autoincrement': True},
+    )
 
     member_id: Mapped[int] = mapped_column(primary_key=True)
     # Using RFC 5321, 5322, and 3696 for member name and email lengths
     member_name: Mapped[str] = mapped_column(String(64), nullable=False)
+    # The lowercase member name, set with member_name (see `validate_member_name()`),
+    # so case-insensitive lookups use the index instead of LOWER(member_name) or ILIKE
+    member_name_lower: Mapped[str] = mapped_column(String(64), nullable=False)
     member_email: Mapped[str] = mapped_column(String(320), nullable=False, unique=True)
     member_group: Mapped[Optional[str]] = mapped_column(String(256))
     password_hash: Mapped[str] = mapped_column(String(128), nullable=False)
     is_admin: Mapped[bool] = mapped_column(nullable=False)
+    # Incremented when the member's privileges or credentials change,
+    # so API tokens issued with the previous version are no longer trusted
+    token_version: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
 
     associations: Mapped[List['Association']] = relationship(
         'Association', back_populates='member', cascade=CASCADE_ARG
@@ -84,6 +95,35 @@ class Member(UserMixin, db.Model):
 
         self.is_admin = is_admin
 
+    @validates('member_name')
+    def validate_member_name(self, _, value: str) -> str:
+        """Keep the lowercase member name in sync with the member name.
+
+        :param str _: The key, i.e., member_name. Not used
+        :param str value: The new member name
+
+        :return: The value, unchanged
+        :rtype: str
+        """
+        self.member_name_lower = self.normalize_name(value)
+        return value
+
+    @staticmethod
+    def normalize_name(member_name: str) -> str:
+        """Get the form of a member name used to look up members, regardless of case.
+
+        Usage: select(Member).where(Member.member_name_lower == Member.normalize_name(_name))
+
+        :param str member_name: The member name
+
+        :returns: The lowercase member name
+        :rtype: str
+        """
+        # Validate inputs
+        validate_input('member_name', member_name, str)
+
+        return member_name.lower()
+
     def get_id(self) -> int:
         """Overrides UserMixin get_id, so you can use member_id instead of id.
 
@@ -93,10 +133,12 @@ class Member(UserMixin, db.Model):
         return self.member_id
 
     def set_password(self, password: str) -> None:
-        """Hashes a password using scrypt
+        """Hashes a password using scrypt, in the password service's worker processes
 
         :param str password: A password in plain text
 
+        :raises PasswordServiceBusy: If the password service is full
+
         :returns: None
         :rtype: None
         """
@@ -104,7 +146,7 @@ class Member(UserMixin, db.Model):
         validate_input('password', password, str)
         self.validate_password(password)
 
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_service.hash_password(password)
 
     @staticmethod
     def validate_password(password: str) -> None:
@@ -125,17 +167,42 @@ class Member(UserMixin, db.Model):
             raise ValueError('Invalid password.')
 
     def verify_password(self, password_to_verify: str) -> bool:
-        """Converts input to a hash and compares it against an existing hash
+        """Converts input to a hash and compares it against an existing hash,
+        in the password service's worker processes
 
         :param str password_to_verify: A provided password in plain text
 
+        :raises PasswordServiceBusy: If the password service is full
+
         :returns: True if the password hashes match
         :rtype: bool
         """
         # Validate inputs
         validate_input('password_to_verify', password_to_verify, str)
 
-        return check_password_hash(self.password_hash, password_to_verify)
+        return password_service.verify_password(self.password_hash, password_to_verify)
+
+    def rehash_password(self, verified_password: str) -> bool:
+        """Hash the password again if its hash does not use PASSWORD_HASH_METHOD,
+        so existing hashes move to a new method as members log in.
+
+        **NOTE** - Call after `verify_password()` succeeds, and commit the change.
+        The password itself does not change, so API tokens stay valid.
+
+        :param str verified_password: The password in plain text, already verified
+
+        :raises PasswordServiceBusy: If the password service is full
+
+        :returns: True if the hash was replaced
+        :rtype: bool
+        """
+        # Validate inputs
+        validate_input('verified_password', verified_password, str)
+
+        if not password_service.needs_rehash(self.password_hash):
+            return False
+        self.password_hash = password_service.hash_password(verified_password)
+        return True
 
     def to_dict(self) -> dict:
         """Return the object as a dictionary for conversion to JSON
@@ -243,34 +310,15 @@ class Course(db.Model):
         """
         validate_input('plain_text', plain_text_key, str)
 
-        # Get the 256-bit key (32 bytes) from the environment and convert it to a byte string
-        # The environment variable KEY_32 should contain a 32-byte (256-bit) key.
-        _env_key_32 = os.environ.get('KEY_32', 'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF')
-        _key = str.encode(_env_key_32, encoding='utf-8')
-        assert len(_key) == 32, "Key must be 32 bytes to use AES-256 encryption."
-
-        # Generate a random initialization vector (IV) / nonce
-        # GCM standard is 96 bits (12 bytes);
-        # longer IV's do not improve security and may hurt performance
-        _iv = os.urandom(12)
-
-        # Instantiate a cipher object that defines how encryption will be performed
-        _cipher = Cipher(algorithms.AES(_key), modes.GCM(_iv), backend=default_backend())
-
-        # Convert the plain text to a byte string and encrypt
-        _byte_str = str.encode(plain_text_key, encoding='utf-8')
-        _encryptor = _cipher.encryptor()
-        _ciphertext = _encryptor.update(_byte_str) + _encryptor.finalize()
-
-        # Combine the IV, cyphertext, and tag into an encrypted package
-        _encrypted_data = _iv + _ciphertext + _encryptor.tag
-
-        self.course_key = _encrypted_data
+        # The key manager reuses the validated key and cipher across calls
+        self.course_key = key_manager.encrypt(plain_text_key)
 
     @staticmethod
     def decrypt_text(encrypted_data: bytes) -> str:
         """Decrypt AES-GCM encrypted data.
 
+        **NOTE** - To decrypt many keys, like in exports, use `key_manager.decrypt_many()`.
+
         :param bytes encrypted_data: The initialization vector (IV) / nonce, ciphertext, \
             and tag to decrypt
 
@@ -279,32 +327,7 @@ class Course(db.Model):
         """
         validate_input('encrypted_data', encrypted_data, bytes)
 
-        # Get the 256-bit key (32 bytes) from the environment and convert it to a byte string
-        # The environment variable KEY_32 should contain a 32-byte (256-bit) key.
-        _env_key_32 = os.environ.get('KEY_32', 'ABCDEFGHIJKLMNOPQRSTUVWXYZABCDEF')
-        _key = str.encode(_env_key_32, encoding='utf-8')
-        assert len(_key) == 32, "Key must be 32 bytes to use AES-256 encryption."
-
-        # Extract the IV, tag, and ciphertext from the encrypted data
-        # The first 12 bytes are the IV
-        _iv = encrypted_data[:12]
-
-        # The last 16 bytes are the tag
-        _tag = encrypted_data[-16:]
-
-        # The remainder is the ciphertext
-        _ciphertext = encrypted_data[12:-16]
-
-        # Instantiate a cipher object that defines how decryption will be performed
-        _cipher = Cipher(algorithms.AES(_key), modes.GCM(_iv, _tag), backend=default_backend())
-
-        # Decrypt the ciphertext in the encrypted data
-        _decryptor = _cipher.decryptor()
-        _decrypted_text = (_decryptor.update(_ciphertext) + _decryptor.finalize()).decode(
-            encoding='utf-8'
-        )
-
-        return _decrypted_text
+        return key_manager.decrypt(encrypted_data)
 
     def to_dict(self):
         """Return the object as a dictionary for conversion to JSON
@@ -403,7 +426,14 @@ class Association(db.Model):
 
     # Members may only be assigned to a course once,
     # so they cannot have multiple roles in the course
-    __table_args__ = (UniqueConstraint('course_id', 'member_id', name='uq_course_member'),)
+    # The primary key and the unique constraint start with course_id, so add indexes
+    # for lookups by member (course listings, privileges, and deleting a member)
+    # and by role (deleting a role); both cover the columns those queries read
+    __table_args__ = (
+        UniqueConstraint('course_id', 'member_id', name='uq_course_member'),
+        Index('ix_associations_member_course', 'member_id', 'course_id', 'role_id'),
+        Index('ix_associations_role_member', 'role_id', 'member_id'),
+    )
 
     course: Mapped['Course'] = relationship(back_populates='associations')
     role: Mapped['Role'] = relationship(back_populates='associations')
@@ -416,3 +446,16 @@ class Association(db.Model):
         :rtype: dict
         """
         return {'course_id': self.course_id, 'role_id': self.role_id, 'member_id': self.member_id}
+
+
+class TableVersion(db.Model):
+    """Table version database model
+    Note: A row is incremented each time a transaction changes the table (see `table_versions.py`)
+    """
+
+    __tablename__ = 'table_versions'
+
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(nullable=False, default=0, server_default='0')
+    # Seconds since the epoch (UTC) of the last change, for the Last-Modified header
+    changed_at: Mapped[float] = mapped_column(nullable=False, default=0, server_default='0')
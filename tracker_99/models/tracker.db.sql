@@ -130,6 +130,8 @@ INSERT INTO associations (course_id, role_id, member_id) VALUES (16, 3, 5);
 INSERT INTO associations (course_id, role_id, member_id) VALUES (16, 2, 6);
 INSERT INTO associations (course_id, role_id, member_id) VALUES (16, 2, 7);
 INSERT INTO associations (course_id, role_id, member_id) VALUES (16, 2, 8);
+CREATE INDEX ix_associations_member_course ON associations (member_id, course_id, role_id);
+CREATE INDEX ix_associations_role_member ON associations (role_id, member_id);
 
 -- Table: courses
 DROP TABLE IF EXISTS courses;
@@ -163,31 +165,33 @@ INSERT INTO courses (course_id, course_name, course_code, course_group, course_k
 -- Table: members
 DROP TABLE IF EXISTS members;
 CREATE TABLE IF NOT EXISTS members (
-	member_id INTEGER NOT NULL,
+	member_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
 	member_name VARCHAR(64) NOT NULL,
+	member_name_lower VARCHAR(64) NOT NULL,
 	member_email VARCHAR(320) NOT NULL,
 	member_group VARCHAR(256),
 	password_hash VARCHAR(128) NOT NULL,
 	is_admin BOOLEAN NOT NULL,
-	PRIMARY KEY (member_id),
+	token_version INTEGER DEFAULT '0' NOT NULL,
 	UNIQUE (member_email)
 );
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (1, 'Admin', 'admin@tracker.com', 'admins', 'scrypt:32768:8:1$TPHjP3e5urHhQxCX$94fbf10ec7b7a5a8379210ba2136172423ee8869c38991a0e143cca065bc5da997d24f4537e059bbd53addf0bad11f90719a207d5198b9ac27229705c5d145ee', 1);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (2, 'Leto.Atreides', 'leto.atreides@atreides.com', 'atreides', 'scrypt:32768:8:1$k7SmljiwOWFdJDfT$fb24d0ff3da9f263c0be6e892f6968d851585f8c064cef38500db461c0db47a117e4680ec6c0cd46efc0daf148abee869af0dfdb4b94bce5ef5bfaf4c5add106', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (3, 'Paul.Atreides', 'paul.atreides@atreides.com', 'atreides, fremen', 'scrypt:32768:8:1$oTDu2i81wvOzSw1Y$f7b2f4ed6ad14178c1ec80f86a125e650bbdf50ae660c5de95e234d8c20e69baeed0a11a8fc2be61c8df5b079fa3c169b2d97f128c603bddf8d451f0911936ab', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (4, 'Jessica.Nerus', 'jessica.nerus@atreides.com', 'atreides, fremen', 'scrypt:32768:8:1$hyLkEQy1S04Gx0Kx$a5f878f20f76e0163ed387c199bd1a1c5f695cf266e4694a750c7ef75dfb3156b8687c23edb3c50da5492ad13d7c2c6f037d829d6fa35664fad5d6f4c1b100aa', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (5, 'Thufir.Hawat', 'thufir.hawat@atreides.com', 'atreides', 'scrypt:32768:8:1$kyPZ57noTtmXQRtX$3f2975d61c6652aab775412d98c588f46bfa59db4002f5655e75901ba7afcbfecc3527274a9b367af0ec3a221d886aa6a56c366aa812b6b2cfd7ccf455e2a802', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (6, 'Gurney.Halleck', 'gurney.halleck@atreides.com', 'atreides', 'scrypt:32768:8:1$fe7UK3fbqE7DS9aD$2a98e54d0ec8fac54f583dd78af01c99d91c19e6eb0545ed4152c1a75f4db3479954abd165b4ae005e13c7e86dd5d2913f72d5bd897dd3e095bf86845ec65155', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (7, 'Duncan.Idaho', 'duncan.idaho@atreides.com', 'atreides', 'scrypt:32768:8:1$adrPabnlzLVqFWEV$644b4b025aabb9ab1fa0928f3c31066e3b1ac204147e6ee1dfeee166cd21c604134b7653a5707750d0a657ad5c18ddf75db90773be9205583e620d42f17f6f44', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (8, 'Vladimir.Harkonnen', 'vladmir.harkonnen@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$Zh6Sn42OkhfUzMf1$4d0fc45c4e2ba8fd65bae775323bf608921d2d2d4664f9fe7e654216c7f01bb36b75f005e039b37bc1e19e4398eff6f404f2104cbefb4e3ef057fe98c1316536', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (9, 'Glossu.Rabban', 'glossu.rabban@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$OB057Capri5LauE4$61da5cf107dad37f12b0045b5660123a1d1b12fedb1fc652f2fdf744380882ec13f7492646ce92772f333fc5de950f6e5bc2e8e926f3dce843c097ae10811c57', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (10, 'Feyd-Rautha.Rabban', 'feyd-rautha.rabban@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$lV9z2p60IVxRooku$b88a6658b3f99e1d7ee5deb09cae899caf5f3442a83306f2aac3a89aad765bb0ea6bdf8f4b40efcaf35e726cfa167a49c6526ac8fa66443fa7574a3c0cf05e3f', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (11, 'Piter.DeVries', 'piter.devries@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$sSBdPOYcAHktRRPS$2a1ad11cde4118b79db7dcae9d1be8d75b2df928984b186b69b30678daffe66b29364ee0d7023c6453841e8ee57ad16c23f48fa16e2cbdff1b09dae28b329993', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (12, 'Shaddam.Corrino', 'shaddam.corrino@corrino.com', 'corrino', 'scrypt:32768:8:1$6R4beUdP7zxHdPEf$1ec95a4a5f14ee79136ab5c8e0253623b747cdd702f3d272fb69c99fecbe483617d89cd482ad66d1e7ab9e7cc50c70d986b4cc3ca75eb96222700910aa21253b', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (13, 'Irulan.Corrino', 'irulan.corrino@corrino.com', 'corrino', 'scrypt:32768:8:1$8iLiLzRBCanb7EAa$70582709e031870075d283605c9c3ca47e50f49752ed9bcfab75b25fbe0026947606d54a966fd472ad9aa7289f825f78c2046bbfd61ffb21c3fa075dbe5fc404', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (14, 'Liet.Kynes', 'liet.kynes@fremen.com', 'fremen', 'scrypt:32768:8:1$wWmc7bRFmeCtft8D$8f0d41704ed5cb8e8f70c0e84f9e0e063e3e6b31153d0a8feecf71ba80146735f4f2c4664785ddc114397d0a714457501736b6dc61adbfb1d9af26e57d337698', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (15, 'Chani.Kynes', 'chani.kynes@fremen.com', 'fremen, atreides', 'scrypt:32768:8:1$RSdXoW7hc2Z0esQ9$bd173195fbc0f94dae2b4577f23d821072fce25e8bb6a7341bc5f85409315659ecd3d009afda5ae51c5d302e106723006433a6d46d08833be2c683410fef303a', 0);
-INSERT INTO members (member_id, member_name, member_email, member_group, password_hash, is_admin) VALUES (16, 'Stilgar.Tabr', 'stilgar.tabr@fremen.com', 'fremen, atreides', 'scrypt:32768:8:1$oas3xnujvxqQUpqv$4f84b4b648c11d15629a8e987bd800fe76b074267e0a885addc7c6dcd693d1b41db3f28d1907a9ecdbcd3fd114930eacfaa32ec1ca68ec1cf2dcb8474a7d3d98', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (1, 'Admin', 'admin', 'admin@tracker.com', 'admins', 'scrypt:32768:8:1$TPHjP3e5urHhQxCX$94fbf10ec7b7a5a8379210ba2136172423ee8869c38991a0e143cca065bc5da997d24f4537e059bbd53addf0bad11f90719a207d5198b9ac27229705c5d145ee', 1);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (2, 'Leto.Atreides', 'leto.atreides', 'leto.atreides@atreides.com', 'atreides', 'scrypt:32768:8:1$k7SmljiwOWFdJDfT$fb24d0ff3da9f263c0be6e892f6968d851585f8c064cef38500db461c0db47a117e4680ec6c0cd46efc0daf148abee869af0dfdb4b94bce5ef5bfaf4c5add106', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (3, 'Paul.Atreides', 'paul.atreides', 'paul.atreides@atreides.com', 'atreides, fremen', 'scrypt:32768:8:1$oTDu2i81wvOzSw1Y$f7b2f4ed6ad14178c1ec80f86a125e650bbdf50ae660c5de95e234d8c20e69baeed0a11a8fc2be61c8df5b079fa3c169b2d97f128c603bddf8d451f0911936ab', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (4, 'Jessica.Nerus', 'jessica.nerus', 'jessica.nerus@atreides.com', 'atreides, fremen', 'scrypt:32768:8:1$hyLkEQy1S04Gx0Kx$a5f878f20f76e0163ed387c199bd1a1c5f695cf266e4694a750c7ef75dfb3156b8687c23edb3c50da5492ad13d7c2c6f037d829d6fa35664fad5d6f4c1b100aa', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (5, 'Thufir.Hawat', 'thufir.hawat', 'thufir.hawat@atreides.com', 'atreides', 'scrypt:32768:8:1$kyPZ57noTtmXQRtX$3f2975d61c6652aab775412d98c588f46bfa59db4002f5655e75901ba7afcbfecc3527274a9b367af0ec3a221d886aa6a56c366aa812b6b2cfd7ccf455e2a802', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (6, 'Gurney.Halleck', 'gurney.halleck', 'gurney.halleck@atreides.com', 'atreides', 'scrypt:32768:8:1$fe7UK3fbqE7DS9aD$2a98e54d0ec8fac54f583dd78af01c99d91c19e6eb0545ed4152c1a75f4db3479954abd165b4ae005e13c7e86dd5d2913f72d5bd897dd3e095bf86845ec65155', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (7, 'Duncan.Idaho', 'duncan.idaho', 'duncan.idaho@atreides.com', 'atreides', 'scrypt:32768:8:1$adrPabnlzLVqFWEV$644b4b025aabb9ab1fa0928f3c31066e3b1ac204147e6ee1dfeee166cd21c604134b7653a5707750d0a657ad5c18ddf75db90773be9205583e620d42f17f6f44', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (8, 'Vladimir.Harkonnen', 'vladimir.harkonnen', 'vladmir.harkonnen@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$Zh6Sn42OkhfUzMf1$4d0fc45c4e2ba8fd65bae775323bf608921d2d2d4664f9fe7e654216c7f01bb36b75f005e039b37bc1e19e4398eff6f404f2104cbefb4e3ef057fe98c1316536', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (9, 'Glossu.Rabban', 'glossu.rabban', 'glossu.rabban@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$OB057Capri5LauE4$61da5cf107dad37f12b0045b5660123a1d1b12fedb1fc652f2fdf744380882ec13f7492646ce92772f333fc5de950f6e5bc2e8e926f3dce843c097ae10811c57', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (10, 'Feyd-Rautha.Rabban', 'feyd-rautha.rabban', 'feyd-rautha.rabban@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$lV9z2p60IVxRooku$b88a6658b3f99e1d7ee5deb09cae899caf5f3442a83306f2aac3a89aad765bb0ea6bdf8f4b40efcaf35e726cfa167a49c6526ac8fa66443fa7574a3c0cf05e3f', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (11, 'Piter.DeVries', 'piter.devries', 'piter.devries@harkonnen.com', 'harkonnen', 'scrypt:32768:8:1$sSBdPOYcAHktRRPS$2a1ad11cde4118b79db7dcae9d1be8d75b2df928984b186b69b30678daffe66b29364ee0d7023c6453841e8ee57ad16c23f48fa16e2cbdff1b09dae28b329993', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (12, 'Shaddam.Corrino', 'shaddam.corrino', 'shaddam.corrino@corrino.com', 'corrino', 'scrypt:32768:8:1$6R4beUdP7zxHdPEf$1ec95a4a5f14ee79136ab5c8e0253623b747cdd702f3d272fb69c99fecbe483617d89cd482ad66d1e7ab9e7cc50c70d986b4cc3ca75eb96222700910aa21253b', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (13, 'Irulan.Corrino', 'irulan.corrino', 'irulan.corrino@corrino.com', 'corrino', 'scrypt:32768:8:1$8iLiLzRBCanb7EAa$70582709e031870075d283605c9c3ca47e50f49752ed9bcfab75b25fbe0026947606d54a966fd472ad9aa7289f825f78c2046bbfd61ffb21c3fa075dbe5fc404', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (14, 'Liet.Kynes', 'liet.kynes', 'liet.kynes@fremen.com', 'fremen', 'scrypt:32768:8:1$wWmc7bRFmeCtft8D$8f0d41704ed5cb8e8f70c0e84f9e0e063e3e6b31153d0a8feecf71ba80146735f4f2c4664785ddc114397d0a714457501736b6dc61adbfb1d9af26e57d337698', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (15, 'Chani.Kynes', 'chani.kynes', 'chani.kynes@fremen.com', 'fremen, atreides', 'scrypt:32768:8:1$RSdXoW7hc2Z0esQ9$bd173195fbc0f94dae2b4577f23d821072fce25e8bb6a7341bc5f85409315659ecd3d009afda5ae51c5d302e106723006433a6d46d08833be2c683410fef303a', 0);
+INSERT INTO members (member_id, member_name, member_name_lower, member_email, member_group, password_hash, is_admin) VALUES (16, 'Stilgar.Tabr', 'stilgar.tabr', 'stilgar.tabr@fremen.com', 'fremen, atreides', 'scrypt:32768:8:1$oas3xnujvxqQUpqv$4f84b4b648c11d15629a8e987bd800fe76b074267e0a885addc7c6dcd693d1b41db3f28d1907a9ecdbcd3fd114930eacfaa32ec1ca68ec1cf2dcb8474a7d3d98', 0);
+CREATE UNIQUE INDEX ix_members_member_name_lower ON members (member_name_lower);
 
 -- Table: roles
 DROP TABLE IF EXISTS roles;
@@ -204,5 +208,14 @@ INSERT INTO roles (role_id, role_name, role_privilege) VALUES (3, 'Associate', 1
 INSERT INTO roles (role_id, role_name, role_privilege) VALUES (4, 'Teacher', 20);
 INSERT INTO roles (role_id, role_name, role_privilege) VALUES (5, 'Chair', 30);
 
+-- Table: table_versions
+DROP TABLE IF EXISTS table_versions;
+CREATE TABLE IF NOT EXISTS table_versions (
+	table_name VARCHAR(64) NOT NULL,
+	version INTEGER DEFAULT '0' NOT NULL,
+	changed_at FLOAT DEFAULT '0' NOT NULL,
+	PRIMARY KEY (table_name)
+);
+
 COMMIT TRANSACTION;
 PRAGMA foreign_keys = on;
@@ -0,0 +1,476 @@
+"""Hashes and verifies member passwords in a bounded pool of worker processes.
+
+scrypt, werkzeug's default password method, is designed to take tens of milliseconds of CPU
+per hash, so a burst of logins (e.g., at the start of a term) running on the request threads
+starves every other request. The password service runs the hashes in PASSWORD_HASH_WORKERS
+processes instead, and the request thread waits for the result without holding the GIL.
+
+At most PASSWORD_HASH_MAX_PENDING hashes are admitted at a time (running or waiting for a worker).
+When the service is full, a request waits up to PASSWORD_HASH_QUEUE_TIMEOUT seconds for room,
+then fails fast with PasswordServiceBusy, which the login and member routes return as
+`503 Service Unavailable` with a `Retry-After: PASSWORD_HASH_RETRY_AFTER` header,
+instead of queueing more work than the workers can finish.
+
+The time spent hashing is added to the timing of the request (`hash_ms`, see instrumentation.py),
+and `stats()` reports the latency percentiles of the recent hashes and the number of rejections.
+
+New hashes use PASSWORD_HASH_METHOD (e.g., 'scrypt:32768:8:1' or 'pbkdf2:sha256:1000000').
+After a successful login, a stored hash made with another method is replaced with a new hash
+of the verified password (see `needs_rehash()` and `Member.rehash_password()`), so existing hashes
+move to a new method as members log in. Use `calibrate()`, or
+`flask --app tracker_99 passwords calibrate`, to find the costliest method that verifies
+within your login latency budget on this host.
+
+> **NOTE** - The workers are started the first time a password is hashed.
+Set PASSWORD_HASH_WORKERS = 1 to hash in the request thread, still with admission control.
+
+Usage:
+- password_service.init_app(app)
+- _hash = password_service.hash_password('Change.Me.123')
+- _hashes = password_service.hash_passwords(['Change.Me.123', 'Change.Me.321'])
+- _valid = password_service.verify_password(_member.password_hash, 'Change.Me.123')
+- _stale = password_service.needs_rehash(_member.password_hash)
+- _stats = password_service.stats()
+- _calibration = calibrate(SCRYPT_CANDIDATES, target_ms=250)
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Iterable, List, Union
+
+from flask import Flask, g, has_request_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from tracker_99.app_utils import validate_input
+
+__all__ = [
+    'PBKDF2_CANDIDATES',
+    'SCRYPT_CANDIDATES',
+    'PasswordService',
+    'PasswordServiceBusy',
+    'calibrate',
+    'normalize_hash_method',
+    'password_service',
+]
+
+# werkzeug's default method, scrypt with N = 2^15, r = 8, and p = 1
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+
+# Candidate methods for `calibrate()`, from the cheapest to the costliest;
+# each scrypt step doubles the time and memory (128 * N * r bytes) of a hash
+SCRYPT_CANDIDATES = tuple(f'scrypt:{2 ** _exponent}:8:1' for _exponent in range(14, 18))
+PBKDF2_CANDIDATES = tuple(f'pbkdf2:sha256:{_iterations}'
+                          for _iterations in (250000, 500000, 1000000, 2000000))
+
+# The number of recent hashes used for the latency percentiles
+_LATENCY_WINDOW = 1024
+
+# The password hashed and verified by `calibrate()`
+_CALIBRATION_PASSWORD = 'Calibrate.Me.123'
+
+
+def normalize_hash_method(method: str) -> str:
+    """Get the full form of a password hash method, as werkzeug writes it at the start of a hash.
+
+    For example, 'scrypt' becomes 'scrypt:32768:8:1', and 'pbkdf2' becomes 'pbkdf2:sha256:1000000'.
+
+    :param str method: The method, with or without its parameters
+
+    :raises ValueError: If the method or its parameters are not supported
+
+    :returns: The method with all of its parameters
+    :rtype: str
+    """
+    # Validate inputs
+    validate_input('method', method, str)
+
+    _name, *_args = method.split(':')
+    try:
+        if _name == 'scrypt' and len(_args) in (0, 3):
+            _n, _r, _p = map(int, _args) if _args else map(int, DEFAULT_HASH_METHOD.split(':')[1:])
+            # N must be a power of 2 greater than 1
+            if _n > 1 and _n & (_n - 1) == 0 and _r > 0 and _p > 0:
+                return f'scrypt:{_n}:{_r}:{_p}'
+        elif _name == 'pbkdf2' and len(_args) <= 2:
+            _hash_name = _args[0] if _args else 'sha256'
+            _iterations = int(_args[1]) if len(_args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+            if _hash_name and _iterations > 0:
+                return f'pbkdf2:{_hash_name}:{_iterations}'
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid password hash method: {method!r}. "
+                     "Use 'scrypt:N:r:p' or 'pbkdf2:hash_name:iterations'.")
+
+
+def calibrate(candidates: Iterable[str], target_ms: float, samples: int = 3) -> dict:
+    """Time how long each candidate method takes to verify a password on this host,
+    and recommend the costliest one that verifies within the target time.
+
+    **NOTE** - The hashes run in the calling process, one at a time, like in one worker.
+
+    :param Iterable[str] candidates: The methods to time (e.g., SCRYPT_CANDIDATES)
+    :param float target_ms: The longest acceptable verification time in milliseconds
+    :param int samples: The number of times to verify with each method, defaults to 3
+
+    :returns: The median verification time of each method, and the recommended method, \
+        or None if no method verifies within the target time
+    :rtype: dict
+    """
+    # Validate inputs
+    validate_input('target_ms', target_ms, (int, float))
+    validate_input('samples', samples, int)
+
+    if target_ms <= 0 or samples < 1:
+        raise ValueError('target_ms and samples must be greater than 0.')
+
+    _results = []
+    for _method in dict.fromkeys(normalize_hash_method(_m) for _m in candidates):
+        _hash = generate_password_hash(_CALIBRATION_PASSWORD, method=_method)
+        _times = []
+        for _ in range(samples):
+            _start = time.perf_counter()
+            check_password_hash(_hash, _CALIBRATION_PASSWORD)
+            _times.append(time.perf_counter() - _start)
+        _median_ms = sorted(_times)[len(_times) // 2] * 1000
+        _results.append({
+            'method': _method,
+            'median_ms': round(_median_ms, 3),
+            'verifies_per_second': round(1000 / _median_ms, 1) if _median_ms else None,
+        })
+
+    # Slower hashes cost more, so the slowest method within the target is the costliest
+    _within_target = [_result for _result in _results if _result['median_ms'] <= target_ms]
+    _recommended = max(_within_target, key=lambda _result: _result['median_ms'], default=None)
+    return {
+        'target_ms': target_ms,
+        'results': _results,
+        'recommended': _recommended['method'] if _recommended else None,
+    }
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when the password service has no room for another hash."""
+
+    def __init__(self, retry_after: int = 1) -> None:
+        """Initialization.
+
+        :param int retry_after: The number of seconds the client should wait before retrying
+        """
+        super().__init__('The server is busy. Please try again in a moment.')
+        self.retry_after = retry_after
+
+
+class PasswordService:
+    """Runs password hashes in worker processes, and admits a bounded number at a time."""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, workers: int = 1, max_pending: int = 16, queue_timeout: float = 0.0,
+                 retry_after: int = 1, method: str = DEFAULT_HASH_METHOD) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param int workers: The number of worker processes (0 for one per CPU, \
+            1 to hash in the calling thread), defaults to 1
+        :param int max_pending: The number of hashes that can run or wait at once, defaults to 16
+        :param float queue_timeout: The number of seconds to wait for room, defaults to 0.0
+        :param int retry_after: The number of seconds to send in Retry-After, defaults to 1
+        :param str method: The method of new hashes, defaults to 'scrypt:32768:8:1'
+        """
+        self._lock = threading.Lock()
+        self._executor = None
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        # The number of hashes running or waiting for a worker
+        self.pending = 0
+        self.configure(workers, max_pending, queue_timeout, retry_after, method)
+
+    def init_app(self, app: Flask) -> None:
+        """Apply the PASSWORD_HASH_* settings of the application.
+
+        :param Flask app: The application instance
+
+        :returns: None
+        :rtype: None
+        """
+        # Validate inputs
+        validate_input('app', app, Flask)
+
+        self.configure(
+            int(app.config.get('PASSWORD_HASH_WORKERS', 1)),
+            int(app.config.get('PASSWORD_HASH_MAX_PENDING', 16)),
+            float(app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 0.0)),
+            int(app.config.get('PASSWORD_HASH_RETRY_AFTER', 1)),
+            app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+        )
+
+    # pylint: disable-next=too-many-arguments
+    def configure(self, workers: int, max_pending: int, queue_timeout: float,
+                  retry_after: int, method: str = DEFAULT_HASH_METHOD) -> None:
+        """Change the settings, and stop the workers if their number changed.
+
+        **NOTE** - Hashes that are already running finish with the previous settings.
+
+        :param int workers: The number of worker processes (0 for one per CPU, \
+            1 to hash in the calling thread)
+        :param int max_pending: The number of hashes that can run or wait at once
+        :param float queue_timeout: The number of seconds to wait for room
+        :param int retry_after: The number of seconds to send in Retry-After
+        :param str method: The method of new hashes, defaults to 'scrypt:32768:8:1'
+
+        :returns: None
+        :rtype: None
+        """
+        # Validate inputs
+        validate_input('workers', workers, int, allow_empty=True)
+        validate_input('max_pending', max_pending, int)
+        validate_input('queue_timeout', queue_timeout, (int, float), allow_empty=True)
+        validate_input('retry_after', retry_after, int)
+
+        if workers < 0 or max_pending < 1 or queue_timeout < 0 or retry_after < 1:
+            raise ValueError('workers and queue_timeout cannot be negative, '
+                             'and max_pending and retry_after must be greater than 0.')
+        _method = normalize_hash_method(method)
+
+        with self._lock:
+            if self._executor is not None and workers != self.workers:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.workers = workers
+            self.max_pending = max_pending
+            self.queue_timeout = float(queue_timeout)
+            self.retry_after = retry_after
+            self.method = _method
+            self._slots = threading.BoundedSemaphore(max_pending)
+            self.completed = 0
+            self.rejected = 0
+            self._latencies.clear()
+
+    def hash_password(self, password: str) -> str:
+        """Hash a password with the configured method (PASSWORD_HASH_METHOD).
+
+        :param str password: A password in plain text
+
+        :raises PasswordServiceBusy: If the service is full
+
+        :returns: The password hash
+        :rtype: str
+        """
+        # Validate inputs
+        validate_input('password', password, str)
+
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_passwords(self, passwords: List[str]) -> List[str]:
+        """Hash a batch of passwords (e.g., for a bulk import) in the shared worker processes.
+
+        **NOTE** - The batch is sent in chunks of at most one hash per worker, and each hash
+        of a chunk takes a slot, waiting for it instead of failing fast, so a login waits
+        behind at most one chunk. The latency of the batch is not recorded.
+
+        :param List[str] passwords: The passwords in plain text
+
+        :returns: The password hashes, in the same order
+        :rtype: List[str]
+        """
+        # Validate inputs
+        validate_input('passwords', passwords, list, allow_empty=True)
+
+        _hash = partial(generate_password_hash, method=self.method)
+        # Never ask for more slots than the service has, or the chunk would wait forever
+        _chunk_size = max(1, min(self.workers or os.cpu_count() or 1, self.max_pending))
+        _hashes = []
+        for _start in range(0, len(passwords), _chunk_size):
+            _chunk = passwords[_start:_start + _chunk_size]
+            _held = []
+            try:
+                for _ in _chunk:
+                    _held.append(self._admit(None))
+                _executor = self._get_executor()
+                if _executor is None:
+                    _hashes.extend(_hash(_password) for _password in _chunk)
+                    continue
+                try:
+                    _hashes.extend(_executor.map(_hash, _chunk))
+                except BrokenProcessPool:
+                    self._discard_executor(_executor)
+                    raise
+            finally:
+                for _slots in _held:
+                    self._release(_slots)
+        return _hashes
+
+    def verify_password(self, password_hash: str, password: str) -> bool:
+        """Check a password against a hash.
+
+        :param str password_hash: The stored password hash
+        :param str password: A password in plain text
+
+        :raises PasswordServiceBusy: If the service is full
+
+        :returns: True if the password matches the hash
+        :rtype: bool
+        """
+        # Validate inputs
+        validate_input('password_hash', password_hash, str)
+        validate_input('password', password, str)
+
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Check if a hash was made with another method than the configured one.
+
+        :param str password_hash: The stored password hash
+
+        :returns: True if the password should be hashed again with the configured method
+        :rtype: bool
+        """
+        # Validate inputs
+        validate_input('password_hash', password_hash, str)
+
+        # e.g., 'scrypt:32768:8:1$salt$hash'
+        return password_hash.split('$', 1)[0] != self.method
+
+    def stats(self) -> dict:
+        """Get the number of hashes and rejections, and the latency of the recent hashes.
+
+        **NOTE** - The latency includes the time spent waiting for a free worker.
+
+        :returns: The settings, counters, and latency percentiles in milliseconds
+        :rtype: dict
+        """
+        with self._lock:
+            _latencies = sorted(self._latencies)
+            _stats = {
+                'method': self.method,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+        for _name, _percentile in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            _stats[_name] = (round(_latencies[int(len(_latencies) * _percentile)] * 1000, 3)
+                             if _latencies else None)
+        _stats['max_ms'] = round(_latencies[-1] * 1000, 3) if _latencies else None
+        return _stats
+
+    def shutdown(self) -> None:
+        """Stop the worker processes. They are started again when needed.
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            _executor, self._executor = self._executor, None
+        if _executor is not None:
+            _executor.shutdown()
+
+    def _run(self, func: Callable, *args) -> Any:
+        """Run a hash function in a worker if there is room, and record its latency.
+
+        :param Callable func: The function to run
+        :param args: The arguments of the function
+
+        :raises PasswordServiceBusy: If there is no room within the queue timeout
+
+        :returns: The result of the function
+        :rtype: Any
+        """
+        _slots = self._admit(self.queue_timeout)
+        _start = time.perf_counter()
+        try:
+            _executor = self._get_executor()
+            if _executor is None:
+                return func(*args)
+            try:
+                return _executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                self._discard_executor(_executor)
+                raise
+        finally:
+            _elapsed = time.perf_counter() - _start
+            self._release(_slots)
+            with self._lock:
+                self.completed += 1
+                self._latencies.append(_elapsed)
+            if has_request_context():
+                g.hash_time = g.get('hash_time', 0.0) + _elapsed
+
+    def _admit(self, timeout: Union[float, None]) -> threading.BoundedSemaphore:
+        """Take a slot for a hash, or a batch of hashes.
+
+        :param float or None timeout: The number of seconds to wait for room \
+            (0 to fail fast, None to wait until there is room)
+
+        :raises PasswordServiceBusy: If there is no room within the timeout
+
+        :returns: The semaphore the slot was taken from, to pass to `_release()`
+        :rtype: threading.BoundedSemaphore
+        """
+        # Keep the semaphore, in case the service is reconfigured while the hash runs
+        _slots = self._slots
+        if timeout is None:
+            _admitted = _slots.acquire()
+        elif timeout > 0:
+            _admitted = _slots.acquire(timeout=timeout)
+        else:
+            _admitted = _slots.acquire(blocking=False)
+        if not _admitted:
+            with self._lock:
+                self.rejected += 1
+            raise PasswordServiceBusy(self.retry_after)
+
+        with self._lock:
+            self.pending += 1
+        return _slots
+
+    def _release(self, slots: threading.BoundedSemaphore) -> None:
+        """Give back a slot taken with `_admit()`.
+
+        :param threading.BoundedSemaphore slots: The semaphore the slot was taken from
+
+        :returns: None
+        :rtype: None
+        """
+        slots.release()
+        with self._lock:
+            self.pending -= 1
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Forget a broken process pool, so new workers are started for the next hash.
+
+        :param ProcessPoolExecutor executor: The pool whose worker died (e.g., it was killed)
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def _get_executor(self) -> Union[ProcessPoolExecutor, None]:
+        """Get the process pool, and start it if needed.
+
+        :returns: The process pool, or None to hash in the calling thread
+        :rtype: ProcessPoolExecutor or None
+        """
+        if self.workers == 1:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # Do not fork the threads of the web server; start the workers from a clean process
+                _methods = multiprocessing.get_all_start_methods()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers or os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context(
+                        'forkserver' if 'forkserver' in _methods else 'spawn'),
+                )
+            return self._executor
+
+
+password_service = PasswordService()
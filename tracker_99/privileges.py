@@ -0,0 +1,86 @@
+"""Resolve a member's role privilege in each course, with at most one query per request.
+
+The first check for a member reads all of the member's course assignments in one query,
+and the map of course IDs to role IDs is kept for the rest of the request (in `g`)
+and in a short-lived cache (PRIVILEGE_CACHE_TTL) shared by the request threads.
+The cached maps are keyed by the version of the associations table (see `table_versions.py`),
+so a committed assignment change is seen by the next request, without explicit invalidation.
+Role IDs are converted to privileges with the cached roles (see `roles_cache.py`),
+so a changed role privilege applies right away as well.
+
+Admin pages and API routes use the same maps; API requests with current rich token claims
+use the privileges in the token instead (see `api.requester_course_privilege`).
+
+Usage:
+- _privilege = course_privilege(course_id, member_id)
+- _privileges = course_privileges(member_id)
+"""
+
+from typing import Union
+
+from flask import g, has_app_context
+from sqlalchemy import select
+
+from tracker_99.app_utils import validate_input
+from tracker_99.caches import privilege_maps
+from tracker_99.models import db
+from tracker_99.models.models import Association
+from tracker_99.roles_cache import roles_cache
+from tracker_99.table_versions import get_table_versions
+
+__all__ = ['course_privilege', 'course_privileges']
+
+
+def course_privileges(member_id: int) -> dict:
+    """Get a member's role privilege in each of their courses.
+
+    :param int member_id: The ID of the member
+
+    :returns: The privilege of the member's role in each course, by course ID
+    :rtype: dict
+    """
+    # Validate inputs
+    validate_input('member_id', member_id, int)
+
+    _key = (member_id, get_table_versions(('associations',))['associations'][0])
+
+    # Reuse the map if this request already resolved it
+    _memo = g.setdefault('course_privileges', {}) if has_app_context() else {}
+    _privileges = _memo.get(_key)
+    if _privileges is not None:
+        return _privileges
+
+    _role_ids = privilege_maps.get(_key)
+    if _role_ids is None:
+        """
+        SELECT course_id, role_id FROM associations WHERE member_id = 2;
+        """
+        _role_ids = dict(db.session.execute(
+            select(Association.course_id, Association.role_id)
+            .where(Association.member_id == member_id)
+        ).all())
+        privilege_maps.set(_key, _role_ids)
+
+    _privileges = {}
+    for _course_id, _role_id in _role_ids.items():
+        _privilege = roles_cache.privilege(_role_id)
+        if _privilege is not None:
+            _privileges[_course_id] = _privilege
+
+    _memo[_key] = _privileges
+    return _privileges
+
+
+def course_privilege(course_id: int, member_id: int) -> Union[int, None]:
+    """Get a member's role privilege in a course.
+
+    :param int course_id: The ID of the course
+    :param int member_id: The ID of the member
+
+    :returns: The privilege of the member's role, or None if the member is not assigned
+    :rtype: int or None
+    """
+    # Validate inputs
+    validate_input('course_id', course_id, int)
+
+    return course_privileges(member_id).get(course_id)
@@ -1,18 +1,52 @@
-"""Add profiling support to the Flask application using the Werkzeug ProfilerMiddleware.
+"""Add profiling support to the Flask application.
+
+There are two modes, set by PROFILING_MODE:
+
+    - every: Profile every request with the Werkzeug ProfilerMiddleware and print the stats
+      to stdout (use `flask run --without-threads`)
+    - sample: Profile 1 in PROFILE_SAMPLE_RATE requests with cProfile, keep the profiles
+      of requests that took at least PROFILE_SLOW_MS milliseconds, merge them by endpoint,
+      and write the merged profiles to PROFILE_DIR every PROFILE_FLUSH_INTERVAL seconds
+
+In sample mode, unsampled requests only pay for a counter increment, so the profiler
+can run under real traffic. Only one request is profiled at a time; a sampled request
+that arrives while another request is being profiled is not profiled. The profiles are
+written by a background thread, so requests never wait for the disk.
+
+View a merged profile with `python -m pstats tracker_profiles/<file>.prof`.
+
+Usage:
+- _app = add_profiler_middleware(_app)
 """
 
+import atexit
+import cProfile
+import itertools
+import os
+import pstats
+import re
+import threading
+import time
+from typing import Callable, Iterable
+
 from flask import Flask
 from werkzeug.middleware.profiler import ProfilerMiddleware
 
 from tracker_99.app_utils import validate_input
 
-__all__ = ['add_profiler_middleware']
+__all__ = ['PROFILING_MODES', 'SamplingProfilerMiddleware', 'add_profiler_middleware']
+
+PROFILING_MODES = ('every', 'sample')
+
+_UNSAFE_FILE_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
 
 
 def add_profiler_middleware(app: Flask) -> Flask:
-    """Wraps the application instance in middleware that profiles each request
+    """Wraps the application instance in middleware that profiles requests
     using the cProfile module.
 
+    In sample mode, the middleware is stored in `app.extensions['profiler']`.
+
     :param Flask app: The application instance
 
     :returns: The wrapped application instance
@@ -21,6 +55,193 @@ def add_profiler_middleware(app: Flask) -> Flask:
     # Validate inputs
     validate_input('app', app, Flask)
 
-    # Add ProfilerMiddleware to your Flask app.
-    app.wsgi_app = ProfilerMiddleware(app.wsgi_app, restrictions=[30])
+    _mode = app.config.get('PROFILING_MODE', 'every')
+    if _mode not in PROFILING_MODES:
+        raise ValueError(f'Invalid profiling mode. Use one of {PROFILING_MODES}.')
+
+    if _mode == 'every':
+        # Add ProfilerMiddleware to your Flask app.
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, restrictions=[30])
+        return app
+
+    _profiler = SamplingProfilerMiddleware(
+        app,
+        sample_rate=int(app.config.get('PROFILE_SAMPLE_RATE', 100)),
+        slow_ms=float(app.config.get('PROFILE_SLOW_MS', 0)),
+        profile_dir=app.config.get('PROFILE_DIR', 'tracker_profiles'),
+        flush_interval=float(app.config.get('PROFILE_FLUSH_INTERVAL', 60)),
+    )
+    app.wsgi_app = _profiler
+    app.extensions['profiler'] = _profiler
+    # Write the last profiles when the process exits
+    atexit.register(_profiler.flush)
     return app
+
+
+class SamplingProfilerMiddleware:
+    """WSGI middleware that profiles a sample of requests and merges the profiles by endpoint."""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, app: Flask, sample_rate: int = 100, slow_ms: float = 0,
+                 profile_dir: str = 'tracker_profiles', flush_interval: float = 60) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param Flask app: The application instance
+        :param int sample_rate: Profile 1 in this many requests, defaults to 100
+        :param float slow_ms: Only keep the profiles of requests that took at least this many \
+            milliseconds, defaults to 0 (keep every sampled profile)
+        :param str profile_dir: The directory for the merged profiles, defaults to \
+            'tracker_profiles'
+        :param float flush_interval: The number of seconds between writes, defaults to 60
+        """
+        # Validate inputs
+        validate_input('app', app, Flask)
+        validate_input('sample_rate', sample_rate, int)
+        validate_input('slow_ms', slow_ms, (int, float), allow_empty=True)
+        validate_input('profile_dir', profile_dir, str)
+        validate_input('flush_interval', flush_interval, (int, float))
+
+        if sample_rate < 1 or flush_interval <= 0:
+            raise ValueError('sample_rate and flush_interval must be greater than 0.')
+
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.sample_rate = sample_rate
+        self.slow_ms = float(slow_ms)
+        self.profile_dir = profile_dir
+        self.flush_interval = float(flush_interval)
+
+        # next() on a count is atomic in CPython, so no lock is needed to sample
+        self._counter = itertools.count()
+        # Only one cProfile profiler can be active at a time
+        self._profiling = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Profiles merged since the last flush, guarded by _stats_lock
+        self._stats = {}
+        # Only one flush at a time, and only the flush uses the totals
+        self._flush_lock = threading.Lock()
+        self._totals = {}
+        self._requests = {}
+        self._last_flush = time.monotonic()
+        self.profiled = 0
+        self.kept = 0
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        """Handle a request, profiling it if it is sampled.
+
+        :param dict environ: The WSGI environment
+        :param Callable start_response: The WSGI start_response callable
+
+        :returns: The response body
+        :rtype: Iterable[bytes]
+        """
+        if next(self._counter) % self.sample_rate:
+            return self.wsgi_app(environ, start_response)
+
+        if not self._profiling.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            _profile = cProfile.Profile()
+            _start = time.perf_counter()
+            # Only the call is profiled, not the iteration of the response body,
+            # so streamed responses are not buffered in memory
+            _profile.enable()
+            try:
+                _response = self.wsgi_app(environ, start_response)
+            finally:
+                _profile.disable()
+            _elapsed_ms = (time.perf_counter() - _start) * 1000
+        finally:
+            self._profiling.release()
+
+        if _elapsed_ms >= self.slow_ms:
+            self._merge(self._endpoint(environ), _profile)
+        else:
+            with self._stats_lock:
+                self.profiled += 1
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._last_flush = time.monotonic()
+            threading.Thread(target=self.flush, name='profile-flush', daemon=True).start()
+
+        return _response
+
+    def stats(self) -> dict:
+        """Get the profiler counters.
+
+        :returns: The number of profiled and kept requests, and the kept requests by endpoint
+        :rtype: dict
+        """
+        with self._stats_lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'slow_ms': self.slow_ms,
+                'profiled': self.profiled,
+                'kept': self.kept,
+                'endpoints': dict(self._requests),
+            }
+
+    def flush(self) -> None:
+        """Write the merged profile of each endpoint to the profile directory.
+
+        Each process writes its own files (e.g., `tracker_99_1234_api_bp.login.prof`),
+        and each write replaces the process's previous file with the latest totals.
+
+        **NOTE** - Only the swap of the pending profiles holds the stats lock, so requests
+        that finish profiling during the write do not wait for the disk.
+
+        :returns: None
+        :rtype: None
+        """
+        with self._flush_lock:
+            with self._stats_lock:
+                self._last_flush = time.monotonic()
+                _pending, self._stats = self._stats, {}
+            if not _pending:
+                return
+
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for _endpoint, _stats in _pending.items():
+                if _endpoint in self._totals:
+                    self._totals[_endpoint].add(_stats)
+                else:
+                    self._totals[_endpoint] = _stats
+                _name = _UNSAFE_FILE_CHARS.sub('_', f'{self.app.name}_{os.getpid()}_{_endpoint}')
+                _path = os.path.join(self.profile_dir, f'{_name}.prof')
+                # Replace the file in one step, so readers never see a partial profile
+                self._totals[_endpoint].dump_stats(f'{_path}.tmp')
+                os.replace(f'{_path}.tmp', _path)
+
+    def _merge(self, endpoint: str, profile: cProfile.Profile) -> None:
+        """Add a profile to the merged profile of its endpoint.
+
+        :param str endpoint: The endpoint of the request
+        :param cProfile.Profile profile: The profile of the request
+
+        :returns: None
+        :rtype: None
+        """
+        with self._stats_lock:
+            if endpoint in self._stats:
+                self._stats[endpoint].add(profile)
+            else:
+                self._stats[endpoint] = pstats.Stats(profile)
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            self.profiled += 1
+            self.kept += 1
+
+    def _endpoint(self, environ: dict) -> str:
+        """Get the endpoint of a request from its URL.
+
+        :param dict environ: The WSGI environment
+
+        :returns: The endpoint, or '(no endpoint)' if the URL does not match a route
+        :rtype: str
+        """
+        # Allow except Exception, since any routing error means there is no endpoint
+        try:
+            _endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+            return _endpoint
+        except Exception:  # pylint: disable=broad-except
+            return '(no endpoint)'
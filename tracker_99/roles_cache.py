@@ -0,0 +1,175 @@
+"""An in-process, read-through cache of the roles table, which is small and rarely changes.
+
+The roles are loaded once at startup into an immutable snapshot, so request threads
+read them without a lock or a query. The role routes (HTML and API) reload the snapshot
+after they add, edit, or delete a role, and the snapshot is also reloaded when the version
+of the roles table changes (see `table_versions.py`), so other worker processes see
+the change after TABLE_VERSION_TTL seconds.
+
+**NOTE** - The 'Unassigned' role (UNASSIGNED_ROLE_ID) is not stored in the database,
+so it is not in the cache either.
+
+Usage:
+- roles_cache.init_app(app)
+- _role = roles_cache.get(role_id)
+- _owner_role = roles_cache.by_privilege(c.PRIVILEGE_LVL_OWNER)
+"""
+
+import threading
+from collections import namedtuple
+from typing import Tuple, Union
+
+from flask import Flask
+from sqlalchemy import select
+
+from tracker_99.app_utils import validate_input
+from tracker_99.models import db
+from tracker_99.models.models import Role
+from tracker_99.table_versions import get_table_versions
+
+__all__ = ['CachedRole', 'RolesCache', 'roles_cache']
+
+# The attributes match the Role model and ROLE_SERIALIZER, so the rows can be used in their place
+CachedRole = namedtuple('CachedRole', ['role_id', 'role_name', 'role_privilege'])
+
+# The snapshot of the roles table: the table version, the roles by ID and by privilege,
+# and every role, by ID
+_Snapshot = namedtuple('_Snapshot', ['version', 'by_id', 'by_privilege', 'roles'])
+
+
+class RolesCache:
+    """A thread-safe snapshot of the roles table, replaced as a whole when it is reloaded."""
+
+    def __init__(self) -> None:
+        """Initialization of an empty cache, loaded on first use or by `init_app()`."""
+        self._snapshot = None
+        # Only one thread reloads the snapshot; the others wait and use its result
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def init_app(self, app: Flask) -> None:
+        """Load the roles of the application's database.
+
+        :param Flask app: The application instance
+
+        :returns: None
+        :rtype: None
+        """
+        # Validate inputs
+        validate_input('app', app, Flask)
+
+        with app.app_context():
+            self.reload()
+
+    def invalidate(self) -> None:
+        """Discard the snapshot, so the next lookup loads the roles again.
+
+        :returns: None
+        :rtype: None
+        """
+        self._snapshot = None
+
+    def reload(self) -> None:
+        """Load the roles again, e.g., after a role is added, edited, or deleted.
+
+        **NOTE** - Call after the change is committed, within an application context.
+
+        :returns: None
+        :rtype: None
+        """
+        with self._lock:
+            self._snapshot = self._load()
+
+    def all(self) -> Tuple[CachedRole, ...]:
+        """Get every role.
+
+        :returns: The roles, in role_id order
+        :rtype: Tuple[CachedRole, ...]
+        """
+        return self._current().roles
+
+    def get(self, role_id: int) -> Union[CachedRole, None]:
+        """Get a role by ID.
+
+        :param int role_id: The ID of the role
+
+        :returns: The role or None if it does not exist
+        :rtype: CachedRole or None
+        """
+        return self._current().by_id.get(role_id)
+
+    def by_privilege(self, role_privilege: int) -> Union[CachedRole, None]:
+        """Get the role with a privilege level.
+
+        :param int role_privilege: The privilege level of the role
+
+        :returns: The role or None if no role has the privilege level
+        :rtype: CachedRole or None
+        """
+        return self._current().by_privilege.get(role_privilege)
+
+    def privilege(self, role_id: Union[int, None]) -> Union[int, None]:
+        """Get the privilege level of a role.
+
+        :param int or None role_id: The ID of the role
+
+        :returns: The privilege level or None if the role does not exist
+        :rtype: int or None
+        """
+        _role = self._current().by_id.get(role_id)
+        return None if _role is None else _role.role_privilege
+
+    def _current(self) -> _Snapshot:
+        """Get the snapshot, and reload it if it is missing or the roles table has changed.
+
+        :returns: The current snapshot
+        :rtype: _Snapshot
+        """
+        _snapshot = self._snapshot
+        if _snapshot is not None and _snapshot.version == self._table_version():
+            return _snapshot
+
+        with self._lock:
+            # Another thread may have reloaded the snapshot while this one waited
+            _snapshot = self._snapshot
+            if _snapshot is None or _snapshot.version != self._table_version():
+                _snapshot = self._snapshot = self._load()
+            return _snapshot
+
+    def _load(self) -> _Snapshot:
+        """Read the roles table.
+
+        :returns: A new snapshot
+        :rtype: _Snapshot
+        """
+        # Read the version first, so a change between the two reads causes another reload,
+        # instead of being missed
+        _version = self._table_version()
+        """
+        SELECT role_id, role_name, role_privilege FROM roles ORDER BY role_id;
+        """
+        _roles = tuple(
+            CachedRole(*_row) for _row in db.session.execute(
+                select(Role.role_id, Role.role_name, Role.role_privilege).order_by(Role.role_id)
+            )
+        )
+        self.loads += 1
+        return _Snapshot(
+            version=_version,
+            by_id={_role.role_id: _role for _role in _roles},
+            by_privilege={_role.role_privilege: _role for _role in _roles},
+            roles=_roles,
+        )
+
+    @staticmethod
+    def _table_version() -> int:
+        """Get the version of the roles table, from the cache of table versions if possible.
+
+        :returns: The version
+        :rtype: int
+        """
+        return get_table_versions(('roles',))['roles'][0]
+
+
+# Create an instance of the cache for the roles table
+roles_cache = RolesCache()
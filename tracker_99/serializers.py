@@ -0,0 +1,111 @@
+"""Serialize query rows to dictionaries for JSON responses, without loading ORM objects.
+
+Loading full ORM objects (e.g., `Member.query.all()`) to copy a few of their columns
+adds each object to the session's identity map and sets up its attribute instrumentation.
+A `RowSerializer` selects only the columns it needs, as lightweight `Row` tuples,
+and converts each row with a field mapping that is built once, when the module is imported.
+
+Usage:
+- _rows = db.session.execute(MEMBER_SERIALIZER.select().order_by(Member.member_id))
+- _members = MEMBER_SERIALIZER.dump_all(_rows)
+"""
+
+from operator import attrgetter
+from typing import Iterable, List
+
+from sqlalchemy import Row, Select, select
+
+from tracker_99.app_utils import validate_input
+from tracker_99.models.models import Association, Course, Member, Role
+
+__all__ = ['COURSE_DETAILS_SERIALIZER', 'COURSE_SERIALIZER', 'MEMBER_SERIALIZER',
+           'ROLE_SERIALIZER', 'RowSerializer']
+
+
+class RowSerializer:
+    """Convert rows to dictionaries with a field mapping built once."""
+
+    def __init__(self, fields: dict) -> None:
+        """Initialization with validation to ensure valid types and values.
+
+        :param dict fields: The column for each field, in the order of the output \
+            (e.g., {'member_id': Member.member_id})
+        """
+        # Validate inputs
+        validate_input('fields', fields, dict)
+
+        if len(fields) < 2:
+            raise ValueError('A serializer needs at least two fields.')
+
+        self.names = tuple(fields)
+        self.columns = tuple(fields.values())
+        # Get every field of a row in one call, by name, so the row can have other columns
+        # With two or more names, attrgetter returns a tuple
+        self._getter = attrgetter(*self.names)
+
+    def select(self) -> Select:
+        """Build a statement that selects the fields, and nothing else.
+
+        **NOTE** - Add joins, filters, and ORDER BY to the statement before executing it.
+
+        :returns: The unexecuted statement
+        :rtype: Select
+        """
+        return select(*(_column.label(_name) for _name, _column in zip(self.names, self.columns)))
+
+    def dump(self, row: Row) -> dict:
+        """Convert one row to a dictionary.
+
+        :param Row row: A row with a column or attribute for each field
+
+        :returns: The fields and their values
+        :rtype: dict
+        """
+        return dict(zip(self.names, self._getter(row)))
+
+    def dump_all(self, rows: Iterable[Row]) -> List[dict]:
+        """Convert rows to dictionaries.
+
+        :param Iterable[Row] rows: Rows with a column or attribute for each field
+
+        :returns: The fields and their values, for each row
+        :rtype: List[dict]
+        """
+        # Use local names in the loop, to avoid an attribute lookup per row
+        _names = self.names
+        _getter = self._getter
+        return [dict(zip(_names, _getter(_row))) for _row in rows]
+
+
+# Exclude the 'password_hash' field
+MEMBER_SERIALIZER = RowSerializer({
+    'member_id': Member.member_id,
+    'member_name': Member.member_name,
+    'member_email': Member.member_email,
+    'is_admin': Member.is_admin,
+})
+
+COURSE_SERIALIZER = RowSerializer({
+    'course_id': Course.course_id,
+    'course_name': Course.course_name,
+    'course_code': Course.course_code,
+    'course_group': Course.course_group,
+    'course_key': Course.course_key,
+    'course_desc': Course.course_desc,
+})
+
+ROLE_SERIALIZER = RowSerializer({
+    'role_id': Role.role_id,
+    'role_name': Role.role_name,
+    'role_privilege': Role.role_privilege,
+})
+
+# A member's assignment to a course, with the course and role
+COURSE_DETAILS_SERIALIZER = RowSerializer({
+    'member_id': Association.member_id,
+    'member_name': Member.member_name,
+    **dict(zip(COURSE_SERIALIZER.names, COURSE_SERIALIZER.columns)),
+    'role_id': Role.role_id,
+    'role_name': Role.role_name,
+    'role_privilege': Role.role_privilege,
+})
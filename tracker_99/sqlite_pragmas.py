@@ -0,0 +1,96 @@
+"""Apply SQLite pragmas to each new database connection, based on SQLITE_PRAGMAS.
+
+Pragmas like `synchronous` and `busy_timeout` only last for the connection that sets them,
+so they are set in the engine's `connect` event, before the pool hands the connection out.
+
+In the default rollback-journal mode, a commit locks out every reader until it ends.
+In WAL mode (`journal_mode = WAL`), readers keep reading the last committed data
+while a writer is active, and `synchronous = NORMAL` skips the sync on each commit
+(a power loss can undo the last commits, but cannot corrupt the database).
+See ProductionConfig in config.py and benchmark_sqlite.py.
+
+> **NOTE** - WAL mode is stored in the database file and adds `-wal` and `-shm` files
+beside it. Use `PRAGMA journal_mode = DELETE` to switch back.
+
+Usage:
+- init_sqlite_pragmas(app)
+"""
+
+import re
+from typing import List
+
+from flask import Flask
+from sqlalchemy import event
+
+from tracker_99.app_utils import validate_input
+from tracker_99.models import db
+
+__all__ = ['SQLITE_PRAGMA_NAMES', 'init_sqlite_pragmas', 'pragma_statements']
+
+# Only per-connection and journal pragmas that are safe to set at runtime
+SQLITE_PRAGMA_NAMES = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size',
+                       'temp_store', 'foreign_keys', 'wal_autocheckpoint', 'journal_size_limit')
+
+# Pragma values are numbers or keywords, like WAL or NORMAL
+_PRAGMA_VALUE = re.compile(r'-?\d+|[A-Za-z_]+')
+
+
+def pragma_statements(pragmas: dict) -> List[str]:
+    """Build the PRAGMA statements for the settings.
+
+    :param dict pragmas: The value of each pragma (e.g., {'journal_mode': 'WAL'})
+
+    :raises ValueError: If a pragma is not supported or its value is not a number or keyword
+
+    :returns: The statements, in the order of the settings
+    :rtype: List[str]
+    """
+    # Validate inputs
+    validate_input('pragmas', pragmas, dict, allow_empty=True)
+
+    _statements = []
+    for _name, _value in pragmas.items():
+        if _name not in SQLITE_PRAGMA_NAMES:
+            raise ValueError(f'Invalid SQLite pragma. Use one of {SQLITE_PRAGMA_NAMES}.')
+        # The values are part of the statement, since pragmas do not accept parameters
+        if isinstance(_value, bool) or not _PRAGMA_VALUE.fullmatch(str(_value)):
+            raise ValueError(f'Invalid value for SQLite pragma {_name}: {_value!r}.')
+        _statements.append(f'PRAGMA {_name} = {_value}')
+    return _statements
+
+
+def init_sqlite_pragmas(app: Flask) -> None:
+    """Set the pragmas in SQLITE_PRAGMAS on each new connection of the application's engine.
+
+    **NOTE** - Call after `db.init_app(app)` and before the first connection is opened.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('app', app, Flask)
+
+    _statements = pragma_statements(app.config.get('SQLITE_PRAGMAS') or {})
+    if not _statements:
+        return
+
+    with app.app_context():
+        _engine = db.engine
+    if _engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(_engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        """Set the pragmas on a new DBAPI connection.
+
+        :returns: None
+        :rtype: None
+        """
+        _cursor = dbapi_connection.cursor()
+        try:
+            for _statement in _statements:
+                _cursor.execute(_statement)
+        finally:
+            _cursor.close()
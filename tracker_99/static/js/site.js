@@ -38,11 +38,43 @@ let filterTableOptions = {
                 column.footer().replaceChildren(input);
 
                 // Event listener for user input
+                // Wait until the user stops typing, since server-side tables query on each draw
+                let timer = null;
                 input.addEventListener('keyup', () => {
-                    if (column.search() !== this.value) {
-                        column.search(input.value).draw();
-                    }
+                    clearTimeout(timer);
+                    timer = setTimeout(() => {
+                        if (column.search() !== input.value) {
+                            column.search(input.value).draw();
+                        }
+                    }, 400);
                 });
             });
     },
 };
+
+// Switch a DataTable to server-side processing, so the browser only holds one page of rows:
+// enableServerSide(filterTableOptions, "/courses/data")
+// The server returns a keyset cursor with each page.
+// When moving to the next page, send the cursor back instead of an offset,
+// so the server can seek to the next row instead of skipping over the previous ones
+function enableServerSide(options, url) {
+    let keyset = { start: null, cursor: null };
+
+    options.serverSide = true;
+    options.processing = true;
+    options.searchDelay = 400;
+    options.ajax = {
+        url: url,
+        data: function (d) {
+            if (keyset.cursor !== null && d.start === keyset.start) {
+                d.after = keyset.cursor;
+            }
+        },
+        dataSrc: function (json) {
+            keyset.cursor = json.cursor;
+            keyset.start = json.next_start;
+            return json.data;
+        },
+    };
+    return options;
+}
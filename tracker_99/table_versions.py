@@ -0,0 +1,198 @@
+"""Per-table change versions, for conditional GET requests (ETag and Last-Modified).
+
+Each transaction that inserts, updates, or deletes rows increments the version of the tables
+it changed, in the `table_versions` table, before it commits, so the versions change
+with the data, whether the change comes from the admin pages, the API, or the CLI.
+Session events record the changed tables, so routes do not have to.
+
+Routes that only read a few tables can then compare the versions of those tables
+with the ETag sent by the client, and respond with `304 Not Modified` without querying them
+(see `api.conditional_get`).
+
+> **NOTE** - The versions are cached for TABLE_VERSION_TTL seconds. A commit clears the cache
+of its own process, but other worker processes see the change after this delay.
+
+Usage:
+- init_table_versions(app)
+- _versions = get_table_versions(('courses', 'associations'))
+"""
+
+import time
+from typing import Iterable
+
+from flask import Flask
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from tracker_99.app_utils import validate_input
+from tracker_99.caches import table_versions
+from tracker_99.models import db
+from tracker_99.models.models import TableVersion
+
+__all__ = ['get_table_versions', 'init_table_versions']
+
+# The session events are registered once per process for every session,
+# since each application instance (e.g., in tests) creates its own session
+_SESSION_EVENTS_REGISTERED = False
+
+# Keys of `Session.info`
+_CHANGED_TABLES = 'changed_tables'
+_BUMPED_TABLES = 'bumped_tables'
+
+
+def init_table_versions(app: Flask) -> None:
+    """Record the tables changed by each commit.
+
+    **NOTE** - `upgrade_db()` creates the table of versions in older databases.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('app', app, Flask)
+
+    table_versions.configure(ttl=app.config.get('TABLE_VERSION_TTL'))
+
+    global _SESSION_EVENTS_REGISTERED  # pylint: disable=global-statement
+    if not _SESSION_EVENTS_REGISTERED:
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+        event.listen(Session, 'before_commit', _before_commit)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_transaction_end', _after_transaction_end)
+        _SESSION_EVENTS_REGISTERED = True
+
+
+def get_table_versions(tables: Iterable[str]) -> dict:
+    """Get the current version of each table, using the cache if possible.
+
+    :param Iterable[str] tables: The names of the tables
+
+    :returns: The version and the time of the last change (seconds since the epoch) \
+        of each table; tables that have never changed are at version 0, changed at 0.0
+    :rtype: dict
+    """
+    _versions = {}
+    _missing = []
+    for _table in tables:
+        _version = table_versions.get(_table)
+        if _version is None:
+            _missing.append(_table)
+        else:
+            _versions[_table] = _version
+
+    if _missing:
+        """
+        SELECT table_name, version, changed_at FROM table_versions
+        WHERE table_name IN ('courses', 'associations');
+        """
+        _rows = db.session.execute(
+            select(TableVersion.table_name, TableVersion.version, TableVersion.changed_at)
+            .where(TableVersion.table_name.in_(_missing))
+        ).all()
+        _found = {_name: (_version, _changed_at) for _name, _version, _changed_at in _rows}
+        for _table in _missing:
+            _versions[_table] = _found.get(_table, (0, 0.0))
+            table_versions.set(_table, _versions[_table])
+
+    return _versions
+
+
+def _record(session: Session, tables: Iterable[str]) -> None:
+    """Record the tables changed by the current transaction.
+
+    :param Session session: The session of the transaction
+    :param Iterable[str] tables: The names of the changed tables
+
+    :returns: None
+    :rtype: None
+    """
+    session.info.setdefault(_CHANGED_TABLES, set()).update(
+        _table for _table in tables if _table != TableVersion.__tablename__
+    )
+
+
+def _after_flush(session: Session, _flush_context) -> None:
+    """Record the tables of the objects that were added, changed, or deleted.
+
+    **NOTE** - The session still lists the flushed objects as new, dirty, or deleted here.
+
+    :returns: None
+    :rtype: None
+    """
+    _record(session, (
+        _obj.__tablename__ for _objs in (session.new, session.dirty, session.deleted)
+        for _obj in _objs
+    ))
+
+
+def _do_orm_execute(orm_execute_state: ORMExecuteState) -> None:
+    """Record the table of an INSERT, UPDATE, or DELETE statement run through the session,
+    like bulk inserts or `bump_token_versions()`, which do not load objects.
+
+    :returns: None
+    :rtype: None
+    """
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _record(orm_execute_state.session, (orm_execute_state.statement.table.name,))
+
+
+def _before_commit(session: Session) -> None:
+    """Increment the versions of the changed tables in the transaction that changed them.
+
+    :returns: None
+    :rtype: None
+    """
+    # The commit flushes after this event, so flush now to record the pending changes
+    session.flush()
+
+    _tables = session.info.pop(_CHANGED_TABLES, None)
+    if not _tables:
+        return
+
+    _now = time.time()
+    """
+    UPDATE table_versions SET version = version + 1, changed_at = 1735689600.0
+    WHERE table_name IN ('courses', 'associations');
+    """
+    _updated = set(session.scalars(
+        update(TableVersion)
+        .where(TableVersion.table_name.in_(_tables))
+        .values(version=TableVersion.version + 1, changed_at=_now)
+        .returning(TableVersion.table_name)
+    ))
+    if _tables - _updated:
+        """
+        INSERT INTO table_versions (table_name, version, changed_at)
+        VALUES ('courses', 1, 1735689600.0);
+        """
+        session.execute(insert(TableVersion), [
+            {'table_name': _table, 'version': 1, 'changed_at': _now}
+            for _table in _tables - _updated
+        ])
+
+    session.info[_BUMPED_TABLES] = _tables
+
+
+def _after_commit(session: Session) -> None:
+    """Remove the committed versions from the cache, so this process sees them right away.
+
+    :returns: None
+    :rtype: None
+    """
+    for _table in session.info.pop(_BUMPED_TABLES, ()):
+        table_versions.pop(_table)
+
+
+def _after_transaction_end(session: Session, transaction) -> None:
+    """Forget the changes of a transaction that was rolled back or closed.
+
+    :returns: None
+    :rtype: None
+    """
+    # Savepoints end within the outer transaction, which may still commit their changes
+    if transaction.parent is None:
+        session.info.pop(_CHANGED_TABLES, None)
+        session.info.pop(_BUMPED_TABLES, None)
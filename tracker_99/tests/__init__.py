@@ -5,12 +5,19 @@ to display messages along with pylint output (i.e., `pytest tracker_99/tests -s`
 `coverage run -m pytest tracker_99/tests -s`)
 """
 
+import os
+import shutil
+
 import pytest
 from flask import Flask
 from flask.testing import FlaskCliRunner, FlaskClient
-from pytest import FixtureRequest
+from pytest import FixtureRequest, MonkeyPatch
 
 from tracker_99 import create_app
+from tracker_99.caches import (listing_counts, privilege_maps, table_versions, token_cache,
+                               token_versions)
+from tracker_99.config import Config
+from tracker_99.roles_cache import roles_cache
 
 
 @pytest.fixture()
@@ -61,6 +68,35 @@ def app(request: FixtureRequest):
     ###
 
 
+@pytest.fixture()
+def temp_db_app(tmp_path: str, monkeypatch: MonkeyPatch) -> Flask:
+    """Fixture to create an application instance that uses a copy of the database,
+    for tests that change data.
+
+    :param str tmp_path: A temporary directory for the copy of the database
+    :param MonkeyPatch monkeypatch: The fixture that overrides the database location
+
+    :yields: The Flask application instance to test
+    :yield type: Flask
+    """
+    _db_path = os.path.join(tmp_path, 'tracker.db')
+    shutil.copyfile(os.path.join(os.path.dirname(__file__), '..', 'tracker.db'), _db_path)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{_db_path}')
+
+    _app = create_app(config_name='default', log_events=False)
+    _app.config.update({'TESTING': True, 'LOGIN_DISABLED': True})
+
+    yield _app
+
+    # Do not leave snapshots of the copy in the shared caches
+    token_cache.clear()
+    token_versions.clear()
+    table_versions.clear()
+    privilege_maps.clear()
+    listing_counts.clear()
+    roles_cache.invalidate()
+
+
 # W0621: Redefining name 'app' from outer scope is a false positive
 # In pytest, functions require 'app' as an argument
 # pylint: disable=redefined-outer-name
@@ -0,0 +1,325 @@
+"""Test methods and functions in assignments.py, the assign course page, and the bulk API
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import re
+
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event, select
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.assignments import apply_assignments, bulk_assign, course_member_roles
+from tracker_99.models import db
+from tracker_99.models.models import Association, Course, Member
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def _roles(course_id: int) -> dict:
+    """Get the role of each member assigned to a course.
+
+    :param int course_id: The ID of the course
+
+    :returns: The role ID by member ID
+    :rtype: dict
+    """
+    return dict(db.session.execute(
+        select(Association.member_id, Association.role_id)
+        .where(Association.course_id == course_id)
+    ).all())
+
+
+def test_course_member_roles(temp_db_app: Flask) -> None:
+    """Test that every member is listed once, with their role in the course, if any.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _rows = course_member_roles(1)
+
+        assert len(_rows) == Member.query.count()
+        _by_id = {_r['member_id']: _r for _r in _rows}
+        assert _by_id[2]['role_id'] == 5
+        assert _by_id[2]['role_privilege'] == 30
+        assert _by_id[1]['role_id'] is None
+
+
+def test_apply_assignments(temp_db_app: Flask) -> None:
+    """Test that new, changed, and removed assignments are applied.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _before = _roles(1)
+        assert 1 not in _before and _before[3] == 4 and 4 in _before
+
+        apply_assignments(upserts=[(1, 1, 2), (1, 3, 2)], deletes=[(1, 4)])
+        db.session.commit()
+
+        _after = _roles(1)
+        assert _after[1] == 2
+        assert _after[3] == 2
+        assert 4 not in _after
+        assert len(_after) == len(_before)
+
+
+def test_assign_course_saves_only_changes(temp_db_app: Flask) -> None:
+    """Test that the assign course page saves the changed assignments with two statements,
+    and only through the PATCH endpoint, which checks the CSRF token.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    temp_db_app.config['WTF_CSRF_ENABLED'] = False
+    _client = temp_db_app.test_client()
+    with _client.session_transaction() as _session:
+        # Log in as the administrator
+        _session['_user_id'] = 1
+
+    assert _client.get('/admin/assign_course/1').status_code == 200
+
+    _writes = []
+    with temp_db_app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            # pylint: disable=unused-argument, too-many-arguments, too-many-positional-arguments
+            # Leave out the table versions, which every commit increments
+            if statement.startswith(('INSERT', 'DELETE')) and 'table_versions' not in statement:
+                _writes.append(statement)
+
+    # The page no longer accepts form submissions, which were not checked for a CSRF token
+    assert _client.post('/admin/assign_course/1', data={'1_role': '2'}).status_code == 405
+    assert not _writes
+
+    # Assign member 1 as a student, unassign member 4, and leave member 3 unchanged
+    _response = _client.patch('/admin/assign_course/1/changes', json={'changes': [
+        {'member_id': 1, 'role_id': 2},
+        {'member_id': 3, 'role_id': 4},
+        {'member_id': 4, 'role_id': 1},
+    ]})
+    assert _response.status_code == 200
+    assert len(_writes) == 2
+
+    with temp_db_app.app_context():
+        _after = _roles(1)
+        assert _after[1] == 2
+        assert _after[3] == 4
+        assert 4 not in _after
+
+
+def _logged_in_client(app: Flask, member_id: int) -> FlaskClient:
+    """Create a test client with a logged in member.
+
+    :param Flask app: The application instance
+    :param int member_id: The ID of the member to log in
+
+    :returns: The test client
+    :rtype: FlaskClient
+    """
+    _client = app.test_client()
+    with _client.session_transaction() as _session:
+        _session['_user_id'] = member_id
+    return _client
+
+
+def test_candidates_are_paginated_and_searchable(temp_db_app: Flask) -> None:
+    """Test that candidates are returned one page at a time and can be found by group.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = _logged_in_client(temp_db_app, 1)
+
+    _page = _client.get('/admin/assign_course/1/candidates?length=5').get_json()
+    assert len(_page['data']) == 5
+    assert _page['recordsTotal'] == 16
+    assert _page['cursor']
+
+    _found = _client.get('/admin/assign_course/1/candidates?search[value]=atreides').get_json()
+    assert _found['recordsFiltered'] == len(_found['data']) > 0
+    assert all('atreides' in f"{_m['member_name']} {_m['member_group']}".lower()
+               for _m in _found['data'])
+    assert {_m['member_id']: _m['role_id'] for _m in _found['data']}[2] == 5
+
+
+def test_teacher_only_sees_and_changes_lower_roles(temp_db_app: Flask) -> None:
+    """Test that a teacher cannot see or change chairs and teachers, or assign teachers.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    # Member 3 is a teacher (privilege 20) in course 1, and member 2 is the chair
+    temp_db_app.config['WTF_CSRF_ENABLED'] = False
+    _client = _logged_in_client(temp_db_app, 3)
+
+    _page = _client.get('/admin/assign_course/1/candidates?length=100').get_json()
+    _ids = {_m['member_id'] for _m in _page['data']}
+    assert 2 not in _ids and 3 not in _ids
+
+    _url = '/admin/assign_course/1/changes'
+    assert _client.patch(_url, json={'changes': [{'member_id': 2, 'role_id': 1}]}
+                         ).status_code == 403
+    assert _client.patch(_url, json={'changes': [{'member_id': 1, 'role_id': 4}]}
+                         ).status_code == 403
+    assert _client.patch(_url, json={'changes': [{'member_id': 1}]}).status_code == 400
+
+
+def test_patch_saves_only_the_changes(temp_db_app: Flask) -> None:
+    """Test that the PATCH endpoint requires the CSRF token from the page,
+    applies the changes, and reports what changed.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = _logged_in_client(temp_db_app, 1)
+    _page = _client.get('/admin/assign_course/1').get_data(as_text=True)
+    _token = re.search(r'const csrfToken = "([^"]+)"', _page).group(1)
+
+    _url = '/admin/assign_course/1/changes'
+    assert _client.patch(_url, json={'changes': []}).status_code == 400
+
+    _response = _client.patch(_url, headers={'X-CSRFToken': _token}, json={'changes': [
+        {'member_id': 1, 'role_id': 2},
+        {'member_id': 3, 'role_id': 2},
+        {'member_id': 4, 'role_id': 1},
+        {'member_id': 2, 'role_id': 5},
+    ]})
+
+    assert _response.status_code == 200
+    assert _response.get_json() == {'message': 'Assignments saved.',
+                                    'added': 1, 'updated': 1, 'removed': 1}
+    with temp_db_app.app_context():
+        _after = _roles(1)
+        assert _after[1] == 2 and _after[3] == 2 and 4 not in _after
+
+
+def test_bulk_assign_endpoint(temp_db_app: Flask) -> None:
+    """Test that the bulk endpoint saves the valid items and reports a status for each item.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    _url = '/api/courses/assign/bulk'
+    with temp_db_app.app_context():
+        _headers = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+
+    assert _client.post(_url, headers=_headers, json={'assignments': [{'course_id': 1}]}
+                        ).status_code == 400
+
+    _response = _client.post(_url, headers=_headers, json={'assignments': [
+        {'course_id': 1, 'member_id': 1, 'role_id': 2},
+        {'course_id': 1, 'member_id': 6, 'role_id': 3},
+        {'course_id': 1, 'member_id': 7, 'role_id': None},
+        {'course_id': 1, 'member_id': 8, 'role_id': 2},
+        {'course_id': 1, 'member_id': 8, 'role_id': 3},
+        {'course_id': 999, 'member_id': 8, 'role_id': 2},
+    ]})
+
+    assert _response.status_code == 200
+    _body = _response.get_json()
+    assert [_r['status'] for _r in _body['results']] == [
+        'added', 'updated', 'removed', 'invalid', 'invalid', 'not_found']
+    assert _body['added'] == 1 and _body['invalid'] == 2 and _body['forbidden'] == 0
+    with temp_db_app.app_context():
+        _after = _roles(1)
+        assert _after[1] == 2 and _after[6] == 3 and 7 not in _after and _after[8] == 2
+
+
+def test_bulk_assign_rejects_every_duplicate(temp_db_app: Flask) -> None:
+    """Test that no item of a course and member sent more than once is applied,
+    not even the first one.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        assert 1 not in _roles(1)
+        _results, _counts = bulk_assign([(1, 1, 3), (1, 6, 3), (1, 1, 2)], requester_id=1,
+                                        requester_is_admin=True)
+
+        assert [_r['status'] for _r in _results] == ['invalid', 'updated', 'invalid']
+        assert _counts['invalid'] == 2
+        assert 1 not in _roles(1) and _roles(1)[6] == 3
+
+
+def test_bulk_assign_privileges(temp_db_app: Flask) -> None:
+    """Test that non-admins can only assign roles below their privilege in their courses,
+    with the requester's privileges read in one query for every course.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    # Member 3 is a teacher (privilege 20) in course 1, and member 2 is the chair
+    with temp_db_app.app_context():
+        _statements = []
+        # Leave out the table versions, which the roles cache reads when its copy expires
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: 'table_versions' in args[2] or _statements.append(args[2]))
+
+        _results, _counts = bulk_assign([
+            (1, 1, 3),
+            (1, 2, 1),
+            (1, 4, 4),
+            (1, 3, 2),
+            (2, 13, 3),
+        ] + [(1, _member_id, 2) for _member_id in range(5, 9)], requester_id=3)
+
+        assert [_r['status'] for _r in _results[:5]] == ['added'] + ['forbidden'] * 4
+        assert _counts['updated'] == 1 and _counts['unchanged'] == 3
+        # Courses, members, current assignments, requester privileges, and one upsert
+        # The roles come from the roles cache
+        assert len(_statements) == 5
+
+
+def test_bulk_assign_chunks_large_batches(temp_db_app: Flask) -> None:
+    """Test that large batches are read in chunks and applied.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _course_ids = db.session.scalars(select(Course.course_id)).all()
+        _member_ids = db.session.scalars(select(Member.member_id)).all()
+        _items = [(_course_id, _member_id, 2)
+                  for _course_id in _course_ids for _member_id in _member_ids]
+        # Add unknown members, so the batch is larger than one IN list
+        _items += [(1, _member_id, 2) for _member_id in range(1000, 1600)]
+
+        _results, _counts = bulk_assign(_items, requester_id=1, requester_is_admin=True)
+        db.session.commit()
+
+        assert len(_results) == len(_items)
+        assert _counts['not_found'] == 600
+        assert db.session.query(Association).filter(Association.role_id == 2).count() == (
+            len(_course_ids) * len(_member_ids))
@@ -0,0 +1,89 @@
+"""Test methods and functions in bulk_export.py and the export API
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import csv
+import gzip
+import io
+import json
+
+from flask import Flask
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.bulk_export import export_chunks, export_statement, gzip_chunks
+from tracker_99.models.models import Association, Member
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_export_chunks(temp_db_app: Flask) -> None:
+    """Test that rows are encoded one batch per chunk, without password hashes.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _count = Association.query.count()
+        _chunks = list(export_chunks(export_statement('associations', 1, True), batch_size=50))
+        assert len(_chunks) == -(-_count // 50)
+
+        _rows = [json.loads(_line) for _chunk in _chunks for _line in _chunk.splitlines()]
+        assert len(_rows) == _count
+        assert set(_rows[0]) == {'course_id', 'member_id', 'role_id'}
+
+        _csv = b''.join(export_chunks(export_statement('members', 1, True), 'csv', batch_size=5))
+        _members = list(csv.DictReader(io.StringIO(_csv.decode('utf-8'))))
+        assert len(_members) == Member.query.count()
+        assert 'password_hash' not in _members[0]
+
+
+def test_gzip_chunks() -> None:
+    """Test that the compressed chunks decompress to the original data.
+
+    :returns: None
+    :rtype: None
+    """
+    _chunks = [f'{{"row":{_i}}}\n'.encode('utf-8') * 100 for _i in range(10)]
+    assert gzip.decompress(b''.join(gzip_chunks(_chunks))) == b''.join(_chunks)
+
+
+def test_export_api(temp_db_app: Flask) -> None:
+    """Test that the export is streamed, compressed if accepted,
+    and limited to assigned courses for members.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _admin = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+        _member = {'Authorization': f'Bearer {encode_auth_token(2)}'}
+
+    assert _client.get('/api/export/members', headers=_member).status_code == 403
+    assert _client.get('/api/export/widgets', headers=_admin).status_code == 404
+    assert _client.get('/api/export/roles?format=xml', headers=_admin).status_code == 400
+
+    _response = _client.get('/api/export/roles', headers=_admin)
+    assert _response.status_code == 200
+    assert _response.is_streamed
+    assert _response.mimetype == 'application/x-ndjson'
+    assert len(_response.get_data().splitlines()) == 4
+
+    _response = _client.get('/api/export/courses?format=csv',
+                            headers={**_member, 'Accept-Encoding': 'gzip'})
+    assert _response.headers['Content-Encoding'] == 'gzip'
+    _courses = list(csv.DictReader(io.StringIO(
+        gzip.decompress(_response.get_data()).decode('utf-8'))))
+    assert len(_courses) == 8
+    assert 'course_key' not in _courses[0]
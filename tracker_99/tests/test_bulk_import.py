@@ -0,0 +1,190 @@
+"""Test methods and functions in bulk_import.py, the import API, and the import command
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import io
+import json
+
+from flask import Flask
+from werkzeug.security import check_password_hash
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.bulk_import import import_rows, read_rows
+from tracker_99.models import db
+from tracker_99.models.models import Course, Member, Role
+from tracker_99.password_service import PasswordService, password_service
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+MEMBERS_NDJSON = '\n'.join(json.dumps(_row) for _row in [
+    {'member_name': 'Farok.Tabr', 'member_email': 'farok.tabr@fremen.com',
+     'password': 'Change.Me.123', 'is_admin': False},
+    {'member_name': 'Shadout.Mapes', 'member_email': 'shadout.mapes@fremen.com',
+     'member_group': 'Sietch Tabr', 'password': 'Change.Me.123'},
+    {'member_name': 'Farok.Again', 'member_email': 'farok.tabr@fremen.com',
+     'password': 'Change.Me.123'},
+    {'member_name': '1nvalid', 'member_email': 'invalid@fremen.com', 'password': 'Change.Me.123'},
+    {'member_name': 'Weak.Password', 'member_email': 'weak@fremen.com', 'password': 'weak'},
+]) + '\n\nnot json\n'
+
+
+def test_import_members(temp_db_app: Flask) -> None:
+    """Test that valid members are inserted with hashed passwords,
+    and invalid or duplicate rows are reported by line number.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _before = Member.query.count()
+        _report = import_rows('members', read_rows(io.StringIO(MEMBERS_NDJSON)),
+                              batch_size=2, workers=1)
+
+        assert _report['rows'] == 6
+        assert _report['inserted'] == 2
+        assert [_error['line'] for _error in _report['errors']] == [3, 4, 5, 7]
+        assert _report['errors'][0]['error'] == 'Member already exists.'
+        assert Member.query.count() == _before + 2
+
+        _member = db.session.scalar(
+            db.select(Member).where(Member.member_email == 'shadout.mapes@fremen.com'))
+        assert _member.member_group == 'Sietch Tabr' and _member.is_admin is False
+        assert check_password_hash(_member.password_hash, 'Change.Me.123')
+
+        # Importing the same file again skips every member
+        _report = import_rows('members', read_rows(io.StringIO(MEMBERS_NDJSON)), workers=1,
+                              max_errors=1)
+        assert _report['inserted'] == 0 and _report['failed'] == 6
+        assert len(_report['errors']) == 1
+
+
+def test_import_members_process_pool(temp_db_app: Flask) -> None:
+    """Test that passwords hashed in a process pool match their members.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _rows = [(_i, {'member_name': f'Member.{_i}', 'member_email': f'member.{_i}@tracker.edu',
+                   'password': f'Change.Me.{_i}'}) for _i in range(1, 5)]
+    with temp_db_app.app_context():
+        _report = import_rows('members', _rows, batch_size=3, workers=2)
+        assert _report['inserted'] == 4
+
+        for _i in range(1, 5):
+            _member = db.session.scalar(
+                db.select(Member).where(Member.member_email == f'member.{_i}@tracker.edu'))
+            assert _member.verify_password(f'Change.Me.{_i}')
+
+
+def test_import_courses_and_roles_from_csv(temp_db_app: Flask) -> None:
+    """Test that courses (with encrypted keys) and roles are imported from CSV.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _courses = (
+        'course_name,course_code,course_group,course_key,course_desc\n'
+        'Intro to Foo,FOO 101,FOO,Change.Me.123,An introduction to Foo.\n'
+        'Intro to Foo,FOO 101,FOO,Change.Me.123,A duplicate.\n'
+        'Intro to Bar,BAR 101,,short,\n'
+    )
+    _roles = 'role_name,role_privilege\nGrader,15\nUnassigned,0\nDuplicate,30\nAuditor,abc\n'
+
+    with temp_db_app.app_context():
+        _report = import_rows('courses', read_rows(io.StringIO(_courses), 'csv'))
+        assert _report['inserted'] == 1
+        assert [_error['line'] for _error in _report['errors']] == [3, 4]
+
+        _course = db.session.scalar(db.select(Course).where(Course.course_code == 'FOO 101'))
+        assert Course.decrypt_text(_course.course_key) == 'Change.Me.123'
+
+        _report = import_rows('roles', read_rows(io.StringIO(_roles), 'csv'))
+        assert _report['inserted'] == 1 and _report['failed'] == 3
+        assert db.session.scalar(
+            db.select(Role.role_privilege).where(Role.role_name == 'Grader')) == 15
+
+
+def test_import_api_and_command(temp_db_app: Flask, tmp_path: str) -> None:
+    """Test that only administrators can import with the API, and that the command imports a file.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param str tmp_path: A temporary directory for the input file
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _admin = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+        _member = {'Authorization': f'Bearer {encode_auth_token(2)}'}
+
+    assert _client.post('/api/import/roles', headers=_member, data='').status_code == 403
+    assert _client.post('/api/import/widgets', headers=_admin, data='').status_code == 404
+
+    _response = _client.post('/api/import/roles', headers=_admin, content_type='text/csv',
+                             data='role_name,role_privilege\nGrader,15\n')
+    assert _response.status_code == 200
+    assert _response.get_json()['inserted'] == 1
+
+    _file = tmp_path / 'members.ndjson'
+    _file.write_text(MEMBERS_NDJSON, encoding='utf-8')
+    _result = temp_db_app.test_cli_runner().invoke(
+        args=['data', 'import', 'members', str(_file), '--workers', '1', '--json'])
+    assert _result.exit_code == 0
+    assert json.loads(_result.output)['inserted'] == 2
+
+
+def test_import_api_uses_password_service(temp_db_app: Flask, monkeypatch) -> None:
+    """Test that the import API hashes passwords in the shared workers of the password service,
+    instead of starting a process pool for the request.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param monkeypatch: The pytest fixture that replaces attributes for the test
+
+    :returns: None
+    :rtype: None
+    """
+    _batches = []
+
+    def _hash_passwords(passwords: list) -> list:
+        """Record the batch, and hash it in the calling thread.
+
+        :param list passwords: The passwords in plain text
+
+        :returns: The password hashes
+        :rtype: list
+        """
+        _batches.append(len(passwords))
+        return PasswordService(workers=1).hash_passwords(passwords)
+
+    def _no_pool(*args, **kwargs) -> None:
+        """Fail if the import starts its own password service.
+
+        :raises AssertionError: Always
+        """
+        raise AssertionError('The import started its own process pool.')
+
+    monkeypatch.setattr(password_service, 'hash_passwords', _hash_passwords)
+    monkeypatch.setattr('tracker_99.bulk_import.PasswordService', _no_pool)
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _admin = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+
+    _response = _client.post('/api/import/members', headers=_admin,
+                             content_type='application/x-ndjson', data=MEMBERS_NDJSON)
+    assert _response.status_code == 200
+    assert _response.get_json()['inserted'] == 2
+    assert _batches == [2]
@@ -0,0 +1,124 @@
+"""Test methods and functions in caches.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import time
+
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import update
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.caches import TTLCache, TokenCache, token_cache, token_versions
+from tracker_99.models import db
+from tracker_99.models.models import Member
+# W0611: Unused app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app, client, temp_db_app
+
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    """Test that a full cache evicts the entry that was used least recently."""
+    _cache = TTLCache(max_size=2, ttl=60)
+    _cache.set('a', 1)
+    _cache.set('b', 2)
+    assert _cache.get('a') == 1
+    _cache.set('c', 3)
+
+    assert _cache.get('b') is None
+    assert _cache.get('a') == 1
+    assert _cache.stats()['evictions'] == 1
+
+
+def test_ttl_cache_expires_entries() -> None:
+    """Test that expired entries are not returned."""
+    _cache = TTLCache(max_size=2, ttl=60)
+    _cache.set('a', 1, ttl=0.01)
+    time.sleep(0.02)
+
+    assert _cache.get('a') is None
+    assert _cache.stats()['size'] == 0
+
+
+def test_token_cache_invalidate_member() -> None:
+    """Test that invalidating a member removes only that member's tokens."""
+    _cache = TokenCache()
+    _exp = time.time() + 60
+    _cache.set_token('token.one', {'sub': '1', 'exp': _exp}, {'member_id': 1, 'is_admin': True})
+    _cache.set_token('token.two', {'sub': '2', 'exp': _exp}, {'member_id': 2, 'is_admin': False})
+    _cache.invalidate_member(1)
+
+    assert _cache.get_token('token.one') is None
+    assert _cache.get_token('token.two')['requester']['member_id'] == 2
+
+
+def test_token_cache_indexes_only_cached_tokens() -> None:
+    """Test that expired and evicted tokens are not left in the member index."""
+    _cache = TokenCache(max_size=1)
+    _exp = time.time() + 60
+    _cache.set_token('token.old', {'sub': '1', 'exp': time.time() - 1}, {'member_id': 1})
+    # pylint: disable-next=protected-access
+    assert not _cache._members
+
+    _cache.set_token('token.one', {'sub': '1', 'exp': _exp}, {'member_id': 1})
+    _cache.set_token('token.two', {'sub': '2', 'exp': _exp}, {'member_id': 2})
+    # pylint: disable-next=protected-access
+    assert _cache._members == {2: {_cache.digest('token.two')}}
+
+
+def test_token_required_uses_cache(client: FlaskClient, app: Flask) -> None:
+    """Test that a second call with the same token is served from the cache.
+
+    :param FlaskClient client: The fixture that sends requests (GET, POST, etc.) to app
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        _auth_token = encode_auth_token(1)
+    _headers = {'Authorization': f'Bearer {_auth_token}'}
+
+    assert client.get('/api/stats/token_cache', headers=_headers).status_code == 200
+    response = client.get('/api/stats/token_cache', headers=_headers)
+    assert response.status_code == 200
+    assert response.json['hits'] == 1
+    assert response.json['misses'] == 1
+
+    # Once the member changes, the token must be verified again
+    token_cache.invalidate_member(1)
+    response = client.get('/api/stats/token_cache', headers=_headers)
+    assert response.json['misses'] == 2
+
+
+def test_cached_token_dropped_when_version_changes(temp_db_app: Flask) -> None:
+    """Test that a cached token is not used once its member's token version changes,
+    even if the change was made by another process, which cannot clear this process's cache.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _headers = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+    assert _client.get('/api/stats/token_cache', headers=_headers).status_code == 200
+
+    # Demote the administrator the way another process would, without touching the token cache
+    with temp_db_app.app_context():
+        db.session.execute(update(Member).where(Member.member_id == 1)
+                           .values(is_admin=False, token_version=Member.token_version + 1))
+        db.session.commit()
+
+    # The cached version is still trusted until it expires (TOKEN_VERSION_TTL)
+    assert _client.get('/api/stats/token_cache', headers=_headers).status_code == 200
+    token_versions.pop(1)
+    assert _client.get('/api/stats/token_cache', headers=_headers).status_code == 403
@@ -0,0 +1,204 @@
+"""Test methods and functions in cli.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from tracker_99.cli import rotate_course_keys
+from tracker_99.key_manager import DEFAULT_KEY_32, key_manager
+from tracker_99.models import db
+from tracker_99.models.models import Course
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+NEW_KEY = 'ZYXWVUTSRQPONMLKJIHGFEDCBAZYXWVU'
+
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture()
+def rotated_key() -> None:
+    """Fixture to make key 2 the active key, and restore the default keys afterward.
+
+    :yields: None
+    :yield type: None
+    """
+    key_manager.load_keys(DEFAULT_KEY_32, {2: NEW_KEY}, 2)
+    yield
+    key_manager.load_keys(DEFAULT_KEY_32)
+
+
+def test_key_ring_prefix_and_legacy_fallback(rotated_key: None) -> None:
+    """Test that new data gets the key ID prefix and legacy data still decrypts.
+
+    :param None rotated_key: The fixture that makes key 2 the active key
+
+    :returns: None
+    :rtype: None
+    """
+    _new = key_manager.encrypt('Change.Me.123')
+    assert _new[0] == 2
+    assert key_manager.decrypt_with_key_id(_new) == ('Change.Me.123', 2)
+
+    key_manager.load_keys(DEFAULT_KEY_32)
+    _legacy = key_manager.encrypt('Change.Me.123')
+    key_manager.load_keys(DEFAULT_KEY_32, {2: NEW_KEY}, 2)
+    assert key_manager.decrypt_with_key_id(_legacy) == ('Change.Me.123', None)
+
+
+def test_rotate_course_keys(temp_db_app: Flask, rotated_key: None, tmp_path: str) -> None:
+    """Test that every course key is re-encrypted, and a second run skips them all.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param None rotated_key: The fixture that makes key 2 the active key
+    :param str tmp_path: A temporary directory for the checkpoint
+
+    :returns: None
+    :rtype: None
+    """
+    _checkpoint = os.path.join(tmp_path, 'rotation.json')
+    with temp_db_app.app_context():
+        _before = key_manager.decrypt_many([_c.course_key for _c in Course.query.all()])
+
+        _totals = rotate_course_keys(5, _checkpoint, report=lambda _msg: None)
+        assert _totals['rotated'] == 16
+        assert not os.path.exists(_checkpoint)
+
+        db.session.expire_all()
+        _courses = Course.query.order_by(Course.course_id).all()
+        assert all(_c.course_key[0] == 2 for _c in _courses)
+        assert key_manager.decrypt_many([_c.course_key for _c in _courses]) == _before
+
+        _totals = rotate_course_keys(5, _checkpoint, report=lambda _msg: None)
+        assert _totals['rotated'] == 0
+        assert _totals['skipped'] == 16
+
+
+def test_rotate_resumes_from_checkpoint(temp_db_app: Flask, rotated_key: None,
+                                        tmp_path: str) -> None:
+    """Test that a rotation resumes after the last committed course.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param None rotated_key: The fixture that makes key 2 the active key
+    :param str tmp_path: A temporary directory for the checkpoint
+
+    :returns: None
+    :rtype: None
+    """
+    _checkpoint = os.path.join(tmp_path, 'rotation.json')
+    with open(_checkpoint, 'w', encoding='utf-8') as _file:
+        json.dump({'active_key_id': 2, 'last_id': 10, 'rotated': 10, 'skipped': 0}, _file)
+
+    with temp_db_app.app_context():
+        _totals = rotate_course_keys(100, _checkpoint, report=lambda _msg: None)
+        assert _totals['rotated'] == 16
+
+        # Courses before the checkpoint were not touched
+        assert key_manager.decrypt_with_key_id(db.session.get(Course, 1).course_key)[1] is None
+        assert key_manager.decrypt_with_key_id(db.session.get(Course, 11).course_key)[1] == 2
+
+
+def test_rotate_keeps_keys_changed_during_rotation(temp_db_app: Flask, rotated_key: None,
+                                                   tmp_path: str, monkeypatch) -> None:
+    """Test that a course key changed between the read and the write is not overwritten,
+    and that the course is retried instead of skipped by the checkpoint.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param None rotated_key: The fixture that makes key 2 the active key
+    :param str tmp_path: A temporary directory for the checkpoint
+    :param monkeypatch: The fixture that replaces the re-encryption for the test
+
+    :returns: None
+    :rtype: None
+    """
+    _reencrypt_many = key_manager.reencrypt_many
+
+    def reencrypt_and_edit(encrypted_items: list) -> list:
+        """Re-encrypt the keys, while the application changes the key of course 3.
+
+        :param list encrypted_items: The encrypted keys
+
+        :returns: The re-encrypted keys
+        :rtype: list
+        """
+        _result = _reencrypt_many(encrypted_items)
+        _calls.append(encrypted_items)
+        if len(_calls) == 1:
+            db.session.execute(db.update(Course).where(Course.course_id == 3)
+                               .values(course_key=key_manager.encrypt('New.Key.123')))
+        return _result
+
+    _calls = []
+    monkeypatch.setattr(key_manager, 'reencrypt_many', reencrypt_and_edit)
+
+    with temp_db_app.app_context():
+        _totals = rotate_course_keys(5, os.path.join(tmp_path, 'rotation.json'),
+                                     report=lambda _msg: None)
+        assert _totals['conflicts'] == 1
+        assert _totals['rotated'] == 15
+        assert _totals['skipped'] == 1
+
+        db.session.expire_all()
+        assert key_manager.decrypt(db.session.get(Course, 3).course_key) == 'New.Key.123'
+        assert all(_c.course_key[0] == 2 for _c in Course.query.all())
+
+
+def test_rotate_command(temp_db_app: Flask, rotated_key: None, tmp_path: str) -> None:
+    """Test the `flask keys rotate` command.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param None rotated_key: The fixture that makes key 2 the active key
+    :param str tmp_path: A temporary directory for the checkpoint
+
+    :returns: None
+    :rtype: None
+    """
+    _result = temp_db_app.test_cli_runner().invoke(
+        args=['keys', 'rotate', '--batch-size', '10',
+              '--checkpoint', os.path.join(tmp_path, 'rotation.json')]
+    )
+    assert _result.exit_code == 0
+    assert 'Rotation complete: 16 re-encrypted' in _result.output
+
+
+def test_rotate_skips_unreadable_keys(temp_db_app: Flask, rotated_key: None,
+                                      tmp_path: str) -> None:
+    """Test that a key encrypted with a key that is not in the ring is skipped and reported,
+    and that the command exits with an error after rotating the other keys.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+    :param None rotated_key: The fixture that makes key 2 the active key
+    :param str tmp_path: A temporary directory for the checkpoint
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        # Encrypt the key of course 4 with a key that is then removed from the ring
+        key_manager.load_keys(DEFAULT_KEY_32, {3: 'Q' * 32}, 3)
+        _lost = key_manager.encrypt('Lost.Key.123')
+        key_manager.load_keys(DEFAULT_KEY_32, {2: NEW_KEY}, 2)
+        db.session.execute(db.update(Course).where(Course.course_id == 4)
+                           .values(course_key=_lost))
+        db.session.commit()
+
+        _totals = rotate_course_keys(5, os.path.join(tmp_path, 'rotation.json'),
+                                     report=lambda _msg: None)
+        assert _totals['unreadable'] == [4]
+        assert _totals['rotated'] == 15 and _totals['skipped'] == 0
+
+    _result = temp_db_app.test_cli_runner().invoke(
+        args=['keys', 'rotate', '--checkpoint', os.path.join(tmp_path, 'rotation.json')])
+    assert _result.exit_code == 1
+    assert 'Rotation complete: 0 re-encrypted, 15 already current' in _result.output
+    assert 'were not re-encrypted: 4.' in _result.output
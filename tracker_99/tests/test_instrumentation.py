@@ -0,0 +1,185 @@
+"""Test methods and functions in instrumentation.py and the JSON-lines access log
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import json
+import logging
+
+import pytest
+from flask import Flask, Response, g, request
+from sqlalchemy import exc, text
+
+from tracker_99 import create_app
+from tracker_99.app_utils import log_page_request
+from tracker_99.instrumentation import fingerprint
+from tracker_99.log_pipeline import JsonLinesFormatter
+from tracker_99.models import db
+from tracker_99.models.models import Member
+# W0611: Unused app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app
+
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+class _ListHandler(logging.Handler):
+    """Keeps formatted records in a list."""
+
+    def __init__(self) -> None:
+        """Initialization."""
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Keep the formatted record.
+
+        :param logging.LogRecord record: The record to keep
+
+        :returns: None
+        :rtype: None
+        """
+        self.lines.append(self.format(record))
+
+
+def _json_log_app() -> tuple:
+    """Create an application that writes JSON access records to a list.
+
+    :returns: The application instance and the handler that holds the records
+    :rtype: tuple
+    """
+    _app = create_app(config_name='testing', log_events=False)
+    _app.config['ACCESS_LOG_FORMAT'] = 'json'
+
+    _handler = _ListHandler()
+    _handler.setFormatter(JsonLinesFormatter(server_ip='127.0.0.1'))
+    _app.logger.addHandler(_handler)
+    _app.logger.setLevel(logging.INFO)
+
+    @_app.after_request
+    def _log(response: Response) -> Response:
+        log_page_request(_app, request, response)
+        return response
+
+    return _app, _handler
+
+
+def test_json_access_record_has_timing() -> None:
+    """Test that an access record is one JSON object with the request and timing fields.
+
+    :returns: None
+    :rtype: None
+    """
+    _app, _handler = _json_log_app()
+    _response = _app.test_client().post(
+        '/api/login', json={'username': 'nobody', 'password': 'Change.Me.123'}
+    )
+    assert _response.status_code == 401
+
+    _entry = json.loads(_handler.lines[-1])
+    assert _entry['type'] == 'access'
+    assert _entry['path'] == '/api/login'
+    assert _entry['endpoint'] == 'api_bp.login'
+    assert _entry['method'] == 'POST'
+    assert _entry['status'] == 401
+    assert _entry['bytes'] == len(_response.data)
+    assert _entry['requester'] is None
+    # The login route looks up the member
+    assert _entry['db_queries'] >= 1
+    assert _entry['wall_ms'] >= _entry['db_ms'] > 0
+
+
+def test_json_event_record_escapes_message() -> None:
+    """Test that other records keep their message, even with commas and quotes.
+
+    :returns: None
+    :rtype: None
+    """
+    _record = logging.LogRecord('test', logging.WARNING, __file__, 1,
+                                'Path "/a,b" not found', None, None)
+    _entry = json.loads(JsonLinesFormatter().format(_record))
+
+    assert _entry['type'] == 'event'
+    assert _entry['level'] == 'WARNING'
+    assert _entry['message'] == 'Path "/a,b" not found'
+
+
+def test_app_without_requests_is_not_timed(app: Flask) -> None:
+    """Test that database statements outside a request do not fail.
+
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        assert Member.query.count() > 0
+
+
+def test_failed_statement_is_timed(app: Flask) -> None:
+    """Test that a statement that raises is counted, and its start time is not left
+    on the pooled connection.
+
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        # The info of the pooled connection outlives the session's Connection
+        _info = db.session.connection().info
+        with pytest.raises(exc.OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+
+        assert not _info.get('query_start')
+        assert g.db_queries == 1
+        assert 'SELECT * FROM no_such_table' in g.db_statements
+
+
+def test_fingerprint_normalizes_values() -> None:
+    """Test that statements that differ only by their values have the same fingerprint.
+
+    :returns: None
+    :rtype: None
+    """
+    _first = fingerprint("SELECT * FROM members\n  WHERE member_id IN (?, ?, ?) AND name = 'a'")
+    _second = fingerprint("SELECT * FROM members WHERE member_id IN (?) AND name = 'it''s'")
+
+    assert _first == _second == 'SELECT * FROM members WHERE member_id IN (?) AND name = ?'
+
+
+def test_server_timing_and_n_plus_one_warning(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the Server-Timing header, and the warning when a statement runs once per row.
+
+    :param pytest.LogCaptureFixture caplog: The fixture that captures log records
+
+    :returns: None
+    :rtype: None
+    """
+    _app = create_app(config_name='testing', log_events=False)
+    _app.config['SERVER_TIMING_ENABLED'] = True
+    _app.config['N_PLUS_ONE_THRESHOLD'] = 5
+
+    @_app.route('/test/n_plus_one')
+    def n_plus_one() -> str:
+        """Query each member separately.
+
+        :returns: The number of members
+        :rtype: str
+        """
+        _ids = [_id for (_id,) in db.session.query(Member.member_id).limit(6)]
+        _members = [db.session.get(Member, _id) for _id in _ids]
+        return str(len(_members))
+
+    with caplog.at_level(logging.WARNING):
+        _response = _app.test_client().get('/test/n_plus_one')
+
+    assert _response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'desc="7 queries"' in _response.headers['Server-Timing']
+    assert 'Possible N+1 query in n_plus_one: 6 of 7 queries' in caplog.text
@@ -0,0 +1,87 @@
+"""Test methods and functions in json_provider.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import base64
+import datetime
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.json_provider import init_json_provider, orjson
+from tracker_99.models import db
+from tracker_99.models.models import Course, Role
+# W0611: Unused app and temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app, temp_db_app
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' and 'temp_db_app' as arguments
+# pylint: disable=redefined-outer-name
+
+
+@pytest.mark.parametrize('use_orjson', [False, True])
+def test_encoders_match(app: Flask, use_orjson: bool) -> None:
+    """Test that both encoders convert bytes, datetimes, and rows the same way.
+
+    :param Flask app: The Flask application instance used for test
+    :param bool use_orjson: Use orjson instead of the standard library
+
+    :returns: None
+    :rtype: None
+    """
+    if use_orjson and orjson is None:
+        pytest.skip('orjson is not installed.')
+
+    with app.app_context():
+        app.json.use_orjson = use_orjson
+        _row = db.session.execute(db.select(Role.role_id, Role.role_name).limit(1)).first()
+        _data = {
+            'key': b'\x00\xffkey',
+            'when': datetime.datetime(2024, 7, 9, 22, 8, 25),
+            'row': _row,
+            'statuses': {200: 1},
+        }
+        _body = json.loads(jsonify(_data).get_data())
+        assert json.loads(app.json.dumps(_data)) == _body
+
+    assert _body == {
+        'key': base64.b64encode(b'\x00\xffkey').decode('ascii'),
+        'when': '2024-07-09T22:08:25',
+        'row': {'role_id': _row.role_id, 'role_name': _row.role_name},
+        'statuses': {'200': 1},
+    }
+
+
+def test_course_keys_are_base64(temp_db_app: Flask) -> None:
+    """Test that the course list returns the encrypted course keys as Base64 text.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _headers = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+        _key = db.session.get(Course, 1).course_key
+
+    _response = _client.get('/api/courses/all?sort=course_id', headers=_headers)
+    assert _response.status_code == 200
+    assert base64.b64decode(_response.get_json()['courses'][0]['course_key']) == _key
+
+
+def test_invalid_json_provider() -> None:
+    """Test that an unknown JSON_PROVIDER is rejected.
+
+    :returns: None
+    :rtype: None
+    """
+    _app = Flask(__name__)
+    _app.config['JSON_PROVIDER'] = 'simplejson'
+    with pytest.raises(ValueError):
+        init_json_provider(_app)
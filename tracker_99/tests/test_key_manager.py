@@ -0,0 +1,54 @@
+"""Test methods and functions in key_manager.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import pytest
+from flask import Flask
+
+from tracker_99.key_manager import KeyManager, key_manager
+from tracker_99.models.models import Course
+# W0611: Unused app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app
+
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_encrypt_decrypt_round_trip() -> None:
+    """Test that encrypted text decrypts to the original text, with a new IV each time."""
+    _first = key_manager.encrypt('Change.Me.123')
+    _second = key_manager.encrypt('Change.Me.123')
+
+    assert _first != _second
+    assert key_manager.decrypt(_first) == 'Change.Me.123'
+    assert Course.decrypt_text(_second) == 'Change.Me.123'
+
+
+def test_many_preserves_order() -> None:
+    """Test that the batch methods return the items in the same order."""
+    _texts = [f'Change.Me.{_i}' for _i in range(100)]
+    assert key_manager.decrypt_many(key_manager.encrypt_many(_texts)) == _texts
+
+
+def test_decrypts_existing_course_keys(app: Flask) -> None:
+    """Test that keys encrypted before the key manager existed still decrypt.
+
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        _keys = [_course.course_key for _course in Course.query.limit(3).all()]
+        assert all(key_manager.decrypt_many(_keys))
+
+
+def test_invalid_key_length_fail() -> None:
+    """Test that a key that is not 32 bytes is rejected when it is loaded."""
+    with pytest.raises(ValueError):
+        KeyManager().load_key('too short')
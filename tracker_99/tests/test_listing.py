@@ -0,0 +1,199 @@
+"""Test methods and functions in listing.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import base64
+import json
+
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_login import current_user
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.caches import listing_counts
+from tracker_99.listing import (COURSE_LISTING_COLUMNS, _encode_cursor, course_listing_query,
+                                fetch_page, parse_api_listing_args, parse_datatables_args)
+from tracker_99.models import db
+from tracker_99.models.models import Course
+# W0611: Unused app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app, client, temp_db_app
+
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_keyset_page_matches_offset_page(app: Flask) -> None:
+    """Test that seeking with a cursor returns the same rows as skipping with an offset.
+
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        _stmt, _columns = course_listing_query(1, True)
+        _first = fetch_page(_stmt, _columns, Course.course_id, sort='course_group', length=5)
+        _seek = fetch_page(_stmt, _columns, Course.course_id, sort='course_group', length=5,
+                           after=_first['cursor'])
+        _skip = fetch_page(_stmt, _columns, Course.course_id, sort='course_group', length=5,
+                           start=5)
+
+        assert len(_first['rows']) == 5
+        assert [r.course_id for r in _seek['rows']] == [r.course_id for r in _skip['rows']]
+
+
+def test_cursor_ignored_when_filters_change(app: Flask) -> None:
+    """Test that a cursor from a different search is not applied.
+
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        _stmt, _columns = course_listing_query(1, True)
+        _first = fetch_page(_stmt, _columns, Course.course_id, length=2)
+        _page = fetch_page(_stmt, _columns, Course.course_id, length=2,
+                           searches={'course_group': 'CMSC'}, after=_first['cursor'])
+
+        assert _page['filtered'] == 4
+        assert [r.course_code for r in _page['rows']] == ['CMSC 495', 'CMSC 215']
+
+
+def test_member_listing_only_assigned_courses(app: Flask) -> None:
+    """Test that members only see the courses they are assigned to, with their role.
+
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        _stmt, _columns = course_listing_query(2, False)
+        _page = fetch_page(_stmt, _columns, Course.course_id, sort='course_id')
+
+        assert _page['total'] == 8
+        assert _page['rows'][0].course_id == 1
+        assert _page['rows'][0].role_name == 'Chair'
+
+
+def test_parse_datatables_args_clamps_length() -> None:
+    """Test that a request for all rows (-1) returns one bounded page."""
+    _options = parse_datatables_args(
+        {'draw': '3', 'length': '-1', 'order[0][column]': '2', 'order[0][dir]': 'desc'},
+        COURSE_LISTING_COLUMNS
+    )
+    assert _options['draw'] == 3
+    assert _options['sort'] == 'course_code'
+    assert _options['direction'] == 'desc'
+    assert _options['length'] == 100
+
+
+def test_courses_data_code_pass(client: FlaskClient, app: Flask) -> None:
+    """Test the response to a DataTables request for a page of courses.
+
+    :param FlaskClient client: The fixture that sends requests (GET, POST, etc.) to app
+    :param Flask app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    # Act as an authenticated administrator for testing
+    with app.test_request_context():
+        current_user.is_admin = True
+
+        response = client.get('/courses/data?draw=1&start=0&length=10')
+        assert response.status_code == 200
+        assert response.json['recordsTotal'] == 16
+        assert len(response.json['data']) == 10
+        assert response.json['cursor'] is not None
+
+
+def test_row_counts_are_cached_until_the_tables_change(temp_db_app: Flask) -> None:
+    """Test that the next pages of a listing reuse the row counts, until a listed table changes.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _stmt, _columns = course_listing_query(1, True)
+        _search = {'searches': {'course_group': 'CMSC'}}
+        _first = fetch_page(_stmt, _columns, Course.course_id, length=2, **_search)
+        assert listing_counts.stats()['misses'] == 2
+
+        _next = fetch_page(_stmt, _columns, Course.course_id, length=2, after=_first['cursor'],
+                           **_search)
+        assert (_next['total'], _next['filtered']) == (_first['total'], _first['filtered'])
+        assert listing_counts.stats()['hits'] == 2
+
+        _course = db.session.scalars(
+            db.select(Course).where(Course.course_group != 'CMSC').limit(1)).one()
+        _course.course_group = 'CMSC'
+        db.session.commit()
+        _changed = fetch_page(_stmt, _columns, Course.course_id, length=2, **_search)
+        assert _changed['total'] == _first['total']
+        assert _changed['filtered'] == _first['filtered'] + 1
+
+
+def test_api_course_list_is_unpaged_by_default(temp_db_app: Flask) -> None:
+    """Test that API clients that do not ask for a page still get every course.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    assert parse_api_listing_args({}, COURSE_LISTING_COLUMNS)['length'] is None
+    assert parse_api_listing_args({'limit': '5'}, COURSE_LISTING_COLUMNS)['length'] == 5
+
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _headers = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+
+    _response = _client.get('/api/courses/all', headers=_headers)
+    assert _response.status_code == 200
+    assert len(_response.json['courses']) == _response.json['total'] == 16
+    assert _response.json['next_cursor'] is None
+
+    _response = _client.get('/api/courses/all?limit=5', headers=_headers)
+    assert len(_response.json['courses']) == 5
+    assert _response.json['next_cursor'] is not None
+
+
+def test_forged_cursor_is_ignored(temp_db_app: Flask) -> None:
+    """Test that unsigned cursors, and signed cursors with values of the wrong type,
+    return the first page instead of an error.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _headers = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+        _first = _client.get('/api/courses/all?limit=5', headers=_headers).json
+        _fingerprint = json.loads(base64.urlsafe_b64decode(
+            _first['next_cursor'].split('.')[0]))['f']
+
+        _values = {'f': _fingerprint, 'v': {'x': 1}, 'i': 1}
+        _unsigned = base64.urlsafe_b64encode(json.dumps(_values).encode('utf-8')).decode('ascii')
+        _cursors = [
+            _unsigned,
+            f'{_unsigned}.forged',
+            _encode_cursor(_values),
+            _encode_cursor({**_values, 'v': 'CMSC 115', 'i': 'x'}),
+            _encode_cursor({**_values, 'v': True, 'i': 1}),
+        ]
+
+    for _cursor in _cursors:
+        _response = _client.get(f'/api/courses/all?limit=5&after={_cursor}', headers=_headers)
+        assert _response.status_code == 200
+        assert _response.json['courses'] == _first['courses']
@@ -0,0 +1,162 @@
+"""Test methods and functions in log_pipeline.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import logging
+import os
+import threading
+import time
+
+from tracker_99.log_pipeline import _SENTINEL, BatchedRotatingFileHandler, LogPipeline
+
+
+def _logger(name: str, pipeline: LogPipeline) -> logging.Logger:
+    """Create a logger that only writes to the pipeline.
+
+    :param str name: The name of the logger
+    :param LogPipeline pipeline: The pipeline
+
+    :returns: The logger
+    :rtype: logging.Logger
+    """
+    _log = logging.getLogger(name)
+    _log.propagate = False
+    _log.handlers = [pipeline.handler]
+    _log.setLevel(logging.INFO)
+    return _log
+
+
+def test_pipeline_writes_all_records(tmp_path: str) -> None:
+    """Test that every queued record is written by the time the pipeline stops.
+
+    :param str tmp_path: A temporary directory for the log file
+
+    :returns: None
+    :rtype: None
+    """
+    _path = os.path.join(tmp_path, 'test.log')
+    _pipeline = LogPipeline(BatchedRotatingFileHandler(_path, encoding='utf-8'),
+                            max_size=1000, batch_size=50)
+    _pipeline.start()
+    _log = _logger('test_pipeline_writes_all_records', _pipeline)
+    for _i in range(200):
+        _log.info('Request %d', _i)
+    _pipeline.stop()
+
+    with open(_path, 'r', encoding='utf-8') as _file:
+        _lines = _file.read().splitlines()
+
+    assert _lines[0] == 'Request 0'
+    assert len(_lines) == 200
+    assert _pipeline.stats()['written'] == 200
+    assert _pipeline.stats()['dropped'] == 0
+
+
+def test_drop_new_policy_counts_drops(tmp_path: str) -> None:
+    """Test that a full queue drops new records without blocking.
+
+    :param str tmp_path: A temporary directory for the log file
+
+    :returns: None
+    :rtype: None
+    """
+    _path = os.path.join(tmp_path, 'test.log')
+    # Do not start the pipeline, so the queue fills up
+    _pipeline = LogPipeline(BatchedRotatingFileHandler(_path, encoding='utf-8'), max_size=5)
+    _log = _logger('test_drop_new_policy_counts_drops', _pipeline)
+    for _i in range(8):
+        _log.info('Request %d', _i)
+
+    assert _pipeline.stats()['queued'] == 5
+    assert _pipeline.stats()['dropped'] == 3
+    assert _pipeline.queue.get_nowait().getMessage() == 'Request 0'
+
+
+def test_drop_oldest_policy_keeps_newest(tmp_path: str) -> None:
+    """Test that a full queue discards the oldest records to make room.
+
+    :param str tmp_path: A temporary directory for the log file
+
+    :returns: None
+    :rtype: None
+    """
+    _path = os.path.join(tmp_path, 'test.log')
+    _pipeline = LogPipeline(BatchedRotatingFileHandler(_path, encoding='utf-8'), max_size=5,
+                            policy='drop_oldest')
+    _log = _logger('test_drop_oldest_policy_keeps_newest', _pipeline)
+    for _i in range(8):
+        _log.info('Request %d', _i)
+
+    assert _pipeline.stats()['dropped'] == 3
+    assert _pipeline.queue.get_nowait().getMessage() == 'Request 3'
+
+
+def test_drop_oldest_policy_keeps_stop_sentinel(tmp_path: str) -> None:
+    """Test that a full queue drops the new record instead of the stop sentinel.
+
+    :param str tmp_path: A temporary directory for the log file
+
+    :returns: None
+    :rtype: None
+    """
+    _path = os.path.join(tmp_path, 'test.log')
+    _pipeline = LogPipeline(BatchedRotatingFileHandler(_path, encoding='utf-8'), max_size=2,
+                            policy='drop_oldest', flush_interval=60)
+    _log = _logger('test_drop_oldest_policy_keeps_stop_sentinel', _pipeline)
+    _pipeline.queue.put_nowait(_SENTINEL)
+    _log.info('Request 0')
+    _log.info('Request 1')
+
+    assert _pipeline.stats()['dropped'] == 1
+    assert _SENTINEL in list(_pipeline.queue.queue)
+
+    # The thread writes the queued record and stops on the sentinel, without waiting for a batch
+    _pipeline.start()
+    # pylint: disable-next=protected-access
+    _pipeline._thread.join(1)
+    # pylint: disable-next=protected-access
+    assert not _pipeline._thread.is_alive()
+    assert _pipeline.stats()['written'] == 1
+    _pipeline.stop()
+
+
+def test_stop_does_not_hang_when_stuck(tmp_path: str) -> None:
+    """Test that stopping returns in time when the queue is full and the writer is stuck.
+
+    :param str tmp_path: A temporary directory for the log file
+
+    :returns: None
+    :rtype: None
+    """
+    _release = threading.Event()
+
+    class StuckHandler(logging.Handler):
+        """A handler whose first write waits until the test releases it."""
+
+        def emit(self, record: logging.LogRecord) -> None:
+            """Wait for the test instead of writing the record.
+
+            :param logging.LogRecord record: The record to write
+
+            :returns: None
+            :rtype: None
+            """
+            _release.wait(5)
+
+    _pipeline = LogPipeline(StuckHandler(), max_size=2, batch_size=1, flush_interval=0.01)
+    _pipeline.start()
+    _log = _logger('test_stop_does_not_hang_when_stuck', _pipeline)
+    for _i in range(10):
+        _log.info('Request %d', _i)
+    assert _pipeline.stats()['depth'] == 2
+
+    _start = time.monotonic()
+    _pipeline.stop(timeout=0.2)
+    assert time.monotonic() - _start < 1.0
+
+    # Once the writer recovers, it writes what is left and stops
+    _release.set()
+    time.sleep(0.2)
+    assert _pipeline.stats()['depth'] == 0
@@ -0,0 +1,131 @@
+"""Test methods and functions in log_report.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import json
+import os
+
+from flask import Flask
+
+from tracker_99.log_report import LatencyHistogram, build_report
+# W0611: Unused app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' as an argument
+# pylint: disable=redefined-outer-name
+
+CSV_LOG = (
+    '"date_time", "server_ip", "process_id", "msg_level", "message"\n'
+    '"2024-07-09 22:08:25,132", "127.0.0.1", "9132", "INFO", "Starting tracker_99 application."\n'
+    '"2024-07-09 22:08:26,001", "127.0.0.1", "9132", "INFO", '
+    '"/courses requested by 127.0.0.1 (USER:1) using GET; 200 OK."\n'
+    '"2024-07-09 22:08:27,001", "127.0.0.1", "9132", "INFO", '
+    '"/courses requested by 127.0.0.1 (ANON) using GET; 302 FOUND."\n'
+)
+
+
+def _write_logs(log_dir: str) -> None:
+    """Write a CSV log, and a rotated JSON-lines log with 100 timed requests.
+
+    :param str log_dir: The directory for the log files
+
+    :returns: None
+    :rtype: None
+    """
+    with open(os.path.join(log_dir, 'tracker_99_1.log'), 'w', encoding='utf-8') as _file:
+        _file.write(CSV_LOG)
+
+    with open(os.path.join(log_dir, 'tracker_99_2.jsonl.1'), 'w', encoding='utf-8') as _file:
+        _file.write(json.dumps({'type': 'event', 'message': 'Starting.'}) + '\n')
+        for _i in range(1, 101):
+            _file.write(json.dumps({
+                'type': 'access', 'path': '/api/courses/all', 'endpoint': 'api_bp.api_courses_all',
+                'status': 200 if _i <= 90 else 500, 'requester': 2, 'wall_ms': float(_i),
+            }, separators=(',', ':')) + '\n')
+
+
+def test_latency_histogram_percentiles() -> None:
+    """Test that the estimated percentiles are within 5% of the exact values.
+
+    :returns: None
+    :rtype: None
+    """
+    _histogram = LatencyHistogram()
+    for _i in range(1, 1001):
+        _histogram.add(float(_i))
+
+    for _percent in (50, 95, 99):
+        assert _percent * 10 <= _histogram.percentile(_percent) <= _percent * 10 * 1.05
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_build_report_reads_both_formats(tmp_path: str) -> None:
+    """Test that CSV and rotated JSON-lines logs are counted together.
+
+    :param str tmp_path: A temporary directory for the log files
+
+    :returns: None
+    :rtype: None
+    """
+    _write_logs(tmp_path)
+    _report = build_report(str(tmp_path)).to_dict(top=2)
+
+    assert _report['files'] == 2
+    assert _report['requests'] == 102
+
+    _api, _courses = _report['endpoints']
+    assert _api['endpoint'] == 'api_bp.api_courses_all'
+    assert _api['statuses'] == {200: 90, 500: 10}
+    assert 50 <= _api['p50_ms'] <= 52.5
+    assert 99 <= _api['p99_ms'] <= 104
+
+    # CSV logs do not have endpoints or timing
+    assert _courses == {'endpoint': '/courses', 'requests': 2, 'statuses': {200: 1, 302: 1}}
+    assert _report['top_requesters'] == [('USER:2', 100), ('USER:1', 1)]
+
+
+def test_report_command(app: Flask, tmp_path: str) -> None:
+    """Test the `flask tracker-logs report` command.
+
+    :param Flask app: The Flask application instance used for test
+    :param str tmp_path: A temporary directory for the log files
+
+    :returns: None
+    :rtype: None
+    """
+    _write_logs(tmp_path)
+    _result = app.test_cli_runner().invoke(
+        args=['tracker-logs', 'report', '--log-dir', str(tmp_path), '--json']
+    )
+    assert _result.exit_code == 0
+    assert json.loads(_result.output)['requests'] == 102
+
+
+def test_build_report_skips_damaged_records(tmp_path: str) -> None:
+    """Test that JSON access records with fields of the wrong type are skipped,
+    instead of failing the report.
+
+    :param str tmp_path: A temporary directory for the log files
+
+    :returns: None
+    :rtype: None
+    """
+    _records = [
+        {'type': 'access', 'endpoint': 'main_bp.index', 'status': 200, 'wall_ms': 5},
+        {'type': 'access', 'endpoint': 'main_bp.index', 'status': 200, 'wall_ms': 'slow'},
+        {'type': 'access', 'endpoint': 'main_bp.index', 'status': 200, 'wall_ms': True},
+        {'type': 'access', 'endpoint': ['main_bp.index'], 'status': 200},
+        {'type': 'access', 'endpoint': 'main_bp.index', 'status': {'code': 200}},
+    ]
+    with open(os.path.join(tmp_path, 'tracker_99_1.log'), 'w', encoding='utf-8') as _file:
+        for _record in _records:
+            _file.write(json.dumps(_record, separators=(',', ':')) + '\n')
+        _file.write('{"type":"access", "wall_ms": \n')
+
+    _report = build_report(str(tmp_path), workers=2).to_dict()
+    assert _report['requests'] == 1
+    assert _report['endpoints'][0]['statuses'] == {200: 1}
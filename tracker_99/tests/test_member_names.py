@@ -0,0 +1,151 @@
+"""Test the lowercase member names used by both logins and the member forms
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import io
+import json
+
+import pytest
+from flask import Flask, session
+from sqlalchemy import exc, select, text
+
+from tracker_99.bulk_import import import_rows, read_rows
+from tracker_99.models import db
+from tracker_99.models.create_db import upgrade_db
+from tracker_99.models.models import Member
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_model_keeps_lowercase_name(temp_db_app: Flask) -> None:
+    """Test that the lowercase name is set with the member name, and is unique.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _member = Member('Farok.Tabr', 'farok.tabr@fremen.com', 'fremen', 'Change.Me.123')
+        assert _member.member_name_lower == 'farok.tabr'
+        db.session.add(_member)
+        db.session.commit()
+
+        _member.member_name = 'Farok.TABR.Naib'
+        db.session.commit()
+        assert db.session.scalar(
+            select(Member.member_name_lower).where(Member.member_id == _member.member_id)
+        ) == 'farok.tabr.naib'
+
+        # Names that only differ by case are duplicates
+        db.session.add(Member('LETO.atreides', 'leto.2@atreides.com', 'atreides', 'Change.Me.123'))
+        with pytest.raises(exc.IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_logins_ignore_case(temp_db_app: Flask) -> None:
+    """Test that both logins find members regardless of case, and only by exact name.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    temp_db_app.config['WTF_CSRF_ENABLED'] = False
+    _client = temp_db_app.test_client()
+
+    _response = _client.post(
+        '/api/login', json={'username': 'LETO.atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 200
+    # ILIKE treated '_' as a wildcard, so 'Leto_Atreides' matched 'Leto.Atreides'
+    _response = _client.post(
+        '/api/login', json={'username': 'Leto_Atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 401
+    _response = _client.post('/api/login', json={'username': None, 'password': 'Change.Me.123'})
+    assert _response.status_code == 401
+
+    with _client:
+        _response = _client.post(
+            '/login', data={'member_name': 'leto.ATREIDES', 'password': 'Change.Me.123'})
+        assert _response.status_code == 302
+        assert session['_user_id'] == 2
+
+
+def test_import_rejects_names_that_differ_by_case(temp_db_app: Flask) -> None:
+    """Test that imported members get the lowercase name, and duplicate names are reported.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _rows = '\n'.join(json.dumps(_row) for _row in [
+        {'member_name': 'Farok.Tabr', 'member_email': 'farok.tabr@fremen.com',
+         'password': 'Change.Me.123'},
+        {'member_name': 'FAROK.TABR', 'member_email': 'farok.2@fremen.com',
+         'password': 'Change.Me.123'},
+        {'member_name': 'stilgar.TABR', 'member_email': 'stilgar.2@fremen.com',
+         'password': 'Change.Me.123'},
+    ])
+    with temp_db_app.app_context():
+        _report = import_rows('members', read_rows(io.StringIO(_rows)), workers=1)
+
+        assert _report['inserted'] == 1
+        assert [_error['line'] for _error in _report['errors']] == [2, 3]
+        assert db.session.scalar(
+            select(Member.member_name_lower).where(Member.member_name == 'Farok.Tabr')
+        ) == 'farok.tabr'
+
+
+def test_upgrade_db_backfills_lowercase_names(temp_db_app: Flask) -> None:
+    """Test that existing databases get the lowercase names and their index at startup.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        db.session.execute(text('DROP INDEX ix_members_member_name_lower'))
+        db.session.execute(text('ALTER TABLE members DROP COLUMN member_name_lower'))
+        db.session.commit()
+        db.session.close()
+
+        upgrade_db()
+
+        _rows = db.session.execute(
+            text('SELECT member_name, member_name_lower FROM members')).all()
+        assert _rows and all(_lower == _name.lower() for _name, _lower in _rows)
+        assert db.session.scalar(text(
+            "SELECT sql FROM sqlite_master WHERE name = 'ix_members_member_name_lower'"
+        )).startswith('CREATE UNIQUE INDEX')
+
+
+def test_upgrade_db_reports_case_duplicates(temp_db_app: Flask) -> None:
+    """Test that the upgrade stops, and lists the names, if member names only differ in case.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        db.session.execute(text('DROP INDEX ix_members_member_name_lower'))
+        db.session.execute(text('ALTER TABLE members DROP COLUMN member_name_lower'))
+        db.session.execute(text(
+            "UPDATE members SET member_name = 'LETO.ATREIDES' WHERE member_id = 3"))
+        db.session.commit()
+        db.session.close()
+
+        with pytest.raises(RuntimeError, match='Leto.Atreides, LETO.ATREIDES'):
+            upgrade_db()
+        assert db.session.scalar(text(
+            "SELECT sql FROM sqlite_master WHERE name = 'ix_members_member_name_lower'")) is None
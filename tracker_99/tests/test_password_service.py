@@ -0,0 +1,291 @@
+"""Test methods and functions in password_service.py, and the logins that use it
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import json
+import threading
+
+import pytest
+from flask import Flask
+from sqlalchemy import select
+
+from tracker_99.models import db
+from tracker_99.models.models import Member
+from tracker_99.password_service import (PasswordService, PasswordServiceBusy, calibrate,
+                                         normalize_hash_method, password_service)
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def _hold_slot(service: PasswordService) -> tuple:
+    """Take one of the service's slots until the returned event is set.
+
+    :param PasswordService service: The password service
+
+    :returns: The event that releases the slot, and the thread that holds it
+    :rtype: tuple
+    """
+    _release = threading.Event()
+    _started = threading.Event()
+
+    def hold() -> None:
+        """Hold the slot in the calling thread.
+
+        :returns: None
+        :rtype: None
+        """
+        # pylint: disable-next=protected-access
+        service._run(lambda: _started.set() or _release.wait(5))
+
+    _thread = threading.Thread(target=hold)
+    _thread.start()
+    assert _started.wait(5)
+    return _release, _thread
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_hash_and_verify(workers: int) -> None:
+    """Test that passwords are hashed and verified in the calling thread or in worker processes,
+    and that the latency of each hash is recorded.
+
+    :param int workers: The number of workers (1 hashes in the calling thread)
+
+    :returns: None
+    :rtype: None
+    """
+    _service = PasswordService(workers=workers)
+    try:
+        _hash = _service.hash_password('Change.Me.123')
+        assert _hash.startswith('scrypt:')
+        assert _service.verify_password(_hash, 'Change.Me.123') is True
+        assert _service.verify_password(_hash, 'Change.Me.321') is False
+
+        _stats = _service.stats()
+        assert _stats['completed'] == 3 and _stats['rejected'] == 0 and _stats['pending'] == 0
+        assert 0 < _stats['p50_ms'] <= _stats['p99_ms'] <= _stats['max_ms']
+    finally:
+        _service.shutdown()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_hash_passwords(workers: int) -> None:
+    """Test that a batch of passwords is hashed in order, in chunks of one hash per worker,
+    so the batch never holds more slots than there are workers.
+
+    :param int workers: The number of workers (1 hashes in the calling thread)
+
+    :returns: None
+    :rtype: None
+    """
+    _service = PasswordService(workers=workers, max_pending=4)
+    _peaks = []
+    # pylint: disable-next=protected-access
+    _admit = _service._admit
+
+    def _record(timeout: object) -> object:
+        """Record the number of admitted hashes after each admission.
+
+        :param object timeout: The timeout passed to `_admit()`
+
+        :returns: The semaphore from `_admit()`
+        :rtype: object
+        """
+        _slots = _admit(timeout)
+        _peaks.append(_service.pending)
+        return _slots
+
+    _service._admit = _record  # pylint: disable=protected-access
+    try:
+        _passwords = [f'Change.Me.{_i}' for _i in range(5)]
+        _hashes = _service.hash_passwords(_passwords)
+        assert len(_hashes) == 5 and max(_peaks) == workers
+        assert all(_service.verify_password(_hash, _password)
+                   for _hash, _password in zip(_hashes, _passwords))
+        assert _service.hash_passwords([]) == []
+        assert _service.stats()['pending'] == 0 and _service.stats()['rejected'] == 0
+    finally:
+        _service.shutdown()
+
+
+def test_full_service_fails_fast() -> None:
+    """Test that hashes are rejected, not queued, while the service is full.
+
+    :returns: None
+    :rtype: None
+    """
+    _service = PasswordService(workers=1, max_pending=1, retry_after=3)
+    _release, _thread = _hold_slot(_service)
+    try:
+        with pytest.raises(PasswordServiceBusy) as _error:
+            _service.hash_password('Change.Me.123')
+        assert _error.value.retry_after == 3
+        assert _service.stats()['pending'] == 1 and _service.stats()['rejected'] == 1
+    finally:
+        _release.set()
+        _thread.join()
+
+    assert _service.hash_password('Change.Me.123').startswith('scrypt:')
+    assert _service.stats()['completed'] == 2
+
+
+def test_logins_return_503_while_full(temp_db_app: Flask) -> None:
+    """Test that both logins return 503 with Retry-After while the service is full,
+    and that the hashing time is reported in Server-Timing.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    temp_db_app.config.update({'WTF_CSRF_ENABLED': False, 'SERVER_TIMING_ENABLED': True})
+    _client = temp_db_app.test_client()
+    _credentials = {'username': 'Leto.Atreides', 'password': 'Change.Me.123'}
+
+    password_service.configure(workers=1, max_pending=1, queue_timeout=0.0, retry_after=2)
+    _release, _thread = _hold_slot(password_service)
+    try:
+        _response = _client.post('/api/login', json=_credentials)
+        assert _response.status_code == 503
+        assert _response.headers['Retry-After'] == '2'
+
+        _response = _client.post('/login', data={'member_name': 'Leto.Atreides',
+                                                 'password': 'Change.Me.123'})
+        assert _response.status_code == 503
+        assert _response.headers['Retry-After'] == '2'
+    finally:
+        _release.set()
+        _thread.join()
+
+    _response = _client.post('/api/login', json=_credentials)
+    assert _response.status_code == 200
+    assert 'hash;dur=' in _response.headers['Server-Timing']
+
+
+def test_member_changes_return_503_while_full(temp_db_app: Flask) -> None:
+    """Test that adding or editing a member with a password returns 503 with Retry-After
+    while the service is full, instead of an error, and saves nothing.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    temp_db_app.config.update({'WTF_CSRF_ENABLED': False})
+    _client = temp_db_app.test_client()
+    _token = _client.post('/api/login', json={
+        'username': 'Admin', 'password': 'Change.Me.321'}).get_json()['auth_token']
+    _admin = {'Authorization': f'Bearer {_token}'}
+    _client.post('/login', data={'member_name': 'Admin', 'password': 'Change.Me.321'})
+    _new = {'member_name': 'Farok.Tabr', 'member_email': 'farok.tabr@fremen.com',
+            'member_group': 'fremen', 'password': 'Change.Me.123'}
+
+    password_service.configure(workers=1, max_pending=1, queue_timeout=0.0, retry_after=2)
+    _release, _thread = _hold_slot(password_service)
+    try:
+        _responses = [
+            _client.post('/api/members/add', headers=_admin, json={**_new, 'is_admin': False}),
+            _client.put('/api/members/edit/2', headers=_admin, json={'password': 'Change.Me.456'}),
+            _client.post('/admin/add_member', data={**_new, 'password2': 'Change.Me.123'}),
+            _client.post('/admin/edit_member/2', data={
+                'member_name': 'Leto.Atreides', 'member_email': 'leto.atreides@atreides.com',
+                'member_group': 'atreides', 'password': 'Change.Me.456',
+                'password2': 'Change.Me.456'}),
+        ]
+    finally:
+        _release.set()
+        _thread.join()
+
+    for _response in _responses:
+        assert _response.status_code == 503
+        assert _response.headers['Retry-After'] == '2'
+    assert b'try again' in _responses[2].get_data()
+    with temp_db_app.app_context():
+        assert db.session.scalar(
+            select(Member).where(Member.member_name == 'Farok.Tabr')) is None
+        assert db.session.get(Member, 2).verify_password('Change.Me.123')
+
+
+def test_hash_method_policy() -> None:
+    """Test that hash methods are written in full, and hashes made with another method are found.
+
+    :returns: None
+    :rtype: None
+    """
+    assert normalize_hash_method('scrypt') == 'scrypt:32768:8:1'
+    assert normalize_hash_method('pbkdf2:sha512:1000') == 'pbkdf2:sha512:1000'
+    for _method in ('md5', 'scrypt:1000:8:1', 'pbkdf2:sha256:many'):
+        with pytest.raises(ValueError):
+            normalize_hash_method(_method)
+
+    _service = PasswordService(method='pbkdf2:sha256:1000')
+    _hash = _service.hash_password('Change.Me.123')
+    assert _hash.startswith('pbkdf2:sha256:1000$')
+    assert _service.needs_rehash(_hash) is False
+    assert _service.needs_rehash('scrypt:32768:8:1$salt$hash') is True
+
+
+def test_logins_rehash_to_the_current_method(temp_db_app: Flask) -> None:
+    """Test that both logins replace hashes made with another method, without revoking tokens.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    temp_db_app.config['WTF_CSRF_ENABLED'] = False
+    password_service.configure(workers=1, max_pending=16, queue_timeout=0.0, retry_after=1,
+                               method='pbkdf2:sha256:1000')
+    _client = temp_db_app.test_client()
+
+    _response = _client.post(
+        '/api/login', json={'username': 'Leto.Atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 200
+    _response = _client.post(
+        '/login', data={'member_name': 'Paul.Atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 302
+
+    with temp_db_app.app_context():
+        _members = db.session.execute(
+            select(Member.password_hash, Member.token_version).where(Member.member_id.in_((2, 3)))
+        ).all()
+        assert all(_hash.startswith('pbkdf2:sha256:1000$') for _hash, _ in _members)
+        assert all(_version == 0 for _, _version in _members)
+
+    # The new hash verifies, and is not replaced again
+    _response = _client.post(
+        '/api/login', json={'username': 'Leto.Atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 200
+    assert password_service.stats()['completed'] == 5
+
+
+def test_calibrate(temp_db_app: Flask) -> None:
+    """Test that the costliest method within the target time is recommended.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _candidates = ('pbkdf2:sha256:1000', 'pbkdf2:sha256:200000')
+    _calibration = calibrate(_candidates, target_ms=60000, samples=1)
+    assert [_result['method'] for _result in _calibration['results']] == list(_candidates)
+    assert _calibration['recommended'] == 'pbkdf2:sha256:200000'
+    assert calibrate(_candidates, target_ms=0.000001, samples=1)['recommended'] is None
+
+    _runner = temp_db_app.test_cli_runner()
+    _result = _runner.invoke(args=['passwords', 'calibrate', '--method', 'pbkdf2:sha256:1000',
+                                   '--samples', '1', '--json'])
+    assert _result.exit_code == 0, _result.output
+    _output = json.loads(_result.output)
+    assert _output['current'] == 'scrypt:32768:8:1'
+    assert [_r['method'] for _r in _output['results']] == ['pbkdf2:sha256:1000', 'scrypt:32768:8:1']
+
+    _result = _runner.invoke(args=['passwords', 'calibrate', '--method', 'md5'])
+    assert _result.exit_code == 2
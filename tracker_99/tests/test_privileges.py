@@ -0,0 +1,83 @@
+"""Test methods and functions in privileges.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+from flask import Flask
+from sqlalchemy import event
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.assignments import apply_assignments
+from tracker_99.caches import privilege_maps
+from tracker_99.models import db
+from tracker_99.privileges import course_privilege, course_privileges
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_privileges_are_read_once(temp_db_app: Flask) -> None:
+    """Test that a member's privileges in every course are read with one query,
+    and read again after an assignment changes.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.test_request_context():
+        privilege_maps.clear()
+        _statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: 'table_versions' in args[2] or _statements.append(args[2]))
+
+        # Member 2 is the chair of course 1 and a teacher in course 3
+        assert course_privilege(1, 2) == 30
+        assert course_privilege(3, 2) == 20
+        assert course_privilege(2, 2) is None
+        assert len(course_privileges(2)) == 8
+        assert len(_statements) == 1
+
+        apply_assignments(upserts=[(2, 2, 3)])
+        db.session.commit()
+        assert course_privilege(2, 2) == 10
+        assert len(_statements) == 3
+
+
+def test_routes_share_the_privileges(temp_db_app: Flask) -> None:
+    """Test that the admin pages and the API check privileges with one query per request.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _teacher = {'Authorization': f'Bearer {encode_auth_token(3)}'}
+        _statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: _statements.append(args[2]))
+
+    with _client.session_transaction() as _session:
+        # Log in as member 3, a teacher in course 1
+        _session['_user_id'] = 3
+
+    privilege_maps.clear()
+    assert _client.get('/admin/view_course/1').status_code == 200
+    assert _client.get('/admin/delete_course/1').status_code == 403
+    # Both pages reused the map cached by the first page
+    assert sum('FROM associations \nWHERE associations.member_id' in _statement
+               for _statement in _statements) == 1
+
+    # A teacher can edit a course, but not delete it
+    assert _client.delete('/api/courses/delete/1', headers=_teacher).status_code == 403
+    assert _client.put('/api/courses/edit/1', headers=_teacher,
+                       json={'course_desc': 'Updated.'}).status_code == 200
+    assert _client.put('/api/courses/edit/2', headers=_teacher,
+                       json={'course_desc': 'Updated.'}).status_code == 404
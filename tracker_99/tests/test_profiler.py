@@ -0,0 +1,115 @@
+"""Test methods and functions in profiler.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import os
+import pstats
+
+from flask import Flask
+
+from tracker_99 import create_app
+from tracker_99.profiler import SamplingProfilerMiddleware, add_profiler_middleware
+
+
+def _sampling_app(tmp_path: str, **settings) -> Flask:
+    """Create an application that profiles a sample of requests.
+
+    :param str tmp_path: A temporary directory for the profiles
+    :param settings: Configuration settings to override
+
+    :returns: The application instance
+    :rtype: Flask
+    """
+    _app = create_app(config_name='testing', log_events=False)
+    _app.config.update(PROFILING_MODE='sample', PROFILE_DIR=str(tmp_path), **settings)
+    return add_profiler_middleware(_app)
+
+
+def test_sample_rate_and_merge_by_endpoint(tmp_path: str) -> None:
+    """Test that 1 in N requests are profiled, and their profiles are merged by endpoint.
+
+    :param str tmp_path: A temporary directory for the profiles
+
+    :returns: None
+    :rtype: None
+    """
+    _app = _sampling_app(tmp_path, PROFILE_SAMPLE_RATE=3)
+    _profiler = _app.extensions['profiler']
+    assert isinstance(_profiler, SamplingProfilerMiddleware)
+
+    _client = _app.test_client()
+    for _ in range(9):
+        assert _client.get('/about').status_code == 200
+
+    assert _profiler.stats()['profiled'] == 3
+    assert _profiler.stats()['endpoints'] == {'main_bp.about': 3}
+
+    _profiler.flush()
+    _files = os.listdir(tmp_path)
+    assert len(_files) == 1
+    assert _files[0].endswith('_main_bp.about.prof')
+
+    # The merged profile can be read by pstats
+    _stats = pstats.Stats(os.path.join(tmp_path, _files[0]))
+    assert _stats.total_calls > 0
+
+
+def test_slow_threshold_discards_fast_requests(tmp_path: str) -> None:
+    """Test that profiles of requests faster than PROFILE_SLOW_MS are not kept.
+
+    :param str tmp_path: A temporary directory for the profiles
+
+    :returns: None
+    :rtype: None
+    """
+    _app = _sampling_app(tmp_path, PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_MS=60000)
+    _profiler = _app.extensions['profiler']
+
+    _app.test_client().get('/about')
+
+    assert _profiler.stats()['profiled'] == 1
+    assert _profiler.stats()['kept'] == 0
+    _profiler.flush()
+    assert not os.listdir(tmp_path)
+
+
+def test_flush_writes_totals_outside_stats_lock(tmp_path: str, monkeypatch) -> None:
+    """Test that flush writes without holding the stats lock, and the files keep the totals.
+
+    :param str tmp_path: A temporary directory for the profiles
+    :param monkeypatch: The pytest monkeypatch fixture
+
+    :returns: None
+    :rtype: None
+    """
+    _app = _sampling_app(tmp_path, PROFILE_SAMPLE_RATE=1)
+    _profiler = _app.extensions['profiler']
+    _client = _app.test_client()
+    _locked = []
+    _dump_stats = pstats.Stats.dump_stats
+
+    def _record_dump(stats: pstats.Stats, filename: str) -> None:
+        """Record whether the stats lock is held, then write the profile.
+
+        :param pstats.Stats stats: The profile to write
+        :param str filename: The file to write to
+
+        :returns: None
+        :rtype: None
+        """
+        # pylint: disable-next=protected-access
+        _locked.append(_profiler._stats_lock.locked())
+        _dump_stats(stats, filename)
+
+    monkeypatch.setattr(pstats.Stats, 'dump_stats', _record_dump)
+
+    _client.get('/about')
+    _profiler.flush()
+    _first = pstats.Stats(os.path.join(tmp_path, os.listdir(tmp_path)[0])).total_calls
+    _client.get('/about')
+    _profiler.flush()
+
+    assert _locked == [False, False]
+    assert pstats.Stats(os.path.join(tmp_path, os.listdir(tmp_path)[0])).total_calls > _first
@@ -0,0 +1,221 @@
+"""Test that the association queries use indexes, with EXPLAIN QUERY PLAN.
+
+Each test builds a statement the way the routes do and fails if SQLite plans a full scan
+of a table the statement filters on (e.g., `SCAN associations` instead of
+`SEARCH associations USING COVERING INDEX ix_associations_member_course (member_id=?)`),
+so a changed query or a dropped index is caught before it slows down large databases.
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import re
+
+from flask import Flask
+from sqlalchemy import and_, delete, select, text
+
+from tracker_99 import constants as c
+from tracker_99.listing import assign_candidates_query, course_listing_query
+from tracker_99.models import db
+from tracker_99.models.create_db import upgrade_db
+from tracker_99.models.models import Association, Course, Member, Role
+from tracker_99.serializers import COURSE_DETAILS_SERIALIZER
+# W0611: Unused app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import app, temp_db_app
+
+# W0621: Redefining name 'app' from outer scope is a false positive
+# In pytest, functions require 'app' as an argument
+# pylint: disable=redefined-outer-name
+
+# A step that reads every row of a table, or every entry of one of its indexes
+# (e.g., 'SCAN associations USING COVERING INDEX ...'); index lookups are 'SEARCH' steps
+_TABLE_SCAN = re.compile(r'\bSCAN (\w+)')
+
+_ASSOCIATION_INDEXES = ('ix_associations_member_course', 'ix_associations_role_member')
+
+
+def _query_plan(stmt) -> list:
+    """Get the steps of SQLite's plan for a statement.
+
+    :param stmt: The unexecuted SQLAlchemy statement
+
+    :returns: The detail of each step (e.g., 'SCAN associations')
+    :rtype: list
+    """
+    _sql = stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    return [_row[3] for _row in db.session.execute(text(f'EXPLAIN QUERY PLAN {_sql}'))]
+
+
+def _scanned_tables(stmt) -> set:
+    """Get the tables that SQLite reads in full to run a statement.
+
+    :param stmt: The unexecuted SQLAlchemy statement
+
+    :returns: The names of the scanned tables
+    :rtype: set
+    """
+    _scanned = set()
+    for _step in _query_plan(stmt):
+        _match = _TABLE_SCAN.search(_step)
+        if _match:
+            _scanned.add(_match.group(1))
+    return _scanned
+
+
+def test_member_lookups_use_index(app: Flask) -> None:
+    """Test that the queries that filter associations by member do not scan the table.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        # The course listing on the index page and in the API
+        _stmt, _ = course_listing_query(2, False)
+        assert 'associations' not in _scanned_tables(_stmt)
+        # The privilege map (see privileges.py)
+        assert not _scanned_tables(
+            select(Association.course_id, Association.role_id)
+            .where(Association.member_id == 2))
+        # The privileges in rich token claims (see token_claims.py)
+        assert not _scanned_tables(
+            select(Association.course_id, Role.role_privilege)
+            .join(Role, Role.role_id == Association.role_id)
+            .where(Association.member_id == 2)
+            .limit(51))
+        # Deleting a member
+        assert not _scanned_tables(delete(Association).where(Association.member_id == 2))
+
+
+def test_member_listing_reads_only_member_rows(app: Flask) -> None:
+    """Test that the course listing reads only the member's assignments,
+    using the covering member-first index.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        _stmt, _ = course_listing_query(2, False)
+        _plan = _query_plan(_stmt)
+        assert any('COVERING INDEX ix_associations_member_course (member_id=?)' in _step
+                   for _step in _plan), _plan
+
+
+def test_role_lookups_use_index(app: Flask) -> None:
+    """Test that the queries that filter associations by role do not scan the table.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        # The members whose tokens are stale after a role changes (see token_claims.py)
+        assert not _scanned_tables(
+            select(Association.member_id).distinct().where(Association.role_id == 5))
+        # Deleting a role
+        assert not _scanned_tables(delete(Association).where(Association.role_id == 5))
+
+
+def test_course_lookups_use_index(app: Flask) -> None:
+    """Test that the queries that filter associations by course do not scan the table.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        # The members whose tokens are stale after a course changes (see token_claims.py)
+        assert not _scanned_tables(
+            select(Association.member_id).distinct().where(Association.course_id == 3))
+        # Deleting a course
+        assert not _scanned_tables(delete(Association).where(Association.course_id == 3))
+        # Finding one assignment (see api_routes.py)
+        assert not _scanned_tables(
+            select(Association)
+            .where(Association.course_id == 3, Association.member_id == 2))
+        # The chairs on the course page (see course_routes.py)
+        assert 'associations' not in _scanned_tables(
+            select(Member.member_name)
+            .join(Association, Association.member_id == Member.member_id)
+            .join(Course, Course.course_id == Association.course_id)
+            .join(Role, Role.role_id == Association.role_id)
+            .where(Course.course_id == 3, Role.role_privilege >= c.PRIVILEGE_LVL_OWNER))
+        # The assignments of a course in the API (see api_routes.py)
+        _details = (COURSE_DETAILS_SERIALIZER.select()
+                    .select_from(Association)
+                    .join(Course, Association.course_id == Course.course_id)
+                    .join(Member, Association.member_id == Member.member_id)
+                    .join(Role, Association.role_id == Role.role_id)
+                    .where(Association.course_id == 3))
+        assert not _scanned_tables(_details)
+        assert not _scanned_tables(_details.where(Association.member_id == 2))
+
+
+def test_member_name_lookup_uses_index(app: Flask) -> None:
+    """Test that finding a member by name, regardless of case, does not scan the members.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        # Both logins and the member forms (see auth_routes.py, api_routes.py, member_forms.py)
+        _plan = _query_plan(
+            select(Member).where(Member.member_name_lower == Member.normalize_name('LeTo.ATREIDES')))
+        assert _plan == ['SEARCH members USING INDEX ix_members_member_name_lower '
+                         '(member_name_lower=?)'], _plan
+
+
+def test_member_listings_scan_only_members(app: Flask) -> None:
+    """Test that the listings of members look up each member's assignment by index.
+
+    **NOTE** - These listings show every member, so they read the members table in full.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    with app.app_context():
+        # The members on the assign course page (see listing.py and assignments.py)
+        _stmt, _ = assign_candidates_query(3, 20)
+        assert _scanned_tables(_stmt) <= {'members'}
+        assert _scanned_tables(
+            select(Member.member_id, Association.role_id)
+            .outerjoin(Association, and_(Association.member_id == Member.member_id,
+                                         Association.course_id == 3))
+            .order_by(Member.member_id)) <= {'members'}
+
+
+def test_upgrade_db_adds_indexes(temp_db_app: Flask) -> None:
+    """Test that existing databases get the association indexes at startup.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        for _index in _ASSOCIATION_INDEXES:
+            db.session.execute(text(f'DROP INDEX {_index}'))
+        db.session.commit()
+        # The connections cache prepared statements, with their plans, so open new ones
+        db.engine.dispose()
+        _stmt = select(Association.course_id).where(Association.member_id == 2)
+        assert _scanned_tables(_stmt) == {'associations'}
+
+        upgrade_db()
+        db.session.close()
+        db.engine.dispose()
+
+        _names = set(db.session.scalars(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'associations'")))
+        assert set(_ASSOCIATION_INDEXES) <= _names
+        assert not _scanned_tables(_stmt)
@@ -0,0 +1,73 @@
+"""Test methods and functions in roles_cache.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+from flask import Flask
+from sqlalchemy import event, update
+
+from tracker_99 import constants as c
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.caches import table_versions
+from tracker_99.models import db
+from tracker_99.models.models import Role
+from tracker_99.roles_cache import roles_cache
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_lookups_do_not_query(temp_db_app: Flask) -> None:
+    """Test that the roles are looked up by ID and privilege without querying the database.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: 'table_versions' in args[2] or _statements.append(args[2]))
+
+        assert [_role.role_id for _role in roles_cache.all()] == [2, 3, 4, 5]
+        assert roles_cache.get(4).role_name == 'Teacher'
+        assert roles_cache.by_privilege(c.PRIVILEGE_LVL_OWNER).role_id == 5
+        assert roles_cache.privilege(3) == 10
+        # 'Unassigned' is not stored in the database
+        assert roles_cache.privilege(1) is None
+        assert not _statements
+
+
+def test_changes_reload_the_cache(temp_db_app: Flask) -> None:
+    """Test that the cache is reloaded when a role is changed by the API,
+    or when the version of the roles table changes.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _admin = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+
+    assert _client.put('/api/roles/edit/5', headers=_admin,
+                       json={'role_name': 'Dean'}).status_code == 200
+
+    with temp_db_app.app_context():
+        assert roles_cache.get(5).role_name == 'Dean'
+        _loads = roles_cache.loads
+
+        # Change a role outside the role routes, like another process would,
+        # and clear the cached table versions, as if their time-to-live had passed
+        db.session.execute(update(Role).where(Role.role_id == 4).values(role_name='Professor'))
+        db.session.commit()
+        table_versions.clear()
+        assert roles_cache.get(4).role_name == 'Professor'
+        assert roles_cache.loads == _loads + 1
@@ -0,0 +1,69 @@
+"""Test methods and functions in serializers.py and the list endpoints that use them
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+from flask import Flask
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.models import db
+from tracker_99.models.models import Member, Role
+from tracker_99.serializers import MEMBER_SERIALIZER, ROLE_SERIALIZER
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_serializer_matches_objects(temp_db_app: Flask) -> None:
+    """Test that the serialized rows have the same values as the ORM objects,
+    and that no objects are loaded into the session.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _rows = MEMBER_SERIALIZER.dump_all(
+            db.session.execute(MEMBER_SERIALIZER.select().order_by(Member.member_id)))
+        assert len(db.session.identity_map) == 0
+
+        _members = Member.query.order_by(Member.member_id).all()
+        assert _rows == [{_key: _value for _key, _value in _m.to_dict().items()
+                          if _key != 'member_group'} for _m in _members]
+
+        # Rows with other columns are serialized by field name
+        _row = db.session.execute(
+            ROLE_SERIALIZER.select().add_columns(Role.role_name.label('extra'))).first()
+        assert ROLE_SERIALIZER.dump(_row) == db.session.get(Role, _row.role_id).to_dict()
+
+
+def test_list_endpoints(temp_db_app: Flask) -> None:
+    """Test that the member and role list endpoints and pages return every row.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _headers = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+        _member_count = Member.query.count()
+
+    _members = _client.get('/api/members/all', headers=_headers).get_json()['members']
+    assert len(_members) == _member_count
+    assert set(_members[0]) == {'member_id', 'member_name', 'member_email', 'is_admin'}
+
+    _roles = _client.get('/api/roles/all', headers=_headers).get_json()['roles']
+    assert [_r['role_name'] for _r in _roles] == ['Student', 'Associate', 'Teacher', 'Chair']
+
+    with _client.session_transaction() as _session:
+        _session['_user_id'] = 1
+    assert b'Chair' in _client.get('/roles').get_data()
+    assert b'admin' in _client.get('/members').get_data()
@@ -0,0 +1,60 @@
+"""Test methods and functions in sqlite_pragmas.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import os
+import shutil
+
+import pytest
+from pytest import MonkeyPatch
+from sqlalchemy import text
+
+from tracker_99 import create_app
+from tracker_99.config import Config
+from tracker_99.models import db
+from tracker_99.sqlite_pragmas import pragma_statements
+
+
+def test_pragma_statements() -> None:
+    """Test that only supported pragmas with number or keyword values are accepted.
+
+    :returns: None
+    :rtype: None
+    """
+    assert pragma_statements({'journal_mode': 'WAL', 'cache_size': -2000}) == [
+        'PRAGMA journal_mode = WAL', 'PRAGMA cache_size = -2000']
+    assert not pragma_statements({})
+
+    with pytest.raises(ValueError):
+        pragma_statements({'writable_schema': 'ON'})
+    with pytest.raises(ValueError):
+        pragma_statements({'journal_mode': 'WAL; DROP TABLE members'})
+
+
+def test_production_config(tmp_path: str, monkeypatch: MonkeyPatch) -> None:
+    """Test that the production configuration sets the pragmas on each connection.
+
+    :param str tmp_path: A temporary directory for the copy of the database
+    :param MonkeyPatch monkeypatch: The fixture that overrides the database location
+
+    :returns: None
+    :rtype: None
+    """
+    # WAL mode is stored in the database file, so use a copy
+    _db_path = os.path.join(tmp_path, 'tracker.db')
+    shutil.copyfile(os.path.join(os.path.dirname(__file__), '..', 'tracker.db'), _db_path)
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{_db_path}')
+
+    _app = create_app(config_name='production', log_events=False)
+    with _app.app_context():
+        assert db.engine.pool.size() == 10
+        with db.engine.connect() as _conn:
+            assert _conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            # NORMAL
+            assert _conn.execute(text('PRAGMA synchronous')).scalar() == 1
+            assert _conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            # MEMORY
+            assert _conn.execute(text('PRAGMA temp_store')).scalar() == 2
+        db.engine.dispose()
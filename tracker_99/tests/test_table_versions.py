@@ -0,0 +1,141 @@
+"""Test methods and functions in table_versions.py and conditional GET requests to the API
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+from datetime import datetime, timezone
+
+from flask import Flask
+from sqlalchemy import event, update
+
+from tracker_99.app_utils import encode_auth_token
+from tracker_99.models import db
+from tracker_99.models.models import Member, Role
+from tracker_99.table_versions import get_table_versions
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+
+# W0621: Redefining name 'temp_db_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' as an argument
+# pylint: disable=redefined-outer-name
+
+
+def test_versions_change_on_commit(temp_db_app: Flask) -> None:
+    """Test that a commit increments the versions of the tables it changed, and nothing else.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    with temp_db_app.app_context():
+        _before = get_table_versions(('members', 'roles'))
+
+        # Changes that are rolled back do not count
+        db.session.add(Role(role_name='Auditor', role_privilege=5))
+        db.session.flush()
+        db.session.rollback()
+        assert get_table_versions(('members', 'roles')) == _before
+
+        db.session.add(Role(role_name='Auditor', role_privilege=5))
+        db.session.commit()
+        _after = get_table_versions(('members', 'roles'))
+        assert _after['roles'][0] == _before['roles'][0] + 1
+        assert _after['members'] == _before['members']
+
+        # Statements that do not load objects count as well
+        db.session.execute(update(Member).where(Member.member_id == 2)
+                           .values(member_group='atreides'))
+        db.session.commit()
+        assert get_table_versions(('members',))['members'][0] == _before['members'][0] + 1
+
+
+def test_conditional_get(temp_db_app: Flask) -> None:
+    """Test that a current ETag gets a 304 without querying the table,
+    and that a change or another requester gets a new ETag.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _admin = {'Authorization': f'Bearer {encode_auth_token(1)}'}
+        _member = {'Authorization': f'Bearer {encode_auth_token(2)}'}
+
+    _response = _client.get('/api/roles/all', headers=_admin)
+    assert _response.status_code == 200
+    _etag = _response.headers['ETag']
+
+    _queries = []
+    with temp_db_app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            # pylint: disable=unused-argument, too-many-arguments, too-many-positional-arguments
+            if 'FROM roles' in statement:
+                _queries.append(statement)
+
+    _response = _client.get('/api/roles/all', headers={**_admin, 'If-None-Match': _etag})
+    assert _response.status_code == 304
+    assert _response.headers['ETag'] == _etag
+    assert not _response.get_data()
+    assert not _queries
+
+    # Another requester, or another page of the listing, has its own ETag
+    _courses = _client.get('/api/courses/all', headers=_admin).headers['ETag']
+    assert _client.get('/api/courses/all', headers=_member).headers['ETag'] != _courses
+    assert _client.get('/api/courses/all?limit=5', headers=_admin).headers['ETag'] != _courses
+
+    # Errors are not tagged
+    assert 'ETag' not in _client.get('/api/roles/all', headers=_member).headers
+
+    assert _client.put('/api/roles/edit/5', headers=_admin,
+                       json={'role_name': 'Dean'}).status_code == 200
+    _response = _client.get('/api/roles/all', headers={**_admin, 'If-None-Match': _etag})
+    assert _response.status_code == 200
+    assert _response.headers['ETag'] != _etag
+    assert 'Dean' in _response.get_data(as_text=True)
+
+    # Without If-None-Match, compare the time of the last change with If-Modified-Since
+    _last_modified = _response.headers['Last-Modified']
+    assert _client.get('/api/roles/all', headers={
+        **_admin, 'If-Modified-Since': _last_modified}).status_code == 304
+    _long_ago = datetime(2000, 1, 1, tzinfo=timezone.utc).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    assert _client.get('/api/roles/all', headers={
+        **_admin, 'If-Modified-Since': _long_ago}).status_code == 200
+
+
+def test_conditional_get_checks_authorization(temp_db_app: Flask) -> None:
+    """Test that requesters the route would reject get its error, not 304,
+    even with a current If-Modified-Since.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: None
+    :rtype: None
+    """
+    _client = temp_db_app.test_client()
+    with temp_db_app.app_context():
+        _member = {'Authorization': f'Bearer {encode_auth_token(2)}'}
+        # Change the tables, so If-Modified-Since is compared with the time of the change
+        db.session.execute(update(Member).where(Member.member_id == 3).values(member_group='x'))
+        db.session.execute(update(Role).where(Role.role_id == 5).values(role_name='Dean'))
+        db.session.commit()
+    _future = {**_member, 'If-Modified-Since': datetime(2100, 1, 1, tzinfo=timezone.utc).strftime(
+        '%a, %d %b %Y %H:%M:%S GMT')}
+
+    # Member 2 is not an administrator, and is not assigned to course 2
+    assert _client.get('/api/roles/all', headers=_future).status_code == 403
+    assert _client.get('/api/roles/get/5', headers=_future).status_code == 403
+    assert _client.get('/api/members/all', headers=_future).status_code == 403
+    assert _client.get('/api/members/get/3', headers=_future).status_code == 403
+    assert _client.get('/api/courses/get/2', headers=_future).status_code == 403
+    assert _client.get('/api/courses/get/details/2', headers=_future).status_code == 404
+
+    # Requesters the route allows still get 304
+    for _path in ('/api/members/get/2', '/api/courses/get/1', '/api/courses/get/details/1'):
+        _etag = _client.get(_path, headers=_member).headers['ETag']
+        assert _client.get(_path, headers={**_member, 'If-None-Match': _etag}).status_code == 304
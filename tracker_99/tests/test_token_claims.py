@@ -0,0 +1,258 @@
+"""Test methods and functions in token_claims.py
+
+Run with -s option to allow tests to use the 'print' command within the tests
+to display messages along with pylint output (i.e., `pytest tracker_99/tests -s` or
+`coverage run -m pytest tracker_99/tests -s`)
+"""
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+
+from tracker_99.app_utils import decode_auth_token_claims, encode_auth_token
+from tracker_99.caches import token_versions
+from tracker_99.models import db
+from tracker_99.models.create_db import upgrade_db
+from tracker_99.models.models import Member
+# W0611: Unused temp_db_app imported from . (unused-import) is a false positive
+# pylint: disable=unused-import
+from tracker_99.tests import temp_db_app
+from tracker_99.token_claims import (build_rich_claims, bump_token_versions, current_token_version,
+                                     requester_from_claims)
+
+
+# W0621: Redefining name 'rich_app' from outer scope is a false positive
+# In pytest, functions require 'temp_db_app' and 'rich_app' as arguments
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture()
+def rich_app(temp_db_app: Flask) -> Flask:
+    """Fixture to create an application instance that issues rich tokens.
+
+    :param Flask temp_db_app: An application instance that uses a copy of the database
+
+    :returns: The Flask application instance to test
+    :rtype: Flask
+    """
+    temp_db_app.config['RICH_TOKENS_ENABLED'] = True
+    return temp_db_app
+
+
+def _rich_token(member_id: int) -> str:
+    """Issue a token with rich claims. Call within an application context.
+
+    :param int member_id: The ID of the member
+
+    :returns: The authorization token
+    :rtype: str
+    """
+    return encode_auth_token(member_id,
+                             extra_claims=build_rich_claims(db.session.get(Member, member_id)))
+
+
+def test_build_rich_claims(rich_app: Flask) -> None:
+    """Test that the claims include the member's privilege in each assigned course.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with rich_app.app_context():
+        _claims = decode_auth_token_claims(_rich_token(2))
+
+        assert _claims['sub'] == '2'
+        assert _claims['adm'] is False
+        assert _claims['ver'] == 0
+        assert len(_claims['prv']) == 8
+        assert _claims['prv']['1'] == 30
+
+
+def test_oversized_privileges_omitted(rich_app: Flask) -> None:
+    """Test that members with too many courses get a token without the privilege map.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    rich_app.config['RICH_TOKEN_MAX_COURSES'] = 2
+    with rich_app.app_context():
+        _claims = decode_auth_token_claims(_rich_token(2))
+        _requester = requester_from_claims(_claims)
+
+        assert 'prv' not in _claims
+        assert _requester['member_id'] == 2
+        assert _requester['privileges'] is None
+
+
+def test_bumped_version_makes_token_stale(rich_app: Flask) -> None:
+    """Test that a token issued before a version bump is checked against the database.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with rich_app.app_context():
+        _claims = decode_auth_token_claims(_rich_token(2))
+        assert requester_from_claims(_claims)['privileges'][1] == 30
+
+        bump_token_versions(course_id=1)
+        db.session.commit()
+
+        assert db.session.get(Member, 2).token_version == 1
+        assert requester_from_claims(_claims)['privileges'] is None
+
+
+def test_get_course_authorized_from_claims(rich_app: Flask) -> None:
+    """Test that a rich token is rejected without querying the associations table.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    _statements = []
+
+    with rich_app.app_context():
+        _headers = {'Authorization': f'Bearer {_rich_token(2)}'}
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            # pylint: disable=unused-argument, too-many-arguments, too-many-positional-arguments
+            _statements.append(statement)
+
+    # Member 2 is not assigned to course 2
+    _client = rich_app.test_client()
+    assert _client.get('/api/courses/get/2', headers=_headers).status_code == 403
+
+    assert _statements
+    assert not any('associations' in _s for _s in _statements)
+
+
+def test_upgrade_db_adds_token_versions(rich_app: Flask) -> None:
+    """Test that existing databases get the token versions at startup, so logins keep working.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with rich_app.app_context():
+        db.session.execute(text('ALTER TABLE members DROP COLUMN token_version'))
+        db.session.commit()
+        db.session.close()
+
+        upgrade_db()
+
+        assert set(db.session.scalars(text('SELECT token_version FROM members'))) == {0}
+
+    _response = rich_app.test_client().post(
+        '/api/login', json={'username': 'Leto.Atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 200
+    with rich_app.app_context():
+        assert decode_auth_token_claims(_response.json['auth_token'])['ver'] == 0
+
+
+def test_cached_versions_dropped_after_commit(rich_app: Flask) -> None:
+    """Test that the cached token versions are dropped when the bump commits, not before,
+    so a version read while the transaction is open is not trusted afterward.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    with rich_app.app_context():
+        assert current_token_version(2) == 0
+
+        bump_token_versions([2])
+        # Another request reads the committed version, 0, before this transaction commits
+        token_versions.set(2, 0)
+        db.session.commit()
+        assert token_versions.get(2) is None
+        assert current_token_version(2) == 1
+
+        # The version does not change if the transaction is rolled back
+        bump_token_versions([2])
+        db.session.rollback()
+        assert token_versions.get(2) == 1
+        db.session.commit()
+        assert token_versions.get(2) == 1
+
+
+def test_deleted_member_tokens_rejected(rich_app: Flask) -> None:
+    """Test that the tokens of a deleted member are rejected, even after a new member is added,
+    since the new member never gets the deleted member's ID.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    _client = rich_app.test_client()
+    with rich_app.app_context():
+        _admin = {'Authorization': f'Bearer {_rich_token(1)}'}
+        # Stilgar.Tabr has the highest ID, which SQLite would give to the next member
+        _token = _rich_token(16)
+        _claims = decode_auth_token_claims(_token)
+    _headers = {'Authorization': f'Bearer {_token}'}
+
+    assert _client.get('/api/courses/all', headers=_headers).status_code == 200
+    assert _client.delete('/api/members/delete/16', headers=_admin).status_code == 200
+    assert _client.get('/api/courses/all', headers=_headers).status_code == 404
+
+    with rich_app.app_context():
+        assert token_versions.get(16) is None
+        assert requester_from_claims(_claims) is None
+
+        _member = Member('Farok.Tabr', 'farok.tabr@fremen.com', 'fremen', 'Change.Me.123')
+        db.session.add(_member)
+        db.session.commit()
+        assert _member.member_id == 17
+        assert requester_from_claims(_claims) is None
+
+
+def test_upgrade_db_stops_reusing_member_ids(rich_app: Flask) -> None:
+    """Test that existing databases get a members table that never reuses IDs,
+    without losing members or their course assignments.
+
+    :param Flask rich_app: The Flask application instance used for test
+
+    :returns: None
+    :rtype: None
+    """
+    _count = 'SELECT (SELECT COUNT(*) FROM members), (SELECT COUNT(*) FROM associations)'
+    with rich_app.app_context():
+        _counts = tuple(db.session.execute(text(_count)).one())
+
+        # Replace the table with one without AUTOINCREMENT, as in databases created before it
+        _sql = db.session.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'members'"))
+        db.session.execute(text('DROP INDEX ix_members_member_name_lower'))
+        db.session.execute(text(
+            _sql.replace('AUTOINCREMENT', '').replace('"members"', 'members_old', 1)))
+        db.session.execute(text('INSERT INTO members_old SELECT * FROM members'))
+        db.session.commit()
+        db.session.close()
+        with db.engine.connect() as _conn:
+            _conn.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            _conn.exec_driver_sql('DROP TABLE members')
+            _conn.exec_driver_sql('ALTER TABLE members_old RENAME TO members')
+            _conn.commit()
+        assert 'AUTOINCREMENT' not in db.session.scalar(
+            text("SELECT sql FROM sqlite_master WHERE name = 'members'"))
+        db.session.close()
+
+        upgrade_db()
+
+        assert 'AUTOINCREMENT' in db.session.scalar(
+            text("SELECT sql FROM sqlite_master WHERE name = 'members'"))
+        assert tuple(db.session.execute(text(_count)).one()) == _counts
+        assert not db.session.execute(text('PRAGMA foreign_key_check')).all()
+        assert db.session.scalar(text(
+            "SELECT name FROM sqlite_master WHERE name = 'ix_members_member_name_lower'"))
+
+    _response = rich_app.test_client().post(
+        '/api/login', json={'username': 'Leto.Atreides', 'password': 'Change.Me.123'})
+    assert _response.status_code == 200
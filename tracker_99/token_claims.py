@@ -0,0 +1,278 @@
+"""Rich API token claims, so protected API calls can be authorized without querying the database.
+
+When RICH_TOKENS_ENABLED is True, `/api/login` signs the following claims into the token,
+along with `sub`, `exp`, and `iat`:
+
+    - adm: True if the member is an administrator
+    - ver: The member's token version when the token was issued
+    - prv: A map of course IDs to the member's role privilege in that course
+      (omitted if the member has more than RICH_TOKEN_MAX_COURSES courses)
+
+Whenever a member's privileges or credentials change, call `bump_token_versions()`
+before committing. Tokens that carry an older version are stale, and the requester is
+looked up in the database instead, as are tokens without rich claims.
+The cached versions and tokens of the members are dropped once the transaction commits,
+so a request that reads them while the transaction is open cannot cache the old version again.
+
+Usage:
+- init_token_claims(app)
+- _auth_token = encode_auth_token(member.member_id, extra_claims=build_rich_claims(member))
+- _requester = requester_from_claims(_claims)
+"""
+
+from typing import Union
+
+from flask import Flask, current_app
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from tracker_99.app_utils import validate_input
+from tracker_99.caches import token_cache, token_versions
+from tracker_99.models import db
+from tracker_99.models.models import Association, Member, Role
+
+__all__ = [
+    'build_rich_claims',
+    'bump_token_versions',
+    'current_token_version',
+    'forget_cached_tokens',
+    'init_token_claims',
+    'requester_from_claims',
+]
+
+# The session events are registered once per process for every session,
+# since each application instance (e.g., in tests) creates its own session
+_SESSION_EVENTS_REGISTERED = False
+
+# Key of `Session.info`
+_STALE_MEMBERS = 'stale_token_members'
+
+
+def init_token_claims(app: Flask) -> None:
+    """Drop the cached versions and tokens of the members whose tokens a commit made stale.
+
+    :param Flask app: The application instance
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('app', app, Flask)
+
+    global _SESSION_EVENTS_REGISTERED  # pylint: disable=global-statement
+    if not _SESSION_EVENTS_REGISTERED:
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_transaction_end', _after_transaction_end)
+        _SESSION_EVENTS_REGISTERED = True
+
+
+def build_rich_claims(member: Member) -> dict:
+    """Build the claims that let API routes authorize the member without querying the database.
+
+    :param Member member: The member the token is issued to
+
+    :returns: The adm, ver, and, unless the member has too many courses, prv claims
+    :rtype: dict
+    """
+    # Validate inputs
+    validate_input('member', member, Member)
+
+    _claims = {'adm': bool(member.is_admin), 'ver': member.token_version}
+
+    # Administrators can access every course, so they do not need a privilege map
+    if member.is_admin:
+        return _claims
+
+    _max_courses = int(current_app.config.get('RICH_TOKEN_MAX_COURSES', 50))
+
+    # Get one more row than allowed, to find out if the map would be too large
+    """
+    SELECT associations.course_id, roles.role_privilege
+    FROM associations
+    JOIN roles ON roles.role_id = associations.role_id
+    WHERE associations.member_id = 2
+    LIMIT 51;
+    """
+    _rows = db.session.execute(
+        select(Association.course_id, Role.role_privilege)
+        .join(Role, Role.role_id == Association.role_id)
+        .where(Association.member_id == member.member_id)
+        .limit(_max_courses + 1)
+    ).all()
+
+    # Oversized maps would bloat every request header, so leave them out;
+    # routes will look up the privileges in the database instead
+    if len(_rows) <= _max_courses:
+        # JSON object keys must be strings
+        _claims['prv'] = {str(_course_id): _privilege for _course_id, _privilege in _rows}
+
+    return _claims
+
+
+def current_token_version(member_id: int) -> Union[int, None]:
+    """Get the current token version of a member, using the cache if possible.
+
+    :param int member_id: The ID of the member
+
+    :returns: The token version or None if the member does not exist
+    :rtype: int or None
+    """
+    # Validate inputs
+    validate_input('member_id', member_id, int)
+
+    _version = token_versions.get(member_id)
+    if _version is None:
+        """
+        SELECT token_version FROM members WHERE member_id = 2;
+        """
+        _version = db.session.scalar(
+            select(Member.token_version).where(Member.member_id == member_id)
+        )
+        if _version is not None:
+            token_versions.set(member_id, _version)
+
+    return _version
+
+
+def requester_from_claims(claims: dict) -> Union[dict, None]:
+    """Build a snapshot of the requester from the claims of a verified token.
+
+    If the token has current rich claims, the snapshot is built from the claims alone.
+    Otherwise, the requester is looked up in the database, and `privileges` is None,
+    so routes look up the requester's privileges in the database as well.
+
+    :param dict claims: The decoded payload of a verified token
+
+    :returns: The member_id, is_admin, privileges (a map of course IDs to role privileges \
+        or None), and token_version of the requester, or None if the requester does not exist
+    :rtype: dict or None
+    """
+    # Validate inputs
+    validate_input('claims', claims, dict)
+
+    _member_id = int(claims['sub'])
+
+    # The member was deleted, so the token is no longer valid, whatever its claims
+    _version = current_token_version(_member_id)
+    if _version is None:
+        return None
+
+    if 'ver' in claims and claims['ver'] == _version:
+        _privileges = claims.get('prv')
+        return {
+            'member_id': _member_id,
+            'is_admin': bool(claims.get('adm', False)),
+            'privileges': (
+                None if _privileges is None
+                else {int(_course_id): _level for _course_id, _level in _privileges.items()}
+            ),
+            'token_version': claims['ver'],
+        }
+
+    # Plain or stale token, so fall back to the database
+    """
+    SELECT member_id, is_admin, token_version FROM members WHERE member_id = 2;
+    """
+    _requester = db.session.execute(
+        select(Member.member_id, Member.is_admin, Member.token_version)
+        .where(Member.member_id == _member_id)
+    ).first()
+    if _requester is None:
+        return None
+
+    token_versions.set(_requester.member_id, _requester.token_version)
+    return {
+        'member_id': _requester.member_id,
+        'is_admin': bool(_requester.is_admin),
+        'privileges': None,
+        'token_version': _requester.token_version,
+    }
+
+
+def bump_token_versions(member_ids: Union[list, set, tuple, None] = None,
+                        course_id: Union[int, None] = None,
+                        role_id: Union[int, None] = None) -> None:
+    """Mark the tokens of one or more members as stale.
+
+    **NOTE** - The update is part of the current transaction, so call this function
+    before committing. When deleting a course or role, call it before deleting the associations.
+    This process drops its cached versions and tokens when the transaction commits;
+    other processes keep their cached versions for up to TOKEN_VERSION_TTL seconds.
+
+    :param list or set or tuple or None member_ids: The IDs of the members to update
+    :param int or None course_id: Update every member assigned to this course
+    :param int or None role_id: Update every member assigned to a course with this role
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('member_ids', member_ids, Union[list, set, tuple, None], allow_empty=True)
+    validate_input('course_id', course_id, Union[int, None])
+    validate_input('role_id', role_id, Union[int, None])
+
+    _member_ids = {int(_id) for _id in member_ids or ()}
+
+    if course_id is not None or role_id is not None:
+        """
+        SELECT DISTINCT member_id FROM associations WHERE course_id = 12;
+        """
+        _stmt = select(Association.member_id).distinct()
+        if course_id is not None:
+            _stmt = _stmt.where(Association.course_id == course_id)
+        if role_id is not None:
+            _stmt = _stmt.where(Association.role_id == role_id)
+        _member_ids.update(db.session.scalars(_stmt).all())
+
+    if not _member_ids:
+        return
+
+    """
+    UPDATE members SET token_version = token_version + 1 WHERE member_id IN (2, 3);
+    """
+    db.session.execute(
+        update(Member)
+        .where(Member.member_id.in_(_member_ids))
+        .values(token_version=Member.token_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    forget_cached_tokens(_member_ids)
+
+
+def forget_cached_tokens(member_ids: Union[list, set, tuple]) -> None:
+    """Drop the cached versions and tokens of members when the current transaction commits,
+    e.g., after their token versions change or they are deleted.
+
+    :param list or set or tuple member_ids: The IDs of the members
+
+    :returns: None
+    :rtype: None
+    """
+    # Validate inputs
+    validate_input('member_ids', member_ids, Union[list, set, tuple], allow_empty=True)
+
+    # Until the commit, other requests read the old version, and may cache it again
+    db.session.info.setdefault(_STALE_MEMBERS, set()).update(int(_id) for _id in member_ids)
+
+
+def _after_commit(session: Session) -> None:
+    """Drop the cached versions and tokens, so the next request reads the committed version.
+
+    :returns: None
+    :rtype: None
+    """
+    for _member_id in session.info.pop(_STALE_MEMBERS, ()):
+        token_versions.pop(_member_id)
+        token_cache.invalidate_member(_member_id)
+
+
+def _after_transaction_end(session: Session, transaction) -> None:
+    """Forget the stale members of a transaction that was rolled back or closed.
+
+    :returns: None
+    :rtype: None
+    """
+    # Savepoints end within the outer transaction, which may still commit their changes
+    if transaction.parent is None:
+        session.info.pop(_STALE_MEMBERS, None)